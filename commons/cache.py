@@ -0,0 +1,54 @@
+# commons/cache.py
+"""
+Utilitários para aliases do cache Django usados como estado compartilhado
+entre processos/workers (circuit breaker, contexto fiscal, limites de
+desconto).
+
+LocMemCache e DummyCache vivem em um único processo: contadores e
+invalidações por sinal não chegam aos demais workers.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from django.conf import settings
+from django.core import checks
+
+BACKENDS_POR_PROCESSO = frozenset({
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+})
+
+
+def cache_compartilhado(alias: str) -> bool:
+    """
+    True se o alias aponta para um backend compartilhado entre processos
+    (Redis, Memcached, banco, arquivo).
+    """
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    return backend not in BACKENDS_POR_PROCESSO
+
+
+def checar_cache_compartilhado(*, setting: str, uso: str, id: str) -> List[checks.CheckMessage]:
+    """
+    Mensagem de system check quando o alias em `setting` não é compartilhado:
+    Error em produção, Warning com DEBUG (desenvolvimento em um processo).
+    """
+    alias = getattr(settings, setting, "default")
+    if alias not in settings.CACHES:
+        return [checks.Error(
+            f"{setting}={alias!r} não existe em CACHES.",
+            hint=f"Configure o alias usado por {uso} em CACHES.",
+            id=id,
+        )]
+    if cache_compartilhado(alias):
+        return []
+
+    nivel = checks.Warning if settings.DEBUG else checks.Error
+    return [nivel(
+        f"{setting}={alias!r} usa um backend por processo "
+        f"({settings.CACHES[alias]['BACKEND']}); {uso} não é compartilhado entre workers.",
+        hint=f"Aponte {setting} para um cache compartilhado (Redis/Memcached).",
+        id=id,
+    )]
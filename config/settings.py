@@ -102,7 +102,7 @@ AUTH_USER_MODEL = "usuario.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "usuario.authentication.PdvJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_RATES": {
@@ -166,6 +166,84 @@ CACHES = {
     }
 }
 
+# Numeração NFC-e: "sequencial" (lock no Terminal) ou "bloco" (lease de blocos por processo)
+FISCAL_NFCE_NUMERACAO_MODO = os.getenv("FISCAL_NFCE_NUMERACAO_MODO", "sequencial")
+FISCAL_NFCE_BLOCO_TAMANHO = int(os.getenv("FISCAL_NFCE_BLOCO_TAMANHO", "50"))
+FISCAL_NFCE_BLOCO_TTL_SEGUNDOS = int(os.getenv("FISCAL_NFCE_BLOCO_TTL_SEGUNDOS", "3600"))
+# Emissão NFC-e: após esse tempo (nunca menos que FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS
+# + 30s) um claim cujo processo morreu pode ser reassumido; a SEFAZ é consultada
+# antes de reenviar (nfce_reconciliar_emissoes reconcilia os "em_consulta")
+FISCAL_NFCE_EMISSAO_CLAIM_TTL_SEGUNDOS = int(os.getenv("FISCAL_NFCE_EMISSAO_CLAIM_TTL_SEGUNDOS", "120"))
+# Emissão NFC-e: "sincrono" (SEFAZ na requisição) ou "assincrono" (fila + 202 com URL de status)
+FISCAL_NFCE_EMISSAO_MODO = os.getenv("FISCAL_NFCE_EMISSAO_MODO", "sincrono")
+# Workers da fila: emissões simultâneas por UF (padrão e overrides "SP=8,MG=2")
+FISCAL_NFCE_EMISSAO_LIMITE_POR_UF = int(os.getenv("FISCAL_NFCE_EMISSAO_LIMITE_POR_UF", "4"))
+FISCAL_NFCE_EMISSAO_LIMITES_UF = {
+    uf.strip().upper(): int(limite)
+    for uf, _, limite in (
+        item.partition("=")
+        for item in os.getenv("FISCAL_NFCE_EMISSAO_LIMITES_UF", "").split(",")
+        if "=" in item
+    )
+}
+FISCAL_NFCE_EMISSAO_MAX_TENTATIVAS = int(os.getenv("FISCAL_NFCE_EMISSAO_MAX_TENTATIVAS", "5"))
+FISCAL_NFCE_EMISSAO_JOB_TTL_SEGUNDOS = int(os.getenv("FISCAL_NFCE_EMISSAO_JOB_TTL_SEGUNDOS", "300"))
+# Circuit breaker SEFAZ por (UF, ambiente). O alias de cache precisa ser
+# compartilhado entre processos (Redis/Memcached): por padrão o breaker só fica
+# ativo nesse caso, e o check fiscal.E001 acusa breaker ativo sobre LocMemCache.
+FISCAL_SEFAZ_CB_CACHE = os.getenv("FISCAL_SEFAZ_CB_CACHE", "default")
+FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = os.getenv(
+    "FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO",
+    "0" if CACHES.get(FISCAL_SEFAZ_CB_CACHE, {}).get("BACKEND", "").endswith(("LocMemCache", "DummyCache")) else "1",
+) == "1"
+FISCAL_SEFAZ_CB_LIMITE_FALHAS = int(os.getenv("FISCAL_SEFAZ_CB_LIMITE_FALHAS", "5"))
+FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS = int(os.getenv("FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS", "30"))
+FISCAL_SEFAZ_CB_SONDA_SEGUNDOS = int(os.getenv("FISCAL_SEFAZ_CB_SONDA_SEGUNDOS", "30"))
+# Client SEFAZ: "mock" (MockSefazClient) ou "http" (simulador local,
+# python manage.py sefaz_simulador)
+FISCAL_SEFAZ_CLIENTE = os.getenv("FISCAL_SEFAZ_CLIENTE", "mock")
+FISCAL_SEFAZ_HTTP_URL = os.getenv("FISCAL_SEFAZ_HTTP_URL", "http://127.0.0.1:8765")
+FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS = float(os.getenv("FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS", "10"))
+# Sonda de status SEFAZ (sefaz_status_sonda): janela de amostras por
+# (UF, ambiente) no cache compartilhado, lida pela emissão para escolher
+# contingência imediata e o timeout da chamada
+FISCAL_SEFAZ_STATUS_CACHE = os.getenv("FISCAL_SEFAZ_STATUS_CACHE", "default")
+FISCAL_SEFAZ_STATUS_ROTEAMENTO_ATIVO = os.getenv("FISCAL_SEFAZ_STATUS_ROTEAMENTO_ATIVO", "1") == "1"
+FISCAL_SEFAZ_STATUS_INTERVALO_SEGUNDOS = float(os.getenv("FISCAL_SEFAZ_STATUS_INTERVALO_SEGUNDOS", "15"))
+FISCAL_SEFAZ_STATUS_JANELA = int(os.getenv("FISCAL_SEFAZ_STATUS_JANELA", "20"))
+FISCAL_SEFAZ_STATUS_VALIDADE_SEGUNDOS = int(os.getenv("FISCAL_SEFAZ_STATUS_VALIDADE_SEGUNDOS", "120"))
+FISCAL_SEFAZ_STATUS_FALHAS_CONTINGENCIA = int(os.getenv("FISCAL_SEFAZ_STATUS_FALHAS_CONTINGENCIA", "3"))
+FISCAL_SEFAZ_STATUS_DISPONIBILIDADE_MINIMA = float(os.getenv("FISCAL_SEFAZ_STATUS_DISPONIBILIDADE_MINIMA", "0.5"))
+FISCAL_SEFAZ_STATUS_FATOR_TIMEOUT = float(os.getenv("FISCAL_SEFAZ_STATUS_FATOR_TIMEOUT", "4"))
+FISCAL_SEFAZ_STATUS_TIMEOUT_MINIMO = float(os.getenv("FISCAL_SEFAZ_STATUS_TIMEOUT_MINIMO", "1"))
+# Assinatura NFC-e: chaves A1 decifradas mantidas por processo (LRU) e
+# função (caminho pontilhado) que decifra FilialCertificadoA1.senha_hash
+FISCAL_A1_CACHE_MAX_FILIAIS = int(os.getenv("FISCAL_A1_CACHE_MAX_FILIAIS", "256"))
+FISCAL_A1_SENHA_DECIFRADOR = os.getenv("FISCAL_A1_SENHA_DECIFRADOR", "")
+# Auditoria fiscal: "transacao" (um INSERT multi-linha no fim da transação) ou
+# "outbox" (nfce_auditoria_outbox, drenada com COPY por nfce_auditoria_outbox)
+FISCAL_AUDITORIA_MODO = os.getenv("FISCAL_AUDITORIA_MODO", "transacao")
+FISCAL_AUDITORIA_OUTBOX_LOTE = int(os.getenv("FISCAL_AUDITORIA_OUTBOX_LOTE", "1000"))
+# nfce_documento / nfce_auditoria particionadas por mês: partições criadas à
+# frente (nfce_particoes) e retenção antes do arquivamento (nfce_arquivar_particoes)
+FISCAL_NFCE_PARTICOES_MESES_A_FRENTE = int(os.getenv("FISCAL_NFCE_PARTICOES_MESES_A_FRENTE", "3"))
+FISCAL_NFCE_RETENCAO_MESES = int(os.getenv("FISCAL_NFCE_RETENCAO_MESES", "60"))
+FISCAL_NFCE_ARQUIVO_DIR = os.getenv("FISCAL_NFCE_ARQUIVO_DIR", "")
+# Cache do contexto fiscal por (usuário, terminal): vínculo, séries, UF/ambiente
+# e validade do A1. Invalidado por sinais; nunca vive além do vencimento do A1.
+# Precisa ser compartilhado entre processos (check fiscal.E002)
+FISCAL_CONTEXTO_CACHE = os.getenv("FISCAL_CONTEXTO_CACHE", "default")
+FISCAL_CONTEXTO_CACHE_TTL_SEGUNDOS = int(os.getenv("FISCAL_CONTEXTO_CACHE_TTL_SEGUNDOS", "300"))
+# Cache dos limites de desconto por (terminal, filial, perfil do operador).
+# Invalidado por sinais de Terminal, Filial e UserPerfil; precisa ser
+# compartilhado entre processos (check vendas.E001)
+VENDAS_LIMITES_DESCONTO_CACHE = os.getenv("VENDAS_LIMITES_DESCONTO_CACHE", "default")
+VENDAS_LIMITES_DESCONTO_CACHE_TTL_SEGUNDOS = int(os.getenv("VENDAS_LIMITES_DESCONTO_CACHE_TTL_SEGUNDOS", "300"))
+# JWT: User remontado das claims assinadas do login (sem SELECT por requisição).
+# A lista de revogação (jti / por usuário) precisa de cache compartilhado.
+AUTH_JWT_CLAIMS_CONFIAVEIS = os.getenv("AUTH_JWT_CLAIMS_CONFIAVEIS", "0") == "1"
+AUTH_REVOGACAO_CACHE = os.getenv("AUTH_REVOGACAO_CACHE", "default")
+
 REST_FRAMEWORK.update({
     "DEFAULT_THROTTLE_CLASSES": ["rest_framework.throttling.UserRateThrottle"],
     "DEFAULT_THROTTLE_RATES": {"user": "60/min"},  # prod
@@ -2,7 +2,7 @@
 from django.contrib import admin
 from django.urls import path, include
 
-from vendas.api.v1.views import FinalizarVendaNfceView
+from vendas.api.v1.views import AdicionarItensLoteView, FinalizarVendaNfceView
 
 urlpatterns = [
     path("api/v1/usuario/", include("usuario.urls")),
@@ -24,5 +24,10 @@ urlpatterns = [
         FinalizarVendaNfceView.as_view(),
         name="pdv-venda-finalizar-nfce",
     ),
+    path(
+        "api/v1/pdv/vendas/<uuid:venda_id>/itens/lote/",
+        AdicionarItensLoteView.as_view(),
+        name="pdv-venda-itens-lote",
+    ),
 
 ]
@@ -4,3 +4,9 @@ class FiscalConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "fiscal"
     verbose_name = "Fiscal (NFC-e)"
+
+    def ready(self):
+        from fiscal import checks  # noqa: F401 - registra os system checks
+        from fiscal.signals import conectar_sinais_contexto_fiscal
+
+        conectar_sinais_contexto_fiscal()
@@ -0,0 +1,31 @@
+# fiscal/checks.py
+"""
+System checks do app fiscal: estado em cache que precisa ser compartilhado
+entre processos.
+"""
+
+from django.conf import settings
+from django.core import checks
+
+from commons.cache import checar_cache_compartilhado
+
+
+@checks.register(checks.Tags.caches)
+def checar_cache_circuit_breaker(app_configs=None, **kwargs):
+    if not getattr(settings, "FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO", False):
+        return []
+    return checar_cache_compartilhado(
+        setting="FISCAL_SEFAZ_CB_CACHE",
+        uso="o estado do circuit breaker SEFAZ",
+        id="fiscal.E001",
+    )
+
+
+@checks.register(checks.Tags.caches)
+def checar_cache_contexto_fiscal(app_configs=None, **kwargs):
+    # a invalidação por sinais só alcança os outros workers pelo cache
+    return checar_cache_compartilhado(
+        setting="FISCAL_CONTEXTO_CACHE",
+        uso="o contexto fiscal (e sua invalidação por sinais)",
+        id="fiscal.E002",
+    )
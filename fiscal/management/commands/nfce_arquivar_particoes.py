@@ -0,0 +1,104 @@
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.services.particionamento_service import (
+    TABELAS_PARTICIONADAS,
+    arquivar_particao,
+    inicio_do_mes,
+    particoes_fechadas,
+    somar_meses,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta as partições mensais fechadas de nfce_documento/nfce_auditoria "
+        "para CSV comprimido e as desanexa (DETACH). O índice global de "
+        "documentos é mantido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--antes-de",
+            type=str,
+            default=None,
+            help=(
+                "Arquiva meses anteriores a AAAA-MM. "
+                "Padrão: mês corrente menos FISCAL_NFCE_RETENCAO_MESES."
+            ),
+        )
+        parser.add_argument(
+            "--destino",
+            type=str,
+            default=None,
+            help="Diretório dos arquivos (padrão FISCAL_NFCE_ARQUIVO_DIR).",
+        )
+        parser.add_argument(
+            "--remover",
+            action="store_true",
+            help="Remove (DROP) a partição após exportar; sem a opção ela fica desanexada.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas lista as partições que seriam arquivadas.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def _antes_de(self, valor):
+        if not valor:
+            retencao = getattr(settings, "FISCAL_NFCE_RETENCAO_MESES", 60)
+            return somar_meses(inicio_do_mes(timezone.localdate()), -retencao)
+        try:
+            ano, mes = valor.split("-")
+            return date(int(ano), int(mes), 1)
+        except ValueError:
+            raise CommandError("--antes-de deve estar no formato AAAA-MM.")
+
+    def handle(self, *args, **options):
+        antes_de = self._antes_de(options["antes_de"])
+        destino = options["destino"] or getattr(settings, "FISCAL_NFCE_ARQUIVO_DIR", "")
+        if not destino and not options["dry_run"]:
+            raise CommandError("Informe --destino ou configure FISCAL_NFCE_ARQUIVO_DIR.")
+
+        for schema in self._schemas(options["schema_name"]):
+            with schema_context(schema):
+                for tabela in TABELAS_PARTICIONADAS:
+                    for particao in particoes_fechadas(tabela, antes_de=antes_de):
+                        if options["dry_run"]:
+                            self.stdout.write(f"[nfce_arquivar_particoes] {schema}: {particao.nome} (dry-run)")
+                            continue
+                        arquivada = arquivar_particao(
+                            particao, destino=Path(destino), remover=options["remover"]
+                        )
+                        self.stdout.write(
+                            self.style.SUCCESS(
+                                f"[nfce_arquivar_particoes] {schema}: {particao.nome} → "
+                                f"{arquivada.arquivo} ({arquivada.linhas} linha(s), "
+                                f"sha256 {arquivada.sha256[:12]}…)"
+                                f"{' removida' if arquivada.removida else ' desanexada'}."
+                            )
+                        )
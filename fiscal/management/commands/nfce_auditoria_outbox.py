@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.services.auditoria_service import DEFAULT_OUTBOX_LOTE, drenar_outbox_auditoria
+
+
+class Command(BaseCommand):
+    help = (
+        "Drena nfce_auditoria_outbox para nfce_auditoria com COPY, em ordem de "
+        "registro (FISCAL_AUDITORIA_MODO=outbox)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--tamanho-lote",
+            type=int,
+            default=None,
+            help=f"Linhas por COPY/transação (padrão FISCAL_AUDITORIA_OUTBOX_LOTE, {DEFAULT_OUTBOX_LOTE}).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete as passadas até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=1.0,
+            help="Segundos entre passadas no modo contínuo.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def _drenar(self, tamanho_lote):
+        total = 0
+        while True:
+            movidas = drenar_outbox_auditoria(tamanho_lote=tamanho_lote)
+            total += movidas
+            if movidas == 0 or (tamanho_lote and movidas < tamanho_lote):
+                return total
+
+    def handle(self, *args, **options):
+        schemas = self._schemas(options["schema_name"])
+        tamanho_lote = options["tamanho_lote"]
+
+        try:
+            while True:
+                for schema in schemas:
+                    inicio = time.monotonic()
+                    with schema_context(schema):
+                        total = self._drenar(tamanho_lote)
+                    if total or not options["continuo"]:
+                        self.stdout.write(
+                            self.style.SUCCESS(
+                                f"[nfce_auditoria_outbox] {schema}: {total} evento(s) "
+                                f"em {time.monotonic() - inicio:.2f}s."
+                            )
+                        )
+
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("[nfce_auditoria_outbox] Interrompido."))
@@ -0,0 +1,156 @@
+import multiprocessing
+import time
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.services.emissao_fila_service import identificador_worker, processar_fila
+
+
+def _parse_limites(valores: List[str]) -> Dict[str, int]:
+    limites = {}
+    for valor in valores or []:
+        uf, sep, limite = valor.partition("=")
+        if not sep or not limite.strip().isdigit():
+            raise CommandError(f"--limite-uf inválido: {valor!r} (use UF=N, ex.: SP=8).")
+        limites[uf.strip().upper()] = int(limite)
+    return limites
+
+
+def _drenar_uma_rodada(schemas: List[str], limites: Dict[str, int], lote: int) -> int:
+    """
+    Uma rodada por todos os schemas; no máximo `lote` jobs por schema,
+    para que um tenant com fila grande não atrase os demais.
+    """
+    worker = identificador_worker()
+    total = 0
+    for schema in schemas:
+        with schema_context(schema):
+            total += processar_fila(worker=worker, limites=limites, max_jobs=lote)
+    return total
+
+
+def _executar_worker(schemas: List[str], limites: Dict[str, int], lote: int, intervalo: float) -> None:
+    """
+    Loop de um processo worker: drena a fila e dorme quando não há trabalho.
+    """
+    try:
+        while True:
+            if not _drenar_uma_rodada(schemas, limites, lote):
+                time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de emissão NFC-e assíncrona (nfce_emissao_job): "
+        "reivindica jobs com SKIP LOCKED e emite respeitando o limite por UF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--processos",
+            type=int,
+            default=1,
+            help="Quantidade de processos worker.",
+        )
+        parser.add_argument(
+            "--limite-uf",
+            action="append",
+            default=[],
+            help=(
+                "Emissões simultâneas por UF, ex.: --limite-uf SP=8 --limite-uf MG=2. "
+                "Sem override, vale FISCAL_NFCE_EMISSAO_LIMITE_POR_UF."
+            ),
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=20,
+            help="Máximo de jobs por schema a cada rodada.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=1.0,
+            help="Segundos de espera quando a fila está vazia.",
+        )
+        parser.add_argument(
+            "--uma-vez",
+            action="store_true",
+            help="Drena a fila uma vez (processo atual) e encerra.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def handle(self, *args, **options):
+        limites = _parse_limites(options["limite_uf"])
+        schemas = self._schemas(options["schema_name"])
+        lote = max(options["lote"], 1)
+
+        if options["uma_vez"]:
+            total = 0
+            while True:
+                processados = _drenar_uma_rodada(schemas, limites, lote)
+                if not processados:
+                    break
+                total += processados
+            self.stdout.write(
+                self.style.SUCCESS(f"[nfce_emissao_worker] Concluído. Jobs processados: {total}.")
+            )
+            return
+
+        processos = max(options["processos"], 1)
+        self.stdout.write(
+            self.style.NOTICE(
+                f"[nfce_emissao_worker] Iniciando {processos} processo(s) para "
+                f"{len(schemas)} schema(s). Limites por UF: {limites or 'padrão'}."
+            )
+        )
+
+        # Conexões não podem ser compartilhadas entre processos (fork)
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        filhos = [
+            ctx.Process(
+                target=_executar_worker,
+                args=(schemas, limites, lote, options["intervalo"]),
+                name=f"nfce-emissao-worker-{i}",
+            )
+            for i in range(processos)
+        ]
+        for proc in filhos:
+            proc.start()
+
+        try:
+            for proc in filhos:
+                proc.join()
+        except KeyboardInterrupt:
+            for proc in filhos:
+                proc.terminate()
+            for proc in filhos:
+                proc.join()
+
+        self.stdout.write(self.style.SUCCESS("[nfce_emissao_worker] Encerrado."))
@@ -0,0 +1,74 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from fiscal.sefaz_clients import MAX_NFCE_POR_LOTE
+from fiscal.services.emissao_lote_service import (
+    emitir_pre_emissoes_em_lote,
+    regularizar_contingencias_em_lote,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Transmite NFC-e em lotes (enviNFe) agrupados por filial/UF/ambiente: "
+        "escoa pré-emissões sem documento ou regulariza contingências pendentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Nome do schema do tenant a processar. "
+                "Se não informado, usa o schema atual."
+            ),
+        )
+        parser.add_argument(
+            "--regularizar-contingencia",
+            action="store_true",
+            help="Reenvia documentos em contingencia_pendente em vez de pré-emissões pendentes.",
+        )
+        parser.add_argument(
+            "--tamanho-lote",
+            type=int,
+            default=MAX_NFCE_POR_LOTE,
+            help=f"Documentos por lote (máximo {MAX_NFCE_POR_LOTE}).",
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=None,
+            help="Máximo de documentos nesta execução.",
+        )
+
+    def handle(self, *args, **options):
+        schema_name = options["schema_name"]
+        ctx = schema_context(schema_name) if schema_name else nullcontext()
+
+        if options["regularizar_contingencia"]:
+            dispatcher = regularizar_contingencias_em_lote
+            nome = "regularização de contingência"
+        else:
+            dispatcher = emitir_pre_emissoes_em_lote
+            nome = "emissão de pendentes"
+
+        self.stdout.write(self.style.NOTICE(f"[nfce_emitir_lote] Iniciando {nome}."))
+
+        with ctx:
+            resumo = dispatcher(
+                tamanho_lote=options["tamanho_lote"],
+                limite=options["limite"],
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[nfce_emitir_lote] Concluído. Lotes: {resumo.lotes} "
+                f"(erro técnico: {resumo.lotes_com_erro_tecnico}), "
+                f"documentos: {resumo.documentos}, autorizadas: {resumo.autorizadas}, "
+                f"rejeitadas: {resumo.rejeitadas}, contingência: {resumo.contingencia}, "
+                f"ignorados: {resumo.ignorados}."
+            )
+        )
@@ -0,0 +1,85 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from fiscal.services.numero_bloco_service import (
+    liberar_blocos_expirados,
+    listar_faixas_nao_utilizadas,
+    marcar_blocos_reportados,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Lista as faixas de numeração NFC-e arrendadas em bloco e não utilizadas, "
+        "para encaminhamento à inutilização na SEFAZ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Nome do schema do tenant onde a tabela nfce_numero_bloco está. "
+                "Se não informado, usa o schema atual."
+            ),
+        )
+        parser.add_argument(
+            "--terminal-id",
+            type=str,
+            default=None,
+            help="Filtra por terminal.",
+        )
+        parser.add_argument(
+            "--serie",
+            type=int,
+            default=None,
+            help="Filtra por série.",
+        )
+        parser.add_argument(
+            "--liberar-expirados",
+            action="store_true",
+            help="Antes de listar, libera os blocos ativos cujo lease já expirou.",
+        )
+        parser.add_argument(
+            "--marcar-reportados",
+            action="store_true",
+            help="Marca os blocos listados como reportados (não aparecem na próxima execução).",
+        )
+
+    def handle(self, *args, **options):
+        schema_name = options["schema_name"]
+
+        ctx = schema_context(schema_name) if schema_name else nullcontext()
+
+        with ctx:
+            if options["liberar_expirados"]:
+                liberados = liberar_blocos_expirados()
+                self.stdout.write(
+                    self.style.NOTICE(
+                        f"[nfce_numeros_nao_utilizados] Blocos expirados liberados: {liberados}."
+                    )
+                )
+
+            faixas = listar_faixas_nao_utilizadas(
+                terminal_id=options["terminal_id"],
+                serie=options["serie"],
+            )
+
+            for faixa in faixas:
+                self.stdout.write(
+                    f"filial={faixa.filial_id} terminal={faixa.terminal_id} "
+                    f"serie={faixa.serie} numero_inicial={faixa.numero_inicial} "
+                    f"numero_final={faixa.numero_final}"
+                )
+
+            if options["marcar_reportados"]:
+                marcar_blocos_reportados({f.bloco_id for f in faixas})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[nfce_numeros_nao_utilizados] Concluído. Faixas: {len(faixas)}."
+            )
+        )
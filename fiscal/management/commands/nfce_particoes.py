@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.services.particionamento_service import garantir_particoes, meses_a_frente
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria as partições mensais futuras de nfce_documento/nfce_auditoria "
+        "(FISCAL_NFCE_PARTICOES_MESES_A_FRENTE). Idempotente; agendar diariamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=None,
+            help="Meses à frente do corrente (padrão FISCAL_NFCE_PARTICOES_MESES_A_FRENTE).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete a verificação até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=3600.0,
+            help="Segundos entre verificações no modo contínuo.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def handle(self, *args, **options):
+        meses = options["meses"] if options["meses"] is not None else meses_a_frente()
+
+        try:
+            while True:
+                for schema in self._schemas(options["schema_name"]):
+                    with schema_context(schema):
+                        criadas = garantir_particoes(meses=meses)
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"[nfce_particoes] {schema}: {len(criadas)} partição(ões) criada(s)"
+                            f"{': ' + ', '.join(criadas) if criadas else ''}."
+                        )
+                    )
+
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("[nfce_particoes] Interrompido."))
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.services.emissao_consulta_service import reconciliar_emissoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcilia emissões NFC-e com resultado incerto (documentos em_consulta "
+        "e claims vencidos) pela consulta de situação na SEFAZ, sem reenvio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=None,
+            help="Máximo de documentos/claims por caso e tenant em cada passada.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete as passadas até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=30.0,
+            help="Segundos entre passadas no modo contínuo.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def handle(self, *args, **options):
+        schemas = self._schemas(options["schema_name"])
+
+        try:
+            while True:
+                for schema in schemas:
+                    with schema_context(schema):
+                        resumo = reconciliar_emissoes(limite=options["limite"])
+                    if resumo.consultados or not options["continuo"]:
+                        self.stdout.write(
+                            self.style.SUCCESS(
+                                f"[nfce_reconciliar_emissoes] {schema}: consultados {resumo.consultados}, "
+                                f"autorizadas {resumo.autorizadas}, contingência {resumo.contingencia}, "
+                                f"claims liberados {resumo.claims_liberados}, pendentes {resumo.pendentes}."
+                            )
+                        )
+
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("[nfce_reconciliar_emissoes] Interrompido."))
@@ -0,0 +1,150 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from fiscal.management.commands.nfce_emissao_worker import _parse_limites
+from fiscal.models import NfceRegularizacaoCursor
+from fiscal.sefaz_clients import MAX_NFCE_POR_LOTE
+from fiscal.services.contingencia_regularizacao_service import (
+    DEFAULT_TAMANHO_PAGINA,
+    regularizar_contingencias_paralelo,
+    reiniciar_cursor,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Regulariza o backlog de NFC-e em contingencia_pendente: varredura pelo "
+        "índice parcial, lotes com concorrência limitada por UF e checkpoint "
+        "retomável. Reporta throughput e backlog restante por tenant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--limite-uf",
+            action="append",
+            default=[],
+            help=(
+                "Lotes simultâneos por UF, ex.: --limite-uf SP=8 --limite-uf MG=2. "
+                "Sem override, vale FISCAL_NFCE_EMISSAO_LIMITE_POR_UF."
+            ),
+        )
+        parser.add_argument(
+            "--tamanho-lote",
+            type=int,
+            default=MAX_NFCE_POR_LOTE,
+            help=f"Documentos por lote (máximo {MAX_NFCE_POR_LOTE}).",
+        )
+        parser.add_argument(
+            "--tamanho-pagina",
+            type=int,
+            default=DEFAULT_TAMANHO_PAGINA,
+            help="Documentos lidos por página (o checkpoint avança a cada página).",
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=None,
+            help="Máximo aproximado de documentos por tenant nesta execução.",
+        )
+        parser.add_argument(
+            "--cursor",
+            type=str,
+            default=NfceRegularizacaoCursor.NOME_PADRAO,
+            help="Nome do checkpoint (permite varreduras independentes).",
+        )
+        parser.add_argument(
+            "--reiniciar",
+            action="store_true",
+            help="Descarta o checkpoint e recomeça a varredura do início.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete as passadas até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=30.0,
+            help="Segundos entre passadas no modo contínuo.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def _relatar(self, relatorio):
+        backlog = ", ".join(f"{uf or '??'}={total}" for uf, total in relatorio.backlog_restante.items())
+        if relatorio.em_execucao:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"[nfce_regularizar_contingencia] {relatorio.tenant}: já em execução por "
+                    f"outro worker. Backlog: {relatorio.total_backlog} ({backlog or '-'})."
+                )
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[nfce_regularizar_contingencia] {relatorio.tenant}: "
+                f"{relatorio.documentos} documento(s) em {relatorio.duracao_segundos:.1f}s "
+                f"({relatorio.documentos_por_segundo:.1f}/s), lotes: {relatorio.lotes}, "
+                f"autorizadas: {relatorio.autorizadas}, rejeitadas: {relatorio.rejeitadas}, "
+                f"pendentes por erro técnico: {relatorio.contingencia}, "
+                f"ignorados: {relatorio.ignorados}. "
+                f"Backlog restante: {relatorio.total_backlog} ({backlog or '-'})"
+                f"{'' if relatorio.passada_concluida else ' — checkpoint mantido'}."
+            )
+        )
+
+    def handle(self, *args, **options):
+        limites = _parse_limites(options["limite_uf"])
+        schemas = self._schemas(options["schema_name"])
+
+        self.stdout.write(
+            self.style.NOTICE(
+                f"[nfce_regularizar_contingencia] Iniciando para {len(schemas)} schema(s). "
+                f"Limites por UF: {limites or 'padrão'}."
+            )
+        )
+
+        try:
+            while True:
+                for schema in schemas:
+                    with schema_context(schema):
+                        if options["reiniciar"]:
+                            reiniciar_cursor(options["cursor"])
+                        relatorio = regularizar_contingencias_paralelo(
+                            nome_cursor=options["cursor"],
+                            limites=limites,
+                            tamanho_lote=options["tamanho_lote"],
+                            tamanho_pagina=max(options["tamanho_pagina"], 1),
+                            limite=options["limite"],
+                        )
+                    self._relatar(relatorio)
+
+                options["reiniciar"] = False
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(
+                self.style.NOTICE("[nfce_regularizar_contingencia] Interrompido; checkpoint preservado.")
+            )
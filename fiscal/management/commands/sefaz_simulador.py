@@ -0,0 +1,61 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fiscal.sefaz_simulador import PERFIS_EXEMPLO, SimuladorSefaz, carregar_perfis, criar_servidor
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe o simulador local da SEFAZ (HTTP/JSON) com perfis de latência e "
+        "falha por UF. Aponte o PDV com FISCAL_SEFAZ_CLIENTE=http e FISCAL_SEFAZ_HTTP_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", type=str, default="127.0.0.1")
+        parser.add_argument("--porta", type=int, default=8765)
+        parser.add_argument(
+            "--perfis",
+            type=str,
+            default=None,
+            help='Arquivo JSON {"SP": {...}, "*": {...}} com os campos de PerfilSefaz.',
+        )
+        parser.add_argument(
+            "--exemplo",
+            action="store_true",
+            help="Usa os perfis de exemplo (SP lenta, MG instável).",
+        )
+        parser.add_argument(
+            "--semente",
+            type=int,
+            default=None,
+            help="Semente dos sorteios (latência/falhas reprodutíveis).",
+        )
+
+    def _perfis(self, options):
+        if options["perfis"]:
+            try:
+                with open(options["perfis"], encoding="utf-8") as arquivo:
+                    return carregar_perfis(json.load(arquivo))
+            except (OSError, ValueError, TypeError) as exc:
+                raise CommandError(f"--perfis inválido: {exc}")
+        if options["exemplo"]:
+            return dict(PERFIS_EXEMPLO)
+        return None
+
+    def handle(self, *args, **options):
+        simulador = SimuladorSefaz(self._perfis(options), semente=options["semente"])
+        servidor = criar_servidor(simulador, host=options["host"], porta=options["porta"])
+
+        host, porta = servidor.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(f"[sefaz_simulador] ouvindo em http://{host}:{porta}"))
+        for uf, perfil in sorted(simulador.perfis.items()):
+            self.stdout.write(f"[sefaz_simulador] {uf}: {json.dumps(asdict(perfil))}")
+
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
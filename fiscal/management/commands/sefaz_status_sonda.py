@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from fiscal.sefaz_factory import AMBIENTES, SUPPORTED_UFS, _normalize_ambiente, _normalize_uf, criar_sefaz_client
+from fiscal.sefaz_status import sondar
+
+
+class Command(BaseCommand):
+    help = (
+        "Sonda de status da SEFAZ (consStatServ) por (UF, ambiente): grava "
+        "latência e disponibilidade no cache compartilhado (fiscal.sefaz_status), "
+        "usado pela emissão para contingência imediata e timeout dinâmico."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--uf",
+            action="append",
+            default=[],
+            help="UF a sondar (repetível). Padrão: todas as UFs suportadas.",
+        )
+        parser.add_argument(
+            "--ambiente",
+            action="append",
+            default=[],
+            help="Ambiente a sondar (repetível: homolog, producao). Padrão: ambos.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete a sonda até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=None,
+            help="Segundos entre rodadas no modo contínuo (padrão FISCAL_SEFAZ_STATUS_INTERVALO_SEGUNDOS).",
+        )
+
+    def _pares(self, options) -> List[Tuple[str, str]]:
+        ufs = sorted({_normalize_uf(uf) for uf in options["uf"]}) or sorted(SUPPORTED_UFS)
+        ambientes = [_normalize_ambiente(a) for a in options["ambiente"]] or list(AMBIENTES)
+        invalidos = [a for a in ambientes if a not in AMBIENTES]
+        if invalidos:
+            raise CommandError(f"--ambiente inválido: {', '.join(invalidos)} (use homolog ou producao).")
+        return [(uf, ambiente) for uf in ufs for ambiente in ambientes]
+
+    def handle(self, *args, **options):
+        pares = self._pares(options)
+        intervalo = options["intervalo"]
+        if intervalo is None:
+            intervalo = float(getattr(settings, "FISCAL_SEFAZ_STATUS_INTERVALO_SEGUNDOS", 15))
+
+        # Client sem circuit breaker: a sonda precisa chegar à SEFAZ mesmo
+        # com o circuito aberto
+        clients = {par: criar_sefaz_client(*par) for par in pares}
+
+        # Pares sondados em paralelo: uma UF lenta não atrasa as demais
+        executor = ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="sefaz-sonda")
+        try:
+            while True:
+                futuros = [
+                    executor.submit(sondar, client, uf, ambiente)
+                    for (uf, ambiente), client in clients.items()
+                ]
+                for futuro in futuros:
+                    saude = futuro.result()
+                    estilo = self.style.SUCCESS if not saude.falhas_consecutivas else self.style.WARNING
+                    self.stdout.write(
+                        estilo(
+                            f"[sefaz_status_sonda] {saude.uf}/{saude.ambiente}: cStat {saude.ultimo_codigo}, "
+                            f"disponibilidade {saude.disponibilidade:.0%}, "
+                            f"p95 {saude.latencia_p95_ms if saude.latencia_p95_ms is not None else '-'} ms"
+                        )
+                    )
+
+                if not options["continuo"]:
+                    break
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.shutdown(wait=False)
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-17 09:12
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0005_alter_nfceauditoria_codigo_retorno'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceNumeroBloco',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('terminal_id', models.UUIDField()),
+                ('filial_id', models.UUIDField()),
+                ('serie', models.PositiveIntegerField()),
+                ('numero_inicial', models.PositiveIntegerField()),
+                ('numero_final', models.PositiveIntegerField()),
+                ('proximo_numero', models.PositiveIntegerField()),
+                ('holder', models.CharField(max_length=128)),
+                ('status', models.CharField(choices=[('ativo', 'Ativo'), ('esgotado', 'Esgotado'), ('liberado', 'Liberado')], default='ativo', max_length=16)),
+                ('leased_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('reportado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'nfce_numero_bloco',
+                'indexes': [models.Index(fields=['terminal_id', 'serie', 'status'], name='idx_nfce_bloco_term_status'), models.Index(fields=['holder', 'status'], name='idx_nfce_bloco_holder')],
+                'constraints': [models.UniqueConstraint(fields=('terminal_id', 'serie', 'numero_inicial'), name='uniq_nfce_bloco_terminal_serie_inicio')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:05
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_sequencias_nfce(apps, schema_editor):
+    """
+    Cria a sequência NFC-e (modelo 65) de cada terminal/série que já possui
+    reservas, partindo do maior número reservado.
+    """
+    NfceNumeroReserva = apps.get_model("fiscal", "NfceNumeroReserva")
+    DocumentoFiscalSequencia = apps.get_model("fiscal", "DocumentoFiscalSequencia")
+    Terminal = apps.get_model("terminal", "Terminal")
+
+    terminais = set(Terminal.objects.values_list("id", flat=True))
+    ultimos = (
+        NfceNumeroReserva.objects.values("terminal_id", "serie")
+        .annotate(ultimo=Max("numero"))
+        .order_by()
+    )
+    for row in ultimos:
+        if row["terminal_id"] not in terminais:
+            continue
+        DocumentoFiscalSequencia.objects.get_or_create(
+            terminal_id=row["terminal_id"],
+            modelo="65",
+            serie=row["serie"],
+            defaults={"numero_atual": row["ultimo"] or 0},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0006_nfcenumerobloco'),
+        ('terminal', '0010_terminal_desconto_automatico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoFiscalSequencia',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('modelo', models.CharField(choices=[('55', 'NF-e (55)'), ('65', 'NFC-e (65)')], help_text='Modelo de documento fiscal (55=NF-e, 65=NFC-e).', max_length=2)),
+                ('serie', models.PositiveIntegerField(default=1, help_text='Série fiscal para este modelo de documento neste terminal.')),
+                ('numero_atual', models.PositiveIntegerField(default=0, help_text='Último número utilizado. Próximo será numero_atual + 1.')),
+                ('ativo', models.BooleanField(default=True, help_text='Se desativado, essa sequência não será mais usada.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('terminal', models.ForeignKey(help_text='Terminal ao qual esta sequência pertence.', on_delete=django.db.models.deletion.PROTECT, related_name='sequencias_fiscais', to='terminal.terminal')),
+            ],
+            options={
+                'verbose_name': 'Sequência de Documento Fiscal',
+                'verbose_name_plural': 'Sequências de Documentos Fiscais',
+                'db_table': 'documento_fiscal_sequencia',
+                'ordering': ['terminal__filial__razao_social', 'terminal__identificador', 'modelo', 'serie'],
+                'indexes': [models.Index(fields=['terminal'], name='idx_sequencia_terminal'), models.Index(fields=['modelo'], name='idx_sequencia_modelo'), models.Index(fields=['ativo'], name='idx_sequencia_ativo')],
+                'constraints': [models.UniqueConstraint(fields=('terminal', 'modelo', 'serie'), name='uniq_sequencia_terminal_modelo_serie')],
+            },
+        ),
+        migrations.RunPython(seed_sequencias_nfce, migrations.RunPython.noop),
+    ]
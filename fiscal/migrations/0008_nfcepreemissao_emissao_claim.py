@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0007_documentofiscalsequencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfcepreemissao',
+            name='emissao_iniciada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='nfcepreemissao',
+            name='emissao_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
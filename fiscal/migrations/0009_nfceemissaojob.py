@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:05
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0008_nfcepreemissao_emissao_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceEmissaoJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField(unique=True)),
+                ('pre_emissao_id', models.UUIDField()),
+                ('filial_id', models.UUIDField()),
+                ('terminal_id', models.UUIDField()),
+                ('venda_id', models.UUIDField(blank=True, null=True)),
+                ('user_id', models.BigIntegerField()),
+                ('uf', models.CharField(max_length=2)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=16)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('worker', models.CharField(blank=True, max_length=128, null=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('nfce_documento_id', models.UUIDField(blank=True, null=True)),
+                ('codigo_erro', models.CharField(blank=True, max_length=32, null=True)),
+                ('mensagem_erro', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'nfce_emissao_job',
+                'indexes': [models.Index(fields=['status', 'uf', 'disponivel_em'], name='idx_nfce_job_fila')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 13:10
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0009_nfceemissaojob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceRegularizacaoCursor',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome', models.CharField(default='contingencia', max_length=64, unique=True)),
+                ('ultimo_created_at', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_documento_id', models.UUIDField(blank=True, null=True)),
+                ('passada_iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('documentos', models.PositiveIntegerField(default=0)),
+                ('autorizadas', models.PositiveIntegerField(default=0)),
+                ('rejeitadas', models.PositiveIntegerField(default=0)),
+                ('pendentes_erro_tecnico', models.PositiveIntegerField(default=0)),
+                ('ultima_passada_concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'nfce_regularizacao_cursor',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='nfcedocumento',
+            index=models.Index(condition=models.Q(('em_contingencia', True), ('status', 'contingencia_pendente')), fields=['created_at', 'id'], name='idx_nfce_doc_contingencia'),
+        ),
+    ]
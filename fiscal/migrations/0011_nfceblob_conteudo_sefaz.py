@@ -0,0 +1,169 @@
+# Generated by Django 5.0.6 on 2026-10-17 14:20
+
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models, transaction
+from django.db.models import Q
+
+TAMANHO_LOTE = 500
+
+CAMPOS = (
+    ("xml_autorizado", "xml_autorizado_blob_id", "xml"),
+    ("raw_sefaz_response", "raw_sefaz_response_blob_id", "json"),
+)
+
+
+def _serializar(tipo, valor):
+    if tipo == "json":
+        return json.dumps(
+            valor, sort_keys=True, separators=(",", ":"), ensure_ascii=False, cls=DjangoJSONEncoder
+        ).encode("utf-8")
+    return str(valor).encode("utf-8")
+
+
+def _migrar_para_blobs(Model, NfceBlob):
+    filtro = Q(xml_autorizado__isnull=False) | Q(raw_sefaz_response__isnull=False)
+    ultimo = None
+    while True:
+        qs = Model.objects.filter(filtro).order_by("pk").only("pk", "xml_autorizado", "raw_sefaz_response")
+        if ultimo is not None:
+            qs = qs.filter(pk__gt=ultimo)
+        linhas = list(qs[:TAMANHO_LOTE])
+        if not linhas:
+            return
+
+        blobs = {}
+        for obj in linhas:
+            for campo, campo_id, tipo in CAMPOS:
+                valor = getattr(obj, campo)
+                if valor is None:
+                    continue
+                dados = _serializar(tipo, valor)
+                hash_ = hashlib.sha256(dados).hexdigest()
+                if hash_ not in blobs:
+                    blobs[hash_] = NfceBlob(
+                        hash=hash_,
+                        tipo=tipo,
+                        compressao="zlib",
+                        conteudo=zlib.compress(dados, 6),
+                        tamanho_original=len(dados),
+                    )
+                setattr(obj, campo_id, hash_)
+
+        with transaction.atomic():
+            NfceBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+            Model.objects.bulk_update(linhas, ["xml_autorizado_blob", "raw_sefaz_response_blob"])
+        ultimo = linhas[-1].pk
+
+
+def _restaurar_dos_blobs(Model, NfceBlob):
+    filtro = Q(xml_autorizado_blob__isnull=False) | Q(raw_sefaz_response_blob__isnull=False)
+    ultimo = None
+    while True:
+        qs = Model.objects.filter(filtro).order_by("pk")
+        if ultimo is not None:
+            qs = qs.filter(pk__gt=ultimo)
+        linhas = list(qs[:TAMANHO_LOTE])
+        if not linhas:
+            return
+
+        hashes = {getattr(obj, campo_id) for obj in linhas for _, campo_id, _ in CAMPOS} - {None}
+        valores = {}
+        for blob in NfceBlob.objects.filter(hash__in=hashes):
+            texto = zlib.decompress(bytes(blob.conteudo)).decode("utf-8")
+            valores[blob.hash] = json.loads(texto) if blob.tipo == "json" else texto
+
+        for obj in linhas:
+            for campo, campo_id, _ in CAMPOS:
+                hash_ = getattr(obj, campo_id)
+                if hash_ is not None:
+                    setattr(obj, campo, valores[hash_])
+
+        with transaction.atomic():
+            Model.objects.bulk_update(linhas, ["xml_autorizado", "raw_sefaz_response"])
+        ultimo = linhas[-1].pk
+
+
+def mover_conteudo_para_blobs(apps, schema_editor):
+    """
+    Backfill em lotes (keyset por pk, uma transação por lote): grava o
+    conteúdo de xml_autorizado/raw_sefaz_response em NfceBlob e aponta os
+    documentos/auditorias para o hash.
+    """
+    NfceBlob = apps.get_model("fiscal", "NfceBlob")
+    for nome in ("NfceDocumento", "NfceAuditoria"):
+        _migrar_para_blobs(apps.get_model("fiscal", nome), NfceBlob)
+
+
+def restaurar_conteudo_dos_blobs(apps, schema_editor):
+    NfceBlob = apps.get_model("fiscal", "NfceBlob")
+    for nome in ("NfceDocumento", "NfceAuditoria"):
+        _restaurar_dos_blobs(apps.get_model("fiscal", nome), NfceBlob)
+
+
+class Migration(migrations.Migration):
+
+    # Backfill em lotes com transação própria (tabelas grandes)
+    atomic = False
+
+    dependencies = [
+        ('fiscal', '0010_nfceregularizacaocursor_idx_contingencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=8)),
+                ('compressao', models.CharField(default='zlib', max_length=8)),
+                ('conteudo', models.BinaryField()),
+                ('tamanho_original', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'nfce_blob',
+            },
+        ),
+        migrations.AddField(
+            model_name='nfcedocumento',
+            name='xml_autorizado_blob',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.AddField(
+            model_name='nfcedocumento',
+            name='raw_sefaz_response_blob',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.AddField(
+            model_name='nfceauditoria',
+            name='xml_autorizado_blob',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.AddField(
+            model_name='nfceauditoria',
+            name='raw_sefaz_response_blob',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.RunPython(mover_conteudo_para_blobs, restaurar_conteudo_dos_blobs),
+        migrations.RemoveField(
+            model_name='nfcedocumento',
+            name='xml_autorizado',
+        ),
+        migrations.RemoveField(
+            model_name='nfcedocumento',
+            name='raw_sefaz_response',
+        ),
+        migrations.RemoveField(
+            model_name='nfceauditoria',
+            name='xml_autorizado',
+        ),
+        migrations.RemoveField(
+            model_name='nfceauditoria',
+            name='raw_sefaz_response',
+        ),
+    ]
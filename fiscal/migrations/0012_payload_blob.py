@@ -0,0 +1,150 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:05
+
+import django.db.models.deletion
+import hashlib
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models, transaction
+
+TAMANHO_LOTE = 500
+
+
+def _serializar_payload(valor):
+    try:
+        return json.dumps(valor, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except TypeError:
+        return json.dumps(valor, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder).encode("utf-8")
+
+
+def _blob(NfceBlob, valor):
+    dados = _serializar_payload(valor)
+    return NfceBlob(
+        hash=hashlib.sha256(dados).hexdigest(),
+        tipo="payload",
+        compressao="zlib",
+        conteudo=zlib.compress(dados, 6),
+        tamanho_original=len(dados),
+    )
+
+
+def _em_lotes(qs):
+    ultimo = None
+    while True:
+        lote = qs.order_by("pk")
+        if ultimo is not None:
+            lote = lote.filter(pk__gt=ultimo)
+        linhas = list(lote[:TAMANHO_LOTE])
+        if not linhas:
+            return
+        yield linhas
+        ultimo = linhas[-1].pk
+
+
+def mover_payloads_para_blobs(apps, schema_editor):
+    """
+    Backfill em lotes (uma transação por lote): payload da pré-emissão e
+    payload_enviado do documento passam a apontar para o mesmo NfceBlob.
+    Documento sem payload_enviado, mas com hash de um payload conhecido,
+    passa a referenciar esse blob.
+    """
+    NfceBlob = apps.get_model("fiscal", "NfceBlob")
+    NfcePreEmissao = apps.get_model("fiscal", "NfcePreEmissao")
+    NfceDocumento = apps.get_model("fiscal", "NfceDocumento")
+
+    for linhas in _em_lotes(NfcePreEmissao.objects.only("pk", "payload")):
+        blobs = {}
+        for pre in linhas:
+            blob = _blob(NfceBlob, pre.payload)
+            blobs.setdefault(blob.hash, blob)
+            pre.payload_blob_id = blob.hash
+        with transaction.atomic():
+            NfceBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+            NfcePreEmissao.objects.bulk_update(linhas, ["payload_blob"])
+
+    docs = NfceDocumento.objects.exclude(payload_enviado__isnull=True, hash_payload_enviado__isnull=True)
+    for linhas in _em_lotes(docs.only("pk", "payload_enviado", "hash_payload_enviado")):
+        blobs = {}
+        so_hash = {}
+        for doc in linhas:
+            if doc.payload_enviado is not None:
+                blob = _blob(NfceBlob, doc.payload_enviado)
+                blobs.setdefault(blob.hash, blob)
+                doc.payload_enviado_blob_id = blob.hash
+            else:
+                so_hash[doc.hash_payload_enviado] = doc
+        existentes = set(NfceBlob.objects.filter(hash__in=list(so_hash)).values_list("hash", flat=True))
+        for hash_, doc in so_hash.items():
+            if hash_ in existentes:
+                doc.payload_enviado_blob_id = hash_
+        with transaction.atomic():
+            NfceBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+            NfceDocumento.objects.bulk_update(linhas, ["payload_enviado_blob"])
+
+
+def restaurar_payloads(apps, schema_editor):
+    NfceBlob = apps.get_model("fiscal", "NfceBlob")
+    NfcePreEmissao = apps.get_model("fiscal", "NfcePreEmissao")
+    NfceDocumento = apps.get_model("fiscal", "NfceDocumento")
+
+    def _valores(hashes):
+        return {
+            blob.hash: json.loads(zlib.decompress(bytes(blob.conteudo)).decode("utf-8"))
+            for blob in NfceBlob.objects.filter(hash__in=list(hashes - {None}))
+        }
+
+    for linhas in _em_lotes(NfcePreEmissao.objects.all()):
+        valores = _valores({pre.payload_blob_id for pre in linhas})
+        for pre in linhas:
+            pre.payload = valores.get(pre.payload_blob_id, {})
+        with transaction.atomic():
+            NfcePreEmissao.objects.bulk_update(linhas, ["payload"])
+
+    for linhas in _em_lotes(NfceDocumento.objects.filter(payload_enviado_blob__isnull=False)):
+        valores = _valores({doc.payload_enviado_blob_id for doc in linhas})
+        for doc in linhas:
+            doc.payload_enviado = valores.get(doc.payload_enviado_blob_id)
+            doc.hash_payload_enviado = doc.payload_enviado_blob_id
+        with transaction.atomic():
+            NfceDocumento.objects.bulk_update(linhas, ["payload_enviado", "hash_payload_enviado"])
+
+
+class Migration(migrations.Migration):
+
+    # Backfill em lotes com transação própria (tabelas grandes)
+    atomic = False
+
+    dependencies = [
+        ('fiscal', '0011_nfceblob_conteudo_sefaz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfcepreemissao',
+            name='payload_blob',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.AddField(
+            model_name='nfcedocumento',
+            name='payload_enviado_blob',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Payload enviado ao parceiro fiscal; hash SHA256 usado para idempotência e reconciliação.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+        migrations.RunPython(mover_payloads_para_blobs, restaurar_payloads),
+        migrations.RemoveField(
+            model_name='nfcepreemissao',
+            name='payload',
+        ),
+        migrations.RemoveField(
+            model_name='nfcedocumento',
+            name='payload_enviado',
+        ),
+        migrations.RemoveField(
+            model_name='nfcedocumento',
+            name='hash_payload_enviado',
+        ),
+        migrations.AlterField(
+            model_name='nfcepreemissao',
+            name='payload_blob',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='fiscal.nfceblob'),
+        ),
+    ]
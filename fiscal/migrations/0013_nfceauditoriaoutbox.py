@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:40
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0012_payload_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceAuditoriaOutbox',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField()),
+                ('dados', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'nfce_auditoria_outbox',
+            },
+        ),
+    ]
@@ -0,0 +1,274 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:20
+
+import re
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import migrations, models
+
+MESES_A_FRENTE = 3
+
+DOCUMENTO = "nfce_documento"
+AUDITORIA = "nfce_auditoria"
+INDICE = "nfce_documento_indice"
+GATILHO = "nfce_documento_indice_sync"
+
+COLUNAS_INDICE = "id, request_id, chave_acesso, filial_id, serie, numero, created_at"
+
+
+def _q(nome):
+    return '"%s"' % nome.replace('"', '""')
+
+
+def _somar_meses(inicio, meses):
+    total = inicio.year * 12 + (inicio.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _limite(dia):
+    return datetime(dia.year, dia.month, dia.day, tzinfo=dt_timezone.utc)
+
+
+def _indices(cursor, tabela):
+    """
+    Índices que não pertencem a constraints (PK/UNIQUE), como CREATE INDEX.
+    """
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(x.indexrelid)
+          FROM pg_index x
+         WHERE x.indrelid = to_regclass(%s)
+           AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid)
+        """,
+        [tabela],
+    )
+    return [re.sub(r" ON ONLY ", " ON ", linha[0]) for linha in cursor.fetchall()]
+
+
+def _fks_saida(cursor, tabela):
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+          FROM pg_constraint
+         WHERE conrelid = to_regclass(%s) AND contype = 'f' AND conparentid = 0
+        """,
+        [tabela],
+    )
+    return cursor.fetchall()
+
+
+def _fks_entrada(cursor, tabela):
+    cursor.execute(
+        """
+        SELECT conname, conrelid::regclass::text, pg_get_constraintdef(oid)
+          FROM pg_constraint
+         WHERE confrelid = to_regclass(%s) AND contype = 'f' AND conparentid = 0
+           AND conrelid <> confrelid
+        """,
+        [tabela],
+    )
+    return cursor.fetchall()
+
+
+def _reapontar(definicao, alvo):
+    return re.sub(r"REFERENCES\s+\S+?\(id\)", f"REFERENCES {_q(alvo)}(id)", definicao)
+
+
+def _mes_inicial(cursor, tabela):
+    cursor.execute(f"SELECT min(created_at) FROM {_q(tabela)}")
+    menor = cursor.fetchone()[0]
+    hoje = datetime.now(dt_timezone.utc).date()
+    menor = menor.astimezone(dt_timezone.utc).date() if menor else hoje
+    return date(menor.year, menor.month, 1), date(hoje.year, hoje.month, 1)
+
+
+def _recriar_tabela(cursor, tabela, *, particionada):
+    """
+    Recria a tabela (particionada por mês de created_at ou simples) com os
+    mesmos dados, índices, CHECKs e FKs de saída. FKs de entrada devem ser
+    tratadas por quem chama.
+    """
+    indices = _indices(cursor, tabela)
+    fks = _fks_saida(cursor, tabela)
+    legado = f"{tabela}_legado"
+
+    if particionada:
+        primeiro_mes, mes_corrente = _mes_inicial(cursor, tabela)
+
+    cursor.execute(f"ALTER TABLE {_q(tabela)} RENAME TO {_q(legado)}")
+    cursor.execute(
+        f"CREATE TABLE {_q(tabela)} (LIKE {_q(legado)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        + (" PARTITION BY RANGE (created_at)" if particionada else "")
+    )
+
+    if particionada:
+        mes = primeiro_mes
+        ultimo = _somar_meses(mes_corrente, MESES_A_FRENTE)
+        while mes <= ultimo:
+            proximo = _somar_meses(mes, 1)
+            cursor.execute(
+                f"CREATE TABLE {_q(f'{tabela}_p{mes:%Y%m}')} PARTITION OF {_q(tabela)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [_limite(mes), _limite(proximo)],
+            )
+            mes = proximo
+        cursor.execute(f"CREATE TABLE {_q(f'{tabela}_padrao')} PARTITION OF {_q(tabela)} DEFAULT")
+
+    cursor.execute(f"INSERT INTO {_q(tabela)} SELECT * FROM {_q(legado)}")
+    cursor.execute(f"DROP TABLE {_q(legado)}")
+
+    chave = "id, created_at" if particionada else "id"
+    cursor.execute(f"ALTER TABLE {_q(tabela)} ADD CONSTRAINT {_q(f'{tabela}_pkey')} PRIMARY KEY ({chave})")
+    for definicao in indices:
+        cursor.execute(definicao)
+    for nome, definicao in fks:
+        cursor.execute(f"ALTER TABLE {_q(tabela)} ADD CONSTRAINT {_q(nome)} {definicao}")
+
+
+def _criar_gatilho(cursor):
+    cursor.execute("SELECT current_schema()")
+    schema = _q(cursor.fetchone()[0])
+    cursor.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION {schema}.{GATILHO}() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO {schema}.{INDICE} ({COLUNAS_INDICE})
+                VALUES (NEW.id, NEW.request_id, NEW.chave_acesso, NEW.filial_id, NEW.serie, NEW.numero, NEW.created_at);
+            ELSIF TG_OP = 'UPDATE' THEN
+                IF (NEW.id, NEW.request_id, NEW.chave_acesso, NEW.filial_id, NEW.serie, NEW.numero, NEW.created_at)
+                   IS DISTINCT FROM
+                   (OLD.id, OLD.request_id, OLD.chave_acesso, OLD.filial_id, OLD.serie, OLD.numero, OLD.created_at) THEN
+                    UPDATE {schema}.{INDICE}
+                       SET id = NEW.id, request_id = NEW.request_id, chave_acesso = NEW.chave_acesso,
+                           filial_id = NEW.filial_id, serie = NEW.serie, numero = NEW.numero,
+                           created_at = NEW.created_at
+                     WHERE id = OLD.id;
+                END IF;
+            ELSIF coalesce(current_setting('pdv.nfce_movendo_particao', true), '') <> 'on' THEN
+                DELETE FROM {schema}.{INDICE} WHERE id = OLD.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {GATILHO} AFTER INSERT OR UPDATE OR DELETE ON {schema}.{DOCUMENTO} "
+        f"FOR EACH ROW EXECUTE FUNCTION {schema}.{GATILHO}()"
+    )
+
+
+def _particionada(cursor, tabela):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [tabela])
+    return cursor.fetchone() is not None
+
+
+def particionar(apps, schema_editor):
+    """
+    nfce_documento e nfce_auditoria passam a ser particionadas por mês de
+    created_at (partições do primeiro mês com dados até MESES_A_FRENTE meses
+    à frente, mais a partição padrão). Unicidade e FKs que apontavam para
+    nfce_documento(id) vão para nfce_documento_indice.
+
+    Executada por vendas 0014, depois que toda FK para nfce_documento
+    (Venda.nfce_documento) existe.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if _particionada(cursor, DOCUMENTO):
+            return
+
+        entrantes = _fks_entrada(cursor, DOCUMENTO)
+        for nome, tabela, _ in entrantes:
+            cursor.execute(f"ALTER TABLE {tabela} DROP CONSTRAINT {_q(nome)}")
+
+        _recriar_tabela(cursor, DOCUMENTO, particionada=True)
+        cursor.execute(f"INSERT INTO {INDICE} ({COLUNAS_INDICE}) SELECT {COLUNAS_INDICE} FROM {DOCUMENTO}")
+        _criar_gatilho(cursor)
+
+        for nome, tabela, definicao in entrantes:
+            cursor.execute(f"ALTER TABLE {tabela} ADD CONSTRAINT {_q(nome)} {_reapontar(definicao, INDICE)}")
+
+        _recriar_tabela(cursor, AUDITORIA, particionada=True)
+
+
+def desparticionar(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if not _particionada(cursor, DOCUMENTO):
+            return
+
+        _recriar_tabela(cursor, AUDITORIA, particionada=False)
+
+        cursor.execute(f"DROP TRIGGER IF EXISTS {GATILHO} ON {DOCUMENTO}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {GATILHO}()")
+
+        entrantes = _fks_entrada(cursor, INDICE)
+        for nome, tabela, _ in entrantes:
+            cursor.execute(f"ALTER TABLE {tabela} DROP CONSTRAINT {_q(nome)}")
+
+        _recriar_tabela(cursor, DOCUMENTO, particionada=False)
+        cursor.execute(f"ALTER TABLE {DOCUMENTO} ADD CONSTRAINT nfce_documento_chave_acesso_key UNIQUE (chave_acesso)")
+        cursor.execute(f"ALTER TABLE {DOCUMENTO} ADD CONSTRAINT nfce_documento_request_id_key UNIQUE (request_id)")
+        cursor.execute(
+            f"ALTER TABLE {DOCUMENTO} ADD CONSTRAINT nfce_documento_filial_serie_numero_uniq "
+            f"UNIQUE (filial_id, serie, numero)"
+        )
+
+        for nome, tabela, definicao in entrantes:
+            cursor.execute(f"ALTER TABLE {tabela} ADD CONSTRAINT {_q(nome)} {_reapontar(definicao, DOCUMENTO)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0013_nfceauditoriaoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NfceDocumentoIndice',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField(unique=True)),
+                ('chave_acesso', models.CharField(max_length=47, unique=True)),
+                ('filial_id', models.UUIDField()),
+                ('serie', models.PositiveIntegerField()),
+                ('numero', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'nfce_documento_indice',
+                'unique_together': {('filial_id', 'serie', 'numero')},
+            },
+        ),
+        # Unicidade passa para nfce_documento_indice; as constraints antigas
+        # somem junto com a tabela original em particionar(), executada por
+        # vendas 0014 (a FK Venda.nfce_documento precisa existir para ser
+        # reapontada, e depender de vendas aqui puxaria vendas 0001 para
+        # antes de metodoPagamento 0001 no plano de migração)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='nfcedocumento',
+                    name='chave_acesso',
+                    field=models.CharField(max_length=47),
+                ),
+                migrations.AlterField(
+                    model_name='nfcedocumento',
+                    name='request_id',
+                    field=models.UUIDField(),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='nfcedocumento',
+                    unique_together=set(),
+                ),
+            ],
+        ),
+    ]
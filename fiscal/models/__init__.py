@@ -1,16 +1,30 @@
+from .nfce_blob_models import NfceBlob
 from .nfce_models import NfceNumeroReserva, NfceDocumento, NfceAuditoria
+from .nfce_auditoria_outbox_models import NfceAuditoriaOutbox
+from .nfce_documento_indice_models import NfceDocumentoIndice
+from .nfce_numero_bloco_models import NfceNumeroBloco
 from .pre_emissao_models import NfcePreEmissao
+from .nfce_emissao_job_models import NfceEmissaoJob
+from .nfce_regularizacao_cursor_models import NfceRegularizacaoCursor
 from .nfce_inutilizacao_models import NfceInutilizacao
+from .documento_sequencia_models import DocumentoFiscalSequencia
 from .cest_models import CEST
 from .ncm_models import NCM
 
 
 __all__ = [
     "NfceNumeroReserva",
+    "NfceNumeroBloco",
     "NfceDocumento",
+    "NfceDocumentoIndice",
     "NfceAuditoria",
+    "NfceAuditoriaOutbox",
+    "NfceBlob",
     "NfcePreEmissao",
+    "NfceEmissaoJob",
+    "NfceRegularizacaoCursor",
     "NfceInutilizacao",
+    "DocumentoFiscalSequencia",
     "CEST",
     "NCM",
 ]
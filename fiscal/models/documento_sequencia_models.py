@@ -1,10 +1,6 @@
-# empresas/models.py (exemplo – ajuste para o seu app)
 import uuid
 from django.db import models
 
-# importa Terminal do mesmo arquivo ou do local correto
-# from .models import Terminal  # se estiver no mesmo arquivo, não precisa
-
 class DocumentoFiscalSequencia(models.Model):
     """
     Controla a numeração fiscal (série e número atual) por terminal
@@ -14,6 +10,10 @@ class DocumentoFiscalSequencia(models.Model):
       - Terminal A, modelo 65, série 1 -> numeração NFC-e
       - Terminal A, modelo 55, série 2 -> numeração NF-e
       - Terminal B, modelo 65, série 1 -> outra sequência
+
+    A reserva de número é um único UPDATE ... RETURNING nesta linha
+    (fiscal.services.sequencia_service), sem lock explícito no Terminal.
+    Em tenant schema (TENANT_APPS).
     """
 
     MODELO_NFE = "55"
@@ -30,7 +30,7 @@ class DocumentoFiscalSequencia(models.Model):
     )
 
     terminal = models.ForeignKey(
-        "Terminal",                            # string p/ evitar problema de ordem
+        "terminal.Terminal",                   # string p/ evitar import circular
         on_delete=models.PROTECT,
         related_name="sequencias_fiscais",
         help_text="Terminal ao qual esta sequência pertence.",
@@ -65,6 +65,7 @@ class DocumentoFiscalSequencia(models.Model):
     )
 
     class Meta:
+        db_table = "documento_fiscal_sequencia"
         verbose_name = "Sequência de Documento Fiscal"
         verbose_name_plural = "Sequências de Documentos Fiscais"
         ordering = [
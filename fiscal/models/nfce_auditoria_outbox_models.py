@@ -0,0 +1,30 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class NfceAuditoriaOutbox(models.Model):
+    """
+    Outbox durável da auditoria fiscal (FISCAL_AUDITORIA_MODO="outbox").
+
+    - A transação da operação grava aqui a linha de NfceAuditoria já pronta
+      (colunas em `dados`, mesmo id/created_at); tabela estreita, sem os
+      índices de nfce_auditoria.
+    - O flusher (nfce_auditoria_outbox) drena em ordem de id com COPY para
+      nfce_auditoria e apaga as linhas na mesma transação: cada evento entra
+      uma única vez e na ordem em que foi registrado.
+    Em tenant schema (TENANT_APPS).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+
+    request_id = models.UUIDField()
+    dados = models.JSONField(encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "nfce_auditoria_outbox"
+
+    def __str__(self):
+        return f"Outbox auditoria {self.id} req={self.request_id}"
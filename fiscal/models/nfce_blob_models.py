@@ -0,0 +1,204 @@
+import hashlib
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class NfceBlob(models.Model):
+    """
+    Armazenamento endereçado por conteúdo dos blobs fiscais (XML autorizado,
+    resposta bruta da SEFAZ, payload da NFC-e).
+
+    - Chave = SHA-256 do conteúdo original: o mesmo XML gravado no documento
+      e na auditoria (ou o mesmo payload da pré-emissão e do documento)
+      ocupa uma única linha.
+    - Conteúdo comprimido (zlib); fica fora do heap de nfce_documento /
+      nfce_auditoria, que guardam só o hash.
+    - Linhas imutáveis: inserção com ON CONFLICT DO NOTHING.
+    Em tenant schema (TENANT_APPS).
+    """
+
+    TIPO_XML = "xml"
+    TIPO_JSON = "json"
+    # JSON canônico (sort_keys, separadores compactos, ASCII): o hash é o
+    # hash_payload_enviado usado na idempotência/reconciliação
+    TIPO_PAYLOAD = "payload"
+
+    COMPRESSAO_ZLIB = "zlib"
+    NIVEL_COMPRESSAO = 6
+
+    hash = models.CharField(max_length=64, primary_key=True)
+    tipo = models.CharField(max_length=8)
+    compressao = models.CharField(max_length=8, default=COMPRESSAO_ZLIB)
+    conteudo = models.BinaryField()
+    tamanho_original = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "nfce_blob"
+
+    def __str__(self):
+        return f"Blob {self.tipo} {self.hash[:12]} ({self.tamanho_original} bytes)"
+
+    # -------------------------
+    # Serialização
+    # -------------------------
+    @staticmethod
+    def serializar(tipo: str, valor) -> bytes:
+        if tipo == NfceBlob.TIPO_PAYLOAD:
+            try:
+                return json.dumps(valor, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            except TypeError:
+                return json.dumps(
+                    valor, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder
+                ).encode("utf-8")
+        if tipo == NfceBlob.TIPO_JSON:
+            return json.dumps(
+                valor, sort_keys=True, separators=(",", ":"), ensure_ascii=False, cls=DjangoJSONEncoder
+            ).encode("utf-8")
+        return str(valor).encode("utf-8")
+
+    @classmethod
+    def preparar(cls, tipo: str, valor) -> "NfceBlob":
+        """
+        Instância (não salva) com hash e conteúdo comprimido.
+        """
+        dados = cls.serializar(tipo, valor)
+        return cls(
+            hash=hashlib.sha256(dados).hexdigest(),
+            tipo=tipo,
+            conteudo=zlib.compress(dados, cls.NIVEL_COMPRESSAO),
+            tamanho_original=len(dados),
+        )
+
+    def valor(self):
+        dados = bytes(self.conteudo)
+        if self.compressao == self.COMPRESSAO_ZLIB:
+            dados = zlib.decompress(dados)
+        texto = dados.decode("utf-8")
+        return texto if self.tipo == self.TIPO_XML else json.loads(texto)
+
+    # -------------------------
+    # Persistência
+    # -------------------------
+    @classmethod
+    def guardar(cls, blobs) -> None:
+        unicos = {blob.hash: blob for blob in blobs}
+        if unicos:
+            cls.objects.bulk_create(unicos.values(), ignore_conflicts=True)
+
+    @classmethod
+    def carregar(cls, hash_: str):
+        return cls.objects.get(pk=hash_).valor()
+
+
+def _campos_reais(model, campos):
+    mapa = getattr(model, "CAMPOS_BLOB", {})
+    return [mapa.get(c, c) for c in campos]
+
+
+def guardar_blobs_pendentes(instancias) -> None:
+    """
+    Grava os blobs atribuídos às instâncias e ainda não persistidos
+    (usado por save/bulk_create/bulk_update).
+    """
+    pendentes = []
+    for obj in instancias:
+        pendentes.extend(obj.__dict__.pop("_blobs_pendentes", {}).values())
+    NfceBlob.guardar(pendentes)
+
+
+class ConteudoBlobQuerySet(models.QuerySet):
+    """
+    bulk_create/bulk_update cientes dos blobs: gravam o conteúdo pendente e
+    aceitam os nomes lógicos (ex.: xml_autorizado, payload).
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        guardar_blobs_pendentes(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        guardar_blobs_pendentes(objs)
+        return super().bulk_update(objs, _campos_reais(self.model, fields), *args, **kwargs)
+
+
+def propriedade_blob(fk: str, tipo: str) -> property:
+    """
+    Atributo lógico guardado em NfceBlob via a FK `fk`: leitura preguiçosa
+    (cacheada na instância) e escrita que serializa/calcula o hash uma vez.
+    """
+    atributo_id = f"{fk}_id"
+
+    def getter(self):
+        hash_ = getattr(self, atributo_id)
+        if hash_ is None:
+            return None
+        carregados = self.__dict__.setdefault("_blobs_carregados", {})
+        em_cache = carregados.get(fk)
+        if em_cache is None or em_cache[0] != hash_:
+            em_cache = carregados[fk] = (hash_, NfceBlob.carregar(hash_))
+        return em_cache[1]
+
+    def setter(self, valor):
+        carregados = self.__dict__.setdefault("_blobs_carregados", {})
+        if valor is None:
+            setattr(self, atributo_id, None)
+            carregados.pop(fk, None)
+            return
+        blob = NfceBlob.preparar(tipo, valor)
+        setattr(self, atributo_id, blob.hash)
+        self.__dict__.setdefault("_blobs_pendentes", {})[blob.hash] = blob
+        carregados[fk] = (blob.hash, valor)
+
+    return property(getter, setter)
+
+
+def propriedade_hash_blob(fk: str) -> property:
+    """
+    Hash do blob da FK `fk`. Atribuir um hash aponta para um blob já
+    gravado (ex.: o payload da pré-emissão), sem reler nem reserializar.
+    """
+    atributo_id = f"{fk}_id"
+    return property(
+        lambda self: getattr(self, atributo_id),
+        lambda self, valor: setattr(self, atributo_id, valor or None),
+    )
+
+
+class ConteudoBlobMixin:
+    """
+    Base dos models com atributos guardados em NfceBlob. CAMPOS_BLOB mapeia
+    nome lógico -> FK, para save(update_fields=...) e bulk_update.
+
+    - leitura preguiçosa: consultas normais trazem só o hash; o conteúdo é
+      lido (1 consulta) no primeiro acesso ao atributo;
+    - escrita: o blob é gravado junto com o save()/bulk_create/bulk_update.
+    """
+
+    CAMPOS_BLOB = {}
+
+    def save(self, *args, **kwargs):
+        guardar_blobs_pendentes([self])
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = _campos_reais(self, kwargs["update_fields"])
+        super().save(*args, **kwargs)
+
+
+class ConteudoSefazMixin(ConteudoBlobMixin):
+    """
+    xml_autorizado / raw_sefaz_response (NfceDocumento, NfceAuditoria).
+    """
+
+    CAMPOS_BLOB = {
+        "xml_autorizado": "xml_autorizado_blob",
+        "raw_sefaz_response": "raw_sefaz_response_blob",
+    }
+
+    xml_autorizado = propriedade_blob("xml_autorizado_blob", NfceBlob.TIPO_XML)
+    raw_sefaz_response = propriedade_blob("raw_sefaz_response_blob", NfceBlob.TIPO_JSON)
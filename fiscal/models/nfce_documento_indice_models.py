@@ -0,0 +1,37 @@
+import uuid
+from django.db import models
+
+
+class NfceDocumentoIndice(models.Model):
+    """
+    Índice global (não particionado) de nfce_documento.
+
+    nfce_documento é particionada por mês de created_at; unicidade e buscas
+    por request_id, chave_acesso e (filial, série, número) ficam aqui, numa
+    tabela estreita que aponta para (id, created_at) do documento — o
+    created_at permite ao Postgres ler uma única partição.
+
+    - Mantida pelo trigger nfce_documento_indice_sync (INSERT/UPDATE/DELETE).
+    - Continua com as linhas de partições arquivadas: a numeração e as chaves
+      nunca são reaproveitadas.
+    - Alvo das FKs para NfceDocumento no banco (Venda, NfceAuditoria).
+    Em tenant schema (TENANT_APPS).
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    request_id = models.UUIDField(unique=True)
+    chave_acesso = models.CharField(max_length=47, unique=True)
+
+    filial_id = models.UUIDField()
+    serie = models.PositiveIntegerField()
+    numero = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "nfce_documento_indice"
+        unique_together = (("filial_id", "serie", "numero"),)
+
+    def __str__(self):
+        return f"Índice NFC-e {self.numero}/{self.serie} - {self.chave_acesso}"
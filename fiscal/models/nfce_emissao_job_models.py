@@ -0,0 +1,67 @@
+import uuid
+from django.db import models
+from django.utils import timezone
+
+
+class NfceEmissaoJob(models.Model):
+    """
+    Job de emissão NFC-e assíncrona (fila em banco).
+
+    - Um job por request_id da pré-emissão (enfileirar é idempotente).
+    - Workers reivindicam jobs pendentes com SELECT ... FOR UPDATE SKIP LOCKED,
+      respeitando o limite de emissões simultâneas por UF.
+    - O resultado final é o NfceDocumento do mesmo request_id.
+    Em tenant schema (TENANT_APPS).
+    """
+
+    STATUS_PENDENTE = "pendente"
+    STATUS_PROCESSANDO = "processando"
+    STATUS_CONCLUIDO = "concluido"
+    STATUS_ERRO = "erro"
+    STATUS_CHOICES = (
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_PROCESSANDO, "Processando"),
+        (STATUS_CONCLUIDO, "Concluído"),
+        (STATUS_ERRO, "Erro"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    request_id = models.UUIDField(unique=True)
+
+    # Mesmo padrão de NfcePreEmissao: apenas UUIDs, sem FK
+    pre_emissao_id = models.UUIDField()
+    filial_id = models.UUIDField()
+    terminal_id = models.UUIDField()
+    # Venda de origem (fluxo finalizar-nfce), sincronizada ao concluir
+    venda_id = models.UUIDField(null=True, blank=True)
+
+    # Operador que solicitou a emissão (permissões revalidadas no worker)
+    user_id = models.BigIntegerField()
+
+    uf = models.CharField(max_length=2)
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    disponivel_em = models.DateTimeField(default=timezone.now)
+
+    # Worker dono do job em processamento (host:pid)
+    worker = models.CharField(max_length=128, null=True, blank=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    nfce_documento_id = models.UUIDField(null=True, blank=True)
+    codigo_erro = models.CharField(max_length=32, null=True, blank=True)
+    mensagem_erro = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "nfce_emissao_job"
+        indexes = [
+            models.Index(fields=["status", "uf", "disponivel_em"], name="idx_nfce_job_fila"),
+        ]
+
+    def __str__(self):
+        return f"Job emissão NFC-e {self.request_id} ({self.status})"
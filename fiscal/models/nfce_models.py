@@ -1,7 +1,17 @@
 import uuid
 from django.db import models
+from django.db.models import Q, Subquery
 from django.utils import timezone
 
+from .nfce_blob_models import (
+    ConteudoBlobQuerySet,
+    ConteudoSefazMixin,
+    NfceBlob,
+    propriedade_blob,
+    propriedade_hash_blob,
+)
+from .nfce_documento_indice_models import NfceDocumentoIndice
+
 
 class NfceNumeroReserva(models.Model):
     """
@@ -40,15 +50,42 @@ class NfceNumeroReserva(models.Model):
         return f"Reserva NFC-e: term={self.terminal_id} serie={self.serie} num={self.numero}"
 
 
-class NfceDocumento(models.Model):
+class NfceDocumentoQuerySet(ConteudoBlobQuerySet):
+    def pelo_indice(self, **filtro):
+        """
+        Busca por request_id, chave_acesso ou (filial_id, serie, numero)
+        resolvida em NfceDocumentoIndice: o documento é lido pela chave
+        (id, created_at), numa única partição.
+        """
+        indice = NfceDocumentoIndice.objects.filter(**filtro)
+        return self.filter(
+            id=Subquery(indice.values("id")[:1]),
+            created_at=Subquery(indice.values("created_at")[:1]),
+        )
+
+
+class NfceDocumento(ConteudoSefazMixin, models.Model):
     """
     Documento fiscal NFC-e consolidado após comunicação com a SEFAZ.
 
     - Um registro por combinação (filial, série, número).
     - Controla idempotência da emissão via request_id.
     - Serve de base para consultas, reimpressão, cancelamento e auditoria.
+
+    Tabela particionada por mês de created_at (PK no banco: id, created_at).
+    A unicidade de request_id, chave_acesso e (filial, série, número) é
+    garantida por NfceDocumentoIndice; buscas por essas chaves devem usar
+    NfceDocumento.objects.pelo_indice(...).
+    Novas FKs para NfceDocumento precisam de db_constraint=False (a FK do
+    banco aponta para nfce_documento_indice; ver migração 0014).
     """
 
+    CAMPOS_BLOB = {
+        **ConteudoSefazMixin.CAMPOS_BLOB,
+        "payload_enviado": "payload_enviado_blob",
+        "hash_payload_enviado": "payload_enviado_blob",
+    }
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     filial = models.ForeignKey(
@@ -65,8 +102,8 @@ class NfceDocumento(models.Model):
     numero = models.PositiveIntegerField()
     serie = models.PositiveIntegerField()
 
-    # Chave de acesso da NFC-e (44 dígitos)
-    chave_acesso = models.CharField(max_length=47, unique=True)
+    # Chave de acesso da NFC-e (44 dígitos); única via NfceDocumentoIndice
+    chave_acesso = models.CharField(max_length=47)
 
     # Protocolo de autorização da SEFAZ
     protocolo = models.CharField(max_length=64, blank=True, null=True)
@@ -74,28 +111,42 @@ class NfceDocumento(models.Model):
     # Status interno do documento (ex: autorizada, rejeitada, erro, cancelada)
     status = models.CharField(max_length=32)
 
-    # Idempotência: mesmo request_id → mesmo documento
-    request_id = models.UUIDField(unique=True)
+    # Idempotência: mesmo request_id → mesmo documento (único via NfceDocumentoIndice)
+    request_id = models.UUIDField()
 
-    # Payload enviado ao parceiro fiscal (XML/JSON) e hash para idempotência/auditoria
-    payload_enviado = models.JSONField(
-        blank=True,
+    # Payload enviado ao parceiro fiscal: o mesmo NfceBlob da pré-emissão
+    # (referenciado pelo hash, sem cópia). doc.payload_enviado lê sob demanda;
+    # doc.hash_payload_enviado (SHA256 do JSON canônico) é a própria FK.
+    payload_enviado_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
         null=True,
-        help_text="Payload bruto enviado ao parceiro fiscal (XML/JSON).",
+        blank=True,
+        related_name="+",
+        db_index=False,
+        help_text="Payload enviado ao parceiro fiscal; hash SHA256 usado para idempotência e reconciliação.",
     )
-    hash_payload_enviado = models.CharField(
-        max_length=64,
+
+    # XML autorizado devolvido pela SEFAZ (quando existir) e resposta bruta
+    # da SEFAZ: conteúdo em NfceBlob (comprimido, deduplicado), lido sob
+    # demanda via doc.xml_autorizado / doc.raw_sefaz_response
+    xml_autorizado_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
+        null=True,
         blank=True,
+        related_name="+",
+        db_index=False,
+    )
+    raw_sefaz_response_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
         null=True,
-        help_text="Hash SHA256 do payload_enviado, usado para idempotência e reconciliação.",
+        blank=True,
+        related_name="+",
+        db_index=False,
     )
 
-    # XML autorizado devolvido pela SEFAZ (quando existir)
-    xml_autorizado = models.TextField(blank=True, null=True)
-
-    # Resposta bruta da SEFAZ (dict serializado)
-    raw_sefaz_response = models.JSONField(blank=True, null=True)
-
     # Mensagem de retorno da SEFAZ (human-readable)
     mensagem_sefaz = models.TextField(blank=True, null=True)
 
@@ -117,20 +168,30 @@ class NfceDocumento(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    payload_enviado = propriedade_blob("payload_enviado_blob", NfceBlob.TIPO_PAYLOAD)
+    hash_payload_enviado = propriedade_hash_blob("payload_enviado_blob")
+
+    objects = NfceDocumentoQuerySet.as_manager()
+
     class Meta:
         db_table = "nfce_documento"
-        unique_together = (("filial", "serie", "numero"),)
         indexes = [
             models.Index(fields=["request_id"]),
             models.Index(fields=["chave_acesso"]),
             models.Index(fields=["filial", "serie", "numero"]),
+            # Varredura do backlog de contingência (worker de regularização)
+            models.Index(
+                fields=["created_at", "id"],
+                condition=Q(status="contingencia_pendente", em_contingencia=True),
+                name="idx_nfce_doc_contingencia",
+            ),
         ]
 
     def __str__(self):
         return f"NFC-e {self.numero}/{self.serie} - {self.chave_acesso} ({self.status})"
 
 
-class NfceAuditoria(models.Model):
+class NfceAuditoria(ConteudoSefazMixin, models.Model):
     """
     Trilha de auditoria de eventos fiscais relacionados à NFC-e.
 
@@ -139,6 +200,8 @@ class NfceAuditoria(models.Model):
       - EMISSAO_REJEITADA
       - CANCELAMENTO
       - INUTILIZACAO
+
+    Tabela particionada por mês de created_at (PK no banco: id, created_at).
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -171,14 +234,31 @@ class NfceAuditoria(models.Model):
     codigo_retorno = models.CharField(max_length=128, blank=True, null=True)
     mensagem_retorno = models.TextField(blank=True, null=True)
 
-    xml_autorizado = models.TextField(blank=True, null=True)
-    raw_sefaz_response = models.JSONField(blank=True, null=True)
+    # Conteúdo em NfceBlob (ver NfceDocumento)
+    xml_autorizado_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_index=False,
+    )
+    raw_sefaz_response_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_index=False,
+    )
 
     ambiente = models.CharField(max_length=20, blank=True, null=True)
     uf = models.CharField(max_length=2, blank=True, null=True)
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = ConteudoBlobQuerySet.as_manager()
+
     class Meta:
         db_table = "nfce_auditoria"
         indexes = [
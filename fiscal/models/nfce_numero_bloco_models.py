@@ -0,0 +1,74 @@
+import uuid
+from django.db import models
+from django.utils import timezone
+
+
+class NfceNumeroBloco(models.Model):
+    """
+    Bloco contíguo de numeração NFC-e arrendado (lease) por um processo,
+    por terminal/série.
+
+    - O processo dono (holder) distribui os números do bloco sem travar a
+      linha do Terminal: cada reserva é um único UPDATE condicional neste bloco.
+    - Números não consumidos de blocos encerrados (esgotados, liberados ou
+      expirados) ficam pendentes de inutilização.
+    Em tenant schema (TENANT_APPS).
+    """
+
+    STATUS_ATIVO = "ativo"
+    STATUS_ESGOTADO = "esgotado"
+    STATUS_LIBERADO = "liberado"
+    STATUS_CHOICES = (
+        (STATUS_ATIVO, "Ativo"),
+        (STATUS_ESGOTADO, "Esgotado"),
+        (STATUS_LIBERADO, "Liberado"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Mesmo padrão de NfceNumeroReserva: apenas UUIDs, sem FK (evita lock cruzado)
+    terminal_id = models.UUIDField()
+    filial_id = models.UUIDField()
+    serie = models.PositiveIntegerField()
+
+    numero_inicial = models.PositiveIntegerField()
+    numero_final = models.PositiveIntegerField()
+    # Próximo número a ser entregue; bloco esgotado quando > numero_final
+    proximo_numero = models.PositiveIntegerField()
+
+    # Identificação do processo dono do lease (host:pid)
+    holder = models.CharField(max_length=128)
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_ATIVO)
+
+    leased_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    # Preenchido quando as faixas não utilizadas foram reportadas para inutilização
+    reportado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "nfce_numero_bloco"
+        constraints = [
+            # Blocos são sempre contíguos: concorrência no arrendamento
+            # colide aqui e o perdedor tenta novamente.
+            models.UniqueConstraint(
+                fields=["terminal_id", "serie", "numero_inicial"],
+                name="uniq_nfce_bloco_terminal_serie_inicio",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["terminal_id", "serie", "status"], name="idx_nfce_bloco_term_status"),
+            models.Index(fields=["holder", "status"], name="idx_nfce_bloco_holder"),
+        ]
+
+    def __str__(self):
+        return (
+            f"Bloco NFC-e: term={self.terminal_id} serie={self.serie} "
+            f"faixa={self.numero_inicial}-{self.numero_final} ({self.status})"
+        )
+
+    @property
+    def esgotado(self) -> bool:
+        return self.proximo_numero > self.numero_final
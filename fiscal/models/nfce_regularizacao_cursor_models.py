@@ -0,0 +1,40 @@
+import uuid
+from django.db import models
+
+
+class NfceRegularizacaoCursor(models.Model):
+    """
+    Checkpoint do worker de regularização de contingência.
+
+    - Guarda a posição (created_at, id) do último documento em
+      contingencia_pendente já varrido na passada atual; após uma queda o
+      worker retoma a partir daqui em vez de reenviar o backlog inteiro.
+    - Ao fim da varredura a posição é zerada: a próxima passada recomeça do
+      início e retenta o que ficou pendente por erro técnico.
+    Em tenant schema (TENANT_APPS).
+    """
+
+    NOME_PADRAO = "contingencia"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    nome = models.CharField(max_length=64, unique=True, default=NOME_PADRAO)
+
+    ultimo_created_at = models.DateTimeField(null=True, blank=True)
+    ultimo_documento_id = models.UUIDField(null=True, blank=True)
+
+    # Totais da passada atual
+    passada_iniciada_em = models.DateTimeField(null=True, blank=True)
+    documentos = models.PositiveIntegerField(default=0)
+    autorizadas = models.PositiveIntegerField(default=0)
+    rejeitadas = models.PositiveIntegerField(default=0)
+    pendentes_erro_tecnico = models.PositiveIntegerField(default=0)
+
+    ultima_passada_concluida_em = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "nfce_regularizacao_cursor"
+
+    def __str__(self):
+        return f"Cursor regularização {self.nome} ({self.ultimo_created_at or 'início'})"
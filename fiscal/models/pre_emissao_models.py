@@ -2,11 +2,23 @@
 from django.db import models
 from uuid import uuid4
 
-class NfcePreEmissao(models.Model):
+from .nfce_blob_models import (
+    ConteudoBlobMixin,
+    ConteudoBlobQuerySet,
+    NfceBlob,
+    propriedade_blob,
+    propriedade_hash_blob,
+)
+
+
+class NfcePreEmissao(ConteudoBlobMixin, models.Model):
     """
     Registro de pré-emissão antes da comunicação com a SEFAZ (S12).
     Cada pré-emissão está vinculada a uma reserva de número (idempotência).
     """
+
+    CAMPOS_BLOB = {"payload": "payload_blob", "hash_payload": "payload_blob"}
+
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
 
     filial_id = models.UUIDField()
@@ -17,10 +29,27 @@ class NfcePreEmissao(models.Model):
 
     request_id = models.UUIDField(unique=True)
 
-    payload = models.JSONField()  # dados completos da NFC-e enviados pelo PDV
+    # Dados completos da NFC-e enviados pelo PDV, em NfceBlob: JSON canônico
+    # e SHA256 calculados uma vez aqui; o NfceDocumento referencia o mesmo blob
+    payload_blob = models.ForeignKey(
+        "fiscal.NfceBlob",
+        on_delete=models.PROTECT,
+        related_name="+",
+        db_index=False,
+    )
+
+    # Marcador durável de emissão em andamento (claim de emitir_nfce):
+    # preenchido antes da chamada à SEFAZ, fora de qualquer transação longa.
+    emissao_token = models.UUIDField(null=True, blank=True)
+    emissao_iniciada_em = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    payload = propriedade_blob("payload_blob", NfceBlob.TIPO_PAYLOAD)
+    hash_payload = propriedade_hash_blob("payload_blob")
+
+    objects = ConteudoBlobQuerySet.as_manager()
+
     class Meta:
         db_table = "nfce_pre_emissao"
         unique_together = ("filial_id", "terminal_id", "serie", "numero")
@@ -0,0 +1,45 @@
+# fiscal/nfce_xml/__init__.py
+from .assinatura import (
+    AssinadorNfce,
+    ChaveA1,
+    assinador_da_filial,
+    assinar_xml_nfce,
+    invalidar_chave_a1,
+    metricas_cache_a1,
+    montar_xml_assinado_pre_emissao,
+    obter_chave_a1,
+)
+from .builder import (
+    ERR_DADOS_FISCAIS_ITEM,
+    TP_EMIS_NORMAL,
+    TP_EMIS_OFFLINE,
+    EmitenteNfce,
+    NfceXml,
+    NfceXmlBuilder,
+    ambiente_da_filial,
+    montar_xml_pre_emissao,
+)
+from .chave_acesso import calcular_dv, chave_valida, codigo_numerico, gerar_chave_acesso
+
+__all__ = [
+    "ERR_DADOS_FISCAIS_ITEM",
+    "TP_EMIS_NORMAL",
+    "TP_EMIS_OFFLINE",
+    "EmitenteNfce",
+    "NfceXml",
+    "NfceXmlBuilder",
+    "ambiente_da_filial",
+    "montar_xml_pre_emissao",
+    "calcular_dv",
+    "chave_valida",
+    "codigo_numerico",
+    "gerar_chave_acesso",
+    "AssinadorNfce",
+    "ChaveA1",
+    "assinador_da_filial",
+    "assinar_xml_nfce",
+    "invalidar_chave_a1",
+    "metricas_cache_a1",
+    "montar_xml_assinado_pre_emissao",
+    "obter_chave_a1",
+]
@@ -0,0 +1,357 @@
+# fiscal/nfce_xml/assinatura.py
+"""
+Assinatura XMLDSig do infNFe (padrão SEFAZ: C14N 1.0, enveloped-signature,
+RSA-SHA1, certificado X509 no KeyInfo) com a chave do certificado A1.
+
+Abrir o PKCS#12 (decifrar o PFX) custa muito mais que a assinatura em si,
+então a chave privada fica num cache em memória por processo:
+
+  - chave do cache: (schema do tenant, filial_id);
+  - limitado a FISCAL_A1_CACHE_MAX_FILIAIS entradas (LRU);
+  - cada obtenção confere a "versão" da linha FilialCertificadoA1
+    (id, updated_at, a1_expires_at) com uma consulta leve, sem ler o PFX:
+    certificado trocado/atualizado em qualquer processo invalida a entrada;
+  - vencido o a1_expires_at (ou o notAfter do X509), a entrada é descartada
+    e a assinatura bloqueada (FISCAL_3001).
+
+Para lotes, obtenha o assinador uma vez (assinador_da_filial) e reutilize-o
+em todas as NFC-e do lote.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import pkcs12
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from .builder import NAMESPACE_NFE, NfceXml, montar_xml_pre_emissao
+
+logger = logging.getLogger("pdv.fiscal")
+
+ERR_A1_EXPIRED = "FISCAL_3001"
+ERR_A1_INVALIDO = "FISCAL_3005"
+
+DEFAULT_CACHE_MAX_FILIAIS = 256
+
+NAMESPACE_DSIG = "http://www.w3.org/2000/09/xmldsig#"
+ALG_C14N = "http://www.w3.org/TR/2001/REC-xml-c14n-20010315"
+ALG_ENVELOPED = NAMESPACE_DSIG + "enveloped-signature"
+ALG_RSA_SHA1 = NAMESPACE_DSIG + "rsa-sha1"
+ALG_SHA1 = NAMESPACE_DSIG + "sha1"
+
+# SignedInfo já na forma canônica; no documento ele herda o xmlns do
+# <Signature>, na assinatura o namespace entra explícito (C14N inclusivo).
+_SIGNED_INFO = (
+    "<SignedInfo{xmlns}>"
+    '<CanonicalizationMethod Algorithm="' + ALG_C14N + '"></CanonicalizationMethod>'
+    '<SignatureMethod Algorithm="' + ALG_RSA_SHA1 + '"></SignatureMethod>'
+    '<Reference URI="#{id}"><Transforms>'
+    '<Transform Algorithm="' + ALG_ENVELOPED + '"></Transform>'
+    '<Transform Algorithm="' + ALG_C14N + '"></Transform>'
+    "</Transforms>"
+    '<DigestMethod Algorithm="' + ALG_SHA1 + '"></DigestMethod>'
+    "<DigestValue>{digest}</DigestValue></Reference></SignedInfo>"
+)
+_SIGNATURE = (
+    '<Signature xmlns="' + NAMESPACE_DSIG + '">{signed_info}'
+    "<SignatureValue>{valor}</SignatureValue>"
+    "<KeyInfo><X509Data><X509Certificate>{certificado}</X509Certificate></X509Data></KeyInfo>"
+    "</Signature>"
+)
+
+_INF_NFE = re.compile(r"<infNFe\b[^>]*>.*</infNFe>", re.S)
+_ID = re.compile(r'\bId="([^"]+)"')
+
+
+# ---------------------------------------------------------------------------
+# Material do certificado
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ChaveA1:
+    """
+    Chave privada + certificado (DER em base64) já decifrados do PFX.
+    """
+
+    versao: Tuple[Any, ...]
+    chave_privada: Any
+    certificado_b64: str
+    expira_em: datetime
+
+    def expirada(self, agora: Optional[datetime] = None) -> bool:
+        return self.expira_em <= (agora or timezone.now())
+
+
+def _senha_do_certificado(senha_armazenada: str) -> bytes:
+    """
+    senha_hash guarda a senha cifrada; FISCAL_A1_SENHA_DECIFRADOR (caminho
+    pontilhado de uma função str -> str) a decifra. Sem decifrador, o valor
+    é usado como está.
+    """
+    decifrador = getattr(settings, "FISCAL_A1_SENHA_DECIFRADOR", "")
+    senha = import_string(decifrador)(senha_armazenada) if decifrador else senha_armazenada
+    return (senha or "").encode("utf-8")
+
+
+def carregar_pfx(pfx: bytes, senha: bytes, *, versao: Tuple[Any, ...] = (), expira_em=None) -> ChaveA1:
+    """
+    Decifra o PKCS#12 (operação cara: use via cache).
+    """
+    try:
+        chave_privada, certificado, _ = pkcs12.load_key_and_certificates(bytes(pfx), senha or None)
+    except ValueError:
+        raise ValidationError(
+            {"code": ERR_A1_INVALIDO, "message": "Certificado A1 inválido ou senha incorreta."}
+        )
+    if chave_privada is None or certificado is None:
+        raise ValidationError(
+            {"code": ERR_A1_INVALIDO, "message": "PFX sem chave privada ou certificado."}
+        )
+
+    nao_depois = certificado.not_valid_after_utc
+    return ChaveA1(
+        versao=versao,
+        chave_privada=chave_privada,
+        certificado_b64=base64.b64encode(
+            certificado.public_bytes(serialization.Encoding.DER)
+        ).decode("ascii"),
+        expira_em=min(expira_em, nao_depois) if expira_em else nao_depois,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Cache por processo
+# ---------------------------------------------------------------------------
+
+class CacheChavesA1:
+    """
+    LRU limitado, thread-safe. Guarda ChaveA1 por (schema, filial_id).
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = max(int(maximo), 1)
+        self._entradas: "OrderedDict[Hashable, ChaveA1]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def obter(self, chave: Hashable, versao: Tuple[Any, ...]) -> Optional[ChaveA1]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada.versao != versao or entrada.expirada():
+                if entrada is not None:
+                    del self._entradas[chave]
+                    self.descartes += 1
+                self.faltas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada
+
+    def guardar(self, chave: Hashable, entrada: ChaveA1) -> None:
+        with self._lock:
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+                self.descartes += 1
+
+    def invalidar(self, chave: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if chave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(chave, None)
+
+    def metricas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "maximo": self.maximo,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "descartes": self.descartes,
+            }
+
+
+_cache: Optional[CacheChavesA1] = None
+_cache_lock = threading.Lock()
+
+
+def _cache_chaves() -> CacheChavesA1:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheChavesA1(
+                    getattr(settings, "FISCAL_A1_CACHE_MAX_FILIAIS", DEFAULT_CACHE_MAX_FILIAIS)
+                )
+    return _cache
+
+
+def _chave_cache(filial_id) -> Tuple[str, str]:
+    return (getattr(connection, "schema_name", ""), str(filial_id))
+
+
+def invalidar_chave_a1(filial_id=None) -> None:
+    """
+    Remove a chave da filial (ou todas, sem filial_id) do cache deste processo.
+    """
+    _cache_chaves().invalidar(None if filial_id is None else _chave_cache(filial_id))
+
+
+def resetar_cache_chaves_a1() -> None:
+    """
+    Descarta o cache (e as métricas) do processo. Uso em testes.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def metricas_cache_a1() -> Dict[str, int]:
+    return _cache_chaves().metricas()
+
+
+def obter_chave_a1(filial_id) -> ChaveA1:
+    """
+    Chave A1 da filial: confere a versão da linha do certificado (consulta
+    leve) e só lê/decifra o PFX quando o cache não tem a versão atual.
+    """
+    from filial.models.filial_certificado_models import FilialCertificadoA1
+
+    cache = _cache_chaves()
+    chave = _chave_cache(filial_id)
+    versao = (
+        FilialCertificadoA1.objects.filter(filial_id=filial_id)
+        .values_list("id", "updated_at", "a1_expires_at")
+        .first()
+    )
+    if versao is None:
+        cache.invalidar(chave)
+        raise PermissionDenied(
+            {"code": ERR_A1_EXPIRED, "message": "Filial não possui certificado A1 configurado."}
+        )
+    if not versao[2] or versao[2] <= timezone.now():
+        cache.invalidar(chave)
+        raise PermissionDenied(
+            {"code": ERR_A1_EXPIRED, "message": "Certificado A1 expirado. Emissão bloqueada."}
+        )
+
+    entrada = cache.obter(chave, versao)
+    if entrada is not None:
+        return entrada
+
+    pfx, senha = (
+        FilialCertificadoA1.objects.filter(pk=versao[0]).values_list("a1_pfx", "senha_hash").get()
+    )
+    entrada = carregar_pfx(pfx, _senha_do_certificado(senha), versao=versao, expira_em=versao[2])
+    if entrada.expirada():
+        raise PermissionDenied(
+            {"code": ERR_A1_EXPIRED, "message": "Certificado A1 expirado. Emissão bloqueada."}
+        )
+    cache.guardar(chave, entrada)
+
+    logger.info(
+        "certificado_a1_carregado",
+        extra={
+            "event": "certificado_a1_carregado",
+            "filial_id": str(filial_id),
+            "schema": chave[0],
+            "expira_em": entrada.expira_em.isoformat(),
+        },
+    )
+    return entrada
+
+
+# ---------------------------------------------------------------------------
+# Assinatura
+# ---------------------------------------------------------------------------
+
+def canonicalizar_inf_nfe(xml: str, *, canonico: bool = False) -> Tuple[str, bytes]:
+    """
+    Retorna (Id, C14N 1.0 inclusivo do infNFe). O xmlns herdado do <NFe>
+    é declarado no próprio infNFe, como exige a forma canônica do subtree.
+
+    canonico=True: o XML veio do NfceXmlBuilder, que já escreve o infNFe na
+    forma canônica; só o xmlns é acrescentado (sem reparse do documento).
+    """
+    encontrado = _INF_NFE.search(xml)
+    if not encontrado:
+        raise ValueError("XML sem elemento infNFe.")
+    trecho = encontrado.group(0)
+    abertura = trecho[: trecho.index(">")]
+    id_ref = _ID.search(abertura)
+    if not id_ref:
+        raise ValueError("infNFe sem atributo Id.")
+    if "xmlns=" not in abertura:
+        trecho = '<infNFe xmlns="' + NAMESPACE_NFE + '"' + trecho[len("<infNFe"):]
+    if not canonico:
+        trecho = ET.canonicalize(trecho)
+    return id_ref.group(1), trecho.encode("utf-8")
+
+
+class AssinadorNfce:
+    """
+    Assina NFC-e com uma ChaveA1 já carregada. Só CPU: sem banco, seguro
+    para uso concorrente.
+    """
+
+    def __init__(self, chave: ChaveA1):
+        self.chave = chave
+
+    def assinar(self, xml: str, *, canonico: bool = False) -> str:
+        if self.chave.expirada():
+            raise PermissionDenied(
+                {"code": ERR_A1_EXPIRED, "message": "Certificado A1 expirado. Emissão bloqueada."}
+            )
+
+        id_ref, inf_nfe = canonicalizar_inf_nfe(xml, canonico=canonico)
+        digest = base64.b64encode(hashlib.sha1(inf_nfe).digest()).decode("ascii")
+        signed_info = _SIGNED_INFO.replace("{id}", id_ref).replace("{digest}", digest)
+        valor = self.chave.chave_privada.sign(
+            signed_info.replace("{xmlns}", ' xmlns="' + NAMESPACE_DSIG + '"').encode("utf-8"),
+            padding.PKCS1v15(),
+            hashes.SHA1(),
+        )
+        assinatura = (
+            _SIGNATURE.replace("{signed_info}", signed_info.replace("{xmlns}", ""))
+            .replace("{valor}", base64.b64encode(valor).decode("ascii"))
+            .replace("{certificado}", self.chave.certificado_b64)
+        )
+
+        fechamento = xml.rindex("</NFe>")
+        return xml[:fechamento] + assinatura + xml[fechamento:]
+
+
+def assinador_da_filial(filial_id) -> AssinadorNfce:
+    return AssinadorNfce(obter_chave_a1(filial_id))
+
+
+def assinar_xml_nfce(xml: str, *, filial_id, canonico: bool = False) -> str:
+    return assinador_da_filial(filial_id).assinar(xml, canonico=canonico)
+
+
+def montar_xml_assinado_pre_emissao(pre_emissao, filial, **kwargs) -> NfceXml:
+    """
+    XML da NfcePreEmissao (montar_xml_pre_emissao) já assinado.
+    """
+    nfce = montar_xml_pre_emissao(pre_emissao, filial, **kwargs)
+    return replace(nfce, xml=assinar_xml_nfce(nfce.xml, filial_id=filial.id, canonico=True))
@@ -0,0 +1,570 @@
+# fiscal/nfce_xml/builder.py
+"""
+Montagem do XML da NFC-e (modelo 65, layout 4.00) a partir do payload da
+NfcePreEmissao + dados da Filial (emitente) + FiscalUFConfig.
+
+Desempenho:
+  - Os templates de cada bloco são compilados uma vez, na importação, para
+    um format "%s" + itemgetter (sem parse de template por item).
+  - O bloco <emit> é renderizado uma vez por builder (por filial).
+  - O XML é produzido em streaming (iter_xml): um pedaço por bloco/item,
+    com os totais acumulados durante a passagem pelos itens. build() apenas
+    junta os pedaços; escrever() grava direto num arquivo/stream.
+
+Layout de referência: docs/fiscal/modelo_xml_nfce.md. Assinatura XMLDSig em
+nfce_xml.assinatura; QR-Code (infNFeSupl, depende do CSC) fica fora.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from functools import cached_property, lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, TextIO, Tuple
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from fiscal.uf import FiscalUFConfig, get_uf_config
+
+from .chave_acesso import codigo_numerico, gerar_chave_acesso
+
+ERR_DADOS_FISCAIS_ITEM = "FISCAL_4007"
+
+NAMESPACE_NFE = "http://www.portalfiscal.inf.br/nfe"
+VERSAO_LAYOUT = "4.00"
+VERSAO_PROCESSO = "GetStart PDV 1.0"
+NATUREZA_OPERACAO = "VENDA AO CONSUMIDOR"
+
+TP_EMIS_NORMAL = 1
+TP_EMIS_OFFLINE = 9  # contingência off-line NFC-e
+
+# Exigência SEFAZ: em homologação o xProd do 1º item é fixo
+XPROD_HOMOLOGACAO = "NOTA FISCAL EMITIDA EM AMBIENTE DE HOMOLOGACAO - SEM VALOR FISCAL"
+
+_CSOSN_SEM_DESTAQUE = frozenset({"102", "103", "300", "400"})
+_CST_ICMS_SEM_DESTAQUE = frozenset({"40", "41", "50"})
+_CST_PIS_ALIQ = frozenset({"01", "02"})
+_CST_PIS_NT = frozenset({"04", "05", "06", "07", "08", "09"})
+
+_CENTAVO = Decimal("0.01")
+_QTD = Decimal("0.0001")
+_ZERO = Decimal("0")
+_CEM = Decimal("100")
+
+
+# ---------------------------------------------------------------------------
+# Templates compilados
+# ---------------------------------------------------------------------------
+
+_CAMPO = re.compile(r"\{(\w+)\}")
+
+
+def _compilar(template: str) -> Callable[[Mapping[str, Any]], str]:
+    """
+    Converte um template com {campo} em render(dados) = fmt % itemgetter(dados).
+    """
+    partes = _CAMPO.split(template)
+    literais, campos = partes[0::2], partes[1::2]
+    fmt = "%s".join(literal.replace("%", "%%") for literal in literais)
+    if not campos:
+        return lambda _dados: fmt
+    pegar = itemgetter(*campos)
+    if len(campos) == 1:
+        return lambda dados: fmt % (pegar(dados),)
+    return lambda dados: fmt % pegar(dados)
+
+
+_ABERTURA = _compilar(
+    '<NFe xmlns="' + NAMESPACE_NFE + '"><infNFe Id="NFe{chave}" versao="' + VERSAO_LAYOUT + '">'
+)
+_IDE = _compilar(
+    "<ide><cUF>{cUF}</cUF><cNF>{cNF}</cNF><natOp>{natOp}</natOp><mod>{mod}</mod>"
+    "<serie>{serie}</serie><nNF>{nNF}</nNF><dhEmi>{dhEmi}</dhEmi><tpNF>1</tpNF>"
+    "<idDest>1</idDest><cMunFG>{cMunFG}</cMunFG><tpImp>4</tpImp><tpEmis>{tpEmis}</tpEmis>"
+    "<cDV>{cDV}</cDV><tpAmb>{tpAmb}</tpAmb><finNFe>1</finNFe><indFinal>1</indFinal>"
+    "<indPres>1</indPres><procEmi>0</procEmi><verProc>{verProc}</verProc>{contingencia}</ide>"
+)
+_CONTINGENCIA = _compilar("<dhCont>{dhCont}</dhCont><xJust>{xJust}</xJust>")
+_EMIT = _compilar(
+    "<emit><CNPJ>{CNPJ}</CNPJ><xNome>{xNome}</xNome><xFant>{xFant}</xFant><enderEmit>"
+    "<xLgr>{xLgr}</xLgr><nro>{nro}</nro>{xCpl}<xBairro>{xBairro}</xBairro><cMun>{cMun}</cMun>"
+    "<xMun>{xMun}</xMun><UF>{UF}</UF><CEP>{CEP}</CEP><cPais>{cPais}</cPais>"
+    "<xPais>{xPais}</xPais></enderEmit><IE>{IE}</IE><CRT>{CRT}</CRT></emit>"
+)
+_DEST_CPF = _compilar("<dest><CPF>{doc}</CPF><indIEDest>9</indIEDest></dest>")
+_DEST_CNPJ = _compilar("<dest><CNPJ>{doc}</CNPJ><indIEDest>9</indIEDest></dest>")
+_DET = _compilar(
+    '<det nItem="{n}"><prod><cProd>{cProd}</cProd><cEAN>{cEAN}</cEAN><xProd>{xProd}</xProd>'
+    "<NCM>{NCM}</NCM>{CEST}<CFOP>{CFOP}</CFOP><uCom>{uCom}</uCom><qCom>{qCom}</qCom>"
+    "<vUnCom>{vUnCom}</vUnCom><vProd>{vProd}</vProd><cEANTrib>{cEAN}</cEANTrib>"
+    "<uTrib>{uCom}</uTrib><qTrib>{qCom}</qTrib><vUnTrib>{vUnCom}</vUnTrib>{vDesc}"
+    "<indTot>1</indTot></prod><imposto><ICMS>{ICMS}</ICMS><PIS>{PIS}</PIS>"
+    "<COFINS>{COFINS}</COFINS></imposto></det>"
+)
+_ICMSSN102 = _compilar("<ICMSSN102><orig>{orig}</orig><CSOSN>{cst}</CSOSN></ICMSSN102>")
+_ICMSSN500 = _compilar("<ICMSSN500><orig>{orig}</orig><CSOSN>500</CSOSN></ICMSSN500>")
+_ICMS00 = _compilar(
+    "<ICMS00><orig>{orig}</orig><CST>00</CST><modBC>3</modBC><vBC>{vBC}</vBC>"
+    "<pICMS>{p}</pICMS><vICMS>{v}</vICMS></ICMS00>"
+)
+_ICMS40 = _compilar("<ICMS40><orig>{orig}</orig><CST>{cst}</CST></ICMS40>")
+_ICMS60 = _compilar("<ICMS60><orig>{orig}</orig><CST>60</CST></ICMS60>")
+_PIS_ALIQ = _compilar(
+    "<PISAliq><CST>{cst}</CST><vBC>{vBC}</vBC><pPIS>{p}</pPIS><vPIS>{v}</vPIS></PISAliq>"
+)
+_PIS_NT = _compilar("<PISNT><CST>{cst}</CST></PISNT>")
+_PIS_OUTR = _compilar(
+    "<PISOutr><CST>{cst}</CST><vBC>{vBC}</vBC><pPIS>{p}</pPIS><vPIS>{v}</vPIS></PISOutr>"
+)
+_COFINS_ALIQ = _compilar(
+    "<COFINSAliq><CST>{cst}</CST><vBC>{vBC}</vBC><pCOFINS>{p}</pCOFINS>"
+    "<vCOFINS>{v}</vCOFINS></COFINSAliq>"
+)
+_COFINS_NT = _compilar("<COFINSNT><CST>{cst}</CST></COFINSNT>")
+_COFINS_OUTR = _compilar(
+    "<COFINSOutr><CST>{cst}</CST><vBC>{vBC}</vBC><pCOFINS>{p}</pCOFINS>"
+    "<vCOFINS>{v}</vCOFINS></COFINSOutr>"
+)
+_TOTAL = _compilar(
+    "<total><ICMSTot><vBC>{vBC}</vBC><vICMS>{vICMS}</vICMS><vICMSDeson>0.00</vICMSDeson>"
+    "<vFCP>0.00</vFCP><vBCST>0.00</vBCST><vST>0.00</vST><vFCPST>0.00</vFCPST>"
+    "<vFCPSTRet>0.00</vFCPSTRet><vProd>{vProd}</vProd><vFrete>0.00</vFrete><vSeg>0.00</vSeg>"
+    "<vDesc>{vDesc}</vDesc><vII>0.00</vII><vIPI>0.00</vIPI><vIPIDevol>0.00</vIPIDevol>"
+    "<vPIS>{vPIS}</vPIS><vCOFINS>{vCOFINS}</vCOFINS><vOutro>0.00</vOutro><vNF>{vNF}</vNF>"
+    "</ICMSTot></total><transp><modFrete>9</modFrete></transp>"
+)
+_DET_PAG = _compilar("<detPag><tPag>{tPag}</tPag><vPag>{vPag}</vPag></detPag>")
+_INF_ADIC = _compilar("<infAdic><infCpl>{infCpl}</infCpl></infAdic>")
+_FECHAMENTO = "</infNFe></NFe>"
+
+# Mesmo escape de texto da C14N: o infNFe gerado já sai na forma canônica
+# (a assinatura dispensa re-canonicalizar; ver nfce_xml.assinatura)
+_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#xD;"})
+
+
+def _texto(valor: Any, limite: int = 120) -> str:
+    return str(valor or "").strip()[:limite].translate(_ESCAPE)
+
+
+def _digitos(valor: Any) -> str:
+    texto = str(valor or "")
+    if texto.isdigit():
+        return texto
+    return "".join(c for c in texto if c.isdigit())
+
+
+def _dec(valor: Any) -> Decimal:
+    if valor is None or valor == "":
+        return _ZERO
+    if isinstance(valor, Decimal):
+        return valor
+    return Decimal(str(valor))
+
+
+def _moeda(valor: Decimal) -> str:
+    return f"{valor:.2f}"
+
+
+def _valor_unitario(valor: Decimal) -> str:
+    # vUnCom aceita até 10 casas; mantém 2 quando o preço é em centavos
+    return f"{valor:.2f}" if valor == valor.quantize(_CENTAVO) else f"{valor.normalize():f}"
+
+
+@lru_cache(maxsize=512)
+def _grupo_fixo(template: Callable, orig: str, cst: str) -> str:
+    """
+    Grupos de imposto sem valores (só orig/CST): iguais para todos os itens
+    com a mesma tributação, renderizados uma vez.
+    """
+    return template({"orig": orig, "cst": cst, "vBC": "0.00", "p": "0.00", "v": "0.00"})
+
+
+def _erro_item(n: int, mensagem: str) -> ValidationError:
+    return ValidationError({"code": ERR_DADOS_FISCAIS_ITEM, "message": f"Item {n}: {mensagem}"})
+
+
+# ---------------------------------------------------------------------------
+# Emitente
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class EmitenteNfce:
+    """
+    Dados do emitente (bloco <emit>) já normalizados.
+    """
+
+    cnpj: str
+    razao_social: str
+    nome_fantasia: str
+    ie: str
+    crt: str
+    logradouro: str
+    numero: str
+    complemento: str
+    bairro: str
+    codigo_municipio: str
+    municipio: str
+    uf: str
+    cep: str
+    codigo_pais: str = "1058"
+    pais: str = "BRASIL"
+
+    @classmethod
+    def da_filial(cls, filial) -> "EmitenteNfce":
+        """
+        Lê Filial + endereço (+ FilialFiscalConfig, quando houver). Use
+        select_related("endereco__logradouro__bairro__municipio__uf__pais")
+        para montar sem consultas adicionais.
+        """
+        endereco = filial.endereco
+        try:
+            config = filial.fiscal_config
+        except ObjectDoesNotExist:
+            config = None
+
+        ie = (getattr(config, "inscricao_estadual", "") or filial.ie or "ISENTO").strip()
+        return cls(
+            cnpj=_digitos(filial.cnpj),
+            razao_social=filial.razao_social,
+            nome_fantasia=filial.nome_fantasia or "",
+            ie="ISENTO" if ie.upper() == "ISENTO" else _digitos(ie),
+            crt=getattr(config, "regime_tributario", None) or "1",
+            logradouro=endereco.xLgr,
+            numero=endereco.numero,
+            complemento=endereco.complemento or "",
+            bairro=endereco.xBairro,
+            codigo_municipio=endereco.cMun,
+            municipio=endereco.xMun,
+            uf=endereco.uf,
+            cep=_digitos(endereco.cep),
+            codigo_pais=endereco.cPais or "1058",
+            pais=endereco.xPais or "BRASIL",
+        )
+
+    @property
+    def simples_nacional(self) -> bool:
+        return self.crt in ("1", "2")
+
+    @cached_property
+    def xml(self) -> str:
+        return _EMIT(
+            {
+                "CNPJ": self.cnpj,
+                "xNome": _texto(self.razao_social, 60),
+                "xFant": _texto(self.nome_fantasia or self.razao_social, 60),
+                "xLgr": _texto(self.logradouro, 60),
+                "nro": _texto(self.numero, 60),
+                "xCpl": f"<xCpl>{_texto(self.complemento, 60)}</xCpl>" if self.complemento else "",
+                "xBairro": _texto(self.bairro, 60),
+                "cMun": self.codigo_municipio,
+                "xMun": _texto(self.municipio, 60),
+                "UF": self.uf,
+                "CEP": self.cep,
+                "cPais": self.codigo_pais,
+                "xPais": _texto(self.pais, 60),
+                "IE": self.ie,
+                "CRT": self.crt,
+            }
+        )
+
+
+@dataclass(frozen=True)
+class NfceXml:
+    chave_acesso: str
+    codigo_numerico: str
+    xml: str
+
+
+# ---------------------------------------------------------------------------
+# Builder
+# ---------------------------------------------------------------------------
+
+class NfceXmlBuilder:
+    """
+    Builder reutilizável por filial: emitente, UF e ambiente fixos; cada
+    chamada monta uma NFC-e (numero/serie/payload).
+    """
+
+    def __init__(
+        self,
+        emitente: EmitenteNfce,
+        *,
+        ambiente: str = "homolog",
+        uf_config: Optional[FiscalUFConfig] = None,
+    ):
+        self.emitente = emitente
+        self.uf_config = uf_config or get_uf_config(emitente.uf)
+        self.homologacao = (ambiente or "homolog").lower() != "producao"
+        self.tp_amb = "2" if self.homologacao else "1"
+
+    # -------------------------
+    # API
+    # -------------------------
+    def build(self, **kwargs) -> NfceXml:
+        chave, cnf, pedacos = self.iter_xml(**kwargs)
+        return NfceXml(chave_acesso=chave, codigo_numerico=cnf, xml="".join(pedacos))
+
+    def escrever(self, destino: TextIO, **kwargs) -> str:
+        """
+        Grava o XML em streaming no destino; retorna a chave de acesso.
+        """
+        chave, _, pedacos = self.iter_xml(**kwargs)
+        for pedaco in pedacos:
+            destino.write(pedaco)
+        return chave
+
+    def iter_xml(
+        self,
+        *,
+        payload: Mapping[str, Any],
+        numero: int,
+        serie: int,
+        semente: Any,
+        emissao: Optional[datetime] = None,
+        tipo_emissao: int = TP_EMIS_NORMAL,
+        justificativa_contingencia: str = "",
+        produtos: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    ) -> Tuple[str, str, Iterator[str]]:
+        """
+        Calcula a chave e devolve (chave, cNF, gerador de pedaços do XML).
+
+        semente: valor estável da emissão (request_id) usado no cNF.
+        produtos: dados fiscais por produto_id, usados quando o item do
+        payload não traz NCM/CFOP/CSOSN/unidade/GTIN.
+        """
+        if not payload.get("itens"):
+            raise ValidationError(
+                {"code": ERR_DADOS_FISCAIS_ITEM, "message": "NFC-e sem itens no payload."}
+            )
+
+        emissao = timezone.localtime(emissao or timezone.now())
+        cnf = codigo_numerico(semente, numero)
+        chave = gerar_chave_acesso(
+            codigo_uf=self.uf_config.codigo_uf,
+            emissao=emissao,
+            cnpj=self.emitente.cnpj,
+            modelo=self.uf_config.modelo_nfce,
+            serie=serie,
+            numero=numero,
+            tipo_emissao=tipo_emissao,
+            cnf=cnf,
+        )
+        ide = {
+            "cUF": self.uf_config.codigo_uf,
+            "cNF": cnf,
+            "natOp": NATUREZA_OPERACAO,
+            "mod": self.uf_config.modelo_nfce,
+            "serie": serie,
+            "nNF": numero,
+            "dhEmi": emissao.isoformat(timespec="seconds"),
+            "cMunFG": self.emitente.codigo_municipio,
+            "tpEmis": tipo_emissao,
+            "cDV": chave[-1],
+            "tpAmb": self.tp_amb,
+            "verProc": VERSAO_PROCESSO,
+            "contingencia": "",
+        }
+        if tipo_emissao != TP_EMIS_NORMAL:
+            ide["contingencia"] = _CONTINGENCIA(
+                {
+                    "dhCont": emissao.isoformat(timespec="seconds"),
+                    "xJust": _texto(justificativa_contingencia or "SEFAZ indisponivel", 256),
+                }
+            )
+        return chave, cnf, self._gerar(chave, ide, payload, produtos or {})
+
+    # -------------------------
+    # Geração
+    # -------------------------
+    def _gerar(self, chave, ide, payload, produtos) -> Iterator[str]:
+        yield _ABERTURA({"chave": chave})
+        yield _IDE(ide)
+        yield self.emitente.xml
+
+        cliente = payload.get("cliente") or {}
+        doc_cliente = _digitos(cliente.get("cpf") or cliente.get("cnpj"))
+        if len(doc_cliente) == 11:
+            yield _DEST_CPF({"doc": doc_cliente})
+        elif len(doc_cliente) == 14:
+            yield _DEST_CNPJ({"doc": doc_cliente})
+
+        totais = [_ZERO, _ZERO, _ZERO, _ZERO, _ZERO, _ZERO]  # vProd vDesc vBC vICMS vPIS vCOFINS
+        for n, item in enumerate(payload["itens"], start=1):
+            yield self._det(n, item, produtos.get(str(item.get("produto_id"))) or {}, totais)
+
+        v_prod, v_desc, v_bc, v_icms, v_pis, v_cofins = totais
+        v_nf = v_prod - v_desc
+        yield _TOTAL(
+            {
+                "vBC": _moeda(v_bc),
+                "vICMS": _moeda(v_icms),
+                "vProd": _moeda(v_prod),
+                "vDesc": _moeda(v_desc),
+                "vPIS": _moeda(v_pis),
+                "vCOFINS": _moeda(v_cofins),
+                "vNF": _moeda(v_nf),
+            }
+        )
+        yield self._pag(payload.get("pagamentos") or [], v_nf)
+
+        inf_cpl = payload.get("informacoes_adicionais")
+        if inf_cpl:
+            yield _INF_ADIC({"infCpl": _texto(inf_cpl, 5000)})
+        yield _FECHAMENTO
+
+    def _det(self, n: int, item: Mapping[str, Any], produto: Mapping[str, Any], totais: list) -> str:
+        item_get, produto_get = item.get, produto.get
+
+        def campo(nome, alternativo=None):
+            valor = item_get(nome) or produto_get(nome)
+            if not valor and alternativo:
+                valor = item_get(alternativo) or produto_get(alternativo)
+            return valor
+
+        ncm = _digitos(campo("ncm"))
+        if len(ncm) != 8:
+            raise _erro_item(n, "NCM ausente ou inválido.")
+
+        cfop = _digitos(campo("cfop")) or self.uf_config.cfop_venda_dentro_uf
+        qtd = _dec(item.get("quantidade"))
+        v_un = _dec(item.get("preco_unitario"))
+        if qtd <= 0:
+            raise _erro_item(n, "quantidade deve ser maior que zero.")
+
+        v_prod = (qtd * v_un).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+        v_desc = _dec(item.get("desconto")).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+        base = v_prod - v_desc
+        orig = str(campo("origem") or "0")
+
+        icms, v_bc, v_icms = self._icms(n, str(campo("csosn", "cst") or ""), orig, base, campo("aliquota_icms"))
+        cst_pis = str(campo("cst_pis") or "49").zfill(2)
+        cst_cofins = str(campo("cst_cofins") or "49").zfill(2)
+        pis, v_pis = self._pis_cofins(
+            cst_pis, base, campo("aliquota_pis"), _PIS_ALIQ, _PIS_NT, _PIS_OUTR
+        )
+        cofins, v_cofins = self._pis_cofins(
+            cst_cofins, base, campo("aliquota_cofins"), _COFINS_ALIQ, _COFINS_NT, _COFINS_OUTR
+        )
+
+        totais[0] += v_prod
+        totais[1] += v_desc
+        totais[2] += v_bc
+        totais[3] += v_icms
+        totais[4] += v_pis
+        totais[5] += v_cofins
+
+        cest = _digitos(campo("cest"))
+        gtin = _digitos(campo("gtin"))
+        descricao = XPROD_HOMOLOGACAO if (n == 1 and self.homologacao) else campo("descricao")
+        return _DET(
+            {
+                "n": n,
+                "cProd": _texto(campo("codigo", "produto_id"), 60),
+                "cEAN": gtin if len(gtin) in (8, 12, 13, 14) else "SEM GTIN",
+                "xProd": _texto(descricao, 120),
+                "NCM": ncm,
+                "CEST": f"<CEST>{cest}</CEST>" if len(cest) == 7 else "",
+                "CFOP": cfop,
+                "uCom": _texto(campo("unidade") or "UN", 6),
+                "qCom": f"{qtd.quantize(_QTD, rounding=ROUND_HALF_UP):.4f}",
+                "vUnCom": _valor_unitario(v_un),
+                "vProd": _moeda(v_prod),
+                "vDesc": f"<vDesc>{_moeda(v_desc)}</vDesc>" if v_desc else "",
+                "ICMS": icms,
+                "PIS": pis,
+                "COFINS": cofins,
+            }
+        )
+
+    def _icms(self, n, cst, orig, base, aliquota) -> Tuple[str, Decimal, Decimal]:
+        if self.emitente.simples_nacional:
+            cst = cst or "102"
+            if cst in _CSOSN_SEM_DESTAQUE:
+                return _grupo_fixo(_ICMSSN102, orig, cst), _ZERO, _ZERO
+            if cst == "500":
+                return _grupo_fixo(_ICMSSN500, orig, cst), _ZERO, _ZERO
+            raise _erro_item(n, f"CSOSN {cst} não suportado na NFC-e.")
+
+        cst = cst.zfill(2) if cst else ""
+        if cst == "00":
+            p = _dec(aliquota)
+            v = (base * p / _CEM).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+            return _ICMS00({"orig": orig, "vBC": _moeda(base), "p": f"{p:.2f}", "v": _moeda(v)}), base, v
+        if cst in _CST_ICMS_SEM_DESTAQUE:
+            return _grupo_fixo(_ICMS40, orig, cst), _ZERO, _ZERO
+        if cst == "60":
+            return _grupo_fixo(_ICMS60, orig, cst), _ZERO, _ZERO
+        raise _erro_item(n, f"CST ICMS {cst or '(vazio)'} não suportado para CRT 3.")
+
+    @staticmethod
+    def _pis_cofins(cst, base, aliquota, tpl_aliq, tpl_nt, tpl_outr) -> Tuple[str, Decimal]:
+        if cst in _CST_PIS_NT:
+            return _grupo_fixo(tpl_nt, "", cst), _ZERO
+        p = _dec(aliquota)
+        if cst in _CST_PIS_ALIQ:
+            v = (base * p / _CEM).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+            return tpl_aliq({"cst": cst, "vBC": _moeda(base), "p": f"{p:.2f}", "v": _moeda(v)}), v
+        return _grupo_fixo(tpl_outr, "", cst), _ZERO
+
+    @staticmethod
+    def _pag(pagamentos, v_nf: Decimal) -> str:
+        partes = ["<pag>"]
+        troco = _ZERO
+        for pg in pagamentos:
+            if pg.get("status") in ("NEG", "CAN", "EST", "ERR"):
+                continue
+            valor = _dec(pg.get("valor_autorizado") or pg.get("valor_solicitado"))
+            if valor <= 0:
+                continue
+            troco += _dec(pg.get("valor_troco"))
+            partes.append(
+                _DET_PAG({"tPag": (_digitos(pg.get("codigo_fiscal")) or "99").zfill(2), "vPag": _moeda(valor)})
+            )
+        if len(partes) == 1:
+            # Sem pagamento informado: "90 - sem pagamento" fecha o grupo obrigatório
+            partes.append(_DET_PAG({"tPag": "90", "vPag": "0.00"}))
+        if troco:
+            partes.append(f"<vTroco>{_moeda(troco)}</vTroco>")
+        partes.append("</pag>")
+        return "".join(partes)
+
+
+def ambiente_da_filial(filial) -> str:
+    """
+    Ambiente NFC-e da filial (FilialNFCeConfig), com fallback para homologação.
+    """
+    ambiente = getattr(filial, "ambiente", None)
+    if ambiente:
+        return ambiente
+    try:
+        return filial.nfce_config.ambiente
+    except ObjectDoesNotExist:
+        return "homolog"
+
+
+def montar_xml_pre_emissao(
+    pre_emissao,
+    filial,
+    *,
+    emissao: Optional[datetime] = None,
+    tipo_emissao: int = TP_EMIS_NORMAL,
+    produtos: Optional[Dict[str, Mapping[str, Any]]] = None,
+) -> NfceXml:
+    """
+    Atalho: XML de uma NfcePreEmissao com os dados da filial.
+    """
+    builder = NfceXmlBuilder(EmitenteNfce.da_filial(filial), ambiente=ambiente_da_filial(filial))
+    return builder.build(
+        payload=pre_emissao.payload or {},
+        numero=pre_emissao.numero,
+        serie=pre_emissao.serie,
+        semente=pre_emissao.request_id,
+        emissao=emissao or getattr(pre_emissao, "created_at", None),
+        tipo_emissao=tipo_emissao,
+        produtos=produtos,
+    )
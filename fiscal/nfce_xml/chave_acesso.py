@@ -0,0 +1,88 @@
+# fiscal/nfce_xml/chave_acesso.py
+"""
+Chave de acesso NFC-e/NF-e (44 dígitos) com dígito verificador módulo 11.
+
+Composição (layout 4.00):
+    cUF(2) AAMM(4) CNPJ(14) mod(2) serie(3) nNF(9) tpEmis(1) cNF(8) cDV(1)
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Union
+from uuid import UUID
+
+TAMANHO_CHAVE = 44
+
+# Pesos 2..9 aplicados da direita para a esquerda sobre os 43 dígitos
+_PESOS = tuple((2 + (i % 8)) for i in range(TAMANHO_CHAVE - 1))[::-1]
+
+
+def calcular_dv(chave_sem_dv: str) -> int:
+    """
+    DV módulo 11 dos 43 primeiros dígitos: resto 0 ou 1 -> DV 0.
+    """
+    if len(chave_sem_dv) != TAMANHO_CHAVE - 1 or not chave_sem_dv.isdigit():
+        raise ValueError("A chave sem DV deve ter 43 dígitos numéricos.")
+    resto = sum(int(d) * p for d, p in zip(chave_sem_dv, _PESOS)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def chave_valida(chave: str) -> bool:
+    return (
+        len(chave) == TAMANHO_CHAVE
+        and chave.isdigit()
+        and calcular_dv(chave[:-1]) == int(chave[-1])
+    )
+
+
+def codigo_numerico(semente: Union[UUID, str, int], numero: int) -> str:
+    """
+    cNF (8 dígitos) determinístico a partir de uma semente (ex.: request_id da
+    pré-emissão): reconstruir o XML gera a mesma chave. A SEFAZ rejeita cNF
+    igual ao nNF, então esse caso é deslocado.
+    """
+    if isinstance(semente, UUID):
+        valor = semente.int
+    elif isinstance(semente, int):
+        valor = semente
+    else:
+        valor = int.from_bytes(str(semente).encode("utf-8"), "big")
+
+    cnf = valor % 100_000_000
+    if cnf == numero % 100_000_000:
+        cnf = (cnf + 1) % 100_000_000
+    return f"{cnf:08d}"
+
+
+def gerar_chave_acesso(
+    *,
+    codigo_uf: str,
+    emissao: datetime,
+    cnpj: str,
+    modelo: str,
+    serie: int,
+    numero: int,
+    tipo_emissao: int,
+    cnf: str,
+) -> str:
+    """
+    Monta a chave de 44 dígitos (com DV).
+    """
+    cnpj = "".join(c for c in cnpj if c.isdigit())
+    if len(cnpj) != 14:
+        raise ValueError("CNPJ do emitente deve ter 14 dígitos.")
+    if not (0 <= serie <= 999) or not (1 <= numero <= 999_999_999):
+        raise ValueError("Série (0-999) ou número (1-999999999) fora da faixa.")
+
+    base = (
+        f"{int(codigo_uf):02d}"
+        f"{emissao:%y%m}"
+        f"{cnpj}"
+        f"{int(modelo):02d}"
+        f"{serie:03d}"
+        f"{numero:09d}"
+        f"{tipo_emissao:1d}"
+        f"{cnf}"
+    )
+    return f"{base}{calcular_dv(base)}"
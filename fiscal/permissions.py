@@ -1,7 +1,7 @@
 # fiscal/permissions.py
 from rest_framework.permissions import BasePermission
 from rest_framework.exceptions import PermissionDenied
-from terminal.models.terminal_models import Terminal
+from fiscal.services.contexto_fiscal_service import obter_contexto_fiscal
 
 
 class IsUserLinkedToTerminalFilial(BasePermission):
@@ -24,15 +24,14 @@ class IsUserLinkedToTerminalFilial(BasePermission):
             # serializer vai exigir mais à frente
             return True
 
-        # NÃO convertemos para UUID manualmente — o serializer já fez isso.
-        # Se o serializer ainda não rodou, esse valor pode ser string; usamos direto.
-        try:
-            filial_id = Terminal.objects.only("filial_id").get(id=terminal_id).filial_id
-        except Terminal.DoesNotExist:
+        # NÃO validamos o formato aqui — o serializer responde 400.
+        # Contexto fiscal em cache: a service reaproveita a mesma entrada
+        contexto = obter_contexto_fiscal(user=user, terminal_id=terminal_id)
+        if contexto is None:
             # quem responde é a service/view com 404 + TERMINAL_2001
             return True
 
-        if not user.userfilial_set.filter(filial_id=filial_id).exists():
+        if not contexto.vinculado():
             # devolve o code esperado nos testes
             raise PermissionDenied({"code": "AUTH_1006", "message": self.message})
 
@@ -0,0 +1,301 @@
+# fiscal/sefaz_circuit_breaker.py
+"""
+Circuit breaker por (UF, ambiente) para os clients SEFAZ.
+
+Quando uma SEFAZ cai, cada emissão esperaria o próprio timeout até o
+SefazTechnicalError levar à contingência. Com o breaker:
+
+- fechado:     chamadas normais; falhas técnicas consecutivas são contadas.
+- aberto:      após FISCAL_SEFAZ_CB_LIMITE_FALHAS falhas, as chamadas falham
+               na hora (SefazCircuitoAberto, um SefazTechnicalError) e a
+               emissão vai direto para contingencia_pendente, sem rede.
+- meio_aberto: passado FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS, uma sonda por vez
+               (slot atômico via cache.add) testa a SEFAZ; sucesso fecha o
+               circuito, falha reabre.
+
+O estado fica no cache Django (alias FISCAL_SEFAZ_CB_CACHE) para ser
+compartilhado entre processos/workers — o alias deve apontar para um
+backend compartilhado (Redis/Memcached), não LocMemCache. Por isso o breaker
+só vem ativo por padrão com cache compartilhado, e o system check fiscal.E001
+acusa um breaker ativo sobre cache por processo.
+
+Métricas: cada transição gera log estruturado "sefaz_circuit_breaker_transicao"
+e incrementa contadores no cache, expostos por metricas_circuit_breaker().
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from fiscal.sefaz_clients import SefazTechnicalError
+
+logger = logging.getLogger("pdv.fiscal")
+
+ESTADO_FECHADO = "fechado"
+ESTADO_ABERTO = "aberto"
+ESTADO_MEIO_ABERTO = "meio_aberto"
+
+DEFAULT_LIMITE_FALHAS = 5
+DEFAULT_ABERTO_SEGUNDOS = 30
+DEFAULT_SONDA_SEGUNDOS = 30
+
+TRANSICOES = (
+    (ESTADO_FECHADO, ESTADO_ABERTO),
+    (ESTADO_ABERTO, ESTADO_MEIO_ABERTO),
+    (ESTADO_ABERTO, ESTADO_FECHADO),
+    (ESTADO_MEIO_ABERTO, ESTADO_FECHADO),
+    (ESTADO_MEIO_ABERTO, ESTADO_ABERTO),
+)
+
+# Estado/contadores não expiram sozinhos (o breaker controla o ciclo)
+_SEM_EXPIRACAO = None
+
+
+class SefazCircuitoAberto(SefazTechnicalError):
+    """
+    Chamada não realizada: circuito aberto para a UF/ambiente.
+    Tratada pelas services como erro técnico (contingência).
+    """
+
+    def __init__(self, uf: str, ambiente: str):
+        super().__init__(
+            f"SEFAZ {uf}/{ambiente} indisponível (circuit breaker aberto). Chamada não realizada.",
+            codigo="CIRCUITO_ABERTO",
+            raw={"uf": uf, "ambiente": ambiente, "circuit_breaker": ESTADO_ABERTO},
+        )
+
+
+def _cache():
+    return caches[getattr(settings, "FISCAL_SEFAZ_CB_CACHE", "default")]
+
+
+def _incr(cache, chave: str, delta: int = 1) -> int:
+    cache.add(chave, 0, timeout=_SEM_EXPIRACAO)
+    try:
+        return cache.incr(chave, delta)
+    except ValueError:
+        # Chave removida entre o add e o incr (ex.: reset concorrente)
+        cache.set(chave, delta, timeout=_SEM_EXPIRACAO)
+        return delta
+
+
+class CircuitBreakerSefaz:
+    """
+    Estado do breaker de um par (UF, ambiente), guardado no cache.
+    """
+
+    def __init__(self, uf: str, ambiente: str):
+        self.uf = uf
+        self.ambiente = ambiente
+        self.cache = _cache()
+        prefixo = f"sefaz_cb:{uf}:{ambiente}"
+        self._k_aberto_ate = f"{prefixo}:aberto_ate"
+        self._k_falhas = f"{prefixo}:falhas"
+        self._k_sonda = f"{prefixo}:sonda"
+        self._k_metrica = f"{prefixo}:metrica"
+
+    # -------------------------
+    # Configuração
+    # -------------------------
+    @staticmethod
+    def _limite_falhas() -> int:
+        return int(getattr(settings, "FISCAL_SEFAZ_CB_LIMITE_FALHAS", DEFAULT_LIMITE_FALHAS))
+
+    @staticmethod
+    def _aberto_segundos() -> float:
+        return float(getattr(settings, "FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS", DEFAULT_ABERTO_SEGUNDOS))
+
+    @staticmethod
+    def _sonda_segundos() -> int:
+        return int(getattr(settings, "FISCAL_SEFAZ_CB_SONDA_SEGUNDOS", DEFAULT_SONDA_SEGUNDOS))
+
+    # -------------------------
+    # Estado
+    # -------------------------
+    def estado(self) -> str:
+        aberto_ate = self.cache.get(self._k_aberto_ate)
+        if aberto_ate is None:
+            return ESTADO_FECHADO
+        if time.time() < aberto_ate:
+            return ESTADO_ABERTO
+        return ESTADO_MEIO_ABERTO
+
+    def falhas_consecutivas(self) -> int:
+        return int(self.cache.get(self._k_falhas) or 0)
+
+    def _transicao(self, de: str, para: str) -> None:
+        _incr(self.cache, f"{self._k_metrica}:{de}->{para}")
+        log = logger.warning if para == ESTADO_ABERTO else logger.info
+        log(
+            "sefaz_circuit_breaker_transicao",
+            extra={
+                "event": "sefaz_circuit_breaker",
+                "uf": self.uf,
+                "ambiente": self.ambiente,
+                "de": de,
+                "para": para,
+                "falhas_consecutivas": self.falhas_consecutivas(),
+            },
+        )
+
+    def _abrir(self, de: str) -> None:
+        self.cache.set(self._k_aberto_ate, time.time() + self._aberto_segundos(), timeout=_SEM_EXPIRACAO)
+        self.cache.delete(self._k_sonda)
+        self._transicao(de, ESTADO_ABERTO)
+
+    # -------------------------
+    # API usada pelo client
+    # -------------------------
+    def permitir_chamada(self) -> bool:
+        estado = self.estado()
+        if estado == ESTADO_FECHADO:
+            return True
+
+        if estado == ESTADO_MEIO_ABERTO:
+            # Apenas um processo vira sonda; o slot expira caso a sonda morra.
+            if self.cache.add(self._k_sonda, time.time(), timeout=self._sonda_segundos()):
+                self._transicao(ESTADO_ABERTO, ESTADO_MEIO_ABERTO)
+                return True
+
+        _incr(self.cache, f"{self._k_metrica}:bloqueadas")
+        return False
+
+    def registrar_sucesso(self) -> None:
+        estado = self.estado()
+        if estado != ESTADO_FECHADO:
+            # Sonda bem-sucedida (ou chamada iniciada antes da abertura)
+            self.cache.delete_many([self._k_aberto_ate, self._k_falhas, self._k_sonda])
+            self._transicao(estado, ESTADO_FECHADO)
+        elif self.cache.get(self._k_falhas):
+            self.cache.delete(self._k_falhas)
+
+    def registrar_falha(self) -> None:
+        estado = self.estado()
+        if estado == ESTADO_MEIO_ABERTO:
+            # Sonda falhou: reabre por mais uma janela
+            self._abrir(ESTADO_MEIO_ABERTO)
+            return
+        if estado == ESTADO_ABERTO:
+            return
+
+        if _incr(self.cache, self._k_falhas) >= self._limite_falhas():
+            self._abrir(ESTADO_FECHADO)
+
+    def metricas(self) -> Dict[str, Any]:
+        chaves = [f"{self._k_metrica}:{de}->{para}" for de, para in TRANSICOES]
+        chaves.append(f"{self._k_metrica}:bloqueadas")
+        valores = self.cache.get_many(chaves)
+        return {
+            "uf": self.uf,
+            "ambiente": self.ambiente,
+            "estado": self.estado(),
+            "falhas_consecutivas": self.falhas_consecutivas(),
+            "chamadas_bloqueadas": int(valores.get(f"{self._k_metrica}:bloqueadas") or 0),
+            "transicoes": {
+                f"{de}->{para}": int(valores.get(f"{self._k_metrica}:{de}->{para}") or 0)
+                for de, para in TRANSICOES
+            },
+        }
+
+
+class CircuitBreakerMixin:
+    """
+    Mixin que protege os métodos de um client SEFAZ (SefazClientProtocol)
+    com o breaker da UF/ambiente. Só SefazTechnicalError conta como falha:
+    rejeições fiscais são respostas válidas da SEFAZ.
+
+    Chamadas aninhadas (ex.: emitir_nfce delegando para autorizar_nfce no
+    mock) passam direto: cada operação conta uma única vez.
+    """
+
+    circuit_breaker: Optional[CircuitBreakerSefaz] = None
+    _cb_em_chamada = False
+
+    def _protegido(self, metodo: str, kwargs):
+        chamada = getattr(super(CircuitBreakerMixin, self), metodo)
+        breaker = self.circuit_breaker
+        if breaker is None or self._cb_em_chamada:
+            return chamada(**kwargs)
+
+        if not breaker.permitir_chamada():
+            raise SefazCircuitoAberto(breaker.uf, breaker.ambiente)
+
+        self._cb_em_chamada = True
+        try:
+            resp = chamada(**kwargs)
+        except SefazTechnicalError:
+            breaker.registrar_falha()
+            raise
+        finally:
+            self._cb_em_chamada = False
+        breaker.registrar_sucesso()
+        return resp
+
+    def autorizar_nfce(self, **kwargs):
+        return self._protegido("autorizar_nfce", kwargs)
+
+    def autorizar_lote_nfce(self, **kwargs):
+        return self._protegido("autorizar_lote_nfce", kwargs)
+
+    def emitir_nfce(self, **kwargs):
+        return self._protegido("emitir_nfce", kwargs)
+
+    def cancelar_nfce(self, **kwargs):
+        return self._protegido("cancelar_nfce", kwargs)
+
+    def inutilizar_faixa(self, **kwargs):
+        return self._protegido("inutilizar_faixa", kwargs)
+
+    def consultar_nfce(self, **kwargs):
+        return self._protegido("consultar_nfce", kwargs)
+
+    def situacao_nfce(self, **kwargs):
+        return self._protegido("situacao_nfce", kwargs)
+
+
+_classes_protegidas: Dict[type, type] = {}
+
+
+def com_circuit_breaker(client, uf: str, ambiente: str):
+    """
+    Devolve o client protegido pelo breaker de (uf, ambiente).
+
+    O client continua sendo instância da própria classe (subclasse gerada
+    uma vez por classe com CircuitBreakerMixin), preservando isinstance e
+    atributos como uf/ambiente.
+    """
+    cls = type(client)
+    protegida = _classes_protegidas.get(cls)
+    if protegida is None:
+        protegida = type(f"{cls.__name__}ComCircuitBreaker", (CircuitBreakerMixin, cls), {})
+        _classes_protegidas[cls] = protegida
+
+    # Nova instância com o mesmo estado: atribuir __class__ falha quando o
+    # layout da subclasse difere (ex.: clients que herdam de typing.Protocol)
+    protegido = object.__new__(protegida)
+    protegido.__dict__.update(vars(client))
+    protegido.circuit_breaker = CircuitBreakerSefaz(uf, ambiente)
+    return protegido
+
+
+def metricas_circuit_breaker(pares: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Estado e contadores de transição de cada (UF, ambiente) informado.
+    """
+    return [CircuitBreakerSefaz(uf, ambiente).metricas() for uf, ambiente in pares]
+
+
+def resetar_circuit_breaker(uf: str, ambiente: str, *, breaker: Optional[CircuitBreakerSefaz] = None) -> None:
+    """
+    Fecha o circuito manualmente (operação/suporte) e zera as métricas do par.
+    """
+    breaker = breaker or CircuitBreakerSefaz(uf, ambiente)
+    chaves = [breaker._k_aberto_ate, breaker._k_falhas, breaker._k_sonda]
+    chaves += [f"{breaker._k_metrica}:{de}->{para}" for de, para in TRANSICOES]
+    chaves.append(f"{breaker._k_metrica}:bloqueadas")
+    breaker.cache.delete_many(chaves)
@@ -6,15 +6,23 @@ Este módulo define:
 - Contratos para comunicação com a SEFAZ.
 - Implementação MockSefazClient, usada em ambiente de desenvolvimento/teste.
 - Implementação MockSefazClientAlwaysFail, usada em testes de contingência.
+- Implementação HttpSefazClient, que fala HTTP/JSON com o simulador local
+  (fiscal.sefaz_simulador) para testes de carga.
 - Estrutura pronta para, no futuro, termos clients reais por UF/ambiente
   (SP, MG, RJ, ES, homologação/produção).
 """
 
 from __future__ import annotations
 
+import contextvars
+import threading
 import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, Protocol, Optional
+from typing import Any, Dict, List, Protocol, Optional, Sequence
+
+import requests
+from django.conf import settings
 
 
 # ---------------------------------------------------------------------------
@@ -43,6 +51,31 @@ class SefazTechnicalError(Exception):
         self.raw: Dict[str, Any] = raw or {}
 
 
+# Timeout das chamadas feitas dentro de timeout_sefaz() (ex.: timeout dinâmico
+# escolhido pela emissão a partir da sonda de status, fiscal.sefaz_status)
+_timeout_em_vigor: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "sefaz_timeout_em_vigor", default=None
+)
+
+
+@contextmanager
+def timeout_sefaz(segundos: Optional[float]):
+    """
+    Timeout das chamadas SEFAZ feitas dentro do bloco pelos clients de rede
+    (HttpSefazClient); None mantém o timeout do client.
+    """
+    token = _timeout_em_vigor.set(segundos)
+    try:
+        yield
+    finally:
+        _timeout_em_vigor.reset(token)
+
+
+def timeout_em_vigor(padrao: float) -> float:
+    segundos = _timeout_em_vigor.get()
+    return padrao if segundos is None else segundos
+
+
 # ---------------------------------------------------------------------------
 # DTOs de resposta da SEFAZ
 # ---------------------------------------------------------------------------
@@ -66,6 +99,23 @@ class SefazAutorizacaoResponse:
     raw: Dict[str, Any]
 
 
+@dataclass
+class SefazLoteResponse:
+    """
+    Resultado do envio de um lote (enviNFe) de NFC-e.
+
+    - codigo/mensagem/recibo referem-se ao lote (104 = lote processado).
+    - resultados traz uma SefazAutorizacaoResponse por documento, na mesma
+      ordem das pré-emissões enviadas.
+    """
+
+    codigo: int
+    mensagem: str
+    recibo: str
+    resultados: List[SefazAutorizacaoResponse]
+    raw: Dict[str, Any]
+
+
 @dataclass
 class SefazCancelamentoResponse:
     """
@@ -90,10 +140,29 @@ class SefazInutilizacaoResponse:
     raw: Dict[str, Any]
 
 
+@dataclass
+class SefazStatusResponse:
+    """
+    Resultado da consulta de status do serviço (consStatServ).
+    107 = serviço em operação; 108/109 = paralisado.
+    """
+
+    codigo: int
+    mensagem: str
+    raw: Dict[str, Any]
+
+
 # ---------------------------------------------------------------------------
 # Contrato do client SEFAZ
 # ---------------------------------------------------------------------------
 
+# Limite de documentos por lote enviNFe (Manual de Orientação do Contribuinte)
+MAX_NFCE_POR_LOTE = 50
+
+# consSitNFe: documento inexistente na base da SEFAZ
+CODIGO_NAO_CONSTA = 217
+
+
 
 class SefazClientProtocol(Protocol):
     """
@@ -113,6 +182,19 @@ class SefazClientProtocol(Protocol):
     ) -> SefazAutorizacaoResponse:
         ...
 
+    def autorizar_lote_nfce(
+        self,
+        *,
+        filial,
+        pre_emissoes: Sequence,
+    ) -> SefazLoteResponse:
+        """
+        Autoriza até MAX_NFCE_POR_LOTE pré-emissões (mesma filial/UF/ambiente)
+        numa única chamada. Erro técnico afeta o lote inteiro
+        (SefazTechnicalError).
+        """
+        ...
+
     def cancelar_nfce(
         self,
         *,
@@ -133,6 +215,50 @@ class SefazClientProtocol(Protocol):
     ) -> SefazInutilizacaoResponse:
         ...
 
+    def consultar_nfce(
+        self,
+        *,
+        filial,
+        pre_emissao,
+        numero: int,
+        serie: int,
+    ) -> SefazAutorizacaoResponse:
+        """
+        Situação da NFC-e na SEFAZ (consSitNFe), usada para reconciliar
+        emissões com resultado incerto. 100/150 = autorizada (com protocolo);
+        CODIGO_NAO_CONSTA (217) = a SEFAZ não recebeu o documento.
+        """
+        ...
+
+    def consultar_status(self) -> SefazStatusResponse:
+        """
+        Status do serviço da UF/ambiente (consStatServ), usado pela sonda
+        (fiscal.sefaz_status). Não passa pelo circuit breaker.
+        """
+        ...
+
+
+def situacao_para_dict(resp: SefazAutorizacaoResponse) -> Dict[str, Any]:
+    """
+    Resultado de consultar_nfce no dicionário de emitir_nfce; status
+    "nao_consta" quando a SEFAZ não recebeu o documento.
+    """
+    if resp.codigo in (100, 150):
+        status = "autorizada"
+    elif resp.codigo == CODIGO_NAO_CONSTA:
+        status = "nao_consta"
+    else:
+        status = "rejeitada"
+    return {
+        "status": status,
+        "chave_acesso": resp.chave_acesso,
+        "protocolo": resp.protocolo,
+        "xml_autorizado": resp.xml_autorizado,
+        "mensagem": resp.mensagem,
+        "raw": resp.raw,
+        "codigo_retorno": str(resp.codigo),
+    }
+
 
 # ---------------------------------------------------------------------------
 # Implementação mock de client SEFAZ
@@ -233,6 +359,85 @@ class MockSefazClient(SefazClientProtocol):
             "raw": resp.raw,
         }
 
+    # -------------------------
+    # Consulta de situação (consSitNFe)
+    # -------------------------
+    def consultar_nfce(
+        self,
+        *,
+        filial,
+        pre_emissao,
+        numero: int,
+        serie: int,
+    ) -> SefazAutorizacaoResponse:
+        # O mock não guarda o que autorizou: nada consta, e a reconciliação
+        # devolve o documento para a regularização (reenvio).
+        mensagem = "Rejeição: NF-e não consta na base de dados da SEFAZ (mock)."
+        return SefazAutorizacaoResponse(
+            codigo=CODIGO_NAO_CONSTA,
+            mensagem=mensagem,
+            protocolo="",
+            chave_acesso="",
+            xml_autorizado=None,
+            raw={"codigo": CODIGO_NAO_CONSTA, "mensagem": mensagem, "ambiente": self.ambiente, "uf": self.uf},
+        )
+
+    def situacao_nfce(self, *, pre_emissao):
+        """
+        Adaptador de consultar_nfce no formato de dicionário de emitir_nfce
+        (status "autorizada", "nao_consta" ou "rejeitada").
+        """
+        return situacao_para_dict(
+            self.consultar_nfce(
+                filial=getattr(pre_emissao, "filial", None),
+                pre_emissao=pre_emissao,
+                numero=getattr(pre_emissao, "numero", None),
+                serie=getattr(pre_emissao, "serie", None),
+            )
+        )
+
+    # -------------------------
+    # Autorização em lote (enviNFe)
+    # -------------------------
+    def autorizar_lote_nfce(
+        self,
+        *,
+        filial,
+        pre_emissoes: Sequence,
+    ) -> SefazLoteResponse:
+        if len(pre_emissoes) > MAX_NFCE_POR_LOTE:
+            raise ValueError(
+                f"Lote com {len(pre_emissoes)} documentos excede o limite de {MAX_NFCE_POR_LOTE}."
+            )
+
+        resultados = [
+            self.autorizar_nfce(
+                filial=filial,
+                pre_emissao=pre,
+                numero=pre.numero,
+                serie=pre.serie,
+            )
+            for pre in pre_emissoes
+        ]
+
+        recibo = f"REC-{uuid.uuid4().hex[:15]}"
+        mensagem = "Lote processado (mock)."
+
+        return SefazLoteResponse(
+            codigo=104,
+            mensagem=mensagem,
+            recibo=recibo,
+            resultados=resultados,
+            raw={
+                "codigo": 104,
+                "mensagem": mensagem,
+                "recibo": recibo,
+                "quantidade": len(resultados),
+                "ambiente": self.ambiente,
+                "uf": self.uf,
+            },
+        )
+
     # -------------------------
     # Cancelamento NFC-e
     # -------------------------
@@ -295,6 +500,17 @@ class MockSefazClient(SefazClientProtocol):
             raw=raw,
         )
 
+    # -------------------------
+    # Status do serviço
+    # -------------------------
+    def consultar_status(self) -> SefazStatusResponse:
+        mensagem = "Serviço em operação (mock)."
+        return SefazStatusResponse(
+            codigo=107,
+            mensagem=mensagem,
+            raw={"codigo": 107, "mensagem": mensagem, "ambiente": self.ambiente, "uf": self.uf},
+        )
+
 
 class MockSefazClientAlwaysFail(MockSefazClient):
     """
@@ -306,6 +522,9 @@ class MockSefazClientAlwaysFail(MockSefazClient):
 
     Ele oferece:
       - autorizar_nfce(...) -> levanta SefazTechnicalError
+      - autorizar_lote_nfce(...) -> levanta SefazTechnicalError
+      - consultar_status() -> levanta SefazTechnicalError
+      - consultar_nfce(...) -> levanta SefazTechnicalError
       - emitir_nfce(pre_emissao=...) -> levanta SefazTechnicalError
 
     Assim, cobre tanto o uso direto pela service (emitir_nfce) quanto
@@ -354,3 +573,253 @@ class MockSefazClientAlwaysFail(MockSefazClient):
         """
         filial = getattr(pre_emissao, "filial", None)
         self._raise_technical_error(filial=filial)
+
+    def autorizar_lote_nfce(
+        self,
+        *,
+        filial,
+        pre_emissoes: Sequence,
+    ) -> SefazLoteResponse:
+        """
+        Lote inteiro falha tecnicamente (sem resultado por documento).
+        """
+        self._raise_technical_error(filial=filial)
+
+    def consultar_nfce(
+        self,
+        *,
+        filial,
+        pre_emissao,
+        numero: int,
+        serie: int,
+    ) -> SefazAutorizacaoResponse:
+        self._raise_technical_error(filial=filial)
+
+    def consultar_status(self) -> SefazStatusResponse:
+        self._raise_technical_error()
+
+
+# ---------------------------------------------------------------------------
+# Client HTTP (simulador local da SEFAZ)
+# ---------------------------------------------------------------------------
+
+DEFAULT_HTTP_URL = "http://127.0.0.1:8765"
+DEFAULT_HTTP_TIMEOUT_SEGUNDOS = 10.0
+
+# Uma sessão (pool de conexões keep-alive) por thread
+_sessoes_http = threading.local()
+
+
+def _sessao_http() -> requests.Session:
+    sessao = getattr(_sessoes_http, "sessao", None)
+    if sessao is None:
+        sessao = _sessoes_http.sessao = requests.Session()
+    return sessao
+
+
+class HttpSefazClient(SefazClientProtocol):
+    """
+    Client SEFAZ sobre HTTP/JSON, no protocolo do simulador local
+    (fiscal.sefaz_simulador). Selecionado por FISCAL_SEFAZ_CLIENTE="http".
+
+    - Timeout, falha de conexão, HTTP 5xx ou resposta inválida viram
+      SefazTechnicalError (contingência / circuit breaker), como no client real.
+    - Rejeições (cStat diferente de 100/150) são respostas válidas.
+    - O timeout é o de timeout_sefaz() quando em vigor (emissão com timeout
+      dinâmico), senão FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS.
+    """
+
+    def __init__(
+        self,
+        *,
+        ambiente: str = "homolog",
+        uf: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.ambiente = ambiente
+        self.uf = uf or "SP"
+        self.base_url = (base_url or getattr(settings, "FISCAL_SEFAZ_HTTP_URL", DEFAULT_HTTP_URL)).rstrip("/")
+        if timeout is None:
+            timeout = float(getattr(settings, "FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS", DEFAULT_HTTP_TIMEOUT_SEGUNDOS))
+        self.timeout = timeout
+
+    def _url(self, caminho: str) -> str:
+        return f"{self.base_url}/{self.uf}/{self.ambiente}/{caminho}"
+
+    def _post(self, operacao: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._requisitar("POST", f"nfce/{operacao}", payload)
+
+    def _requisitar(self, metodo: str, caminho: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = self._url(caminho)
+        raw_erro = {"url": url, "uf": self.uf, "ambiente": self.ambiente}
+        timeout = timeout_em_vigor(self.timeout)
+        try:
+            resp = _sessao_http().request(metodo, url, json=payload, timeout=timeout)
+        except requests.Timeout as exc:
+            raise SefazTechnicalError(
+                f"Timeout na comunicação com a SEFAZ ({timeout}s).", codigo="TIMEOUT", raw=raw_erro
+            ) from exc
+        except requests.RequestException as exc:
+            raise SefazTechnicalError(
+                f"Falha de conexão com a SEFAZ: {exc}", codigo="CONEXAO", raw=raw_erro
+            ) from exc
+
+        try:
+            dados = resp.json()
+        except ValueError:
+            dados = None
+        if resp.status_code >= 500 or not isinstance(dados, dict):
+            raise SefazTechnicalError(
+                f"SEFAZ indisponível (HTTP {resp.status_code}).",
+                codigo=f"HTTP_{resp.status_code}",
+                raw={**raw_erro, "resposta": dados},
+            )
+        if resp.status_code >= 400:
+            raise SefazTechnicalError(
+                dados.get("mensagem") or f"Requisição recusada pela SEFAZ (HTTP {resp.status_code}).",
+                codigo=f"HTTP_{resp.status_code}",
+                raw={**raw_erro, "resposta": dados},
+            )
+        return dados
+
+    @staticmethod
+    def _autorizacao(dados: Dict[str, Any]) -> SefazAutorizacaoResponse:
+        return SefazAutorizacaoResponse(
+            codigo=int(dados["codigo"]),
+            mensagem=dados.get("mensagem", ""),
+            protocolo=dados.get("protocolo") or "",
+            chave_acesso=dados.get("chave_acesso") or "",
+            xml_autorizado=dados.get("xml_autorizado"),
+            raw=dados,
+        )
+
+    def autorizar_nfce(
+        self,
+        *,
+        filial,
+        pre_emissao,
+        numero: int,
+        serie: int,
+    ) -> SefazAutorizacaoResponse:
+        dados = self._post("autorizacao", {
+            "numero": numero,
+            "serie": serie,
+            "request_id": str(getattr(pre_emissao, "request_id", "") or ""),
+            "cnpj": getattr(filial, "cnpj", None),
+        })
+        return self._autorizacao(dados)
+
+    def emitir_nfce(self, *, pre_emissao):
+        """Mesmo adaptador (dict) do MockSefazClient.emitir_nfce."""
+        resp = self.autorizar_nfce(
+            filial=getattr(pre_emissao, "filial", None),
+            pre_emissao=pre_emissao,
+            numero=getattr(pre_emissao, "numero", None),
+            serie=getattr(pre_emissao, "serie", None),
+        )
+        return {
+            "status": "autorizada" if resp.codigo in (100, 150) else "rejeitada",
+            "chave_acesso": resp.chave_acesso,
+            "protocolo": resp.protocolo,
+            "xml_autorizado": resp.xml_autorizado,
+            "mensagem": resp.mensagem,
+            "raw": resp.raw,
+        }
+
+    def autorizar_lote_nfce(
+        self,
+        *,
+        filial,
+        pre_emissoes: Sequence,
+    ) -> SefazLoteResponse:
+        if len(pre_emissoes) > MAX_NFCE_POR_LOTE:
+            raise ValueError(
+                f"Lote com {len(pre_emissoes)} documentos excede o limite de {MAX_NFCE_POR_LOTE}."
+            )
+        dados = self._post("lote", {
+            "cnpj": getattr(filial, "cnpj", None),
+            "documentos": [
+                {"numero": pre.numero, "serie": pre.serie, "request_id": str(getattr(pre, "request_id", "") or "")}
+                for pre in pre_emissoes
+            ],
+        })
+        return SefazLoteResponse(
+            codigo=int(dados["codigo"]),
+            mensagem=dados.get("mensagem", ""),
+            recibo=dados.get("recibo") or "",
+            resultados=[self._autorizacao(item) for item in dados.get("resultados") or []],
+            raw=dados,
+        )
+
+    def consultar_nfce(
+        self,
+        *,
+        filial,
+        pre_emissao,
+        numero: int,
+        serie: int,
+    ) -> SefazAutorizacaoResponse:
+        dados = self._post("consulta", {
+            "numero": numero,
+            "serie": serie,
+            "request_id": str(getattr(pre_emissao, "request_id", "") or ""),
+            "cnpj": getattr(filial, "cnpj", None),
+        })
+        return self._autorizacao(dados)
+
+    def situacao_nfce(self, *, pre_emissao):
+        """Mesmo adaptador (dict) do MockSefazClient.situacao_nfce."""
+        return situacao_para_dict(
+            self.consultar_nfce(
+                filial=getattr(pre_emissao, "filial", None),
+                pre_emissao=pre_emissao,
+                numero=getattr(pre_emissao, "numero", None),
+                serie=getattr(pre_emissao, "serie", None),
+            )
+        )
+
+    def cancelar_nfce(
+        self,
+        *,
+        filial,
+        documento,
+        motivo: str,
+    ) -> SefazCancelamentoResponse:
+        dados = self._post("cancelamento", {"chave_acesso": documento.chave_acesso, "motivo": motivo})
+        return SefazCancelamentoResponse(
+            codigo=int(dados["codigo"]),
+            mensagem=dados.get("mensagem", ""),
+            protocolo=dados.get("protocolo") or "",
+            raw=dados,
+        )
+
+    def inutilizar_faixa(
+        self,
+        *,
+        filial,
+        serie: int,
+        numero_inicial: int,
+        numero_final: int,
+        motivo: str,
+    ) -> SefazInutilizacaoResponse:
+        dados = self._post("inutilizacao", {
+            "serie": serie,
+            "numero_inicial": numero_inicial,
+            "numero_final": numero_final,
+            "motivo": motivo,
+        })
+        return SefazInutilizacaoResponse(
+            codigo=int(dados["codigo"]),
+            mensagem=dados.get("mensagem", ""),
+            protocolo=dados.get("protocolo") or "",
+            raw=dados,
+        )
+
+    def consultar_status(self) -> SefazStatusResponse:
+        dados = self._requisitar("GET", "status")
+        return SefazStatusResponse(
+            codigo=int(dados["codigo"]),
+            mensagem=dados.get("mensagem", ""),
+            raw=dados,
+        )
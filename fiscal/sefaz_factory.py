@@ -9,23 +9,31 @@ Objetivos:
 
 No momento, todos os ambientes/UFs usam MockSefazClient por padrão,
 e MockSefazClientAlwaysFail para cenários de falha técnica / contingência
-(simulações em testes).
+(simulações em testes). Com FISCAL_SEFAZ_CLIENTE="http", todas as UFs usam
+HttpSefazClient apontado para o simulador local (FISCAL_SEFAZ_HTTP_URL).
 """
 
 from __future__ import annotations
 
 from typing import Type
 
+from django.conf import settings
+
 from filial.models import Filial  # modelo de filial do projeto
+from fiscal.sefaz_circuit_breaker import com_circuit_breaker
 from fiscal.sefaz_clients import (
+    HttpSefazClient,
     MockSefazClient,
     MockSefazClientAlwaysFail,
+    SefazAutorizacaoResponse,
     SefazClientProtocol,
+    situacao_para_dict,
 )
 
 
 # UFs oficialmente suportadas neste MVP
 SUPPORTED_UFS = {"SP", "MG", "RJ", "ES"}
+AMBIENTES = ("homolog", "producao")
 
 # Mapeamento de UF -> classe de client.
 # Por enquanto, todas usam MockSefazClient, mas este dicionário
@@ -80,8 +88,13 @@ def get_sefaz_client_for_filial(
       - Ambiente é derivado de filial.ambiente, normalizado.
       - UF é derivada de filial.uf, normalizada.
       - Para SP/MG/RJ/ES, usamos MockSefazClient (MVP multi-UF).
+      - FISCAL_SEFAZ_CLIENTE="http" troca o mock por HttpSefazClient
+        (simulador local com perfis de latência/falha por UF).
       - force_technical_fail=True força uso de MockSefazClientAlwaysFail
-        (usado em testes de contingência).
+        (usado em testes de contingência), sem circuit breaker.
+      - Com FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO, o client é protegido pelo
+        circuit breaker da (UF, ambiente): com o circuito aberto a chamada
+        falha na hora com SefazTechnicalError (contingência sem rede).
 
     Este é o ponto único onde, futuramente, vamos plugar implementações
     reais por UF, sem precisar alterar services/views.
@@ -92,9 +105,24 @@ def get_sefaz_client_for_filial(
     if force_technical_fail:
         return MockSefazClientAlwaysFail(ambiente=ambiente, uf=uf)
 
+    client = criar_sefaz_client(uf, ambiente)
+
+    if not getattr(settings, "FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO", False):
+        return client
+    return com_circuit_breaker(client, uf, ambiente)
+
+
+def criar_sefaz_client(uf: str, ambiente: str) -> SefazClientProtocol:
+    """
+    Client da (UF, ambiente) já normalizados, sem circuit breaker (usado
+    também pela sonda de status, que precisa chegar à SEFAZ com o circuito
+    aberto).
+    """
     client_cls: Type[SefazClientProtocol]
 
-    if uf in CLIENT_CLASS_BY_UF:
+    if getattr(settings, "FISCAL_SEFAZ_CLIENTE", "mock") == "http":
+        client_cls = HttpSefazClient
+    elif uf in CLIENT_CLASS_BY_UF:
         client_cls = CLIENT_CLASS_BY_UF[uf]
     else:
         # Fallback para UFs não mapeadas explicitamente – mantém comportamento
@@ -102,3 +130,57 @@ def get_sefaz_client_for_filial(
         client_cls = MockSefazClient
 
     return client_cls(ambiente=ambiente, uf=uf)
+
+
+def autorizacao_para_dict(resp: SefazAutorizacaoResponse) -> dict:
+    """
+    Converte a SefazAutorizacaoResponse (autorizar_nfce / item de lote) no
+    dicionário que as services de emissão consomem.
+    """
+    return {
+        "chave_acesso": resp.chave_acesso,
+        "protocolo": resp.protocolo,
+        "status": "autorizada" if resp.codigo in (100, 150) else "rejeitada",
+        "xml_autorizado": resp.xml_autorizado,
+        "mensagem": resp.mensagem,
+        "raw": resp.raw,
+        "codigo_retorno": str(resp.codigo),
+    }
+
+
+class SefazEmitirAdapter:
+    """
+    Adaptador que expõe o método emitir_nfce(pre_emissao=...)
+    a partir de um client baseado em SefazClientProtocol (MockSefazClient, etc).
+
+    A service emitir_nfce continua falando com um client que tem emitir_nfce,
+    mas por baixo usamos autorizar_nfce(filial, pre_emissao, numero, serie)
+    da implementação real (MockSefazClient ou futura implementação por UF).
+    """
+
+    def __init__(self, inner_client, filial: Filial):
+        self.inner_client = inner_client
+        self.filial = filial
+
+    def emitir_nfce(self, *, pre_emissao):
+        """
+        Adapta a chamada do client SEFAZ real (autorizar_nfce) para o formato
+        de dicionário que a service emitir_nfce espera hoje.
+        """
+        resp = self.inner_client.autorizar_nfce(
+            filial=self.filial,
+            pre_emissao=pre_emissao,
+            numero=pre_emissao.numero,
+            serie=pre_emissao.serie,
+        )
+        return autorizacao_para_dict(resp)
+
+    def situacao_nfce(self, *, pre_emissao):
+        """consultar_nfce do client real no formato de dicionário."""
+        resp = self.inner_client.consultar_nfce(
+            filial=self.filial,
+            pre_emissao=pre_emissao,
+            numero=pre_emissao.numero,
+            serie=pre_emissao.serie,
+        )
+        return situacao_para_dict(resp)
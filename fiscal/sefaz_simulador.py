@@ -0,0 +1,357 @@
+# fiscal/sefaz_simulador.py
+"""
+Simulador local da SEFAZ (HTTP/JSON) para testes de carga.
+
+O MockSefazClient responde na hora e o MockSefazClientAlwaysFail falha
+sempre; nenhum dos dois reproduz uma SP lenta ou uma MG instável. Este
+módulo sobe um servidor HTTP (somente biblioteca padrão) com um perfil por
+UF, falado pelo HttpSefazClient (FISCAL_SEFAZ_CLIENTE="http"):
+
+  POST /<UF>/<ambiente>/nfce/autorizacao    {"numero", "serie", ...}
+  POST /<UF>/<ambiente>/nfce/lote           {"documentos": [{"numero", "serie"}, ...]}
+  POST /<UF>/<ambiente>/nfce/consulta       {"request_id", ...} consSitNFe (217 = não consta)
+  POST /<UF>/<ambiente>/nfce/cancelamento   {"chave_acesso", "motivo"}
+  POST /<UF>/<ambiente>/nfce/inutilizacao   {"serie", "numero_inicial", "numero_final", "motivo"}
+  GET  /<UF>/<ambiente>/status              consStatServ (107 = em operação)
+  GET  /_perfis                              perfis em uso
+  GET  /_contadores                          chamadas por operação/falha
+  PUT  /_perfis/<UF>                         troca o perfil da UF em execução
+
+Perfil (PerfilSefaz), por UF ("*" vale para as demais):
+  - latência log-normal dada por mediana e p99 (ms);
+  - taxa_timeout: fração das chamadas que só responde após atraso_timeout_ms
+    (o client desiste antes: SefazTechnicalError);
+  - taxa_erro: fração das chamadas com HTTP 503;
+  - rejeicoes: {"539": 0.01, ...} fração de autorizações rejeitadas por cStat;
+  - indisponivel_ciclo_segundos / indisponivel_fracao: "flapping" — no início
+    de cada ciclo a UF fica fora do ar (HTTP 503) por essa fração do ciclo;
+  - max_lote: documentos aceitos por lote (0 = UF sem autorização em lote).
+
+Subir pela linha de comando:  python manage.py sefaz_simulador --perfis perfis.json
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# z do percentil 99 da normal padrão (latência log-normal por mediana + p99)
+_Z_P99 = 2.326
+
+PERFIL_PADRAO = "*"
+
+MENSAGENS_REJEICAO = {
+    204: "Rejeição: Duplicidade de NF-e",
+    225: "Rejeição: Falha no Schema XML da NFC-e",
+    301: "Uso Denegado: Irregularidade fiscal do emitente",
+    539: "Rejeição: Duplicidade de NF-e, com diferença na Chave de Acesso",
+    778: "Rejeição: Informado NCM inexistente",
+}
+
+
+@dataclass
+class PerfilSefaz:
+    latencia_mediana_ms: float = 20.0
+    latencia_p99_ms: float = 80.0
+    taxa_timeout: float = 0.0
+    atraso_timeout_ms: float = 30000.0
+    taxa_erro: float = 0.0
+    rejeicoes: Dict[str, float] = field(default_factory=dict)
+    indisponivel_ciclo_segundos: float = 0.0
+    indisponivel_fracao: float = 0.0
+    max_lote: int = 50
+
+    @classmethod
+    def de_dict(cls, dados: Dict[str, Any]) -> "PerfilSefaz":
+        conhecidos = {f.name for f in fields(cls)}
+        desconhecidos = set(dados) - conhecidos
+        if desconhecidos:
+            raise ValueError(f"Campos de perfil desconhecidos: {sorted(desconhecidos)}")
+        return cls(**dados)
+
+    def latencia_segundos(self, rnd: random.Random) -> float:
+        if self.latencia_mediana_ms <= 0:
+            return 0.0
+        sigma = 0.0
+        if self.latencia_p99_ms > self.latencia_mediana_ms:
+            sigma = math.log(self.latencia_p99_ms / self.latencia_mediana_ms) / _Z_P99
+        return rnd.lognormvariate(math.log(self.latencia_mediana_ms), sigma) / 1000.0
+
+    def indisponivel(self, agora: float) -> bool:
+        if self.indisponivel_ciclo_segundos <= 0 or self.indisponivel_fracao <= 0:
+            return False
+        fase = agora % self.indisponivel_ciclo_segundos
+        return fase < self.indisponivel_fracao * self.indisponivel_ciclo_segundos
+
+    def sortear_rejeicao(self, rnd: random.Random) -> Optional[int]:
+        sorteio = rnd.random()
+        acumulado = 0.0
+        for codigo, taxa in self.rejeicoes.items():
+            acumulado += taxa
+            if sorteio < acumulado:
+                return int(codigo)
+        return None
+
+
+# Exemplos para --exemplo: SP lenta com timeouts esporádicos, MG instável
+PERFIS_EXEMPLO: Dict[str, PerfilSefaz] = {
+    PERFIL_PADRAO: PerfilSefaz(),
+    "SP": PerfilSefaz(latencia_mediana_ms=600, latencia_p99_ms=4000, taxa_timeout=0.02),
+    "MG": PerfilSefaz(
+        latencia_mediana_ms=150,
+        latencia_p99_ms=900,
+        taxa_erro=0.05,
+        rejeicoes={"539": 0.01},
+        indisponivel_ciclo_segundos=60,
+        indisponivel_fracao=0.25,
+    ),
+}
+
+
+def carregar_perfis(dados: Dict[str, Dict[str, Any]]) -> Dict[str, PerfilSefaz]:
+    """{"SP": {...}, "*": {...}} -> perfis; sem "*", as demais UFs usam o padrão."""
+    perfis = {uf.strip().upper(): PerfilSefaz.de_dict(valor) for uf, valor in dados.items()}
+    perfis.setdefault(PERFIL_PADRAO, PerfilSefaz())
+    return perfis
+
+
+class SimuladorSefaz:
+    """
+    Estado do simulador: perfis por UF, sorteios e contadores. Thread-safe
+    (o servidor atende cada requisição numa thread).
+    """
+
+    def __init__(self, perfis: Optional[Dict[str, PerfilSefaz]] = None, *, semente: Optional[int] = None):
+        self.perfis: Dict[str, PerfilSefaz] = dict(perfis or {PERFIL_PADRAO: PerfilSefaz()})
+        self.perfis.setdefault(PERFIL_PADRAO, PerfilSefaz())
+        self._rnd = random.Random(semente)
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {}
+        # request_id -> retorno da autorização (consSitNFe)
+        self._autorizadas: Dict[str, Dict[str, Any]] = {}
+
+    def perfil(self, uf: str) -> PerfilSefaz:
+        return self.perfis.get(uf.upper()) or self.perfis[PERFIL_PADRAO]
+
+    def definir_perfil(self, uf: str, perfil: PerfilSefaz) -> None:
+        with self._lock:
+            self.perfis[uf.strip().upper()] = perfil
+
+    def _contar(self, chave: str) -> None:
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + 1
+
+    def _sortear(self, perfil: PerfilSefaz) -> Tuple[float, bool, bool, Optional[int]]:
+        # Random não é thread-safe para sequências reprodutíveis: sorteia sob lock
+        with self._lock:
+            latencia = perfil.latencia_segundos(self._rnd)
+            timeout = self._rnd.random() < perfil.taxa_timeout
+            erro = self._rnd.random() < perfil.taxa_erro
+            rejeicao = perfil.sortear_rejeicao(self._rnd)
+        return latencia, timeout, erro, rejeicao
+
+    def atender(self, uf: str, ambiente: str, operacao: str, corpo: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Processa uma operação e devolve (status HTTP, corpo). Dorme a latência
+        sorteada na thread da requisição.
+        """
+        perfil = self.perfil(uf)
+        latencia, timeout, erro, rejeicao = self._sortear(perfil)
+
+        if perfil.indisponivel(time.time()):
+            self._contar("indisponivel")
+            return 503, {"codigo": 108, "mensagem": "Serviço paralisado momentaneamente (simulador)."}
+        if timeout:
+            self._contar("timeout")
+            time.sleep(perfil.atraso_timeout_ms / 1000.0)
+            return 504, {"codigo": 109, "mensagem": "Tempo de resposta esgotado (simulador)."}
+
+        time.sleep(latencia)
+        if erro:
+            self._contar("erro")
+            return 503, {"codigo": 999, "mensagem": "Erro interno (simulador)."}
+
+        self._contar(operacao)
+        base = {"uf": uf, "ambiente": ambiente, "latencia_ms": round(latencia * 1000, 1)}
+
+        if operacao == "status":
+            return 200, {**base, "codigo": 107, "mensagem": "Serviço em operação"}
+        if operacao == "autorizacao":
+            return 200, {**base, **self._autorizacao(corpo, rejeicao)}
+        if operacao == "lote":
+            return self._lote(perfil, base, corpo)
+        if operacao == "consulta":
+            with self._lock:
+                autorizada = self._autorizadas.get(str(corpo.get("request_id") or ""))
+            if autorizada is None:
+                return 200, {
+                    **base,
+                    "codigo": 217,
+                    "mensagem": "Rejeição: NF-e não consta na base de dados da SEFAZ (simulador)",
+                    "protocolo": "",
+                    "chave_acesso": "",
+                    "xml_autorizado": None,
+                }
+            return 200, {**base, **autorizada}
+        if operacao == "cancelamento":
+            chave = str(corpo.get("chave_acesso", ""))
+            return 200, {
+                **base,
+                "codigo": 135,
+                "mensagem": "Evento registrado e vinculado a NF-e (simulador)",
+                "protocolo": f"CANCEL-{chave[-10:]}",
+            }
+        if operacao == "inutilizacao":
+            faixa = f"{corpo.get('numero_inicial')}-{corpo.get('numero_final')}"
+            return 200, {
+                **base,
+                "codigo": 102,
+                "mensagem": "Inutilização de número homologado (simulador)",
+                "protocolo": f"INUT-{uf}-{corpo.get('serie')}-{faixa}",
+            }
+        return 404, {"codigo": 0, "mensagem": f"Operação desconhecida: {operacao}"}
+
+    def _autorizacao(self, corpo: Dict[str, Any], rejeicao: Optional[int]) -> Dict[str, Any]:
+        # 44 dígitos, como a chave de acesso real
+        chave = f"{uuid.uuid4().int:044d}"[:44]
+        if rejeicao is not None:
+            return {
+                "codigo": rejeicao,
+                "mensagem": MENSAGENS_REJEICAO.get(rejeicao, "Rejeição (simulador)"),
+                "protocolo": "",
+                "chave_acesso": chave,
+                "xml_autorizado": None,
+            }
+        autorizada = {
+            "codigo": 100,
+            "mensagem": "Autorizado o uso da NF-e (simulador)",
+            "protocolo": f"PROTO-{uuid.uuid4().hex[:10]}",
+            "chave_acesso": chave,
+            "xml_autorizado": (
+                f"<xml-autorizado numero='{corpo.get('numero')}' "
+                f"serie='{corpo.get('serie')}' chave='{chave}' />"
+            ),
+        }
+        if corpo.get("request_id"):
+            with self._lock:
+                self._autorizadas[str(corpo["request_id"])] = autorizada
+        return autorizada
+
+    def _lote(self, perfil: PerfilSefaz, base: Dict[str, Any], corpo: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        documentos = corpo.get("documentos") or []
+        if perfil.max_lote <= 0:
+            return 501, {**base, "codigo": 0, "mensagem": "UF sem autorização em lote (simulador)."}
+        if len(documentos) > perfil.max_lote:
+            return 200, {
+                **base,
+                "codigo": 103,
+                "mensagem": f"Rejeição: lote com mais de {perfil.max_lote} documentos (simulador)",
+                "recibo": "",
+                "resultados": [],
+            }
+        with self._lock:
+            rejeicoes = [perfil.sortear_rejeicao(self._rnd) for _ in documentos]
+        return 200, {
+            **base,
+            "codigo": 104,
+            "mensagem": "Lote processado (simulador)",
+            "recibo": f"REC-{uuid.uuid4().hex[:15]}",
+            "resultados": [self._autorizacao(doc, rej) for doc, rej in zip(documentos, rejeicoes)],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    simulador: SimuladorSefaz
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - assinatura da stdlib
+        # silencioso: o simulador atende milhares de requisições por teste
+        pass
+
+    def _responder(self, status: int, corpo: Dict[str, Any]) -> None:
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        try:
+            self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            # client desistiu (timeout do lado do PDV)
+            pass
+
+    def _corpo(self) -> Dict[str, Any]:
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if not tamanho:
+            return {}
+        return json.loads(self.rfile.read(tamanho) or b"{}")
+
+    def _rota(self) -> Tuple[str, ...]:
+        return tuple(p for p in self.path.split("?", 1)[0].split("/") if p)
+
+    def do_GET(self):
+        partes = self._rota()
+        if partes == ("_perfis",):
+            self._responder(200, {uf: asdict(p) for uf, p in self.simulador.perfis.items()})
+        elif partes == ("_contadores",):
+            self._responder(200, dict(self.simulador.contadores))
+        elif len(partes) == 3 and partes[2] == "status":
+            self._responder(*self.simulador.atender(partes[0].upper(), partes[1], "status", {}))
+        else:
+            self._responder(404, {"codigo": 0, "mensagem": "Rota inexistente."})
+
+    def do_POST(self):
+        partes = self._rota()
+        try:
+            corpo = self._corpo()
+        except ValueError:
+            self._responder(400, {"codigo": 225, "mensagem": "JSON inválido."})
+            return
+        if len(partes) == 4 and partes[2] == "nfce":
+            self._responder(*self.simulador.atender(partes[0].upper(), partes[1], partes[3], corpo))
+        else:
+            self._responder(404, {"codigo": 0, "mensagem": "Rota inexistente."})
+
+    def do_PUT(self):
+        partes = self._rota()
+        if len(partes) != 2 or partes[0] != "_perfis":
+            self._responder(404, {"codigo": 0, "mensagem": "Rota inexistente."})
+            return
+        try:
+            perfil = PerfilSefaz.de_dict(self._corpo())
+        except (TypeError, ValueError) as exc:
+            self._responder(400, {"codigo": 0, "mensagem": str(exc)})
+            return
+        self.simulador.definir_perfil(partes[1], perfil)
+        self._responder(200, asdict(perfil))
+
+
+def criar_servidor(
+    simulador: SimuladorSefaz,
+    *,
+    host: str = "127.0.0.1",
+    porta: int = 8765,
+) -> ThreadingHTTPServer:
+    """
+    Servidor HTTP do simulador (porta 0 = porta livre, ver server_address).
+    Use serve_forever()/shutdown() ou iniciar_em_thread().
+    """
+    handler = type("SimuladorSefazHandler", (_Handler,), {"simulador": simulador})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def iniciar_em_thread(simulador: SimuladorSefaz, *, host: str = "127.0.0.1", porta: int = 0):
+    """Sobe o servidor numa thread daemon; devolve (servidor, url_base)."""
+    servidor = criar_servidor(simulador, host=host, porta=porta)
+    threading.Thread(target=servidor.serve_forever, name="sefaz-simulador", daemon=True).start()
+    host, porta = servidor.server_address[:2]
+    return servidor, f"http://{host}:{porta}"
@@ -0,0 +1,212 @@
+# fiscal/sefaz_status.py
+"""
+Saúde da SEFAZ por (UF, ambiente), alimentada pela sonda de status
+(consStatServ, comando sefaz_status_sonda) e lida pela emissão.
+
+Até aqui só se descobria uma SEFAZ degradada quando uma venda falhava. A
+sonda roda em processo próprio e grava no cache (alias
+FISCAL_SEFAZ_STATUS_CACHE; compartilhado entre processos em produção) as
+últimas FISCAL_SEFAZ_STATUS_JANELA amostras (sucesso, latência, cStat).
+
+A emissão consulta rota_emissao() — uma leitura de cache, sem chamada
+extra à SEFAZ na venda:
+  - sem amostras recentes (sonda parada): emissão normal, timeout padrão;
+  - FISCAL_SEFAZ_STATUS_FALHAS_CONTINGENCIA sondas seguidas falhando, ou
+    disponibilidade abaixo de FISCAL_SEFAZ_STATUS_DISPONIBILIDADE_MINIMA com
+    a última sonda falhando: contingência imediata (SefazDegradada);
+  - caso contrário: timeout da chamada = p95 da latência x
+    FISCAL_SEFAZ_STATUS_FATOR_TIMEOUT, entre FISCAL_SEFAZ_STATUS_TIMEOUT_MINIMO
+    e FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS, aplicado com
+    sefaz_clients.timeout_sefaz().
+
+Uma única sonda por (UF, ambiente) grava a janela (leitura-e-escrita sem
+lock); várias sondas para o mesmo par só duplicariam amostras.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from fiscal.sefaz_clients import SefazTechnicalError
+
+logger = logging.getLogger("pdv.fiscal")
+
+# cStat do consStatServ: 107 = serviço em operação
+CODIGO_EM_OPERACAO = 107
+
+DEFAULT_JANELA = 20
+DEFAULT_VALIDADE_SEGUNDOS = 120
+DEFAULT_FALHAS_CONTINGENCIA = 3
+DEFAULT_DISPONIBILIDADE_MINIMA = 0.5
+DEFAULT_FATOR_TIMEOUT = 4.0
+DEFAULT_TIMEOUT_MINIMO = 1.0
+DEFAULT_TIMEOUT_MAXIMO = 10.0
+
+
+class SefazDegradada(SefazTechnicalError):
+    """
+    Emissão não transmitida: a sonda de status marca a SEFAZ da UF/ambiente
+    como indisponível. Tratada como erro técnico (contingência).
+    """
+
+    def __init__(self, uf: str, ambiente: str, saude: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            f"SEFAZ {uf}/{ambiente} indisponível segundo a sonda de status. Chamada não realizada.",
+            codigo="SEFAZ_DEGRADADA",
+            raw={"uf": uf, "ambiente": ambiente, "saude": saude or {}},
+        )
+
+
+@dataclass
+class SaudeSefaz:
+    uf: str
+    ambiente: str
+    amostras: int
+    disponibilidade: float
+    latencia_p50_ms: Optional[float]
+    latencia_p95_ms: Optional[float]
+    falhas_consecutivas: int
+    ultimo_codigo: Optional[str]
+    ultima_amostra_em: float
+
+
+@dataclass
+class RotaEmissao:
+    contingencia: bool
+    timeout: Optional[float]
+    motivo: str
+    saude: Optional[SaudeSefaz] = None
+
+
+def _cache():
+    return caches[getattr(settings, "FISCAL_SEFAZ_STATUS_CACHE", "default")]
+
+
+def _chave(uf: str, ambiente: str) -> str:
+    return f"sefaz_status:{uf}:{ambiente}"
+
+
+def _config(nome: str, padrao):
+    return type(padrao)(getattr(settings, nome, padrao))
+
+
+def _percentil(valores: List[float], p: float) -> Optional[float]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def _resumir(uf: str, ambiente: str, amostras: List[list]) -> Optional[SaudeSefaz]:
+    if not amostras:
+        return None
+    latencias = [latencia for _, ok, latencia, _ in amostras if ok]
+    falhas = 0
+    for _, ok, _, _ in reversed(amostras):
+        if ok:
+            break
+        falhas += 1
+    return SaudeSefaz(
+        uf=uf,
+        ambiente=ambiente,
+        amostras=len(amostras),
+        disponibilidade=sum(1 for _, ok, _, _ in amostras if ok) / len(amostras),
+        latencia_p50_ms=_percentil(latencias, 0.50),
+        latencia_p95_ms=_percentil(latencias, 0.95),
+        falhas_consecutivas=falhas,
+        ultimo_codigo=amostras[-1][3],
+        ultima_amostra_em=amostras[-1][0],
+    )
+
+
+def registrar_amostra(uf: str, ambiente: str, *, ok: bool, latencia_ms: float, codigo: Optional[str]) -> SaudeSefaz:
+    """Acrescenta uma amostra à janela do par e devolve a saúde resultante."""
+    cache = _cache()
+    janela = _config("FISCAL_SEFAZ_STATUS_JANELA", DEFAULT_JANELA)
+    validade = _config("FISCAL_SEFAZ_STATUS_VALIDADE_SEGUNDOS", DEFAULT_VALIDADE_SEGUNDOS)
+
+    amostras = cache.get(_chave(uf, ambiente)) or []
+    anterior = _resumir(uf, ambiente, amostras)
+    amostras = amostras[-(janela - 1):] if janela > 1 else []
+    amostras.append([time.time(), ok, round(latencia_ms, 1), codigo])
+    # a janela some sozinha se a sonda parar (rota volta ao padrão)
+    cache.set(_chave(uf, ambiente), amostras, timeout=validade)
+
+    saude = _resumir(uf, ambiente, amostras)
+    if anterior is None or (anterior.falhas_consecutivas == 0) != (saude.falhas_consecutivas == 0):
+        log = logger.info if ok else logger.warning
+        log(
+            "sefaz_status_transicao",
+            extra={"event": "sefaz_status", **asdict(saude)},
+        )
+    return saude
+
+
+def sondar(client, uf: str, ambiente: str) -> SaudeSefaz:
+    """
+    Uma consulta de status (client.consultar_status) para o par: mede a
+    latência e registra a amostra. Erro técnico conta como indisponível.
+    """
+    inicio = time.perf_counter()
+    try:
+        resp = client.consultar_status()
+        ok = resp.codigo == CODIGO_EM_OPERACAO
+        codigo = str(resp.codigo)
+    except SefazTechnicalError as exc:
+        ok = False
+        codigo = getattr(exc, "codigo", None) or "TECH_FAIL"
+    latencia_ms = (time.perf_counter() - inicio) * 1000.0
+    return registrar_amostra(uf, ambiente, ok=ok, latencia_ms=latencia_ms, codigo=codigo)
+
+
+def saude_sefaz(uf: str, ambiente: str) -> Optional[SaudeSefaz]:
+    """Saúde do par pelas amostras ainda válidas; None sem sonda recente."""
+    amostras = _cache().get(_chave(uf, ambiente)) or []
+    saude = _resumir(uf, ambiente, amostras)
+    validade = _config("FISCAL_SEFAZ_STATUS_VALIDADE_SEGUNDOS", DEFAULT_VALIDADE_SEGUNDOS)
+    if saude is None or time.time() - saude.ultima_amostra_em > validade:
+        return None
+    return saude
+
+
+def metricas_status(pares: Iterable) -> List[Dict[str, Any]]:
+    resultado = []
+    for uf, ambiente in pares:
+        saude = saude_sefaz(uf, ambiente)
+        resultado.append(asdict(saude) if saude else {"uf": uf, "ambiente": ambiente, "amostras": 0})
+    return resultado
+
+
+def rota_emissao(uf: str, ambiente: str) -> RotaEmissao:
+    """
+    Decide, pela saúde do par, entre emissão normal (com timeout dinâmico) e
+    contingência imediata. Só lê o cache.
+    """
+    if not getattr(settings, "FISCAL_SEFAZ_STATUS_ROTEAMENTO_ATIVO", True):
+        return RotaEmissao(contingencia=False, timeout=None, motivo="roteamento_desligado")
+
+    saude = saude_sefaz(uf, ambiente)
+    if saude is None:
+        return RotaEmissao(contingencia=False, timeout=None, motivo="sem_sonda")
+
+    limite_falhas = _config("FISCAL_SEFAZ_STATUS_FALHAS_CONTINGENCIA", DEFAULT_FALHAS_CONTINGENCIA)
+    minima = _config("FISCAL_SEFAZ_STATUS_DISPONIBILIDADE_MINIMA", DEFAULT_DISPONIBILIDADE_MINIMA)
+    if saude.falhas_consecutivas >= limite_falhas or (
+        saude.falhas_consecutivas and saude.disponibilidade < minima
+    ):
+        return RotaEmissao(contingencia=True, timeout=None, motivo="sefaz_indisponivel", saude=saude)
+
+    if saude.latencia_p95_ms is None:
+        return RotaEmissao(contingencia=False, timeout=None, motivo="sem_latencia", saude=saude)
+
+    minimo = _config("FISCAL_SEFAZ_STATUS_TIMEOUT_MINIMO", DEFAULT_TIMEOUT_MINIMO)
+    maximo = _config("FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS", DEFAULT_TIMEOUT_MAXIMO)
+    fator = _config("FISCAL_SEFAZ_STATUS_FATOR_TIMEOUT", DEFAULT_FATOR_TIMEOUT)
+    timeout = min(maximo, max(minimo, saude.latencia_p95_ms / 1000.0 * fator))
+    return RotaEmissao(contingencia=False, timeout=round(timeout, 3), motivo="sefaz_em_operacao", saude=saude)
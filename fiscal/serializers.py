@@ -17,3 +17,20 @@ class ReservarNumeroOutputSerializer(serializers.Serializer):
     filial_id = serializers.UUIDField()
     request_id = serializers.UUIDField() 
     reserved_at = serializers.DateTimeField()
+
+
+class ReservarNumeroLoteInputSerializer(serializers.Serializer):
+    terminal_id = serializers.UUIDField()
+    serie = serializers.IntegerField(min_value=1, max_value=999)
+    # limite por chamada para manter a transação curta
+    request_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=100,
+    )
+
+
+class ReservarNumeroLoteOutputSerializer(serializers.Serializer):
+    terminal_id = serializers.UUIDField()
+    serie = serializers.IntegerField()
+    reservas = ReservarNumeroOutputSerializer(many=True)
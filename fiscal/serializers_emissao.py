@@ -33,3 +33,23 @@ class EmitirNfceOutputSerializer(serializers.Serializer):
 
     xml_autorizado = serializers.CharField(allow_blank=True, allow_null=True)
     mensagem = serializers.CharField(allow_blank=True, allow_null=True)
+
+
+class NfceEmissaoJobOutputSerializer(serializers.Serializer):
+    """
+    Status de uma emissão NFC-e assíncrona (NfceEmissaoJob).
+
+    "nfce" só é preenchido quando o job foi concluído com NfceDocumento.
+    """
+
+    job_id = serializers.CharField(source="id")
+    request_id = serializers.CharField()
+    status = serializers.CharField()
+    uf = serializers.CharField()
+    tentativas = serializers.IntegerField()
+    codigo_erro = serializers.CharField(allow_null=True)
+    mensagem_erro = serializers.CharField(allow_null=True)
+    created_at = serializers.DateTimeField()
+    concluido_em = serializers.DateTimeField(allow_null=True)
+    status_url = serializers.CharField()
+    nfce = EmitirNfceOutputSerializer(allow_null=True)
@@ -0,0 +1,215 @@
+# fiscal/services/auditoria_service.py
+
+"""
+Gravação da auditoria fiscal (NfceAuditoria) fora do caminho de latência.
+
+- As operações fiscais registram eventos com registrar_auditoria dentro de
+  auditoria_transacional(); os eventos ficam em memória e são gravados com
+  um único INSERT multi-linha no fim do bloco, ainda dentro da transação
+  (rollback da operação descarta a auditoria: exatamente uma vez).
+- O conteúdo SEFAZ já gravado pelo documento (mesmo hash em NfceBlob) não é
+  reenviado ao banco pela auditoria.
+- FISCAL_AUDITORIA_MODO="outbox": em vez de nfce_auditoria, as linhas vão
+  para nfce_auditoria_outbox (tabela estreita, sem índices) e o flusher
+  (nfce_auditoria_outbox) as copia com COPY, em ordem de registro.
+
+Blocos aninhados: os eventos de um bloco interno que falha são descartados;
+os de um bloco interno bem-sucedido sobem para o externo.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from fiscal.models import NfceAuditoria, NfceAuditoriaOutbox
+from fiscal.models.nfce_blob_models import guardar_blobs_pendentes
+
+logger = logging.getLogger("pdv.fiscal")
+
+AUDITORIA_MODO_TRANSACAO = "transacao"
+AUDITORIA_MODO_OUTBOX = "outbox"
+
+DEFAULT_OUTBOX_LOTE = 1000
+
+_ATRIBUTO_PILHA = "_pdv_auditoria_pendente"
+
+
+def auditoria_modo() -> str:
+    return getattr(settings, "FISCAL_AUDITORIA_MODO", AUDITORIA_MODO_TRANSACAO)
+
+
+# ---------------------------------------------------------------------------
+# Registro
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def auditoria_transacional():
+    """
+    transaction.atomic() que grava, no fim do bloco, as auditorias
+    registradas nele. Também pode ser usado como decorator.
+    """
+    with transaction.atomic():
+        pilha = getattr(connection, _ATRIBUTO_PILHA, None)
+        if pilha is None:
+            pilha = []
+            setattr(connection, _ATRIBUTO_PILHA, pilha)
+        pilha.append([])
+        try:
+            yield
+        except BaseException:
+            pilha.pop()
+            raise
+        eventos = pilha.pop()
+        if pilha:
+            pilha[-1].extend(eventos)
+        else:
+            _gravar(eventos)
+
+
+def _reaproveitar_blobs_do_documento(auditoria: NfceAuditoria) -> None:
+    pendentes = auditoria.__dict__.get("_blobs_pendentes")
+    if not pendentes:
+        return
+    doc = NfceAuditoria._meta.get_field("nfce_documento").get_cached_value(auditoria, default=None)
+    if doc is None or doc.__dict__.get("_blobs_pendentes"):
+        return
+    # Documento já salvo: seus blobs estão no banco
+    for hash_ in (doc.xml_autorizado_blob_id, doc.raw_sefaz_response_blob_id):
+        pendentes.pop(hash_, None)
+
+
+def registrar_auditorias(auditorias: Iterable[NfceAuditoria]) -> List[NfceAuditoria]:
+    """
+    Enfileira as auditorias no bloco auditoria_transacional() corrente;
+    fora de um bloco, grava imediatamente.
+    """
+    auditorias = list(auditorias)
+    for auditoria in auditorias:
+        _reaproveitar_blobs_do_documento(auditoria)
+
+    pilha = getattr(connection, _ATRIBUTO_PILHA, None)
+    if pilha:
+        pilha[-1].extend(auditorias)
+    else:
+        _gravar(auditorias)
+    return auditorias
+
+
+def registrar_auditoria(**campos: Any) -> NfceAuditoria:
+    """
+    Mesmos argumentos de NfceAuditoria.objects.create; a linha é gravada no
+    fim do bloco auditoria_transacional() corrente.
+    """
+    return registrar_auditorias([NfceAuditoria(**campos)])[0]
+
+
+# ---------------------------------------------------------------------------
+# Gravação
+# ---------------------------------------------------------------------------
+
+def _valor_coluna(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        # isoformat completo: preserva microssegundos (ordem dos eventos)
+        return valor.isoformat()
+    if isinstance(valor, UUID):
+        return str(valor)
+    return valor
+
+
+def _dados_da_auditoria(auditoria: NfceAuditoria) -> Dict[str, Any]:
+    return {
+        campo.attname: _valor_coluna(getattr(auditoria, campo.attname))
+        for campo in NfceAuditoria._meta.concrete_fields
+    }
+
+
+def _gravar(eventos: List[NfceAuditoria]) -> None:
+    if not eventos:
+        return
+    if auditoria_modo() == AUDITORIA_MODO_OUTBOX:
+        guardar_blobs_pendentes(eventos)
+        NfceAuditoriaOutbox.objects.bulk_create(
+            [
+                NfceAuditoriaOutbox(request_id=evento.request_id, dados=_dados_da_auditoria(evento))
+                for evento in eventos
+            ]
+        )
+        return
+    NfceAuditoria.objects.bulk_create(eventos)
+
+
+# ---------------------------------------------------------------------------
+# Outbox
+# ---------------------------------------------------------------------------
+
+def _texto_copy(valor: Any) -> str:
+    if valor is None:
+        return r"\N"
+    return (
+        str(valor)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copiar_para_auditoria(linhas: List[Dict[str, Any]]) -> None:
+    campos = NfceAuditoria._meta.concrete_fields
+
+    if connection.vendor != "postgresql":
+        NfceAuditoria.objects.bulk_create([NfceAuditoria(**dados) for dados in linhas])
+        return
+
+    quote = connection.ops.quote_name
+    sql = "COPY {tabela} ({colunas}) FROM STDIN".format(
+        tabela=quote(NfceAuditoria._meta.db_table),
+        colunas=", ".join(quote(campo.column) for campo in campos),
+    )
+    buffer = io.StringIO()
+    for dados in linhas:
+        buffer.write("\t".join(_texto_copy(dados.get(campo.attname)) for campo in campos))
+        buffer.write("\n")
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def drenar_outbox_auditoria(*, tamanho_lote: Optional[int] = None) -> int:
+    """
+    Move um lote do outbox (ordem de id) para nfce_auditoria com COPY e
+    apaga as linhas copiadas, na mesma transação. Linhas travadas por outro
+    flusher são puladas (SKIP LOCKED). Retorna quantas linhas foram movidas.
+    """
+    lote = tamanho_lote or getattr(settings, "FISCAL_AUDITORIA_OUTBOX_LOTE", DEFAULT_OUTBOX_LOTE)
+
+    with transaction.atomic():
+        itens = list(
+            NfceAuditoriaOutbox.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "dados")[:lote]
+        )
+        if not itens:
+            return 0
+
+        _copiar_para_auditoria([dados for _, dados in itens])
+        NfceAuditoriaOutbox.objects.filter(id__in=[id_ for id_, _ in itens]).delete()
+
+    logger.info(
+        "nfce_auditoria_outbox_drenada",
+        extra={
+            "event": "nfce_auditoria_outbox",
+            "tenant_id": getattr(connection, "schema_name", None),
+            "linhas": len(itens),
+            "ultimo_id": itens[-1][0],
+        },
+    )
+    return len(itens)
@@ -4,13 +4,14 @@ import logging
 from dataclasses import dataclass
 from typing import Optional
 
-from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 
 from rest_framework.exceptions import NotFound, PermissionDenied, APIException
 
 from filial.models.filial_models import Filial
-from fiscal.models import NfceDocumento, NfceAuditoria
+from fiscal.models import NfceDocumento
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditoria
+from fiscal.services.contexto_fiscal_service import usuario_vinculado
 
 logger = logging.getLogger("pdv.fiscal")
 
@@ -45,14 +46,16 @@ def _get_documento_por_referencia(
 
     try:
         if chave_acesso:
-            return NfceDocumento.objects.select_related("filial", "terminal").get(
-                chave_acesso=chave_acesso
+            return (
+                NfceDocumento.objects.select_related("filial", "terminal")
+                .pelo_indice(chave_acesso=chave_acesso)
+                .get()
             )
 
         if filial_id and numero is not None and serie is not None:
             return (
                 NfceDocumento.objects.select_related("filial", "terminal")
-                .filter(
+                .pelo_indice(
                     filial_id=filial_id,
                     numero=numero,
                     serie=serie,
@@ -71,14 +74,15 @@ def _get_documento_por_referencia(
     )
 
 
-def _assert_user_tem_acesso_filial(*, user, filial: Filial):
+def _assert_user_tem_acesso_filial(*, user, filial: Filial, terminal_id):
     """
-    Valida se o usuário tem vínculo com a filial do documento.
+    Valida se o usuário tem vínculo com a filial do documento
+    (contexto fiscal em cache do terminal do documento).
     """
     if not user.is_authenticated:
         raise PermissionDenied("Usuário não autenticado.")
 
-    has_link = user.userfilial_set.filter(filial_id=filial.id).exists()
+    has_link = usuario_vinculado(user=user, terminal_id=terminal_id, filial_id=filial.id)
     if not has_link:
         raise PermissionDenied("Usuário não tem acesso à filial da NFC-e.")
 
@@ -102,7 +106,7 @@ def _mock_sefaz_cancelamento(*, doc: NfceDocumento, motivo: str) -> dict:
     }
 
 
-@transaction.atomic
+@auditoria_transacional()
 def cancelar_nfce(
     *,
     user,
@@ -140,7 +144,7 @@ def cancelar_nfce(
     )
 
     # 2) Valida permissão do usuário
-    _assert_user_tem_acesso_filial(user=user, filial=doc.filial)
+    _assert_user_tem_acesso_filial(user=user, filial=doc.filial, terminal_id=doc.terminal_id)
 
     # 3) Regras de status
     if doc.status not in ("autorizada", "cancelada"):
@@ -197,7 +201,7 @@ def cancelar_nfce(
     doc.save(update_fields=["status", "protocolo", "mensagem_sefaz", "updated_at"])
 
     # 7) Auditoria
-    NfceAuditoria.objects.create(
+    registrar_auditoria(
         tipo_evento="CANCELAMENTO",
         nfce_documento=doc,
         tenant_id=None,  # pode ser ajustado quando o tenant estiver amarrado ao user/request
@@ -0,0 +1,243 @@
+# fiscal/services/contexto_fiscal_service.py
+"""
+Cache do contexto fiscal por (tenant, usuário, terminal).
+
+Os services fiscais repetiam, a cada requisição (às vezes duas vezes na
+mesma), o Terminal, a Filial, o vínculo user↔filial e o certificado A1.
+Uma entrada do cache guarda o que essas validações precisam:
+
+  - filial do terminal e filiais permitidas ao usuário (UserFilial);
+  - séries NFC-e (modelo 65) ativas no terminal;
+  - UF e ambiente da filial (mesma normalização do sefaz_factory);
+  - presença e validade (a1_expires_at) do certificado A1.
+
+Regras:
+  - o cache é o Django cache (alias FISCAL_CONTEXTO_CACHE) e precisa ser
+    compartilhado entre processos (Redis/Memcached): a geração avançada pelos
+    sinais de um worker só invalida os demais por ele. O system check
+    fiscal.E002 acusa backend por processo (LocMemCache);
+  - a chave inclui uma geração por tenant: save/delete de UserFilial,
+    Terminal, Filial, FilialCertificadoA1 ou DocumentoFiscalSequencia
+    (fiscal.signals) avança a geração e invalida todas as entradas do tenant;
+  - a entrada vive no máximo FISCAL_CONTEXTO_CACHE_TTL_SEGUNDOS e nunca além
+    do vencimento do A1; a validade do A1 é conferida contra o relógio a cada
+    leitura, então um certificado vence no horário mesmo com a entrada viva;
+  - alterações feitas com QuerySet.update()/SQL cru não disparam sinais:
+    chame invalidar_contexto_fiscal() nesses casos.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import FrozenSet, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import OuterRef
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+
+from fiscal.models import DocumentoFiscalSequencia
+from fiscal.sefaz_factory import _normalize_ambiente, _normalize_uf
+from terminal.models.terminal_models import Terminal
+from usuario.authentication import filiais_das_claims
+from usuario.models.usuario_models import UserFilial
+
+logger = logging.getLogger("pdv.fiscal")
+
+ERR_A1_EXPIRED = "FISCAL_3001"
+ERR_NO_PERMISSION = "AUTH_1006"
+
+DEFAULT_TTL_SEGUNDOS = 300
+
+_PREFIXO = "pdv:fiscal:ctx"
+_SEM_EXPIRACAO = None
+
+_RELACOES_TERMINAL = (
+    "filial__certificado_a1",
+    "filial__endereco__logradouro__bairro__municipio__uf",
+)
+
+
+@dataclass(frozen=True)
+class ContextoFiscal:
+    user_id: str
+    terminal_id: str
+    filial_id: str
+    filiais_permitidas: FrozenSet[str]
+    series_nfce: Tuple[int, ...]
+    uf: str
+    ambiente: str
+    possui_a1: bool
+    a1_expires_at: Optional[datetime]
+
+    def vinculado(self, filial_id=None) -> bool:
+        """Usuário vinculado à filial (por padrão, a do terminal)."""
+        return str(filial_id or self.filial_id) in self.filiais_permitidas
+
+    def assert_vinculado(self, filial_id=None, *, message: str = "Usuário sem permissão para a filial do terminal"):
+        if not self.vinculado(filial_id):
+            raise PermissionDenied({"code": ERR_NO_PERMISSION, "message": message})
+
+    def a1_valido(self) -> bool:
+        return bool(self.a1_expires_at) and self.a1_expires_at > timezone.now()
+
+    def assert_a1_valido(self):
+        """Mesma semântica de numero_service._assert_a1_valid."""
+        if not self.possui_a1:
+            raise PermissionDenied({
+                "code": ERR_A1_EXPIRED,
+                "message": "Filial não possui certificado A1 configurado.",
+            })
+        if not self.a1_valido():
+            raise PermissionDenied({
+                "code": ERR_A1_EXPIRED,
+                "message": "Certificado A1 expirado. Emissão bloqueada.",
+            })
+
+
+def _cache():
+    return caches[getattr(settings, "FISCAL_CONTEXTO_CACHE", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "FISCAL_CONTEXTO_CACHE_TTL_SEGUNDOS", DEFAULT_TTL_SEGUNDOS))
+
+
+def _schema() -> str:
+    return getattr(connection, "schema_name", "")
+
+
+def _chave_geracao(schema: str) -> str:
+    return f"{_PREFIXO}:{schema}:geracao"
+
+
+def _geracao(cache, schema: str) -> int:
+    geracao = cache.get(_chave_geracao(schema))
+    if geracao is None:
+        cache.add(_chave_geracao(schema), 0, timeout=_SEM_EXPIRACAO)
+        geracao = cache.get(_chave_geracao(schema), 0)
+    return geracao
+
+
+def _chave(schema: str, geracao: int, user_id, terminal_id) -> str:
+    return f"{_PREFIXO}:{schema}:{geracao}:{user_id}:{terminal_id}"
+
+
+def invalidar_contexto_fiscal(schema: Optional[str] = None) -> None:
+    """
+    Invalida todas as entradas do tenant (padrão: o schema da conexão),
+    avançando a geração usada nas chaves.
+    """
+    cache = _cache()
+    chave = _chave_geracao(_schema() if schema is None else schema)
+    cache.add(chave, 0, timeout=_SEM_EXPIRACAO)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # chave removida entre o add e o incr (eviction/clear)
+        cache.set(chave, 1, timeout=_SEM_EXPIRACAO)
+
+
+def _carregar_contexto(*, user, terminal_id) -> Optional[ContextoFiscal]:
+    # séries ativas na mesma consulta do terminal/filial/certificado
+    series = DocumentoFiscalSequencia.objects.filter(
+        terminal_id=OuterRef("pk"),
+        modelo=DocumentoFiscalSequencia.MODELO_NFCE,
+        ativo=True,
+    ).values("serie")
+    try:
+        terminal = (
+            Terminal.objects.select_related(*_RELACOES_TERMINAL)
+            .annotate(series_nfce=ArraySubquery(series))
+            .get(id=terminal_id)
+        )
+    except Terminal.DoesNotExist:
+        return None
+
+    filial = terminal.filial
+    cert = getattr(filial, "certificado_a1", None)
+    # token confiável (AUTH_JWT_CLAIMS_CONFIAVEIS) já traz os vínculos
+    filiais = filiais_das_claims(user)
+    if filiais is None:
+        filiais = UserFilial.objects.filter(user_id=user.id).values_list("filial_id", flat=True)
+
+    return ContextoFiscal(
+        user_id=str(user.id),
+        terminal_id=str(terminal.id),
+        filial_id=str(filial.id),
+        filiais_permitidas=frozenset(str(f) for f in filiais),
+        series_nfce=tuple(sorted(terminal.series_nfce or ())),
+        uf=_normalize_uf(getattr(filial, "uf", None)),
+        ambiente=_normalize_ambiente(getattr(filial, "ambiente", None)),
+        possui_a1=cert is not None,
+        a1_expires_at=cert.a1_expires_at if cert else None,
+    )
+
+
+def _timeout(contexto: ContextoFiscal) -> int:
+    timeout = _ttl()
+    if contexto.a1_expires_at is not None:
+        restante = int((contexto.a1_expires_at - timezone.now()).total_seconds())
+        if restante > 0:
+            # a entrada não sobrevive ao certificado
+            timeout = min(timeout, restante)
+    return timeout
+
+
+def obter_contexto_fiscal(*, user, terminal_id) -> Optional[ContextoFiscal]:
+    """
+    Contexto fiscal de (usuário, terminal) do tenant corrente; None se o
+    terminal não existe ou o id é malformado (não é cacheado). Não valida
+    nada: use assert_vinculado()/assert_a1_valido() da entrada.
+    """
+    try:
+        terminal_id = uuid.UUID(str(terminal_id))
+    except ValueError:
+        return None
+
+    cache = _cache()
+    schema = _schema()
+    chave = _chave(schema, _geracao(cache, schema), user.id, terminal_id)
+
+    contexto = cache.get(chave)
+    if contexto is not None:
+        return contexto
+
+    contexto = _carregar_contexto(user=user, terminal_id=terminal_id)
+    if contexto is None:
+        return None
+
+    timeout = _timeout(contexto)
+    if timeout > 0:
+        cache.set(chave, contexto, timeout=timeout)
+    logger.debug(
+        "contexto_fiscal_carregado",
+        extra={
+            "event": "contexto_fiscal",
+            "tenant_id": schema,
+            "user_id": getattr(user, "id", None),
+            "terminal_id": str(terminal_id),
+            "filial_id": contexto.filial_id,
+        },
+    )
+    return contexto
+
+
+def usuario_vinculado(*, user, terminal_id, filial_id) -> bool:
+    """
+    Vínculo user↔filial pelo contexto do terminal; sem contexto (terminal
+    inexistente), pelas claims do token ou UserFilial direto.
+    """
+    contexto = obter_contexto_fiscal(user=user, terminal_id=terminal_id)
+    if contexto is None:
+        filiais = filiais_das_claims(user)
+        if filiais is not None:
+            return str(filial_id) in filiais
+        return user.userfilial_set.filter(filial_id=filial_id).exists()
+    return contexto.vinculado(filial_id)
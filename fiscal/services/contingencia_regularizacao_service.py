@@ -0,0 +1,367 @@
+# fiscal/services/contingencia_regularizacao_service.py
+
+"""
+Worker de regularização de contingência em massa (backlog pós-queda da SEFAZ).
+
+Em vez de uma chamada HTTP por NfceDocumento (regularizar_contingencia_nfce):
+
+- varre os documentos em contingencia_pendente pelo índice parcial
+  idx_nfce_doc_contingencia, em páginas ordenadas por (created_at, id);
+- reenvia em lotes (enviNFe) com concorrência limitada por UF: um pool de
+  threads por UF, do tamanho de limite_por_uf (mesma configuração da fila
+  de emissão);
+- grava o checkpoint (NfceRegularizacaoCursor) ao fim de cada página, para
+  que uma queda retome de onde parou;
+- devolve throughput e backlog restante por UF do tenant.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.exceptions import APIException
+
+from filial.models.filial_models import Filial
+from fiscal.models import NfceDocumento, NfcePreEmissao, NfceRegularizacaoCursor
+from fiscal.sefaz_clients import MAX_NFCE_POR_LOTE, SefazClientProtocol
+from fiscal.sefaz_factory import _normalize_uf, get_sefaz_client_for_filial
+from fiscal.services.emissao_fila_service import limite_por_uf
+from fiscal.services.emissao_lote_service import (
+    STATUS_CONTINGENCIA_PENDENTE,
+    ResumoEmissaoLote,
+    _registrar_lote_regularizado,
+    _transmitir,
+    agrupar_em_lotes,
+)
+from fiscal.services.numero_service import _assert_a1_valid
+
+logger = logging.getLogger("pdv.fiscal")
+
+DEFAULT_TAMANHO_PAGINA = 500
+
+
+@dataclass
+class RelatorioRegularizacao(ResumoEmissaoLote):
+    """
+    Resultado de uma execução do worker para um tenant.
+    """
+
+    tenant: Optional[str] = None
+    paginas: int = 0
+    duracao_segundos: float = 0.0
+    passada_concluida: bool = False
+    em_execucao: bool = False  # outro worker já processa este tenant/cursor
+    backlog_restante: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def documentos_por_segundo(self) -> float:
+        if self.duracao_segundos <= 0:
+            return 0.0
+        return self.documentos / self.duracao_segundos
+
+    @property
+    def total_backlog(self) -> int:
+        return sum(self.backlog_restante.values())
+
+
+def _somar(total: ResumoEmissaoLote, parcial: ResumoEmissaoLote) -> None:
+    total.lotes += parcial.lotes
+    total.documentos += parcial.documentos
+    total.autorizadas += parcial.autorizadas
+    total.rejeitadas += parcial.rejeitadas
+    total.contingencia += parcial.contingencia
+    total.lotes_com_erro_tecnico += parcial.lotes_com_erro_tecnico
+    total.ignorados += parcial.ignorados
+
+
+# ---------------------------------------------------------------------------
+# Consultas (índice parcial idx_nfce_doc_contingencia)
+# ---------------------------------------------------------------------------
+
+def _pendentes():
+    return NfceDocumento.objects.filter(status=STATUS_CONTINGENCIA_PENDENTE, em_contingencia=True)
+
+
+def backlog_contingencia_por_uf() -> Dict[str, int]:
+    """
+    Documentos em contingencia_pendente no tenant atual, por UF.
+    """
+    return {
+        (row["uf"] or "").upper(): row["total"]
+        for row in _pendentes().values("uf").annotate(total=Count("id")).order_by("uf")
+    }
+
+
+def _pagina(cursor: NfceRegularizacaoCursor, tamanho: int) -> List[NfceDocumento]:
+    qs = _pendentes()
+    if cursor.ultimo_created_at is not None:
+        qs = qs.filter(
+            Q(created_at__gt=cursor.ultimo_created_at)
+            | Q(created_at=cursor.ultimo_created_at, id__gt=cursor.ultimo_documento_id)
+        )
+    return list(qs.order_by("created_at", "id")[:tamanho])
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+
+def _obter_cursor(nome: str) -> NfceRegularizacaoCursor:
+    cursor, _ = NfceRegularizacaoCursor.objects.get_or_create(nome=nome)
+    if cursor.passada_iniciada_em is None:
+        cursor.passada_iniciada_em = timezone.now()
+        cursor.save(update_fields=["passada_iniciada_em", "updated_at"])
+    return cursor
+
+
+def _avancar_cursor(
+    cursor: NfceRegularizacaoCursor,
+    ultimo: NfceDocumento,
+    parcial: ResumoEmissaoLote,
+) -> None:
+    cursor.ultimo_created_at = ultimo.created_at
+    cursor.ultimo_documento_id = ultimo.id
+    cursor.documentos += parcial.documentos
+    cursor.autorizadas += parcial.autorizadas
+    cursor.rejeitadas += parcial.rejeitadas
+    cursor.pendentes_erro_tecnico += parcial.contingencia
+    cursor.save()
+
+
+def _concluir_passada(cursor: NfceRegularizacaoCursor) -> None:
+    cursor.ultimo_created_at = None
+    cursor.ultimo_documento_id = None
+    cursor.passada_iniciada_em = None
+    cursor.documentos = 0
+    cursor.autorizadas = 0
+    cursor.rejeitadas = 0
+    cursor.pendentes_erro_tecnico = 0
+    cursor.ultima_passada_concluida_em = timezone.now()
+    cursor.save()
+
+
+def reiniciar_cursor(nome: str = NfceRegularizacaoCursor.NOME_PADRAO) -> None:
+    """
+    Descarta o checkpoint: a próxima execução varre o backlog desde o início.
+    """
+    NfceRegularizacaoCursor.objects.filter(nome=nome).delete()
+
+
+def _tentar_lock(chave: str) -> bool:
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [chave])
+        return bool(cur.fetchone()[0])
+
+
+def _liberar_lock(chave: str) -> None:
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", [chave])
+
+
+# ---------------------------------------------------------------------------
+# Execução de um lote (thread do pool da UF)
+# ---------------------------------------------------------------------------
+
+def _regularizar_lote(
+    *,
+    schema: Optional[str],
+    filial: Filial,
+    docs: Sequence[NfceDocumento],
+    pres: Sequence[NfcePreEmissao],
+    client_factory: Callable[[Filial], SefazClientProtocol],
+) -> ResumoEmissaoLote:
+    """
+    Envia um lote e aplica o retorno, na conexão da própria thread.
+    """
+    parcial = ResumoEmissaoLote()
+    try:
+        with schema_context(schema) if schema else nullcontext():
+            respostas, tech_error = _transmitir(client_factory(filial), filial, pres)
+            parcial.lotes += 1
+
+            if tech_error is not None:
+                parcial.lotes_com_erro_tecnico += 1
+                parcial.contingencia += len(docs)
+                logger.warning(
+                    "nfce_regularizacao_lote_erro_tecnico",
+                    extra={
+                        "event": "nfce_regularizacao_paralela",
+                        "tenant_id": schema,
+                        "filial_id": str(filial.id),
+                        "uf": filial.uf,
+                        "quantidade": len(docs),
+                        "error": str(tech_error),
+                    },
+                )
+                return parcial
+
+            _registrar_lote_regularizado(
+                filial=filial,
+                docs=docs,
+                respostas=respostas,
+                user=None,
+                tenant_schema=schema,
+                resumo=parcial,
+            )
+    finally:
+        # Cada thread tem a própria conexão; não deixar aberta ao sair do pool
+        connection.close()
+    return parcial
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def regularizar_contingencias_paralelo(
+    *,
+    nome_cursor: str = NfceRegularizacaoCursor.NOME_PADRAO,
+    limites: Optional[Dict[str, int]] = None,
+    tamanho_lote: int = MAX_NFCE_POR_LOTE,
+    tamanho_pagina: int = DEFAULT_TAMANHO_PAGINA,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+) -> RelatorioRegularizacao:
+    """
+    Regulariza o backlog de contingencia_pendente do tenant atual.
+
+    - Páginas de até tamanho_pagina documentos a partir do checkpoint.
+    - Cada página vira lotes por (filial, UF, ambiente); os lotes de uma UF
+      rodam no pool daquela UF (limite_por_uf threads), as UFs em paralelo.
+    - O checkpoint só avança depois que todos os lotes da página terminaram;
+      após uma queda a página é revarrida e documentos já regularizados não
+      aparecem mais (saem do índice parcial).
+    - Fim da varredura zera o checkpoint (passada_concluida=True).
+    - limite interrompe após ~limite documentos, mantendo o checkpoint.
+
+    Uma única execução por (tenant, cursor): com outra em andamento, retorna
+    em_execucao=True sem processar.
+    """
+    schema = getattr(connection, "schema_name", None)
+    relatorio = RelatorioRegularizacao(tenant=schema)
+    inicio = time.monotonic()
+
+    chave_lock = f"nfce_regularizacao:{schema}:{nome_cursor}"
+    if not _tentar_lock(chave_lock):
+        relatorio.em_execucao = True
+        relatorio.backlog_restante = backlog_contingencia_por_uf()
+        return relatorio
+
+    pools: Dict[str, ThreadPoolExecutor] = {}
+    filiais: Dict = {}
+    filiais_sem_a1 = set()
+
+    try:
+        cursor = _obter_cursor(nome_cursor)
+
+        while True:
+            docs = _pagina(cursor, tamanho_pagina)
+            if not docs:
+                _concluir_passada(cursor)
+                relatorio.passada_concluida = True
+                break
+
+            novas = {d.filial_id for d in docs} - set(filiais)
+            if novas:
+                filiais.update(
+                    Filial.objects.select_related("endereco", "certificado_a1").in_bulk(novas)
+                )
+            pres_por_request = {
+                pre.request_id: pre
+                for pre in NfcePreEmissao.objects.filter(request_id__in=[d.request_id for d in docs])
+            }
+
+            parcial = ResumoEmissaoLote()
+            futuros = []
+            validos = [d for d in docs if d.request_id in pres_por_request]
+            parcial.ignorados += len(docs) - len(validos)
+
+            for filial, lote_docs in agrupar_em_lotes(validos, filiais, tamanho_lote=tamanho_lote):
+                if filial.id not in filiais_sem_a1:
+                    try:
+                        _assert_a1_valid(filial)
+                    except APIException:
+                        filiais_sem_a1.add(filial.id)
+                if filial.id in filiais_sem_a1:
+                    parcial.ignorados += len(lote_docs)
+                    continue
+
+                uf = _normalize_uf(filial.uf)
+                pool = pools.get(uf)
+                if pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=max(1, limite_por_uf(uf, limites)),
+                        thread_name_prefix=f"nfce-regularizacao-{uf}",
+                    )
+                    pools[uf] = pool
+                futuros.append(
+                    pool.submit(
+                        _regularizar_lote,
+                        schema=schema,
+                        filial=filial,
+                        docs=lote_docs,
+                        pres=[pres_por_request[d.request_id] for d in lote_docs],
+                        client_factory=client_factory,
+                    )
+                )
+
+            # Falha inesperada em um lote propaga sem avançar o checkpoint
+            for futuro in futuros:
+                _somar(parcial, futuro.result())
+
+            _somar(relatorio, parcial)
+            relatorio.paginas += 1
+            _avancar_cursor(cursor, docs[-1], parcial)
+
+            logger.info(
+                "nfce_regularizacao_pagina",
+                extra={
+                    "event": "nfce_regularizacao_paralela",
+                    "tenant_id": schema,
+                    "pagina": relatorio.paginas,
+                    "documentos": parcial.documentos,
+                    "autorizadas": parcial.autorizadas,
+                    "rejeitadas": parcial.rejeitadas,
+                    "pendentes_erro_tecnico": parcial.contingencia,
+                },
+            )
+
+            if len(docs) < tamanho_pagina:
+                _concluir_passada(cursor)
+                relatorio.passada_concluida = True
+                break
+            if limite and relatorio.documentos + relatorio.contingencia >= limite:
+                break
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+        _liberar_lock(chave_lock)
+
+    relatorio.duracao_segundos = time.monotonic() - inicio
+    relatorio.backlog_restante = backlog_contingencia_por_uf()
+
+    logger.info(
+        "nfce_regularizacao_paralela",
+        extra={
+            "event": "nfce_regularizacao_paralela",
+            "tenant_id": schema,
+            "lotes": relatorio.lotes,
+            "documentos": relatorio.documentos,
+            "autorizadas": relatorio.autorizadas,
+            "rejeitadas": relatorio.rejeitadas,
+            "pendentes_erro_tecnico": relatorio.contingencia,
+            "documentos_por_segundo": round(relatorio.documentos_por_segundo, 2),
+            "backlog_restante": relatorio.backlog_restante,
+            "passada_concluida": relatorio.passada_concluida,
+        },
+    )
+    return relatorio
@@ -5,15 +5,15 @@ from dataclasses import dataclass
 from typing import Optional, Dict, Any
 from uuid import UUID
 
-from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.exceptions import NotFound, PermissionDenied, APIException
 
 from filial.models.filial_models import Filial
 from terminal.models.terminal_models import Terminal
-from fiscal.models import NfcePreEmissao, NfceDocumento, NfceAuditoria
-from fiscal.services.numero_service import _assert_a1_valid
+from fiscal.models import NfcePreEmissao, NfceDocumento
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditoria
+from fiscal.services.contexto_fiscal_service import obter_contexto_fiscal
 from fiscal.sefaz_clients import SefazTechnicalError
 from .emissao_service import (
     SefazClientProtocol,
@@ -101,7 +101,7 @@ def _get_documento_contingencia(
 
     # Fallback por chave de acesso (útil em integrações futuras)
     try:
-        return qs.get(chave_acesso=chave_acesso)
+        return qs.pelo_indice(chave_acesso=chave_acesso).get()
     except NfceDocumento.DoesNotExist:
         raise NotFound(
             {
@@ -203,8 +203,9 @@ def regularizar_contingencia_nfce(
     status_antes = doc.status
     em_contingencia_antes = getattr(doc, "em_contingencia", False)
 
-    # 2) Permissão do usuário para a filial
-    if not user.userfilial_set.filter(filial_id=filial.id).exists():
+    # 2) Permissão do usuário para a filial (contexto fiscal em cache)
+    contexto = obter_contexto_fiscal(user=user, terminal_id=terminal.id)
+    if contexto is None or not contexto.vinculado(filial.id):
         raise PermissionDenied(
             {
                 "code": "AUTH_1006",
@@ -247,7 +248,7 @@ def regularizar_contingencia_nfce(
         )
 
     # 4) Certificado A1 ainda precisa estar válido
-    _assert_a1_valid(filial)
+    contexto.assert_a1_valido()
 
     # 5) Necessário ter a pré-emissão vinculada (request_id)
     try:
@@ -263,7 +264,7 @@ def regularizar_contingencia_nfce(
     # 6) Chamada SEFAZ + persistência
 
     try:
-        with transaction.atomic():
+        with auditoria_transacional():
             try:
                 # Reutilizamos o mesmo contrato da emissão normal
                 sefaz_resp = sefaz_client.emitir_nfce(pre_emissao=pre)
@@ -352,7 +353,7 @@ def regularizar_contingencia_nfce(
             ])
 
             # Auditoria específica da regularização
-            NfceAuditoria.objects.create(
+            registrar_auditoria(
                 tipo_evento=tipo_evento,
                 nfce_documento=doc,
                 tenant_id=tenant_schema,
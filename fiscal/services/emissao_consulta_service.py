@@ -0,0 +1,247 @@
+# fiscal/services/emissao_consulta_service.py
+
+"""
+Reconciliação de emissões NFC-e com resultado incerto, pela consulta de
+situação na SEFAZ (consultar_nfce / consSitNFe) — nunca por reenvio às cegas.
+
+Dois casos:
+  - NfceDocumento "em_consulta": falha inesperada durante/após o envio
+    (emitir_nfce ou lote). Autorizada → grava protocolo/XML; nada consta →
+    contingencia_pendente (a regularização reenvia com segurança); qualquer
+    outra situação → continua em consulta.
+  - Claim vencido sem documento e sem advisory lock (processo morreu no meio
+    da chamada). Autorizada → grava o documento; nada consta → libera o
+    claim para o backlog (emissao_lote_service).
+
+Erro técnico na consulta deixa o item para a próxima passada.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from filial.models.filial_models import Filial
+from fiscal.models import NfceDocumento, NfceDocumentoIndice, NfcePreEmissao
+from fiscal.sefaz_clients import SefazClientProtocol, SefazTechnicalError, situacao_para_dict
+from fiscal.sefaz_factory import get_sefaz_client_for_filial
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditoria
+from fiscal.services.emissao_service import (
+    STATUS_EM_CONSULTA,
+    _claim_ttl,
+    _ClaimEmissao,
+    _get_tenant_schema_from_user,
+    _registrar_resultado_emissao,
+    liberar_lock_emissao,
+    tentar_lock_emissao,
+)
+from terminal.models.terminal_models import Terminal
+
+logger = logging.getLogger("pdv.fiscal")
+
+
+@dataclass
+class ResumoReconciliacao:
+    consultados: int = 0
+    autorizadas: int = 0
+    contingencia: int = 0
+    claims_liberados: int = 0
+    pendentes: int = 0
+
+
+def _situacao(client: SefazClientProtocol, filial: Filial, pre: NfcePreEmissao) -> Optional[dict]:
+    try:
+        resp = client.consultar_nfce(filial=filial, pre_emissao=pre, numero=pre.numero, serie=pre.serie)
+    except SefazTechnicalError as exc:
+        logger.warning(
+            "nfce_consulta_erro_tecnico",
+            extra={"event": "nfce_consulta", "request_id": str(pre.request_id), "codigo": exc.codigo},
+        )
+        return None
+    return situacao_para_dict(resp)
+
+
+def _aplicar_situacao(doc: NfceDocumento, situacao: dict, *, user, tenant_schema) -> bool:
+    """
+    Atualiza um documento em consulta com a situação consultada. Retorna
+    False se outro processo já o reconciliou.
+    """
+    with auditoria_transacional():
+        doc = (
+            NfceDocumento.objects.select_for_update(skip_locked=True)
+            .filter(pk=doc.pk, status=STATUS_EM_CONSULTA)
+            .first()
+        )
+        if doc is None:
+            return False
+
+        agora = timezone.now()
+        mensagem = situacao.get("mensagem")
+        raw = situacao.get("raw") or {}
+        if situacao["status"] == "autorizada":
+            doc.status = "autorizada"
+            doc.chave_acesso = situacao.get("chave_acesso") or doc.chave_acesso
+            doc.protocolo = situacao.get("protocolo") or ""
+            doc.xml_autorizado = situacao.get("xml_autorizado")
+            tipo_evento = "EMISSAO_AUTORIZADA"
+        else:
+            # nada consta: a SEFAZ não recebeu; reenvio seguro pela regularização
+            doc.status = "contingencia_pendente"
+            doc.em_contingencia = True
+            doc.contingencia_ativada_em = agora
+            doc.contingencia_motivo = (mensagem or "NFC-e não consta na SEFAZ.")[:255]
+            tipo_evento = "EMISSAO_CONTINGENCIA_ATIVADA"
+        if mensagem is not None:
+            doc.mensagem_sefaz = mensagem
+        if raw:
+            doc.raw_sefaz_response = raw
+
+        doc.save(update_fields=[
+            "status",
+            "chave_acesso",
+            "protocolo",
+            "xml_autorizado",
+            "em_contingencia",
+            "contingencia_ativada_em",
+            "contingencia_motivo",
+            "mensagem_sefaz",
+            "raw_sefaz_response",
+        ])
+
+        registrar_auditoria(
+            tipo_evento=tipo_evento,
+            nfce_documento=doc,
+            tenant_id=tenant_schema,
+            filial_id=doc.filial_id,
+            terminal_id=doc.terminal_id,
+            user_id=getattr(user, "id", None),
+            request_id=doc.request_id,
+            codigo_retorno=situacao.get("codigo_retorno"),
+            mensagem_retorno=mensagem or "",
+            xml_autorizado=situacao.get("xml_autorizado"),
+            raw_sefaz_response=raw,
+            ambiente=doc.ambiente,
+            uf=doc.uf,
+        )
+    return True
+
+
+def reconciliar_documentos_em_consulta(
+    *,
+    user=None,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+    resumo: Optional[ResumoReconciliacao] = None,
+) -> ResumoReconciliacao:
+    resumo = resumo or ResumoReconciliacao()
+    tenant_schema = _get_tenant_schema_from_user(user) if user is not None else None
+
+    docs = NfceDocumento.objects.filter(status=STATUS_EM_CONSULTA).select_related("filial").order_by("created_at")
+    if limite:
+        docs = docs[:limite]
+    docs = list(docs)
+    pres = NfcePreEmissao.objects.in_bulk([d.request_id for d in docs], field_name="request_id")
+
+    for doc in docs:
+        pre = pres.get(doc.request_id)
+        if pre is None:
+            resumo.pendentes += 1
+            continue
+        resumo.consultados += 1
+        situacao = _situacao(client_factory(doc.filial), doc.filial, pre)
+        if situacao is None or situacao["status"] not in {"autorizada", "nao_consta"}:
+            resumo.pendentes += 1
+            continue
+        if _aplicar_situacao(doc, situacao, user=user, tenant_schema=tenant_schema):
+            if situacao["status"] == "autorizada":
+                resumo.autorizadas += 1
+            else:
+                resumo.contingencia += 1
+    return resumo
+
+
+def reconciliar_claims_vencidos(
+    *,
+    user=None,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+    resumo: Optional[ResumoReconciliacao] = None,
+) -> ResumoReconciliacao:
+    resumo = resumo or ResumoReconciliacao()
+    tenant_schema = _get_tenant_schema_from_user(user) if user is not None else None
+
+    pres = (
+        NfcePreEmissao.objects
+        .annotate(tem_documento=Exists(NfceDocumentoIndice.objects.filter(request_id=OuterRef("request_id"))))
+        .filter(
+            tem_documento=False,
+            emissao_token__isnull=False,
+            emissao_iniciada_em__lt=timezone.now() - _claim_ttl(),
+        )
+        .order_by("created_at")
+    )
+    if limite:
+        pres = pres[:limite]
+    pres = list(pres)
+    filiais = Filial.objects.select_related("endereco").in_bulk({p.filial_id for p in pres})
+    terminais = Terminal.objects.in_bulk({p.terminal_id for p in pres})
+
+    for pre in pres:
+        filial = filiais.get(pre.filial_id)
+        terminal = terminais.get(pre.terminal_id)
+        if filial is None or terminal is None:
+            continue
+        # lock ocupado: o processo dono está vivo, só passou do TTL
+        if not tentar_lock_emissao(pre.request_id):
+            resumo.pendentes += 1
+            continue
+        try:
+            resumo.consultados += 1
+            situacao = _situacao(client_factory(filial), filial, pre)
+            if situacao is None or situacao["status"] not in {"autorizada", "nao_consta"}:
+                resumo.pendentes += 1
+                continue
+
+            if situacao["status"] == "nao_consta":
+                resumo.claims_liberados += NfcePreEmissao.objects.filter(
+                    pk=pre.pk, emissao_token=pre.emissao_token
+                ).update(emissao_token=None, emissao_iniciada_em=None)
+                continue
+
+            _registrar_resultado_emissao(
+                claim=_ClaimEmissao(pre=pre, filial=filial, terminal=terminal, token=pre.emissao_token),
+                user=user,
+                request_id=pre.request_id,
+                tenant_schema=tenant_schema,
+                sefaz_resp=situacao,
+                tech_error=None,
+            )
+            resumo.autorizadas += 1
+        finally:
+            liberar_lock_emissao(pre.request_id)
+
+    return resumo
+
+
+def reconciliar_emissoes(
+    *,
+    user=None,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+) -> ResumoReconciliacao:
+    """
+    Uma passada pelos dois casos (documentos em consulta e claims vencidos)
+    do tenant corrente.
+    """
+    resumo = ResumoReconciliacao()
+    reconciliar_documentos_em_consulta(user=user, limite=limite, client_factory=client_factory, resumo=resumo)
+    reconciliar_claims_vencidos(user=user, limite=limite, client_factory=client_factory, resumo=resumo)
+    logger.info(
+        "nfce_reconciliacao",
+        extra={"event": "nfce_consulta", **vars(resumo)},
+    )
+    return resumo
@@ -0,0 +1,451 @@
+# fiscal/services/emissao_fila_service.py
+
+"""
+Emissão NFC-e assíncrona: fila em banco (nfce_emissao_job) + workers.
+
+Fluxo:
+  1. A API enfileira a NfcePreEmissao (enfileirar_emissao_nfce) e responde
+     202 com a URL de status — o PDV não fica preso à latência da SEFAZ.
+  2. Workers (management command nfce_emissao_worker) reivindicam jobs com
+     SELECT ... FOR UPDATE SKIP LOCKED, respeitando o limite de emissões
+     simultâneas por UF, e chamam emitir_nfce (claim → SEFAZ → resultado).
+  3. O PDV consulta (ou aguarda via long-poll) o status do job até obter o
+     NfceDocumento final.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied
+
+from filial.models.filial_models import Filial
+from fiscal.models import NfceDocumento, NfceEmissaoJob, NfcePreEmissao
+from fiscal.sefaz_factory import SefazEmitirAdapter, get_sefaz_client_for_filial
+from fiscal.services.contexto_fiscal_service import usuario_vinculado
+from fiscal.services.emissao_service import (
+    EmissaoEmAndamento,
+    SefazClientProtocol,
+    emitir_nfce,
+)
+from fiscal.services.numero_service import ERR_NO_PERMISSION
+
+logger = logging.getLogger("pdv.fiscal")
+
+User = get_user_model()
+
+EMISSAO_MODO_SINCRONO = "sincrono"
+EMISSAO_MODO_ASSINCRONO = "assincrono"
+
+ERR_JOB_NAO_ENCONTRADO = "FISCAL_4104"
+
+DEFAULT_LIMITE_POR_UF = 4
+DEFAULT_MAX_TENTATIVAS = 5
+DEFAULT_JOB_TTL_SEGUNDOS = 300
+# Backoff entre tentativas técnicas: 2, 4, 8... segundos, até este teto
+BACKOFF_MAXIMO_SEGUNDOS = 60
+
+STATUS_FINAIS = {NfceEmissaoJob.STATUS_CONCLUIDO, NfceEmissaoJob.STATUS_ERRO}
+
+
+# ---------------------------------------------------------------------------
+# Configuração
+# ---------------------------------------------------------------------------
+
+def emissao_assincrona(prefer: Optional[str] = None) -> bool:
+    """
+    Indica se a emissão deve ser enfileirada.
+
+    Assíncrona quando FISCAL_NFCE_EMISSAO_MODO="assincrono" ou quando o PDV
+    pede explicitamente com o cabeçalho "Prefer: respond-async" (RFC 7240).
+    """
+    modo = getattr(settings, "FISCAL_NFCE_EMISSAO_MODO", EMISSAO_MODO_SINCRONO)
+    if modo == EMISSAO_MODO_ASSINCRONO:
+        return True
+    return "respond-async" in (prefer or "").lower()
+
+
+def limite_por_uf(uf: str, limites: Optional[Dict[str, int]] = None) -> int:
+    """
+    Máximo de emissões simultâneas para a UF (por tenant).
+
+    Ordem: limites explícitos (worker) > FISCAL_NFCE_EMISSAO_LIMITES_UF >
+    FISCAL_NFCE_EMISSAO_LIMITE_POR_UF.
+    """
+    for fonte in (limites or {}, getattr(settings, "FISCAL_NFCE_EMISSAO_LIMITES_UF", {}) or {}):
+        if uf in fonte:
+            return int(fonte[uf])
+    return int(getattr(settings, "FISCAL_NFCE_EMISSAO_LIMITE_POR_UF", DEFAULT_LIMITE_POR_UF))
+
+
+def _max_tentativas() -> int:
+    return int(getattr(settings, "FISCAL_NFCE_EMISSAO_MAX_TENTATIVAS", DEFAULT_MAX_TENTATIVAS))
+
+
+def _job_ttl() -> timedelta:
+    segundos = int(getattr(settings, "FISCAL_NFCE_EMISSAO_JOB_TTL_SEGUNDOS", DEFAULT_JOB_TTL_SEGUNDOS))
+    return timedelta(seconds=segundos)
+
+
+def identificador_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------------------------
+# Enfileiramento / consulta
+# ---------------------------------------------------------------------------
+
+def _assert_vinculo_filial(user: User, filial_id, terminal_id) -> None:
+    if not usuario_vinculado(user=user, terminal_id=terminal_id, filial_id=filial_id):
+        raise PermissionDenied(
+            detail={
+                "code": ERR_NO_PERMISSION,
+                "message": "Usuário sem permissão para a filial da pré-emissão.",
+            }
+        )
+
+
+def enfileirar_emissao_nfce(
+    *,
+    user: User,
+    request_id: UUID,
+    venda_id: Optional[UUID] = None,
+) -> NfceEmissaoJob:
+    """
+    Enfileira a emissão da NfcePreEmissao do request_id (idempotente).
+
+    - Mesmo request_id devolve o job existente.
+    - Job em erro volta para a fila (nova tentativa solicitada pelo PDV).
+    """
+    try:
+        pre = NfcePreEmissao.objects.get(request_id=request_id)
+    except NfcePreEmissao.DoesNotExist:
+        raise NotFound(
+            detail={
+                "code": "FISCAL_4100",
+                "message": "NfcePreEmissao não encontrada para o request_id informado.",
+            }
+        )
+
+    _assert_vinculo_filial(user, pre.filial_id, pre.terminal_id)
+
+    try:
+        filial = Filial.objects.select_related("endereco").get(id=pre.filial_id)
+    except Filial.DoesNotExist:
+        raise NotFound(
+            detail={
+                "code": "FISCAL_4101",
+                "message": "Filial associada à pré-emissão não encontrada.",
+            }
+        )
+
+    job, created = NfceEmissaoJob.objects.get_or_create(
+        request_id=pre.request_id,
+        defaults={
+            "pre_emissao_id": pre.id,
+            "filial_id": pre.filial_id,
+            "terminal_id": pre.terminal_id,
+            "venda_id": venda_id,
+            "user_id": user.id,
+            "uf": (filial.uf or "").strip().upper()[:2],
+        },
+    )
+
+    if not created and job.status == NfceEmissaoJob.STATUS_ERRO:
+        NfceEmissaoJob.objects.filter(pk=job.pk, status=NfceEmissaoJob.STATUS_ERRO).update(
+            status=NfceEmissaoJob.STATUS_PENDENTE,
+            tentativas=0,
+            disponivel_em=timezone.now(),
+            codigo_erro=None,
+            mensagem_erro=None,
+            updated_at=timezone.now(),
+        )
+        job.refresh_from_db()
+
+    logger.info(
+        "nfce_emissao_enfileirada",
+        extra={
+            "event": "nfce_emissao_fila",
+            "user_id": getattr(user, "id", None),
+            "request_id": str(pre.request_id),
+            "job_id": str(job.id),
+            "uf": job.uf,
+            "status": job.status,
+            "novo": created,
+        },
+    )
+    return job
+
+
+def obter_job_emissao(*, user: User, request_id: UUID) -> NfceEmissaoJob:
+    try:
+        job = NfceEmissaoJob.objects.get(request_id=request_id)
+    except NfceEmissaoJob.DoesNotExist:
+        raise NotFound(
+            detail={
+                "code": ERR_JOB_NAO_ENCONTRADO,
+                "message": "Emissão assíncrona não encontrada para o request_id informado.",
+            }
+        )
+    _assert_vinculo_filial(user, job.filial_id, job.terminal_id)
+    return job
+
+
+def aguardar_job_emissao(
+    job: NfceEmissaoJob,
+    *,
+    timeout: float,
+    intervalo: float = 0.25,
+) -> NfceEmissaoJob:
+    """
+    Long-poll: relê o job até atingir status final ou esgotar o timeout.
+    Cada leitura é uma query curta em autocommit (sem transação aberta).
+    """
+    limite = time.monotonic() + max(timeout, 0)
+    while job.status not in STATUS_FINAIS and time.monotonic() < limite:
+        time.sleep(intervalo)
+        job.refresh_from_db()
+    return job
+
+
+def documento_do_job(job: NfceEmissaoJob) -> Optional[NfceDocumento]:
+    if job.nfce_documento_id is None:
+        return None
+    return NfceDocumento.objects.filter(pk=job.nfce_documento_id).first()
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def recuperar_jobs_abandonados(agora=None) -> int:
+    """
+    Devolve à fila jobs "processando" cujo worker morreu (sem conclusão após
+    FISCAL_NFCE_EMISSAO_JOB_TTL_SEGUNDOS). O claim de emitir_nfce impede
+    transmissão dupla caso o worker original ainda esteja vivo.
+    """
+    agora = agora or timezone.now()
+    return NfceEmissaoJob.objects.filter(
+        status=NfceEmissaoJob.STATUS_PROCESSANDO,
+        iniciado_em__lt=agora - _job_ttl(),
+    ).update(
+        status=NfceEmissaoJob.STATUS_PENDENTE,
+        worker=None,
+        disponivel_em=agora,
+        updated_at=agora,
+    )
+
+
+def reivindicar_proximo_job(
+    *,
+    worker: str,
+    limites: Optional[Dict[str, int]] = None,
+) -> Optional[NfceEmissaoJob]:
+    """
+    Reivindica o próximo job pendente de uma UF com capacidade livre.
+
+    Por UF, numa transação curta:
+      - pg_advisory_xact_lock serializa a contagem + claim entre workers;
+      - conta os jobs "processando" da UF e pula se o limite foi atingido;
+      - SELECT ... FOR UPDATE SKIP LOCKED no job mais antigo disponível.
+    """
+    agora = timezone.now()
+    schema = getattr(connection, "schema_name", "") or ""
+
+    with transaction.atomic():
+        ufs = list(
+            NfceEmissaoJob.objects.filter(
+                status=NfceEmissaoJob.STATUS_PENDENTE,
+                disponivel_em__lte=agora,
+            )
+            .order_by()
+            .values_list("uf", flat=True)
+            .distinct()
+        )
+
+        for uf in sorted(ufs):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                    [f"nfce_emissao_job:{schema}:{uf}"],
+                )
+
+            em_processamento = NfceEmissaoJob.objects.filter(
+                status=NfceEmissaoJob.STATUS_PROCESSANDO,
+                uf=uf,
+                iniciado_em__gte=agora - _job_ttl(),
+            ).count()
+            if em_processamento >= limite_por_uf(uf, limites):
+                continue
+
+            job = (
+                NfceEmissaoJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=NfceEmissaoJob.STATUS_PENDENTE,
+                    uf=uf,
+                    disponivel_em__lte=agora,
+                )
+                .order_by("disponivel_em", "created_at")
+                .first()
+            )
+            if job is None:
+                continue
+
+            job.status = NfceEmissaoJob.STATUS_PROCESSANDO
+            job.worker = worker
+            job.iniciado_em = agora
+            job.tentativas += 1
+            job.save(update_fields=["status", "worker", "iniciado_em", "tentativas", "updated_at"])
+            return job
+
+    return None
+
+
+def _finalizar_job(job: NfceEmissaoJob, **campos) -> None:
+    """
+    Grava o desfecho do job, desde que ele ainda pertença a este worker
+    (um job recuperado por TTL pode ter sido reassumido por outro).
+    """
+    campos.setdefault("updated_at", timezone.now())
+    NfceEmissaoJob.objects.filter(pk=job.pk, worker=job.worker).update(**campos)
+    for nome, valor in campos.items():
+        setattr(job, nome, valor)
+
+
+def _reagendar(job: NfceEmissaoJob, *, codigo: str, mensagem: str) -> None:
+    agora = timezone.now()
+    if job.tentativas >= _max_tentativas():
+        _finalizar_job(
+            job,
+            status=NfceEmissaoJob.STATUS_ERRO,
+            concluido_em=agora,
+            codigo_erro=codigo,
+            mensagem_erro=mensagem,
+        )
+        return
+
+    espera = min(2 ** job.tentativas, BACKOFF_MAXIMO_SEGUNDOS)
+    _finalizar_job(
+        job,
+        status=NfceEmissaoJob.STATUS_PENDENTE,
+        disponivel_em=agora + timedelta(seconds=espera),
+        codigo_erro=codigo,
+        mensagem_erro=mensagem,
+    )
+
+
+def processar_job(
+    job: NfceEmissaoJob,
+    *,
+    sefaz_client: Optional[SefazClientProtocol] = None,
+) -> NfceEmissaoJob:
+    """
+    Executa a emissão do job reivindicado.
+
+    - Sucesso (autorizada, rejeitada ou contingência): job concluído e
+      vinculado ao NfceDocumento; a venda de origem, se houver, é sincronizada.
+    - Emissão em andamento em outro processo (FISCAL_4103): volta à fila.
+    - Erros de negócio (APIException: pré-emissão, vínculo, A1): erro final.
+    - Erros inesperados: nova tentativa com backoff até o limite.
+
+    sefaz_client: client já no contrato emitir_nfce(pre_emissao=...); por
+    padrão usa get_sefaz_client_for_filial + SefazEmitirAdapter.
+    """
+    log_extra = {
+        "event": "nfce_emissao_fila",
+        "job_id": str(job.id),
+        "request_id": str(job.request_id),
+        "uf": job.uf,
+        "worker": job.worker,
+        "tentativa": job.tentativas,
+    }
+
+    try:
+        user = User.objects.get(pk=job.user_id)
+        if sefaz_client is None:
+            filial = Filial.objects.select_related("endereco").get(id=job.filial_id)
+            sefaz_client = SefazEmitirAdapter(get_sefaz_client_for_filial(filial), filial)
+
+        result = emitir_nfce(user=user, request_id=job.request_id, sefaz_client=sefaz_client)
+    except EmissaoEmAndamento:
+        logger.info("nfce_emissao_job_em_andamento", extra=log_extra)
+        _reagendar(job, codigo="FISCAL_4103", mensagem="Emissão já em andamento.")
+        return job
+    except APIException as exc:
+        detail = exc.detail if isinstance(exc.detail, dict) else {}
+        codigo = str(detail.get("code") or exc.default_code)
+        logger.warning("nfce_emissao_job_erro_negocio", extra={**log_extra, "codigo": codigo})
+        _finalizar_job(
+            job,
+            status=NfceEmissaoJob.STATUS_ERRO,
+            concluido_em=timezone.now(),
+            codigo_erro=codigo[:32],
+            mensagem_erro=str(detail.get("message") or exc.detail),
+        )
+        return job
+    except Exception as exc:
+        logger.exception("nfce_emissao_job_erro_tecnico", extra={**log_extra, "error": str(exc)})
+        _reagendar(job, codigo="FISCAL_5999", mensagem=str(exc))
+        return job
+
+    documento = NfceDocumento.objects.pelo_indice(request_id=job.request_id).first()
+
+    _finalizar_job(
+        job,
+        status=NfceEmissaoJob.STATUS_CONCLUIDO,
+        concluido_em=timezone.now(),
+        nfce_documento_id=getattr(documento, "id", None),
+        codigo_erro=None,
+        mensagem_erro=None,
+    )
+
+    if job.venda_id is not None and documento is not None:
+        from fiscal.services.nfce_venda_service import atualizar_venda_apos_emissao_nfce
+        from vendas.models.venda_models import Venda
+
+        atualizar_venda_apos_emissao_nfce(
+            venda=Venda.objects.get(pk=job.venda_id),
+            documento=documento,
+        )
+
+    logger.info(
+        "nfce_emissao_job_concluido",
+        extra={**log_extra, "status_nfce": result.status, "em_contingencia": result.em_contingencia},
+    )
+    return job
+
+
+def processar_fila(
+    *,
+    worker: Optional[str] = None,
+    limites: Optional[Dict[str, int]] = None,
+    max_jobs: Optional[int] = None,
+    sefaz_client_factory: Optional[Callable[[NfceEmissaoJob], SefazClientProtocol]] = None,
+) -> int:
+    """
+    Drena a fila do schema atual até não haver job disponível (ou max_jobs).
+    Retorna quantos jobs foram processados.
+    """
+    worker = worker or identificador_worker()
+    recuperar_jobs_abandonados()
+
+    processados = 0
+    while max_jobs is None or processados < max_jobs:
+        job = reivindicar_proximo_job(worker=worker, limites=limites)
+        if job is None:
+            break
+        client = sefaz_client_factory(job) if sefaz_client_factory else None
+        processar_job(job, sefaz_client=client)
+        processados += 1
+
+    return processados
@@ -0,0 +1,590 @@
+# fiscal/services/emissao_lote_service.py
+
+"""
+Transmissão de NFC-e em lote (enviNFe, até MAX_NFCE_POR_LOTE documentos).
+
+Usado para escoar backlog (pré-emissões sem NfceDocumento) e para regularizar
+contingência: em vez de uma chamada SEFAZ por documento, agrupa por
+(filial, UF, ambiente), envia lotes e grava NfceDocumento + NfceAuditoria
+com bulk insert/update numa transação curta por lote.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from filial.models.filial_models import Filial
+from fiscal.models import NfceAuditoria, NfceDocumento, NfceDocumentoIndice, NfcePreEmissao
+from fiscal.sefaz_clients import MAX_NFCE_POR_LOTE, SefazClientProtocol, SefazTechnicalError
+from fiscal.sefaz_factory import (
+    _normalize_ambiente,
+    _normalize_uf,
+    autorizacao_para_dict,
+    get_sefaz_client_for_filial,
+)
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditorias
+from fiscal.services.emissao_service import (
+    STATUS_EM_CONSULTA,
+    _chave_lock_emissao,
+    _get_tenant_schema_from_user,
+    _make_dummy_chave_acesso,
+)
+from fiscal.services.numero_service import _assert_a1_valid
+
+logger = logging.getLogger("pdv.fiscal")
+
+STATUS_CONTINGENCIA_PENDENTE = "contingencia_pendente"
+
+ChaveLote = Tuple[str, str, str]  # (filial_id, uf, ambiente)
+
+
+@dataclass
+class ResumoEmissaoLote:
+    """
+    Totais de uma execução do dispatcher de lotes.
+    """
+
+    lotes: int = 0
+    documentos: int = 0
+    autorizadas: int = 0
+    rejeitadas: int = 0
+    contingencia: int = 0
+    em_consulta: int = 0
+    lotes_com_erro_tecnico: int = 0
+    ignorados: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _tenant_schema(user) -> Optional[str]:
+    return (_get_tenant_schema_from_user(user) if user is not None else None) or getattr(
+        connection, "schema_name", None
+    )
+
+
+def _chave_lote(filial: Filial) -> ChaveLote:
+    return (
+        str(filial.id),
+        _normalize_uf(getattr(filial, "uf", None)),
+        _normalize_ambiente(getattr(filial, "ambiente", None)),
+    )
+
+
+def agrupar_em_lotes(
+    itens: Iterable,
+    filiais: Dict,
+    *,
+    tamanho_lote: int = MAX_NFCE_POR_LOTE,
+    filial_id_de: Callable = lambda item: item.filial_id,
+) -> Iterator[Tuple[Filial, List]]:
+    """
+    Agrupa itens por (filial, UF, ambiente) e os fatia em lotes de até
+    tamanho_lote (limitado a MAX_NFCE_POR_LOTE). Itens de filial
+    desconhecida são descartados.
+    """
+    tamanho_lote = max(1, min(tamanho_lote, MAX_NFCE_POR_LOTE))
+
+    grupos: Dict[ChaveLote, List] = defaultdict(list)
+    filial_por_chave: Dict[ChaveLote, Filial] = {}
+    for item in itens:
+        filial = filiais.get(filial_id_de(item))
+        if filial is None:
+            continue
+        chave = _chave_lote(filial)
+        grupos[chave].append(item)
+        filial_por_chave[chave] = filial
+
+    for chave, membros in grupos.items():
+        for inicio in range(0, len(membros), tamanho_lote):
+            yield filial_por_chave[chave], membros[inicio:inicio + tamanho_lote]
+
+
+def _interpretar_item(resp: dict) -> Tuple[bool, Optional[str]]:
+    """
+    Mesma heurística de emitir_nfce: autorizada por status ou código 100/150.
+    """
+    codigo = resp.get("codigo_retorno")
+    autorizado = str(resp.get("status") or "").lower() in {"autorizada", "autorizado", "aut"}
+    if codigo in {"100", "150"}:
+        autorizado = True
+    return autorizado, codigo
+
+
+def _transmitir(client: SefazClientProtocol, filial: Filial, pres: Sequence[NfcePreEmissao]):
+    """
+    Envia o lote. Retorna (respostas_por_pre, erro_tecnico).
+    """
+    try:
+        lote = client.autorizar_lote_nfce(filial=filial, pre_emissoes=list(pres))
+    except SefazTechnicalError as exc:
+        return None, exc
+
+    if len(lote.resultados) != len(pres):
+        raise SefazTechnicalError(
+            "Retorno do lote com quantidade de documentos divergente.",
+            codigo="LOTE_DIVERGENTE",
+            raw=lote.raw,
+        )
+    return [autorizacao_para_dict(r) for r in lote.resultados], None
+
+
+# ---------------------------------------------------------------------------
+# Backlog: pré-emissões sem NfceDocumento
+# ---------------------------------------------------------------------------
+
+def _pre_emissoes_pendentes(request_ids=None, limite=None):
+    # Claims vencidos ficam de fora: a SEFAZ pode já ter o documento, e só a
+    # reconciliação (emissao_consulta_service) consulta antes de reenviar.
+    qs = (
+        NfcePreEmissao.objects
+        .annotate(tem_documento=Exists(NfceDocumentoIndice.objects.filter(request_id=OuterRef("request_id"))))
+        .filter(tem_documento=False, emissao_token__isnull=True)
+        .order_by("created_at")
+    )
+    if request_ids is not None:
+        qs = qs.filter(request_id__in=list(request_ids))
+    if limite:
+        qs = qs[:limite]
+    return list(qs)
+
+
+def _tentar_locks(request_ids) -> List[str]:
+    """
+    Advisory locks de sessão (os mesmos de emitir_nfce) numa única query;
+    devolve os request_ids obtidos.
+    """
+    chaves = [_chave_lock_emissao(rid) for rid in request_ids]
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT chave FROM unnest(%s::text[]) AS chave WHERE pg_try_advisory_lock(hashtext(chave))",
+            [chaves],
+        )
+        obtidas = {row[0] for row in cur.fetchall()}
+    return [rid for rid, chave in zip(request_ids, chaves) if chave in obtidas]
+
+
+def _liberar_locks(request_ids) -> None:
+    if not request_ids:
+        return
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT pg_advisory_unlock(hashtext(chave)) FROM unnest(%s::text[]) AS chave",
+            [[_chave_lock_emissao(rid) for rid in request_ids]],
+        )
+
+
+def _reivindicar_lote(pres: Sequence[NfcePreEmissao]) -> Tuple[List[NfcePreEmissao], List[str]]:
+    """
+    Claim em massa (mesmo marcador e advisory lock de emitir_nfce): só as
+    pré-emissões que ninguém está emitindo entram no lote. Devolve as
+    pré-emissões reivindicadas e os locks mantidos (liberar após gravar).
+    """
+    travados = _tentar_locks([str(p.request_id) for p in pres])
+    token = uuid.uuid4()
+    NfcePreEmissao.objects.filter(
+        request_id__in=travados, emissao_token__isnull=True
+    ).update(emissao_token=token, emissao_iniciada_em=timezone.now())
+    reivindicadas = list(NfcePreEmissao.objects.filter(emissao_token=token).order_by("numero"))
+
+    nossos = {str(p.request_id) for p in reivindicadas}
+    _liberar_locks([rid for rid in travados if rid not in nossos])
+    return reivindicadas, sorted(nossos)
+
+
+def _registrar_lote_emitido(
+    *,
+    filial: Filial,
+    pres: Sequence[NfcePreEmissao],
+    respostas: Optional[List[dict]],
+    tech_error: Optional[SefazTechnicalError],
+    user,
+    tenant_schema: Optional[str],
+    resumo: ResumoEmissaoLote,
+    incerto: Optional[BaseException] = None,
+) -> None:
+    """
+    Grava documentos e auditorias do lote com dois INSERTs multi-linha.
+    Pré-emissões que ganharam documento durante o envio são ignoradas.
+    Resultado incerto (falha inesperada no envio) grava os documentos
+    "em_consulta", como emitir_nfce.
+    """
+    agora = timezone.now()
+    ambiente = getattr(filial, "ambiente", "homolog")
+    uf = filial.uf
+    user_id = getattr(user, "id", None)
+
+    with auditoria_transacional():
+        ja_registrados = set(
+            NfceDocumentoIndice.objects.filter(request_id__in=[p.request_id for p in pres])
+            .values_list("request_id", flat=True)
+        )
+
+        documentos: List[NfceDocumento] = []
+        auditorias: List[NfceAuditoria] = []
+
+        for idx, pre in enumerate(pres):
+            if pre.request_id in ja_registrados:
+                resumo.ignorados += 1
+                continue
+
+            base = dict(
+                filial_id=filial.id,
+                terminal_id=pre.terminal_id,
+                numero=pre.numero,
+                serie=pre.serie,
+                request_id=pre.request_id,
+                ambiente=ambiente,
+                uf=uf,
+                hash_payload_enviado=pre.hash_payload,
+                created_at=agora,
+            )
+
+            if incerto is not None:
+                codigo = str(getattr(incerto, "codigo", None) or "RESULTADO_INCERTO")
+                mensagem = f"Resultado da emissão incerto: {incerto!r}"
+                raw = {"codigo": codigo, "mensagem": mensagem}
+                doc = NfceDocumento(
+                    **base,
+                    chave_acesso=_make_dummy_chave_acesso(),
+                    protocolo="",
+                    status=STATUS_EM_CONSULTA,
+                    mensagem_sefaz=mensagem,
+                    xml_autorizado=None,
+                    raw_sefaz_response=raw,
+                    em_contingencia=False,
+                )
+                tipo_evento = "EMISSAO_RESULTADO_INCERTO"
+                xml = None
+                resumo.em_consulta += 1
+            elif tech_error is not None:
+                codigo = str(getattr(tech_error, "codigo", None) or "TECH_FAIL")
+                mensagem = str(tech_error)
+                raw = {"codigo": codigo, "mensagem": mensagem}
+                doc = NfceDocumento(
+                    **base,
+                    chave_acesso=_make_dummy_chave_acesso(),
+                    protocolo="",
+                    status=STATUS_CONTINGENCIA_PENDENTE,
+                    mensagem_sefaz=mensagem,
+                    xml_autorizado=None,
+                    raw_sefaz_response=raw,
+                    em_contingencia=True,
+                    contingencia_ativada_em=agora,
+                    contingencia_motivo=mensagem[:255],
+                )
+                tipo_evento = "EMISSAO_CONTINGENCIA_ATIVADA"
+                xml = None
+                resumo.contingencia += 1
+            else:
+                resp = respostas[idx]
+                autorizado, codigo = _interpretar_item(resp)
+                mensagem = resp.get("mensagem")
+                raw = resp.get("raw") or {}
+                xml = resp.get("xml_autorizado")
+                doc = NfceDocumento(
+                    **base,
+                    chave_acesso=resp.get("chave_acesso") or _make_dummy_chave_acesso(),
+                    protocolo=resp.get("protocolo") or "",
+                    status="autorizada" if autorizado else "rejeitada",
+                    mensagem_sefaz=mensagem,
+                    xml_autorizado=xml,
+                    raw_sefaz_response=raw,
+                    em_contingencia=False,
+                )
+                tipo_evento = "EMISSAO_AUTORIZADA" if autorizado else "EMISSAO_REJEITADA"
+                if autorizado:
+                    resumo.autorizadas += 1
+                else:
+                    resumo.rejeitadas += 1
+
+            documentos.append(doc)
+            auditorias.append(
+                NfceAuditoria(
+                    tipo_evento=tipo_evento,
+                    nfce_documento=doc,
+                    tenant_id=tenant_schema,
+                    filial_id=filial.id,
+                    terminal_id=pre.terminal_id,
+                    user_id=user_id,
+                    request_id=pre.request_id,
+                    codigo_retorno=codigo,
+                    mensagem_retorno=mensagem,
+                    xml_autorizado=xml,
+                    raw_sefaz_response=raw,
+                    ambiente=ambiente,
+                    uf=uf,
+                    created_at=agora,
+                )
+            )
+
+        NfceDocumento.objects.bulk_create(documentos)
+        registrar_auditorias(auditorias)
+
+    resumo.documentos += len(documentos)
+
+
+def emitir_pre_emissoes_em_lote(
+    *,
+    user=None,
+    request_ids: Optional[Iterable] = None,
+    tamanho_lote: int = MAX_NFCE_POR_LOTE,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+) -> ResumoEmissaoLote:
+    """
+    Dispatcher de backlog: emite em lotes as pré-emissões sem NfceDocumento.
+
+    Por lote: claim em massa (transação implícita curta) → enviNFe fora de
+    transação → bulk insert de NfceDocumento/NfceAuditoria. Erro técnico no
+    lote gera os documentos em contingência, como em emitir_nfce.
+    """
+    tenant_schema = _tenant_schema(user)
+    resumo = ResumoEmissaoLote()
+
+    pendentes = _pre_emissoes_pendentes(request_ids=request_ids, limite=limite)
+    filiais = Filial.objects.select_related("endereco", "certificado_a1").in_bulk(
+        {p.filial_id for p in pendentes}
+    )
+    filiais_sem_a1 = set()
+
+    for filial, candidatos in agrupar_em_lotes(pendentes, filiais, tamanho_lote=tamanho_lote):
+        if filial.id in filiais_sem_a1:
+            continue
+        try:
+            _assert_a1_valid(filial)
+        except APIException:
+            logger.warning(
+                "nfce_lote_filial_sem_a1_valido",
+                extra={"event": "nfce_lote", "tenant_id": tenant_schema, "filial_id": str(filial.id)},
+            )
+            filiais_sem_a1.add(filial.id)
+            continue
+
+        pres, locks = _reivindicar_lote(candidatos)
+        if not pres:
+            continue
+
+        try:
+            incerto = None
+            try:
+                respostas, tech_error = _transmitir(client_factory(filial), filial, pres)
+            except Exception as exc:
+                # O lote pode ter chegado à SEFAZ: nada de liberar o claim
+                # (um retry reenviaria); os documentos vão para consulta.
+                logger.exception(
+                    "nfce_lote_resultado_incerto",
+                    extra={"event": "nfce_lote", "tenant_id": tenant_schema, "filial_id": str(filial.id)},
+                )
+                respostas, tech_error, incerto = None, None, exc
+
+            resumo.lotes += 1
+            if tech_error is not None:
+                resumo.lotes_com_erro_tecnico += 1
+
+            _registrar_lote_emitido(
+                filial=filial,
+                pres=pres,
+                respostas=respostas,
+                tech_error=tech_error,
+                user=user,
+                tenant_schema=tenant_schema,
+                resumo=resumo,
+                incerto=incerto,
+            )
+        finally:
+            _liberar_locks(locks)
+
+        logger.info(
+            "nfce_lote_emitido",
+            extra={
+                "event": "nfce_lote",
+                "tenant_id": tenant_schema,
+                "filial_id": str(filial.id),
+                "quantidade": len(pres),
+                "erro_tecnico": tech_error is not None,
+            },
+        )
+
+    return resumo
+
+
+# ---------------------------------------------------------------------------
+# Regularização de contingência em lote
+# ---------------------------------------------------------------------------
+
+def _registrar_lote_regularizado(
+    *,
+    filial: Filial,
+    docs: Sequence[NfceDocumento],
+    respostas: List[dict],
+    user,
+    tenant_schema: Optional[str],
+    resumo: ResumoEmissaoLote,
+) -> None:
+    """
+    Aplica o retorno do lote aos documentos em contingência (bulk_update) e
+    grava as auditorias (bulk_create). Documentos regularizados por outro
+    caminho durante o envio (ou travados) são ignorados.
+    """
+    agora = timezone.now()
+    resposta_por_doc = {doc.pk: resp for doc, resp in zip(docs, respostas)}
+
+    with auditoria_transacional():
+        pendentes = list(
+            NfceDocumento.objects.select_for_update(skip_locked=True).filter(
+                pk__in=list(resposta_por_doc),
+                status=STATUS_CONTINGENCIA_PENDENTE,
+                em_contingencia=True,
+            )
+        )
+        resumo.ignorados += len(docs) - len(pendentes)
+
+        auditorias: List[NfceAuditoria] = []
+        for doc in pendentes:
+            resp = resposta_por_doc[doc.pk]
+            autorizado, codigo = _interpretar_item(resp)
+            raw = resp.get("raw") or {}
+            mensagem = resp.get("mensagem")
+
+            doc.status = "autorizada" if autorizado else "rejeitada_contingencia"
+            doc.em_contingencia = False
+            doc.contingencia_regularizada_em = agora
+            doc.chave_acesso = resp.get("chave_acesso") or doc.chave_acesso or _make_dummy_chave_acesso()
+            doc.protocolo = resp.get("protocolo") or doc.protocolo
+            if resp.get("xml_autorizado") is not None:
+                doc.xml_autorizado = resp.get("xml_autorizado")
+            if mensagem is not None:
+                doc.mensagem_sefaz = mensagem
+            if raw:
+                doc.raw_sefaz_response = raw
+            doc.updated_at = agora
+
+            if autorizado:
+                resumo.autorizadas += 1
+            else:
+                resumo.rejeitadas += 1
+
+            auditorias.append(
+                NfceAuditoria(
+                    tipo_evento=(
+                        "EMISSAO_CONTINGENCIA_REGULARIZADA" if autorizado
+                        else "EMISSAO_CONTINGENCIA_REJEITADA"
+                    ),
+                    nfce_documento=doc,
+                    tenant_id=tenant_schema,
+                    filial_id=filial.id,
+                    terminal_id=doc.terminal_id,
+                    user_id=getattr(user, "id", None),
+                    request_id=doc.request_id,
+                    codigo_retorno=codigo,
+                    mensagem_retorno=mensagem or "",
+                    xml_autorizado=doc.xml_autorizado,
+                    raw_sefaz_response=raw,
+                    ambiente=filial.ambiente,
+                    uf=filial.uf,
+                    created_at=agora,
+                )
+            )
+
+        NfceDocumento.objects.bulk_update(
+            pendentes,
+            [
+                "status",
+                "em_contingencia",
+                "contingencia_regularizada_em",
+                "chave_acesso",
+                "protocolo",
+                "xml_autorizado",
+                "mensagem_sefaz",
+                "raw_sefaz_response",
+                "updated_at",
+            ],
+        )
+        registrar_auditorias(auditorias)
+
+    resumo.documentos += len(pendentes)
+
+
+def regularizar_contingencias_em_lote(
+    *,
+    user=None,
+    documento_ids: Optional[Iterable] = None,
+    tamanho_lote: int = MAX_NFCE_POR_LOTE,
+    limite: Optional[int] = None,
+    client_factory: Callable[[Filial], SefazClientProtocol] = get_sefaz_client_for_filial,
+) -> ResumoEmissaoLote:
+    """
+    Reenvia em lotes as NFC-e em contingencia_pendente.
+
+    Erro técnico mantém o lote inteiro pendente (nova tentativa na próxima
+    execução); retornos por documento seguem as regras de
+    regularizar_contingencia_nfce (autorizada / rejeitada_contingencia).
+    """
+    tenant_schema = _tenant_schema(user)
+    resumo = ResumoEmissaoLote()
+
+    qs = NfceDocumento.objects.filter(
+        status=STATUS_CONTINGENCIA_PENDENTE, em_contingencia=True
+    ).order_by("contingencia_ativada_em", "created_at")
+    if documento_ids is not None:
+        qs = qs.filter(pk__in=list(documento_ids))
+    if limite:
+        qs = qs[:limite]
+    docs = list(qs)
+
+    pres_por_request = {
+        pre.request_id: pre
+        for pre in NfcePreEmissao.objects.filter(request_id__in=[d.request_id for d in docs])
+    }
+    docs = [d for d in docs if d.request_id in pres_por_request]
+    filiais = Filial.objects.select_related("endereco", "certificado_a1").in_bulk(
+        {d.filial_id for d in docs}
+    )
+
+    for filial, lote_docs in agrupar_em_lotes(docs, filiais, tamanho_lote=tamanho_lote):
+        try:
+            _assert_a1_valid(filial)
+        except APIException:
+            resumo.ignorados += len(lote_docs)
+            continue
+
+        pres = [pres_por_request[d.request_id] for d in lote_docs]
+        respostas, tech_error = _transmitir(client_factory(filial), filial, pres)
+        resumo.lotes += 1
+
+        if tech_error is not None:
+            resumo.lotes_com_erro_tecnico += 1
+            resumo.contingencia += len(lote_docs)
+            logger.warning(
+                "nfce_lote_regularizacao_erro_tecnico",
+                extra={
+                    "event": "nfce_lote",
+                    "tenant_id": tenant_schema,
+                    "filial_id": str(filial.id),
+                    "quantidade": len(lote_docs),
+                    "error": str(tech_error),
+                },
+            )
+            continue
+
+        _registrar_lote_regularizado(
+            filial=filial,
+            docs=lote_docs,
+            respostas=respostas,
+            user=user,
+            tenant_schema=tenant_schema,
+            resumo=resumo,
+        )
+
+    return resumo
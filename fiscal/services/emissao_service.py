@@ -4,25 +4,32 @@ from __future__ import annotations
 
 import logging
 import uuid
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from datetime import timedelta
 from typing import Optional, Protocol, Dict, Any
 from uuid import UUID
 
-from django.db import transaction
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.exceptions import NotFound, PermissionDenied, APIException
 
 from filial.models.filial_models import Filial
 from terminal.models.terminal_models import Terminal
-from fiscal.models import NfcePreEmissao, NfceDocumento, NfceAuditoria
+from fiscal.models import NfceBlob, NfcePreEmissao, NfceDocumento, NfceDocumentoIndice
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditoria
+from fiscal.services.contexto_fiscal_service import usuario_vinculado
+from fiscal.services.idempotencia_service import inserir_idempotente
 from fiscal.services.numero_service import (
     _assert_a1_valid,
     ERR_NO_PERMISSION,
 )
-from fiscal.sefaz_clients import SefazTechnicalError
+from fiscal.sefaz_clients import DEFAULT_HTTP_TIMEOUT_SEGUNDOS, SefazTechnicalError, timeout_sefaz
+from fiscal.sefaz_factory import _normalize_ambiente, _normalize_uf
+from fiscal.sefaz_status import SefazDegradada, rota_emissao
 import hashlib
-import json
 
 logger = logging.getLogger("pdv.fiscal")
 
@@ -109,7 +116,7 @@ def _build_result_from_document(doc: NfceDocumento) -> EmitirNfceResult:
     """
     em_contingencia = getattr(doc, "em_contingencia", False)
 
-    if em_contingencia:
+    if em_contingencia or doc.status == STATUS_EM_CONSULTA:
         chave_acesso = None
         protocolo = None
         xml_autorizado = None
@@ -151,73 +158,128 @@ def _hash_payload(payload: Any) -> str:
     """
     Gera um hash estável (SHA256) do payload enviado ao parceiro fiscal.
 
-    - Normaliza o JSON com sort_keys=True para ser independente da ordem das chaves.
-    - Se o payload não for serializável em JSON, usa str(payload) como fallback.
+    - Mesmo JSON canônico do NfceBlob (sort_keys, separadores compactos):
+      é o hash que a pré-emissão já grava em NfcePreEmissao.hash_payload.
+    - Na emissão não é recalculado; use pre.hash_payload.
     """
-    try:
-        normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"))
-    except TypeError:
-        normalized = str(payload)
-    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return hashlib.sha256(NfceBlob.serializar(NfceBlob.TIPO_PAYLOAD, payload)).hexdigest()
 
 
 # ---------------------------------------------------------------------------
-# Função de domínio principal
+# Marcador de emissão em andamento (claim)
 # ---------------------------------------------------------------------------
 
-def emitir_nfce(
-    *,
-    user: User,
-    request_id: UUID,
-    sefaz_client: SefazClientProtocol,
-) -> EmitirNfceResult:
-    """
-    Fluxo de emissão NFC-e a partir de uma pré-emissão consolidada.
+ERR_EMISSAO_EM_ANDAMENTO = "FISCAL_4103"
+
+DEFAULT_CLAIM_TTL_SEGUNDOS = 120
+# Folga sobre o timeout da chamada SEFAZ antes de um claim poder vencer
+CLAIM_MARGEM_SEGUNDOS = 30
+
+# Resultado incerto (falha inesperada durante/após o envio): o documento
+# fica "em_consulta" até a consulta de situação (emissao_consulta_service)
+STATUS_EM_CONSULTA = "em_consulta"
+
+
+class EmissaoEmAndamento(APIException):
+    status_code = 409
+    default_detail = {
+        "code": ERR_EMISSAO_EM_ANDAMENTO,
+        "message": "Emissão já em andamento para este request_id. Tente novamente em instantes.",
+    }
+    default_code = "emissao_em_andamento"
+
 
-    Regras principais:
-
-      1. Localiza NfcePreEmissao pelo request_id.
-      2. Garante vínculo user ↔ filial (via UserFilial).
-      3. Garante certificado A1 válido (_assert_a1_valid).
-      4. Idempotência forte por NfceDocumento.request_id:
-         - Se já existir NfceDocumento, não chama parceiro fiscal de novo.
-      5. Chama sefaz_client.emitir_nfce(pre_emissao=...).
-      6. Persiste NfceDocumento + NfceAuditoria em transação atômica:
-         - Emissão normal (autorizada/rejeitada).
-         - Emissão em contingência (quando SefazTechnicalError).
-      7. Retorna DTO EmitirNfceResult consistente com o documento
-         persistido, via _build_result_from_document.
+@dataclass
+class _ClaimEmissao:
+    """
+    Resultado da fase 1 (claim): ou um documento já existente (idempotência)
+    ou a pré-emissão reivindicada por este processo, com o token do claim.
     """
 
-    tenant_schema = _get_tenant_schema_from_user(user)
-    logger.info(
-        "emitir_nfce_iniciado",
-        extra={
-            "event": "nfce_emitir",
-            "tenant_id": tenant_schema,
-            "user_id": getattr(user, "id", None),
-            "request_id": str(request_id),
-        },
+    pre: Optional[NfcePreEmissao] = None
+    filial: Optional[Filial] = None
+    terminal: Optional[Terminal] = None
+    token: Optional[UUID] = None
+    documento: Optional[NfceDocumento] = None
+    # claim vencido de outro processo: a SEFAZ pode já ter o documento
+    reassumido: bool = False
+
+
+def _claim_ttl():
+    """
+    Prazo para um claim vencer. Nunca menor que o teto da chamada SEFAZ
+    (FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS, que também limita o timeout
+    dinâmico da sonda) mais CLAIM_MARGEM_SEGUNDOS.
+    """
+    segundos = int(
+        getattr(settings, "FISCAL_NFCE_EMISSAO_CLAIM_TTL_SEGUNDOS", DEFAULT_CLAIM_TTL_SEGUNDOS)
     )
+    teto_chamada = float(
+        getattr(settings, "FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS", DEFAULT_HTTP_TIMEOUT_SEGUNDOS)
+    )
+    return timedelta(seconds=max(segundos, teto_chamada + CLAIM_MARGEM_SEGUNDOS))
+
+
+def _chave_lock_emissao(request_id) -> str:
+    return f"nfce_emissao:{request_id}"
+
+
+def tentar_lock_emissao(request_id) -> bool:
+    """
+    Advisory lock de sessão do request_id, mantido da chamada SEFAZ até o
+    resultado gravado. É o sinal de vida do claim: enquanto o processo dono
+    está vivo (mesmo além do TTL) ninguém reassume; se o processo morre, o
+    PostgreSQL solta o lock com a conexão.
+    """
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [_chave_lock_emissao(request_id)])
+        return bool(cur.fetchone()[0])
+
+
+def liberar_lock_emissao(request_id) -> None:
+    try:
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", [_chave_lock_emissao(request_id)])
+    except DatabaseError:
+        # conexão perdida (o lock foi junto) ou transação externa abortada
+        logger.warning(
+            "emitir_nfce_lock_nao_liberado",
+            extra={"event": "nfce_emitir", "request_id": str(request_id)},
+        )
+
+
+def _documento_existente(request_id) -> Optional[NfceDocumento]:
+    return NfceDocumento.objects.pelo_indice(request_id=request_id).first()
+
+
+def _reivindicar_emissao(*, user: User, request_id: UUID, tenant_schema: Optional[str]) -> _ClaimEmissao:
+    """
+    Fase 1 — transação curta:
+      - valida pré-emissão, filial, terminal, vínculo e A1;
+      - devolve o NfceDocumento existente (idempotência), se houver;
+      - grava o marcador durável de emissão em andamento na pré-emissão
+        (UPDATE condicional) e fica com o advisory lock do request_id.
+        Um claim só é reassumido vencido (_claim_ttl) E sem lock — o processo
+        dono morreu; nesse caso a SEFAZ é consultada antes de reenviar.
+
+    Com claim obtido, o chamador libera o lock (liberar_lock_emissao) após
+    gravar o resultado.
+    """
+    log_extra = {
+        "event": "nfce_emitir",
+        "tenant_id": tenant_schema,
+        "user_id": getattr(user, "id", None),
+        "request_id": str(request_id),
+    }
 
     with transaction.atomic():
         # -------------------------------------------------------------------
         # 1) Localiza pré-emissão
         # -------------------------------------------------------------------
         try:
-            pre = NfcePreEmissao.objects.select_for_update().get(
-                request_id=request_id
-            )
+            pre = NfcePreEmissao.objects.get(request_id=request_id)
         except NfcePreEmissao.DoesNotExist:
-            logger.error(
-                "emitir_nfce_pre_emissao_nao_encontrada",
-                extra={
-                    "event": "nfce_emitir",
-                    "tenant_id": tenant_schema,
-                    "user_id": getattr(user, "id", None),
-                    "request_id": str(request_id),
-                },
-            )
+            logger.error("emitir_nfce_pre_emissao_nao_encontrada", extra=log_extra)
             raise NotFound(
                 detail={
                     "code": "FISCAL_4100",
@@ -225,30 +287,15 @@ def emitir_nfce(
                 }
             )
 
-        filial_id = pre.filial_id
-        terminal_id = pre.terminal_id
-        numero = pre.numero
-        serie = pre.serie
-
-        # Payload enviado ao parceiro fiscal
-        payload_enviado = pre.payload
-        hash_payload_enviado = _hash_payload(payload_enviado)
-
         # -------------------------------------------------------------------
         # 2) Carrega Filial / Terminal
         # -------------------------------------------------------------------
         try:
-            filial = Filial.objects.get(id=filial_id)
+            filial = Filial.objects.select_related("certificado_a1").get(id=pre.filial_id)
         except Filial.DoesNotExist:
             logger.error(
                 "emitir_nfce_filial_nao_encontrada",
-                extra={
-                    "event": "nfce_emitir",
-                    "tenant_id": tenant_schema,
-                    "user_id": getattr(user, "id", None),
-                    "request_id": str(request_id),
-                    "filial_id": str(filial_id),
-                },
+                extra={**log_extra, "filial_id": str(pre.filial_id)},
             )
             raise NotFound(
                 detail={
@@ -258,17 +305,11 @@ def emitir_nfce(
             )
 
         try:
-            terminal = Terminal.objects.get(id=terminal_id)
+            terminal = Terminal.objects.get(id=pre.terminal_id)
         except Terminal.DoesNotExist:
             logger.error(
                 "emitir_nfce_terminal_nao_encontrado",
-                extra={
-                    "event": "nfce_emitir",
-                    "tenant_id": tenant_schema,
-                    "user_id": getattr(user, "id", None),
-                    "request_id": str(request_id),
-                    "terminal_id": str(terminal_id),
-                },
+                extra={**log_extra, "terminal_id": str(pre.terminal_id)},
             )
             raise NotFound(
                 detail={
@@ -278,18 +319,13 @@ def emitir_nfce(
             )
 
         # -------------------------------------------------------------------
-        # 3) Vínculo usuário ↔ filial (mesma regra do numero_service)
+        # 3) Vínculo usuário ↔ filial (contexto fiscal em cache, o mesmo da
+        #    reserva de número e da pré-emissão)
         # -------------------------------------------------------------------
-        if not user.userfilial_set.filter(filial_id=filial.id).exists():
+        if not usuario_vinculado(user=user, terminal_id=terminal.id, filial_id=filial.id):
             logger.warning(
                 "emitir_nfce_permission_denied_filial",
-                extra={
-                    "event": "nfce_emitir",
-                    "tenant_id": tenant_schema,
-                    "user_id": getattr(user, "id", None),
-                    "filial_id": str(filial.id),
-                    "request_id": str(request_id),
-                },
+                extra={**log_extra, "filial_id": str(filial.id)},
             )
             raise PermissionDenied(
                 detail={
@@ -306,43 +342,408 @@ def emitir_nfce(
         # -------------------------------------------------------------------
         # 5) Idempotência por NfceDocumento.request_id
         # -------------------------------------------------------------------
-        print("DEBUG checando idempotência para request_id:", request_id)
-        existing = (
-            NfceDocumento.objects
-            .filter(request_id=request_id)
-            .order_by("-created_at")
-            .first()
-        )
+        existing = _documento_existente(request_id)
         if existing is not None:
-            # Não chama parceiro fiscal novamente; devolve estado consolidado.
             logger.info(
                 "emitir_nfce_idempotente_reuso_documento",
                 extra={
-                    "event": "nfce_emitir",
-                    "tenant_id": tenant_schema,
-                    "user_id": getattr(user, "id", None),
-                    "request_id": str(request_id),
+                    **log_extra,
                     "nfce_documento_id": str(existing.id),
                     "status": existing.status,
                 },
             )
-            return _build_result_from_document(existing)
-        print("DEBUG idempotência: nenhum documento existente, prosseguindo...")
+            return _ClaimEmissao(documento=existing)
+
         # -------------------------------------------------------------------
-        # 6) Chamada parceiro fiscal — tratamento diferenciado para falha técnica
+        # 6) Claim: marcador durável de emissão em andamento + lock de sessão
         # -------------------------------------------------------------------
-        try:
-            sefaz_resp = sefaz_client.emitir_nfce(pre_emissao=pre)
-            tech_error: Optional[SefazTechnicalError] = None
-        except SefazTechnicalError as exc:
-            sefaz_resp = None
+        if not tentar_lock_emissao(request_id):
+            # outro processo vivo está com a chamada SEFAZ em curso
+            logger.info("emitir_nfce_em_andamento", extra=log_extra)
+            raise EmissaoEmAndamento()
+
+        now = timezone.now()
+        token = uuid.uuid4()
+        reassumido = pre.emissao_token is not None
+        claimed = (
+            NfcePreEmissao.objects
+            .filter(pk=pre.pk)
+            .filter(
+                Q(emissao_token__isnull=True)
+                | Q(emissao_iniciada_em__lt=now - _claim_ttl())
+            )
+            .update(emissao_token=token, emissao_iniciada_em=now)
+        )
+        if not claimed:
+            liberar_lock_emissao(request_id)
+            logger.info("emitir_nfce_em_andamento", extra=log_extra)
+            raise EmissaoEmAndamento()
+
+        # Claim vencido reassumido: o processo anterior pode ter gravado o
+        # resultado entre a checagem acima e o UPDATE.
+        existing = _documento_existente(request_id)
+        if existing is not None:
+            liberar_lock_emissao(request_id)
+            return _ClaimEmissao(documento=existing)
+
+    if reassumido:
+        logger.warning("emitir_nfce_claim_reassumido", extra=log_extra)
+
+    pre.emissao_token = token
+    pre.emissao_iniciada_em = now
+    return _ClaimEmissao(pre=pre, filial=filial, terminal=terminal, token=token, reassumido=reassumido)
+
+
+def _consultar_situacao(sefaz_client: SefazClientProtocol, pre: NfcePreEmissao) -> Optional[Dict[str, Any]]:
+    """
+    Consulta a situação (situacao_nfce) antes de reenviar um claim
+    reassumido. Retorna a resposta quando a SEFAZ já autorizou o documento,
+    None quando nada consta (pode enviar). Qualquer outra situação, ou client
+    sem consulta, é resultado incerto (SefazTechnicalError).
+    """
+    situacao_nfce = getattr(sefaz_client, "situacao_nfce", None)
+    if situacao_nfce is None:
+        raise SefazTechnicalError(
+            "Client SEFAZ sem consulta de situação para reconciliar o claim.",
+            codigo="SEM_CONSULTA",
+        )
+    situacao = situacao_nfce(pre_emissao=pre)
+    if situacao.get("status") == "nao_consta":
+        return None
+    if situacao.get("status") == "autorizada":
+        return situacao
+    raise SefazTechnicalError(
+        situacao.get("mensagem") or "Situação da NFC-e inconclusiva na SEFAZ.",
+        codigo=str(situacao.get("codigo_retorno") or "SITUACAO_INCONCLUSIVA"),
+        raw=situacao.get("raw"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Função de domínio principal
+# ---------------------------------------------------------------------------
+
+def emitir_nfce(
+    *,
+    user: User,
+    request_id: UUID,
+    sefaz_client: SefazClientProtocol,
+) -> EmitirNfceResult:
+    """
+    Fluxo de emissão NFC-e a partir de uma pré-emissão consolidada.
+
+    Dividido em três fases para não segurar conexão/lock durante a SEFAZ:
+
+      1. Claim (transação curta): valida pré-emissão, vínculo user ↔ filial e
+         A1; devolve o NfceDocumento existente (idempotência) ou grava o
+         marcador de emissão em andamento na NfcePreEmissao. Um segundo
+         request com o mesmo request_id recebe 409 (FISCAL_4103) enquanto o
+         primeiro não termina — nunca há transmissão dupla.
+      2. Chamada sefaz_client.emitir_nfce(pre_emissao=...) fora de qualquer
+         transação e sem lock de linha (só o advisory lock do request_id).
+         Claim reassumido: consulta a situação antes de reenviar.
+      3. Commit do resultado (transação curta): persiste NfceDocumento +
+         NfceAuditoria (emissão normal; contingência, quando
+         SefazTechnicalError; "em_consulta", quando o resultado é incerto —
+         falha inesperada no client — e o claim não pode ser liberado).
+
+    Retorna DTO EmitirNfceResult consistente com o documento persistido,
+    via _build_result_from_document.
+    """
+
+    tenant_schema = _get_tenant_schema_from_user(user)
+    logger.info(
+        "emitir_nfce_iniciado",
+        extra={
+            "event": "nfce_emitir",
+            "tenant_id": tenant_schema,
+            "user_id": getattr(user, "id", None),
+            "request_id": str(request_id),
+        },
+    )
+
+    # -----------------------------------------------------------------------
+    # Fase 1) Claim
+    # -----------------------------------------------------------------------
+    claim = _reivindicar_emissao(user=user, request_id=request_id, tenant_schema=tenant_schema)
+    if claim.documento is not None:
+        return _build_result_from_document(claim.documento)
+
+    return _transmitir_e_registrar(
+        claim=claim,
+        user=user,
+        request_id=request_id,
+        tenant_schema=tenant_schema,
+        sefaz_client=sefaz_client,
+    )
+
+
+def emitir_nfce_pre_reivindicada(
+    *,
+    pre: NfcePreEmissao,
+    filial: Filial,
+    terminal: Terminal,
+    user: User,
+    sefaz_client: SefazClientProtocol,
+) -> EmitirNfceResult:
+    """
+    Fases 2 e 3 de emitir_nfce para uma pré-emissão gravada já com o claim
+    (emissao_token) pela transação corrente.
+
+    Usado pela finalização de venda (nfce_venda_service), que validou
+    vínculo e A1 com o contexto fiscal já carregado: sem releitura de
+    pré-emissão/filial/terminal e sem lock na linha recém-inserida. Sem
+    advisory lock: a pré-emissão só fica visível no commit da transação
+    corrente, que também é desfeita se o processo morrer.
+    """
+    tenant_schema = _get_tenant_schema_from_user(user)
+    claim = _ClaimEmissao(pre=pre, filial=filial, terminal=terminal, token=pre.emissao_token)
+    return _transmitir_com_lock(
+        claim=claim,
+        user=user,
+        request_id=pre.request_id,
+        tenant_schema=tenant_schema,
+        sefaz_client=sefaz_client,
+        travar_pre_emissao=False,
+    )
+
+
+def _transmitir_e_registrar(
+    *,
+    claim: _ClaimEmissao,
+    user: User,
+    request_id: UUID,
+    tenant_schema: Optional[str],
+    sefaz_client: SefazClientProtocol,
+) -> EmitirNfceResult:
+    """
+    Fases 2 e 3 com o claim e o advisory lock do request_id já obtidos;
+    o lock é solto ao final, com ou sem resultado gravado.
+    """
+    # -----------------------------------------------------------------------
+    # Fase 2) Chamada parceiro fiscal — sem transação aberta
+    # -----------------------------------------------------------------------
+    if connection.in_atomic_block:
+        # O chamador abriu uma transação externa: a conexão continuará presa
+        # durante a chamada remota. Mantemos o fluxo, mas deixamos rastro.
+        logger.warning(
+            "emitir_nfce_sefaz_dentro_de_transacao",
+            extra={
+                "event": "nfce_emitir",
+                "tenant_id": tenant_schema,
+                "request_id": str(request_id),
+            },
+        )
+
+    try:
+        return _transmitir_com_lock(
+            claim=claim,
+            user=user,
+            request_id=request_id,
+            tenant_schema=tenant_schema,
+            sefaz_client=sefaz_client,
+            travar_pre_emissao=True,
+        )
+    finally:
+        liberar_lock_emissao(request_id)
+
+
+def _transmitir_com_lock(
+    *,
+    claim: _ClaimEmissao,
+    user: User,
+    request_id: UUID,
+    tenant_schema: Optional[str],
+    sefaz_client: SefazClientProtocol,
+    travar_pre_emissao: bool,
+) -> EmitirNfceResult:
+    # Saúde da SEFAZ pela sonda de status (só cache): contingência imediata
+    # ou timeout dinâmico para a chamada
+    uf = _normalize_uf(getattr(claim.filial, "uf", None))
+    ambiente = _normalize_ambiente(getattr(claim.filial, "ambiente", None))
+    rota = rota_emissao(uf, ambiente)
+
+    sefaz_resp: Optional[Dict[str, Any]] = None
+    tech_error: Optional[SefazTechnicalError] = None
+    incerto: Optional[BaseException] = None
+    try:
+        if rota.contingencia:
+            logger.warning(
+                "emitir_nfce_contingencia_por_sonda",
+                extra={
+                    "event": "nfce_emitir",
+                    "tenant_id": tenant_schema,
+                    "request_id": str(request_id),
+                    "uf": uf,
+                    "ambiente": ambiente,
+                },
+            )
+            raise SefazDegradada(uf, ambiente, asdict(rota.saude))
+        with timeout_sefaz(rota.timeout):
+            if claim.reassumido:
+                sefaz_resp = _consultar_situacao(sefaz_client, claim.pre)
+            if sefaz_resp is None:
+                sefaz_resp = sefaz_client.emitir_nfce(pre_emissao=claim.pre)
+    except SefazTechnicalError as exc:
+        sefaz_resp = None
+        if claim.reassumido:
+            # sem saber se a SEFAZ já tem o documento: contingência
+            # reenviaria o mesmo número depois
+            incerto = exc
+        else:
             tech_error = exc
+    except Exception as exc:
+        # Falha inesperada: o envio pode ter chegado à SEFAZ. O claim não é
+        # liberado (um retry reenviaria); o resultado vai para consulta.
+        logger.exception(
+            "emitir_nfce_resultado_incerto",
+            extra={"event": "nfce_emitir", "tenant_id": tenant_schema, "request_id": str(request_id)},
+        )
+        sefaz_resp = None
+        incerto = exc
+
+    if tech_error is None and incerto is None and sefaz_resp is None:
+        # Defensivo: não deveria acontecer; sem resposta nem erro, o destino
+        # do envio é desconhecido.
+        incerto = APIException(
+            detail={
+                "code": "FISCAL_5001",
+                "message": "Parceiro fiscal não retornou resposta nem erro técnico.",
+            }
+        )
+
+    # -----------------------------------------------------------------------
+    # Fase 3) Commit do resultado
+    # -----------------------------------------------------------------------
+    return _registrar_resultado_emissao(
+        claim=claim,
+        user=user,
+        request_id=request_id,
+        tenant_schema=tenant_schema,
+        sefaz_resp=sefaz_resp,
+        tech_error=tech_error,
+        incerto=incerto,
+        travar_pre_emissao=travar_pre_emissao,
+    )
+
 
-        ambiente = getattr(filial, "ambiente", "homolog")
-        uf = filial.uf
+def _inserir_documento(doc: NfceDocumento):
+    """
+    Grava o NfceDocumento só se o request_id ainda não tem resultado
+    (NOT EXISTS no índice global, no mesmo INSERT). Retorna (documento, criado);
+    com criado=False, o documento é o já registrado.
+    """
+    return inserir_idempotente(
+        doc,
+        arbitro=NfceDocumentoIndice,
+        leitura=NfceDocumento.objects.pelo_indice(request_id=doc.request_id),
+    )
+
+
+def _resultado_ja_registrado(doc: NfceDocumento, *, tenant_schema: Optional[str]) -> EmitirNfceResult:
+    logger.warning(
+        "emitir_nfce_resultado_ja_registrado",
+        extra={
+            "event": "nfce_emitir",
+            "tenant_id": tenant_schema,
+            "request_id": str(doc.request_id),
+            "nfce_documento_id": str(doc.id),
+        },
+    )
+    return _build_result_from_document(doc)
+
+
+def _registrar_resultado_emissao(
+    *,
+    claim: _ClaimEmissao,
+    user: User,
+    request_id: UUID,
+    tenant_schema: Optional[str],
+    sefaz_resp: Optional[Dict[str, Any]],
+    tech_error: Optional[SefazTechnicalError],
+    incerto: Optional[BaseException] = None,
+    travar_pre_emissao: bool = True,
+) -> EmitirNfceResult:
+    pre = claim.pre
+    filial = claim.filial
+    terminal = claim.terminal
+
+    # Documento referencia o payload já gravado na pré-emissão (mesmo hash)
+    hash_payload_enviado = pre.hash_payload
+
+    ambiente = getattr(filial, "ambiente", "homolog")
+    uf = filial.uf
+
+    # Auditoria gravada junto com o commit (um INSERT, sem reenviar os blobs)
+    with auditoria_transacional():
+        # Lock curto: serializa apenas gravações concorrentes do resultado
+        # (ex.: claim vencido reassumido por outro processo). Pré-emissão
+        # inserida nesta transação já é exclusiva dela.
+        if travar_pre_emissao:
+            NfcePreEmissao.objects.select_for_update().only("id").get(pk=pre.pk)
+
+        # -------------------------------------------------------------------
+        # 0) Resultado incerto → EM CONSULTA (claim mantido)
+        # -------------------------------------------------------------------
+        if incerto is not None:
+            codigo_incerto = str(getattr(incerto, "codigo", None) or "RESULTADO_INCERTO")
+            mensagem_incerto = f"Resultado da emissão incerto: {incerto!r}"
+            raw_incerto: Dict[str, Any] = {"codigo": codigo_incerto, "mensagem": mensagem_incerto}
+
+            doc = NfceDocumento(
+                filial=filial,
+                terminal=terminal,
+                numero=pre.numero,
+                serie=pre.serie,
+                request_id=request_id,
+                chave_acesso=_make_dummy_chave_acesso(),
+                protocolo="",
+                status=STATUS_EM_CONSULTA,
+                mensagem_sefaz=mensagem_incerto,
+                xml_autorizado=None,
+                raw_sefaz_response=raw_incerto,
+                ambiente=ambiente,
+                uf=uf,
+                em_contingencia=False,
+                hash_payload_enviado=hash_payload_enviado,
+            )
+            doc, criado = _inserir_documento(doc)
+            if not criado:
+                return _resultado_ja_registrado(doc, tenant_schema=tenant_schema)
+
+            registrar_auditoria(
+                tipo_evento="EMISSAO_RESULTADO_INCERTO",
+                nfce_documento=doc,
+                tenant_id=tenant_schema,
+                filial_id=filial.id,
+                terminal_id=terminal.id,
+                user_id=getattr(user, "id", None),
+                request_id=request_id,
+                codigo_retorno=codigo_incerto,
+                mensagem_retorno=mensagem_incerto,
+                xml_autorizado=None,
+                raw_sefaz_response=raw_incerto,
+                ambiente=ambiente,
+                uf=uf,
+            )
+
+            logger.warning(
+                "emitir_nfce_em_consulta",
+                extra={
+                    "event": "nfce_emitir",
+                    "tenant_id": tenant_schema,
+                    "user_id": getattr(user, "id", None),
+                    "request_id": str(request_id),
+                    "nfce_documento_id": str(doc.id),
+                    "status": doc.status,
+                    "outcome": STATUS_EM_CONSULTA,
+                },
+            )
+
+            return _build_result_from_document(doc)
 
         # -------------------------------------------------------------------
-        # 6.A) Falha técnica → CONTINGÊNCIA PENDENTE
+        # A) Falha técnica → CONTINGÊNCIA PENDENTE
         # -------------------------------------------------------------------
         if tech_error is not None:
             now = timezone.now()
@@ -354,11 +755,11 @@ def emitir_nfce(
                 "mensagem": mensagem_tech,
             }
 
-            doc = NfceDocumento.objects.create(
+            doc = NfceDocumento(
                 filial=filial,
                 terminal=terminal,
-                numero=numero,
-                serie=serie,
+                numero=pre.numero,
+                serie=pre.serie,
                 request_id=request_id,
                 # chave dummy, nunca nula (campo NOT NULL/UNIQUE)
                 chave_acesso=_make_dummy_chave_acesso(),
@@ -373,12 +774,14 @@ def emitir_nfce(
                 contingencia_ativada_em=now,
                 contingencia_motivo=mensagem_tech,
                 contingencia_regularizada_em=None,
-                # campos novos – payload enviado ao parceiro
-                payload_enviado=payload_enviado,
+                # payload enviado ao parceiro (blob da pré-emissão)
                 hash_payload_enviado=hash_payload_enviado,
             )
+            doc, criado = _inserir_documento(doc)
+            if not criado:
+                return _resultado_ja_registrado(doc, tenant_schema=tenant_schema)
 
-            NfceAuditoria.objects.create(
+            registrar_auditoria(
                 tipo_evento="EMISSAO_CONTINGENCIA_ATIVADA",
                 nfce_documento=doc,
                 tenant_id=tenant_schema,
@@ -410,18 +813,8 @@ def emitir_nfce(
             return _build_result_from_document(doc)
 
         # -------------------------------------------------------------------
-        # 6.B) Emissão normal (autorizada / rejeitada)
+        # B) Emissão normal (autorizada / rejeitada)
         # -------------------------------------------------------------------
-        if sefaz_resp is None:
-            # Defensivo: não deveria acontecer, mas evita quebrar o fluxo.
-            raise APIException(
-                detail={
-                    "code": "FISCAL_5001",
-                    "message": "Parceiro fiscal não retornou resposta nem erro técnico.",
-                }
-            )
-
-        # Normaliza resposta do parceiro
         status_resp = str(sefaz_resp.get("status") or "").lower()
         chave_acesso = sefaz_resp.get("chave_acesso")
         protocolo = sefaz_resp.get("protocolo")
@@ -446,11 +839,11 @@ def emitir_nfce(
             tipo_evento = "EMISSAO_REJEITADA"
             outcome = "rejeitada"
 
-        doc = NfceDocumento.objects.create(
+        doc = NfceDocumento(
             filial=filial,
             terminal=terminal,
-            numero=numero,
-            serie=serie,
+            numero=pre.numero,
+            serie=pre.serie,
             request_id=request_id,
             chave_acesso=chave_acesso or _make_dummy_chave_acesso(),
             protocolo=protocolo or "",
@@ -464,11 +857,13 @@ def emitir_nfce(
             contingencia_ativada_em=None,
             contingencia_motivo=None,
             contingencia_regularizada_em=None,
-            payload_enviado=payload_enviado,
             hash_payload_enviado=hash_payload_enviado,
         )
+        doc, criado = _inserir_documento(doc)
+        if not criado:
+            return _resultado_ja_registrado(doc, tenant_schema=tenant_schema)
 
-        NfceAuditoria.objects.create(
+        registrar_auditoria(
             tipo_evento=tipo_evento,
             nfce_documento=doc,
             tenant_id=tenant_schema,
@@ -0,0 +1,146 @@
+# fiscal/services/idempotencia_service.py
+"""
+Gravação idempotente por request_id num único round trip.
+
+inserir_idempotente substitui o padrão get() → DoesNotExist → create():
+
+    INSERT ... ON CONFLICT (request_id) DO NOTHING RETURNING pk
+
+- Linha inserida: a instância vira a linha gravada (criado=True).
+- Conflito: o INSERT não grava nada nem levanta IntegrityError (nem aborta
+  a transação); a linha vencedora é lida uma vez (criado=False). Um retry
+  concorrente com o mesmo request_id espera o commit do primeiro no índice
+  único e devolve a linha dele.
+
+Tabelas sem constraint única própria (nfce_documento, particionada) usam um
+`arbitro`: o model cuja constraint guarda a unicidade (NfceDocumentoIndice).
+O INSERT vira INSERT ... SELECT ... WHERE NOT EXISTS (arbitro), precedido de
+um advisory lock de transação na chave: corridas com o mesmo request_id são
+serializadas e a segunda enxerga a linha da primeira.
+
+Se mesmo assim o INSERT violar uma constraint única (IntegrityError), fora de
+transação externa a linha existente é relida pela chave; sem linha (conflito
+em outra constraint) ou dentro de transação externa, o erro é propagado.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+from django.db import IntegrityError, connection, models, transaction
+
+from fiscal.models.nfce_blob_models import NfceBlob
+
+
+def _colunas_e_valores(obj: models.Model):
+    campos = obj._meta.concrete_fields
+    colunas, valores = [], []
+    for campo in campos:
+        colunas.append(connection.ops.quote_name(campo.column))
+        valores.append(campo.get_db_prep_save(campo.pre_save(obj, True), connection))
+    return campos, colunas, valores
+
+
+def _cte_blobs(obj: models.Model):
+    """
+    Blobs pendentes da instância (payload, XML...) gravados no mesmo
+    statement, numa CTE: INSERT INTO nfce_blob ... ON CONFLICT DO NOTHING.
+    A FK da linha principal é verificada no fim do statement e já enxerga
+    os blobs da CTE.
+    """
+    pendentes = list(obj.__dict__.pop("_blobs_pendentes", {}).values())
+    if not pendentes:
+        return "", []
+    linhas, params = [], []
+    for blob in pendentes:
+        _, colunas, valores = _colunas_e_valores(blob)
+        linhas.append("(%s)" % ", ".join(["%s"] * len(valores)))
+        params.extend(valores)
+    sql = (
+        f"WITH _blobs AS (INSERT INTO {connection.ops.quote_name(NfceBlob._meta.db_table)} "
+        f"({', '.join(colunas)}) VALUES {', '.join(linhas)} ON CONFLICT DO NOTHING) "
+    )
+    return sql, params
+
+
+def _leitura(model, filtro, leitura: Optional[models.QuerySet]) -> models.QuerySet:
+    if leitura is None:
+        return model._default_manager.filter(**filtro)
+    return leitura
+
+
+def inserir_idempotente(
+    obj: models.Model,
+    *,
+    conflito: Optional[Sequence[str]] = ("request_id",),
+    arbitro: Optional[type] = None,
+    leitura: Optional[models.QuerySet] = None,
+) -> Tuple[Optional[models.Model], bool]:
+    """
+    Grava `obj` se nenhuma linha conflitar em `conflito` e retorna
+    (instância, criado).
+
+    - conflito: colunas do ON CONFLICT; None = qualquer constraint única
+      da tabela (ex.: request_id ou faixa em NfceInutilizacao).
+    - arbitro: model com a constraint única de `conflito`, quando a própria
+      tabela não a tem.
+    - leitura: queryset da linha existente no caso de conflito (padrão:
+      filtro pelas colunas de `conflito`). Retorna None só se a linha
+      conflitante sumiu entre o INSERT e a leitura.
+    """
+    model = type(obj)
+    tabela = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    filtro = {nome: getattr(obj, model._meta.get_field(nome).attname) for nome in conflito or ()}
+
+    # Blobs são imutáveis e endereçados por conteúdo: gravá-los mesmo quando
+    # a linha conflita é seguro
+    prefixo, params = _cte_blobs(obj)
+    campos, colunas, valores = _colunas_e_valores(obj)
+
+    if arbitro is None:
+        alvo = ""
+        if conflito:
+            alvo = " (%s)" % ", ".join(
+                connection.ops.quote_name(model._meta.get_field(nome).column) for nome in conflito
+            )
+        sql = (
+            f"{prefixo}INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(valores))}) "
+            f"ON CONFLICT{alvo} DO NOTHING RETURNING {pk}"
+        )
+        params += valores
+    else:
+        # INSERT ... SELECT: os parâmetros precisam do tipo explícito
+        selecao = ", ".join(f"%s::{campo.cast_db_type(connection)}" for campo in campos)
+        condicoes = " AND ".join(
+            f"{connection.ops.quote_name(arbitro._meta.get_field(nome).column)} = %s" for nome in filtro
+        )
+        sql = (
+            f"{prefixo}INSERT INTO {tabela} ({', '.join(colunas)}) SELECT {selecao} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {connection.ops.quote_name(arbitro._meta.db_table)} "
+            f"WHERE {condicoes}) RETURNING {pk}"
+        )
+        params += valores + list(filtro.values())
+
+    externa = connection.in_atomic_block
+    try:
+        # sem savepoint dentro de transação externa; fora dela, o lock vive
+        # até o commit deste bloco
+        with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+            if arbitro is not None:
+                chave = ":".join([arbitro._meta.db_table, *(str(v) for v in filtro.values())])
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [chave])
+            cursor.execute(sql, params)
+            inserido = cursor.fetchone() is not None
+    except IntegrityError:
+        if externa or (leitura is None and not filtro):
+            raise
+        existente = _leitura(model, filtro, leitura).first()
+        if existente is None:
+            raise
+        return existente, False
+
+    if inserido:
+        obj._state.adding = False
+        obj._state.db = connection.alias
+        return obj, True
+
+    return _leitura(model, filtro, leitura).first(), False
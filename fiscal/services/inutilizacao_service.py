@@ -2,14 +2,17 @@ import logging
 from dataclasses import dataclass
 from typing import Optional
 
-from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Case, Q, When
 
 from rest_framework.exceptions import NotFound, PermissionDenied, APIException
 
 from filial.models.filial_models import Filial
-from fiscal.models import NfceDocumento, NfceInutilizacao, NfceAuditoria
+from fiscal.models import NfceDocumento, NfceInutilizacao
+from fiscal.services.auditoria_service import auditoria_transacional, registrar_auditoria
+from fiscal.services.idempotencia_service import inserir_idempotente
 from terminal.models.terminal_models import Terminal
+from usuario.authentication import filiais_das_claims
 
 logger = logging.getLogger("pdv.fiscal")
 
@@ -30,7 +33,11 @@ def _assert_user_tem_acesso_filial(*, user, filial: Filial):
     if not user.is_authenticated:
         raise PermissionDenied("Usuário não autenticado.")
 
-    has_link = user.userfilial_set.filter(filial_id=filial.id).exists()
+    filiais = filiais_das_claims(user)
+    if filiais is not None:
+        has_link = str(filial.id) in filiais
+    else:
+        has_link = user.userfilial_set.filter(filial_id=filial.id).exists()
     if not has_link:
         raise PermissionDenied("Usuário não tem acesso à filial.")
 
@@ -49,7 +56,7 @@ def _mock_sefaz_inutilizacao(*, filial: Filial, serie: int, numero_inicial: int,
     }
 
 
-@transaction.atomic
+@auditoria_transacional()
 def inutilizar_faixa_nfce(
     *,
     user,
@@ -101,41 +108,47 @@ def inutilizar_faixa_nfce(
 
     _assert_user_tem_acesso_filial(user=user, filial=filial)
 
-    # Idempotência: se já existe inutilização para este request_id, retorna
-    try:
-        existing = NfceInutilizacao.objects.get(request_id=request_id)
-        return InutilizarFaixaNfceResult(
-            request_id=str(existing.request_id),
-            filial_id=str(existing.filial_id),
-            serie=existing.serie,
-            numero_inicial=existing.numero_inicial,
-            numero_final=existing.numero_final,
-            protocolo=existing.protocolo or "",
-            status=existing.status,
-            mensagem=existing.motivo,
-        )
-    except NfceInutilizacao.DoesNotExist:
-        pass
-
-    # Verifica se já existe inutilização para essa faixa (sem request_id)
-    faixa_existente = NfceInutilizacao.objects.filter(
-        filial_id=filial_id,
-        serie=serie,
-        numero_inicial=numero_inicial,
-        numero_final=numero_final,
-    ).first()
-
-    if faixa_existente:
-        # Idempotência por faixa (sem request_id), opcional
+    # Idempotência: a inutilização é gravada antes da chamada à SEFAZ com
+    # INSERT ... ON CONFLICT DO NOTHING (request_id ou faixa já existentes).
+    # Retry concorrente espera este commit e devolve a mesma linha; uma falha
+    # adiante desfaz o INSERT junto com a transação.
+    inutilizacao, criada = inserir_idempotente(
+        NfceInutilizacao(
+            filial=filial,
+            serie=serie,
+            numero_inicial=numero_inicial,
+            numero_final=numero_final,
+            request_id=request_id,
+            status="processando",
+            motivo=motivo,
+            ambiente=getattr(filial, "ambiente", None),
+            uf=filial.uf,
+        ),
+        conflito=None,
+        leitura=(
+            NfceInutilizacao.objects.filter(
+                Q(request_id=request_id)
+                | Q(
+                    filial_id=filial_id,
+                    serie=serie,
+                    numero_inicial=numero_inicial,
+                    numero_final=numero_final,
+                )
+            )
+            # request_id tem precedência sobre a faixa (sem request_id)
+            .order_by(Case(When(request_id=request_id, then=0), default=1))
+        ),
+    )
+    if not criada:
         return InutilizarFaixaNfceResult(
-            request_id=str(faixa_existente.request_id),
-            filial_id=str(faixa_existente.filial_id),
-            serie=faixa_existente.serie,
-            numero_inicial=faixa_existente.numero_inicial,
-            numero_final=faixa_existente.numero_final,
-            protocolo=faixa_existente.protocolo or "",
-            status=faixa_existente.status,
-            mensagem=faixa_existente.motivo,
+            request_id=str(inutilizacao.request_id),
+            filial_id=str(inutilizacao.filial_id),
+            serie=inutilizacao.serie,
+            numero_inicial=inutilizacao.numero_inicial,
+            numero_final=inutilizacao.numero_final,
+            protocolo=inutilizacao.protocolo or "",
+            status=inutilizacao.status,
+            mensagem=inutilizacao.motivo,
         )
 
     # Garante que não há NfceDocumento emitido na faixa
@@ -167,20 +180,11 @@ def inutilizar_faixa_nfce(
     protocolo = sefaz_resp.get("protocolo") or ""
     mensagem = sefaz_resp.get("mensagem") or ""
 
-    # Persistir inutilização
-    inutilizacao = NfceInutilizacao.objects.create(
-        filial=filial,
-        serie=serie,
-        numero_inicial=numero_inicial,
-        numero_final=numero_final,
-        request_id=request_id,
-        protocolo=protocolo,
-        status="inutilizada",
-        motivo=motivo,
-        raw_sefaz_response=sefaz_resp,
-        ambiente=getattr(filial, "ambiente", None),
-        uf=filial.uf,
-    )
+    # Persistir retorno da SEFAZ
+    inutilizacao.protocolo = protocolo
+    inutilizacao.status = "inutilizada"
+    inutilizacao.raw_sefaz_response = sefaz_resp
+    inutilizacao.save(update_fields=["protocolo", "status", "raw_sefaz_response", "updated_at"])
 
     # Auditoria
         # Descobre um terminal da filial para registrar na auditoria
@@ -202,7 +206,7 @@ def inutilizar_faixa_nfce(
         )
 
     # Auditoria
-    NfceAuditoria.objects.create(
+    registrar_auditoria(
         tipo_evento="INUTILIZACAO",
         nfce_documento=None,
         tenant_id=None,
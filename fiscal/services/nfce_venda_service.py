@@ -8,13 +8,15 @@ from typing import Optional, Union
 from uuid import UUID, uuid4
 
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, prefetch_related_objects
 from django.apps import apps
+from django.utils import timezone
 
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from filial.models.filial_models import Filial
 from terminal.models.terminal_models import Terminal
-from usuario.models.usuario_models import User
+from usuario.models.usuario_models import User, UserFilial
 from vendas.models.venda_models import Venda, VendaStatus, TipoDocumentoFiscal
 from vendas.models.venda_item_models import VendaItem
 from vendas.models.venda_pagamentos_models import (
@@ -22,19 +24,42 @@ from vendas.models.venda_pagamentos_models import (
     StatusPagamento,
 )
 
-from fiscal.services.numero_service import reservar_numero_nfce
+from fiscal.sefaz_factory import SefazEmitirAdapter, get_sefaz_client_for_filial
+from fiscal.services.numero_service import (
+    ERR_NO_PERMISSION,
+    _assert_a1_valid,
+    _reservar_numero,
+    reservar_numero_nfce,
+)
 from fiscal.services.pre_emissao_service import (
+    _inserir_pre_emissao,
     criar_pre_emissao,
     PreEmissaoResult,
 )
 from fiscal.services.emissao_service import (
     emitir_nfce,
+    emitir_nfce_pre_reivindicada,
     EmitirNfceResult,
     SefazClientProtocol,
 )
 
 logger = logging.getLogger("pdv.fiscal")
 
+# Relações do contexto fiscal carregadas junto com a venda (uma query):
+# terminal, filial + certificado A1 e a cadeia do endereço até a UF
+# (filial.uf), usada na emissão e na escolha do client SEFAZ.
+_CONTEXTO_FISCAL_RELACOES = (
+    "terminal",
+    "filial__certificado_a1",
+    "filial__endereco__logradouro__bairro__municipio__uf",
+)
+
+# Itens e pagamentos do payload, com as FKs que o payload lê (uma query cada)
+_PREFETCH_ITENS_PAGAMENTOS = (
+    Prefetch("itens", queryset=VendaItem.objects.select_related("produto__unidade_comercial")),
+    Prefetch("pagamentos", queryset=VendaPagamento.objects.select_related("metodo_pagamento")),
+)
+
 
 # ---------------------------------------------------------------------------
 # Helpers internos
@@ -54,9 +79,15 @@ def _montar_payload_nfce_de_venda(venda: Venda) -> dict:
     Esse payload será usado posteriormente pelo serviço de emissão para montar o XML.
     A ideia é ser autoexplicativo e estável.
     """
+    # Sem efeito se a venda já veio com itens/pagamentos pré-carregados
+    prefetch_related_objects([venda], *_PREFETCH_ITENS_PAGAMENTOS)
+
     itens_payload = []
+    # Snapshot fiscal do item (NCM/CFOP/CSOSN...) + unidade/código do produto
+    # entram no payload para o builder do XML (fiscal.nfce_xml).
     for item in venda.itens.all():  # related_name="itens"
         assert isinstance(item, VendaItem)
+        produto = item.produto
 
         itens_payload.append(
             {
@@ -75,6 +106,18 @@ def _montar_payload_nfce_de_venda(venda: Venda) -> dict:
                 "total_liquido": _decimal_to_float(
                     getattr(item, "total_liquido", None)
                 ),
+                "codigo": getattr(produto, "codigo_interno", None) or str(item.produto_id),
+                "unidade": getattr(getattr(produto, "unidade_comercial", None), "sigla", None) or "UN",
+                "ncm": item.ncm_codigo,
+                "cest": item.cest_codigo,
+                "cfop": item.cfop_aplicado,
+                "origem": item.origem_mercadoria_item,
+                "csosn": item.csosn_icms_item,
+                "cst_pis": item.cst_pis_item,
+                "cst_cofins": item.cst_cofins_item,
+                "aliquota_icms": _decimal_to_float(item.aliquota_icms_item),
+                "aliquota_pis": _decimal_to_float(item.aliquota_pis_item),
+                "aliquota_cofins": _decimal_to_float(item.aliquota_cofins_item),
             }
         )
 
@@ -86,6 +129,7 @@ def _montar_payload_nfce_de_venda(venda: Venda) -> dict:
             {
                 "id": str(pg.id),
                 "metodo_pagamento_id": str(pg.metodo_pagamento_id),
+                "codigo_fiscal": pg.metodo_pagamento.codigo_fiscal,
                 "status": pg.status,
                 "utiliza_tef": pg.utiliza_tef,
                 "valor_solicitado": _decimal_to_float(pg.valor_solicitado),
@@ -380,11 +424,99 @@ def nfce_pre_emissao(
 # ---------------------------------------------------------------------------
 
 
-def emitir_nfce_para_venda(
+def carregar_venda_para_emissao(*, venda_id, operador: Optional[User]) -> Venda:
+    """
+    Carrega a venda sob lock com todo o contexto fiscal numa única query:
+    terminal, filial (certificado A1 + endereço até a UF) e o vínculo
+    operador ↔ filial (anotação `operador_vinculado`).
+
+    Deve ser chamada dentro de transaction.atomic(). A venda devolvida,
+    passada a emitir_nfce_para_venda com o mesmo operador, segue o caminho
+    rápido (sem recarregar venda/terminal/filial/vínculo).
+    """
+    vinculo = UserFilial.objects.filter(
+        user_id=getattr(operador, "pk", None),
+        filial_id=OuterRef("filial_id"),
+    )
+    return (
+        Venda.objects.select_for_update(of=("self",))
+        .select_related(*_CONTEXTO_FISCAL_RELACOES)
+        .annotate(operador_vinculado=Exists(vinculo))
+        .get(pk=venda_id)
+    )
+
+
+def _emitir_nfce_com_contexto(
     *,
     venda: Venda,
     operador: User,
+    request_id: UUID,
     sefaz_client: SefazClientProtocol,
+) -> Optional[EmitirNfceResult]:
+    """
+    Caminho rápido de emitir_nfce_para_venda para a venda de
+    carregar_venda_para_emissao: mesmas regras de nfce_pre_emissao +
+    emitir_nfce, validadas sobre o contexto já carregado.
+
+      - itens e pagamentos: uma query cada (validação e payload);
+      - reserva de número sem revalidar terminal/vínculo/A1;
+      - pré-emissão inserida já com o claim de emissão (sem UPDATE de claim,
+        sem reler pré-emissão/filial/terminal).
+
+    Retorna None se o request_id já tem pré-emissão (retry): o chamador
+    segue pelo fluxo completo, idempotente por request_id.
+    """
+    prefetch_related_objects([venda], *_PREFETCH_ITENS_PAGAMENTOS)
+    _validar_venda_para_nfce(venda)
+
+    if not venda.operador_vinculado:
+        raise PermissionDenied(
+            {"code": ERR_NO_PERMISSION, "message": "Usuário sem permissão para a filial do terminal"}
+        )
+
+    filial: Filial = venda.filial
+    terminal: Terminal = venda.terminal
+    _assert_a1_valid(filial)
+
+    reserva = _reservar_numero(
+        terminal_id=terminal.id,
+        filial_id=filial.id,
+        serie=_obter_serie_nfce_do_terminal(terminal),
+        request_id=str(request_id),
+    )
+
+    pre, criada = _inserir_pre_emissao(
+        reserva,
+        request_id=request_id,
+        payload=_montar_payload_nfce_de_venda(venda),
+        emissao_token=uuid4(),
+        emissao_iniciada_em=timezone.now(),
+    )
+    if not criada:
+        return None
+
+    logger.info(
+        "Pré-emissão NFC-e concluída. venda_id=%s pre_emissao_id=%s numero=%s serie=%s",
+        venda.id,
+        pre.id,
+        pre.numero,
+        pre.serie,
+    )
+
+    return emitir_nfce_pre_reivindicada(
+        pre=pre,
+        filial=filial,
+        terminal=terminal,
+        user=operador,
+        sefaz_client=sefaz_client,
+    )
+
+
+def emitir_nfce_para_venda(
+    *,
+    venda: Venda,
+    operador: User,
+    sefaz_client: Optional[SefazClientProtocol] = None,
     request_id: Optional[Union[str, UUID]] = None,
 ) -> EmitirNfceResult:
     """
@@ -396,6 +528,11 @@ def emitir_nfce_para_venda(
          persiste NfceDocumento + auditoria.
       3) Retorna EmitirNfceResult (com chave, protocolo, status, xml, etc).
 
+    Venda vinda de carregar_venda_para_emissao usa o caminho rápido
+    (_emitir_nfce_com_contexto), com o contexto fiscal já carregado.
+
+    Sem sefaz_client, usa o client da filial (get_sefaz_client_for_filial).
+
     Idempotência:
       - nfce_pre_emissao é idempotente por request_id.
       - emitir_nfce também é idempotente por NfceDocumento.request_id (não reemite na SEFAZ).
@@ -413,27 +550,39 @@ def emitir_nfce_para_venda(
         req_uuid,
     )
 
-    # 1) Pré-emissão (reserva + NfcePreEmissao)
-    pre_result = nfce_pre_emissao(
-        venda=venda,
-        operador=operador,
-        request_id=req_uuid,
-    )
+    if sefaz_client is None:
+        sefaz_client = SefazEmitirAdapter(get_sefaz_client_for_filial(venda.filial), venda.filial)
 
-    # 2) Emissão NFC-e (comunicação SEFAZ / API fiscal)
-    result = emitir_nfce(
-        user=operador,
-        request_id=req_uuid,
-        sefaz_client=sefaz_client,
-    )
+    result = None
+    if hasattr(venda, "operador_vinculado"):
+        result = _emitir_nfce_com_contexto(
+            venda=venda,
+            operador=operador,
+            request_id=req_uuid,
+            sefaz_client=sefaz_client,
+        )
+
+    if result is None:
+        # 1) Pré-emissão (reserva + NfcePreEmissao)
+        nfce_pre_emissao(
+            venda=venda,
+            operador=operador,
+            request_id=req_uuid,
+        )
+
+        # 2) Emissão NFC-e (comunicação SEFAZ / API fiscal)
+        result = emitir_nfce(
+            user=operador,
+            request_id=req_uuid,
+            sefaz_client=sefaz_client,
+        )
 
     logger.info(
-        "emitir_nfce_para_venda concluído. venda_id=%s numero=%s serie=%s status_nfce=%s pre_emissao_id=%s",
+        "emitir_nfce_para_venda concluído. venda_id=%s numero=%s serie=%s status_nfce=%s",
         venda.id,
         result.numero,
         result.serie,
         result.status,
-        getattr(pre_result, "id", None),
     )
 
     return result
@@ -449,11 +598,9 @@ def atualizar_venda_apos_emissao_nfce(*, venda, documento):
         codigo_erro_fiscal / mensagem_erro_fiscal da venda;
       - Diferenciar claramente:
         * Autorizada   → FINALIZADA
-        * Contingência → AGUARDANDO_EMISSAO_FISCAL
+        * Contingência / em consulta → AGUARDANDO_EMISSAO_FISCAL
         * Rejeitada    → ERRO_FISCAL
     """
-    from django.db import transaction
-    from django.apps import apps
 
     Venda = apps.get_model("vendas", "Venda")
     NfceDocumento = apps.get_model("fiscal", "NfceDocumento")
@@ -500,9 +647,9 @@ def atualizar_venda_apos_emissao_nfce(*, venda, documento):
             venda.codigo_erro_fiscal = None
             venda.mensagem_erro_fiscal = None
 
-        elif em_contingencia:
-            # Contingência técnica: venda pendente de regularização,
-            # mas vinculada ao documento fiscal em contingência.
+        elif em_contingencia or status_doc == "em_consulta":
+            # Contingência técnica ou resultado em consulta: venda pendente
+            # de regularização, mas vinculada ao documento fiscal.
             if hasattr(VendaStatus, "AGUARDANDO_EMISSAO_FISCAL"):
                 venda.status = VendaStatus.AGUARDANDO_EMISSAO_FISCAL
             else:
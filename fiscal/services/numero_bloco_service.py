@@ -0,0 +1,372 @@
+# fiscal/services/numero_bloco_service.py
+"""
+Alocador de numeração NFC-e por blocos arrendados (lease) por processo.
+
+Em vez de travar a linha do Terminal a cada venda, cada processo (holder)
+arrenda um bloco contíguo de números por (terminal, série) na tabela
+nfce_numero_bloco e distribui os números com um único UPDATE condicional
+no próprio bloco.
+
+Trade-off: números arrendados e não consumidos (processo reiniciado, bloco
+expirado, corrida de idempotência) viram "buracos" na sequência. Eles são
+listados por listar_faixas_nao_utilizadas() para envio à inutilização.
+"""
+
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+
+from fiscal.models import NfceNumeroBloco, NfceNumeroReserva
+from fiscal.services.numero_service import ERR_SERIE_MISMATCH, garantir_sequencia_inicial
+from fiscal.services.idempotencia_service import inserir_idempotente
+from fiscal.services.sequencia_service import MODELO_NFCE, avancar_sequencia
+
+logger = logging.getLogger("pdv.fiscal")
+
+ERR_BLOCO_INDISPONIVEL = "FISCAL_3003"
+
+DEFAULT_TAMANHO_BLOCO = 50
+DEFAULT_TTL_BLOCO_SEGUNDOS = 3600
+
+# Números entregues logo antes do bloco expirar/esgotar ainda podem estar
+# com o INSERT da reserva em andamento; só reportamos após essa janela.
+JANELA_SEGURANCA_RELATORIO = timedelta(seconds=60)
+
+_MAX_TENTATIVAS = 5
+
+# (schema, terminal_id, serie) -> id do bloco ativo deste processo
+_blocos_do_processo: Dict[Tuple[str, str, int], str] = {}
+_blocos_lock = threading.Lock()
+
+
+@dataclass
+class FaixaNaoUtilizada:
+    bloco_id: str
+    terminal_id: str
+    filial_id: str
+    serie: int
+    numero_inicial: int
+    numero_final: int
+
+
+# ---------------------------------------------------------------------------
+# Helpers internos
+# ---------------------------------------------------------------------------
+
+def _holder_id() -> str:
+    """
+    Identifica o processo dono do lease. Após fork, o pid muda e o processo
+    filho passa a ter seus próprios blocos.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _tamanho_bloco() -> int:
+    return max(1, int(getattr(settings, "FISCAL_NFCE_BLOCO_TAMANHO", DEFAULT_TAMANHO_BLOCO)))
+
+
+def _ttl_bloco() -> timedelta:
+    segundos = int(getattr(settings, "FISCAL_NFCE_BLOCO_TTL_SEGUNDOS", DEFAULT_TTL_BLOCO_SEGUNDOS))
+    return timedelta(seconds=segundos)
+
+
+def _chave_cache(terminal_id, serie: int) -> Tuple[str, str, int]:
+    return (getattr(connection, "schema_name", "public"), str(terminal_id), int(serie))
+
+
+def _consumir_numero(bloco_id) -> Optional[int]:
+    """
+    Entrega o próximo número do bloco em um único statement.
+    Retorna None se o bloco não pertence a este processo, expirou ou esgotou.
+    """
+    sql = f"""
+        UPDATE {NfceNumeroBloco._meta.db_table}
+           SET proximo_numero = proximo_numero + 1
+         WHERE id = %s
+           AND holder = %s
+           AND status = %s
+           AND proximo_numero <= numero_final
+           AND expires_at > %s
+        RETURNING proximo_numero - 1
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [bloco_id, _holder_id(), NfceNumeroBloco.STATUS_ATIVO, timezone.now()],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _encerrar_bloco_se_esgotado(bloco_id) -> None:
+    NfceNumeroBloco.objects.filter(
+        id=bloco_id,
+        status=NfceNumeroBloco.STATUS_ATIVO,
+        proximo_numero__gt=F("numero_final"),
+    ).update(status=NfceNumeroBloco.STATUS_ESGOTADO, released_at=timezone.now())
+
+
+def _bloco_ativo_do_holder(*, terminal_id, serie: int) -> Optional[NfceNumeroBloco]:
+    """
+    Reaproveita um bloco ativo deste mesmo holder (ex.: cache perdido após
+    reload do módulo) antes de arrendar um novo.
+    """
+    return (
+        NfceNumeroBloco.objects.filter(
+            terminal_id=terminal_id,
+            serie=serie,
+            holder=_holder_id(),
+            status=NfceNumeroBloco.STATUS_ATIVO,
+            expires_at__gt=timezone.now(),
+            proximo_numero__lte=F("numero_final"),
+        )
+        .order_by("numero_inicial")
+        .first()
+    )
+
+
+def _arrendar_bloco(*, terminal_id, filial_id, serie: int) -> NfceNumeroBloco:
+    """
+    Arrenda um novo bloco contíguo avançando a sequência NFC-e do terminal
+    (DocumentoFiscalSequencia) em FISCAL_NFCE_BLOCO_TAMANHO de uma só vez.
+
+    Blocos de processos diferentes nunca se sobrepõem: o UPDATE ... RETURNING
+    da sequência serializa os arrendamentos.
+    """
+    tamanho = _tamanho_bloco()
+    agora = timezone.now()
+
+    with transaction.atomic():
+        ultimo = avancar_sequencia(
+            terminal_id=terminal_id,
+            modelo=MODELO_NFCE,
+            serie=serie,
+            quantidade=tamanho,
+        )
+        if ultimo is None and garantir_sequencia_inicial(terminal_id=terminal_id, serie=serie):
+            ultimo = avancar_sequencia(
+                terminal_id=terminal_id,
+                modelo=MODELO_NFCE,
+                serie=serie,
+                quantidade=tamanho,
+            )
+        if ultimo is None:
+            raise ValidationError({
+                "code": ERR_SERIE_MISMATCH,
+                "message": "Série informada não possui sequência NFC-e ativa no terminal.",
+            })
+
+        inicio = ultimo - tamanho + 1
+        bloco = NfceNumeroBloco.objects.create(
+            terminal_id=terminal_id,
+            filial_id=filial_id,
+            serie=serie,
+            numero_inicial=inicio,
+            numero_final=ultimo,
+            proximo_numero=inicio,
+            holder=_holder_id(),
+            status=NfceNumeroBloco.STATUS_ATIVO,
+            leased_at=agora,
+            expires_at=agora + _ttl_bloco(),
+        )
+
+    logger.info(
+        "nfce_bloco_arrendado",
+        extra={
+            "event": "nfce_bloco_lease",
+            "terminal_id": str(terminal_id),
+            "serie": serie,
+            "bloco_id": str(bloco.id),
+            "numero_inicial": bloco.numero_inicial,
+            "numero_final": bloco.numero_final,
+            "holder": bloco.holder,
+        },
+    )
+    return bloco
+
+
+def _proximo_numero(*, terminal_id, filial_id, serie: int) -> int:
+    chave = _chave_cache(terminal_id, serie)
+
+    for _ in range(_MAX_TENTATIVAS):
+        bloco_id = _blocos_do_processo.get(chave)
+        if bloco_id is not None:
+            numero = _consumir_numero(bloco_id)
+            if numero is not None:
+                return numero
+            _encerrar_bloco_se_esgotado(bloco_id)
+
+        # Apenas uma thread do processo arrenda bloco novo por vez;
+        # as demais reaproveitam o bloco que ela obtiver.
+        with _blocos_lock:
+            atual = _blocos_do_processo.get(chave)
+            if atual is not None and atual != bloco_id:
+                continue
+
+            bloco = _bloco_ativo_do_holder(terminal_id=terminal_id, serie=serie)
+            if bloco is None:
+                bloco = _arrendar_bloco(terminal_id=terminal_id, filial_id=filial_id, serie=serie)
+            _blocos_do_processo[chave] = str(bloco.id)
+
+    raise APIException(
+        {
+            "code": ERR_BLOCO_INDISPONIVEL,
+            "message": "Não foi possível obter número NFC-e do bloco arrendado. Tente novamente.",
+        }
+    )
+
+
+# ---------------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------------
+
+def reservar_numero_nfce_bloco(*, terminal_id, filial_id, serie: int, request_id) -> NfceNumeroReserva:
+    """
+    Reserva um número NFC-e a partir do bloco arrendado por este processo.
+
+    Pré-condição: vínculo user↔filial, série e A1 já validados pelo chamador
+    (fiscal.services.numero_service.reservar_numero_nfce).
+
+    Idempotência: request_id continua único em NfceNumeroReserva. Se outra
+    requisição com o mesmo request_id vencer a corrida, o número consumido
+    aqui fica sem reserva e é reportado por listar_faixas_nao_utilizadas().
+    """
+    existing = NfceNumeroReserva.objects.filter(request_id=request_id).first()
+    if existing is not None:
+        return existing
+
+    numero = _proximo_numero(terminal_id=terminal_id, filial_id=filial_id, serie=serie)
+
+    reserva, inserida = inserir_idempotente(
+        NfceNumeroReserva(
+            terminal_id=terminal_id,
+            filial_id=filial_id,
+            serie=serie,
+            numero=numero,
+            request_id=request_id,
+            reserved_at=timezone.now(),
+        )
+    )
+    if not inserida:
+        logger.info(
+            "nfce_bloco_numero_descartado",
+            extra={
+                "event": "nfce_reserva_numero",
+                "terminal_id": str(terminal_id),
+                "serie": serie,
+                "numero": numero,
+                "request_id": str(request_id),
+            },
+        )
+    return reserva
+
+
+def liberar_blocos_do_processo() -> int:
+    """
+    Libera os blocos ativos deste processo (ex.: desligamento do worker).
+    O restante não consumido passa a ser reportado para inutilização.
+    """
+    with _blocos_lock:
+        _blocos_do_processo.clear()
+
+    return NfceNumeroBloco.objects.filter(
+        holder=_holder_id(),
+        status=NfceNumeroBloco.STATUS_ATIVO,
+    ).update(status=NfceNumeroBloco.STATUS_LIBERADO, released_at=timezone.now())
+
+
+def liberar_blocos_expirados(*, agora=None) -> int:
+    """
+    Marca como liberados os blocos cujo lease expirou (processo morto ou ocioso).
+    """
+    agora = agora or timezone.now()
+    return NfceNumeroBloco.objects.filter(
+        status=NfceNumeroBloco.STATUS_ATIVO,
+        expires_at__lte=agora,
+    ).update(status=NfceNumeroBloco.STATUS_LIBERADO, released_at=agora)
+
+
+def _compactar_faixas(numeros: List[int]) -> List[Tuple[int, int]]:
+    faixas: List[Tuple[int, int]] = []
+    for n in numeros:
+        if faixas and faixas[-1][1] == n - 1:
+            faixas[-1] = (faixas[-1][0], n)
+        else:
+            faixas.append((n, n))
+    return faixas
+
+
+def listar_faixas_nao_utilizadas(
+    *,
+    terminal_id=None,
+    serie: Optional[int] = None,
+    incluir_reportadas: bool = False,
+    agora=None,
+) -> List[FaixaNaoUtilizada]:
+    """
+    Lista as faixas de números arrendados e não reservados, prontas para
+    inutilizar_faixa_nfce.
+
+    Considera apenas blocos encerrados (esgotados/liberados) ou com lease
+    expirado há mais que JANELA_SEGURANCA_RELATORIO.
+    """
+    agora = agora or timezone.now()
+    limite = agora - JANELA_SEGURANCA_RELATORIO
+
+    qs = NfceNumeroBloco.objects.filter(
+        Q(status__in=[NfceNumeroBloco.STATUS_ESGOTADO, NfceNumeroBloco.STATUS_LIBERADO], released_at__lte=limite)
+        | Q(status=NfceNumeroBloco.STATUS_ATIVO, expires_at__lte=limite)
+    )
+    if terminal_id is not None:
+        qs = qs.filter(terminal_id=terminal_id)
+    if serie is not None:
+        qs = qs.filter(serie=serie)
+    if not incluir_reportadas:
+        qs = qs.filter(reportado_em__isnull=True)
+
+    faixas: List[FaixaNaoUtilizada] = []
+    for bloco in qs.order_by("terminal_id", "serie", "numero_inicial"):
+        usados = set(
+            NfceNumeroReserva.objects.filter(
+                terminal_id=bloco.terminal_id,
+                serie=bloco.serie,
+                numero__gte=bloco.numero_inicial,
+                numero__lte=bloco.numero_final,
+            ).values_list("numero", flat=True)
+        )
+        livres = [
+            n for n in range(bloco.numero_inicial, bloco.numero_final + 1) if n not in usados
+        ]
+        for inicio, fim in _compactar_faixas(livres):
+            faixas.append(
+                FaixaNaoUtilizada(
+                    bloco_id=str(bloco.id),
+                    terminal_id=str(bloco.terminal_id),
+                    filial_id=str(bloco.filial_id),
+                    serie=bloco.serie,
+                    numero_inicial=inicio,
+                    numero_final=fim,
+                )
+            )
+
+    return faixas
+
+
+def marcar_blocos_reportados(bloco_ids) -> int:
+    """
+    Marca blocos cujas faixas não utilizadas já foram encaminhadas para inutilização.
+    """
+    return NfceNumeroBloco.objects.filter(
+        id__in=list(bloco_ids),
+        reportado_em__isnull=True,
+    ).update(reportado_em=timezone.now())
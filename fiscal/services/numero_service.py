@@ -1,18 +1,38 @@
 # fiscal/services/numero_service.py
+import logging
+import uuid
 from dataclasses import dataclass
-from django.db import transaction, IntegrityError
+from typing import Dict, List
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from terminal.models.terminal_models import Terminal
 from filial.models.filial_models import Filial
-from fiscal.models import NfceNumeroReserva
-from rest_framework.exceptions import PermissionDenied
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroReserva
+from fiscal.services.contexto_fiscal_service import invalidar_contexto_fiscal, obter_contexto_fiscal
+from fiscal.services.sequencia_service import (
+    MODELO_NFCE,
+    avancar_sequencia,
+    criar_sequencia_nfce_inicial,
+    inserir_reservas_nfce_lote,
+    reservar_numero_nfce_com_registro,
+)
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
+
+logger = logging.getLogger("pdv.fiscal")
 
 # Códigos de erro do domínio
 ERR_A1_EXPIRED = "FISCAL_3001"
 ERR_SERIE_MISMATCH = "FISCAL_3002"
 ERR_TERMINAL_NOT_FOUND = "TERMINAL_2001"
 ERR_NO_PERMISSION = "AUTH_1006"
+ERR_LOTE_CONFLITO = "FISCAL_3004"
+
+_MAX_TENTATIVAS_LOTE = 3
+
+# Modos de numeração (settings.FISCAL_NFCE_NUMERACAO_MODO)
+NUMERACAO_MODO_SEQUENCIAL = "sequencial"
+NUMERACAO_MODO_BLOCO = "bloco"
 
 @dataclass
 class ReservaNumeroResult:
@@ -40,104 +60,230 @@ def _assert_a1_valid(filial: Filial):
             "message": "Certificado A1 expirado. Emissão bloqueada."
         })
 
+def _result_from_reserva(reserva) -> ReservaNumeroResult:
+    return ReservaNumeroResult(
+        numero=reserva.numero,
+        serie=reserva.serie,
+        terminal_id=str(reserva.terminal_id),
+        filial_id=str(reserva.filial_id),
+        request_id=str(reserva.request_id),
+        reserved_at=reserva.reserved_at.isoformat(),
+    )
+
+
+def _raise_serie_mismatch():
+    raise ValidationError({
+        "code": ERR_SERIE_MISMATCH,
+        "message": "Série informada não possui sequência NFC-e ativa no terminal.",
+    })
+
+
+def garantir_sequencia_inicial(*, terminal_id, serie: int) -> bool:
+    """
+    Cria a sequência NFC-e de um terminal que ainda não tem nenhuma
+    (terminal novo) e invalida o contexto fiscal do tenant, já que o INSERT
+    cru não dispara fiscal.signals.
+
+    Retorna True se a série tem sequência ativa ao final: criada aqui ou por
+    um request concorrente (cujo contexto em cache pode estar desatualizado).
+    """
+    criada = criar_sequencia_nfce_inicial(terminal_id=terminal_id, serie=serie)
+    if not criada and not DocumentoFiscalSequencia.objects.filter(
+        terminal_id=terminal_id, modelo=MODELO_NFCE, serie=serie, ativo=True
+    ).exists():
+        return False
+
+    invalidar_contexto_fiscal()
+    if criada:
+        logger.info(
+            "nfce_sequencia_criada",
+            extra={"event": "nfce_sequencia_inicial", "terminal_id": str(terminal_id), "serie": serie},
+        )
+    return True
+
+
+def _validar_contexto_reserva(*, user, terminal_id, serie: int):
+    """
+    Valida terminal, vínculo usuário ↔ filial, certificado A1 e série a partir
+    do contexto fiscal em cache (contexto_fiscal_service).
+    Retorna o filial_id do terminal.
+    """
+    contexto = obter_contexto_fiscal(user=user, terminal_id=terminal_id)
+    if contexto is None:
+        raise NotFound({"code": ERR_TERMINAL_NOT_FOUND, "message": "Terminal não encontrado"})
+
+    contexto.assert_vinculado()
+    contexto.assert_a1_valido()
+    if serie not in contexto.series_nfce:
+        # terminal sem nenhuma sequência NFC-e: a primeira reserva cria a da série
+        if contexto.series_nfce or not garantir_sequencia_inicial(terminal_id=terminal_id, serie=serie):
+            _raise_serie_mismatch()
+    return contexto.filial_id
+
+
 def reservar_numero_nfce(*, user, terminal_id, serie: int, request_id) -> ReservaNumeroResult:
     """
     Regras:
       - Usuário deve estar vinculado à filial do terminal.
-      - Série informada deve ser igual à série do terminal.
+      - Série informada deve ter sequência NFC-e (modelo 65) ativa no terminal
+        (DocumentoFiscalSequencia).
       - Certificado A1 válido → senão, bloqueia pré-emissão.
+      - Terminal, vínculo, série e A1 vêm do cache de contexto fiscal
+        (sem consulta no caminho quente).
       - Idempotência via unique(request_id): múltiplas chamadas com o mesmo request_id
         retornam SEMPRE a mesma reserva.
-      - Concorrência protegida com select_for_update no Terminal e savepoint na criação da reserva.
-      - Apenas quando a criação da reserva for nossa é que avançamos o numero_atual do Terminal.
+      - Concorrência: avanço da sequência + INSERT da reserva num único statement
+        (UPDATE ... RETURNING / INSERT ... ON CONFLICT). A sequência só avança
+        quando a reserva é nossa; sem select_for_update nem savepoint.
+      - Com FISCAL_NFCE_NUMERACAO_MODO="bloco", o número sai de um bloco arrendado pelo
+        processo (fiscal.services.numero_bloco_service).
     """
-    # 1) Terminal
-    try:
-        terminal = Terminal.objects.select_related(None).get(id=terminal_id)
-    except Terminal.DoesNotExist:
-        from rest_framework.exceptions import NotFound
-        raise NotFound({"code": ERR_TERMINAL_NOT_FOUND, "message": "Terminal não encontrado"})
+    # 1-3) Terminal, vínculo user↔filial, A1 e série (antes de qualquer toque em número)
+    filial_id = _validar_contexto_reserva(user=user, terminal_id=terminal_id, serie=serie)
+    return _reservar_numero(terminal_id=terminal_id, filial_id=filial_id, serie=serie, request_id=request_id)
+
+
+def _reservar_numero(*, terminal_id, filial_id, serie: int, request_id) -> ReservaNumeroResult:
+    """
+    Passos 4-5 de reservar_numero_nfce, para quem já validou terminal,
+    vínculo e A1 (ex.: finalização de venda com o contexto fiscal carregado).
+    """
+    if getattr(settings, "FISCAL_NFCE_NUMERACAO_MODO", NUMERACAO_MODO_SEQUENCIAL) == NUMERACAO_MODO_BLOCO:
+        # import tardio: numero_bloco_service importa este módulo
+        from fiscal.services.numero_bloco_service import reservar_numero_nfce_bloco
 
-    # 2) Vínculo usuário ↔ filial do terminal
-    filial_id = terminal.filial_id
-    if not user.userfilial_set.filter(filial_id=filial_id).exists():
-        from rest_framework.exceptions import PermissionDenied
-        raise PermissionDenied({"code": ERR_NO_PERMISSION, "message": "Usuário sem permissão para a filial do terminal"})
-
-    # 3) Série coerente
-    if terminal.serie != serie:
-        from rest_framework.exceptions import ValidationError
-        raise ValidationError({"code": ERR_SERIE_MISMATCH, "message": "Série informada não coincide com a série do terminal."})
-
-    # 4) Bloqueio por A1 expirado (antes de qualquer toque em número)
-    filial = Filial.objects.only("id", "a1_expires_at").get(id=filial_id)
-    _assert_a1_valid(filial)
-
-    # 5) Curto-circuito de idempotência (se já existe, retorna)
-    try:
-        existing = NfceNumeroReserva.objects.get(request_id=request_id)
-        return ReservaNumeroResult(
-            numero=existing.numero,
-            serie=existing.serie,
-            terminal_id=str(existing.terminal_id),
-            filial_id=str(existing.filial_id),
-            request_id=str(existing.request_id),
-            reserved_at=existing.reserved_at.isoformat(),
+        reserva = reservar_numero_nfce_bloco(
+            terminal_id=terminal_id,
+            filial_id=filial_id,
+            serie=serie,
+            request_id=request_id,
         )
-    except NfceNumeroReserva.DoesNotExist:
-        pass
+        return _result_from_reserva(reserva)
+
+    # 4) Avanço da sequência + reserva (1 round trip no caminho feliz)
+    for tentativa in range(2):
+        reserva_id = uuid.uuid4()
+        with transaction.atomic():
+            row = reservar_numero_nfce_com_registro(
+                reserva_id=reserva_id,
+                terminal_id=terminal_id,
+                filial_id=filial_id,
+                serie=serie,
+                request_id=request_id,
+                reserved_at=timezone.now(),
+            )
+            if row is None:
+                # Nada inserido: request_id já existente (ou corrida com o mesmo
+                # request_id) ou série sem sequência. Desfaz qualquer avanço.
+                transaction.set_rollback(True)
+
+        if row is not None:
+            numero, reserved_at = row
+            return ReservaNumeroResult(
+                numero=numero,
+                serie=serie,
+                terminal_id=str(terminal_id),
+                filial_id=str(filial_id),
+                request_id=str(request_id),
+                reserved_at=reserved_at.isoformat(),
+            )
+
+        # 5) Idempotência: devolve a reserva existente
+        existing = NfceNumeroReserva.objects.filter(request_id=request_id).first()
+        if existing is not None:
+            return _result_from_reserva(existing)
+
+        # Terminal novo (finalização de venda não passa por _validar_contexto_reserva)
+        if tentativa or not garantir_sequencia_inicial(terminal_id=terminal_id, serie=serie):
+            break
+
+    _raise_serie_mismatch()
+
 
-    # 6) Concorrência: lock pessimista no terminal, criação da reserva em savepoint,
-    #    avanço do numero_atual somente se a criação FICOU conosco.
+class _ConflitoLote(Exception):
+    """Outro request concorrente gravou um dos request_ids do lote."""
+
+
+def reservar_numeros_nfce_lote(*, user, terminal_id, serie: int, request_ids) -> List[ReservaNumeroResult]:
+    """
+    Reserva vários números NFC-e (um por request_id) para o mesmo terminal/série
+    numa única transação.
+
+    - Validações de terminal, vínculo e A1 feitas uma única vez.
+    - Idempotência por item, igual a reservar_numero_nfce: request_ids já
+      reservados devolvem a reserva existente; request_ids repetidos no lote
+      recebem a mesma reserva.
+    - Os novos itens recebem números contíguos na ordem enviada, com um único
+      avanço da sequência (UPDATE ... RETURNING) e um INSERT multi-linha.
+    - Se um request concorrente gravar um dos request_ids no meio do caminho,
+      a transação é desfeita inteira (sem buracos) e o lote é reprocessado.
+    """
+    filial_id = _validar_contexto_reserva(user=user, terminal_id=terminal_id, serie=serie)
+
+    # Normaliza e remove duplicados preservando a ordem
+    ids = list(dict.fromkeys(str(rid) for rid in request_ids))
+
+    for _ in range(_MAX_TENTATIVAS_LOTE):
+        try:
+            reservas = _reservar_lote_em_transacao(
+                terminal_id=terminal_id,
+                filial_id=filial_id,
+                serie=serie,
+                request_ids=ids,
+            )
+        except _ConflitoLote:
+            continue
+        return [reservas[str(rid)] for rid in request_ids]
+
+    raise APIException({
+        "code": ERR_LOTE_CONFLITO,
+        "message": "Conflito concorrente ao reservar lote de numeração NFC-e. Tente novamente.",
+    })
+
+
+def _reservar_lote_em_transacao(*, terminal_id, filial_id, serie: int, request_ids) -> Dict[str, ReservaNumeroResult]:
     with transaction.atomic():
-        # trava a linha do terminal
-        term_locked = (
-            Terminal.objects.select_for_update(skip_locked=False)
-            .only("id", "numero_atual", "serie", "filial_id")
-            .get(id=terminal_id)
+        existentes = {
+            str(r.request_id): r
+            for r in NfceNumeroReserva.objects.filter(request_id__in=request_ids)
+        }
+        reservas = {rid: _result_from_reserva(r) for rid, r in existentes.items()}
+
+        novos = [rid for rid in request_ids if rid not in existentes]
+        if not novos:
+            return reservas
+
+        ultimo = avancar_sequencia(
+            terminal_id=terminal_id,
+            modelo=MODELO_NFCE,
+            serie=serie,
+            quantidade=len(novos),
         )
+        if ultimo is None:
+            _raise_serie_mismatch()
 
-        # revalida série sob lock
-        if term_locked.serie != serie:
-            from rest_framework.exceptions import ValidationError
-            raise ValidationError({"code": ERR_SERIE_MISMATCH, "message": "Série informada não coincide com a série do terminal."})
+        primeiro = ultimo - len(novos) + 1
+        reserved_at = timezone.now()
+        itens = [(uuid.uuid4(), rid, primeiro + i) for i, rid in enumerate(novos)]
 
-        created_by_us = False
+        inseridos = inserir_reservas_nfce_lote(
+            terminal_id=terminal_id,
+            filial_id=filial_id,
+            serie=serie,
+            itens=itens,
+            reserved_at=reserved_at,
+        )
+        if len(inseridos) != len(itens):
+            # desfaz o avanço da sequência e os inserts parciais
+            raise _ConflitoLote()
 
-        # savepoint interno: se outra thread já criou a mesma request_id,
-        # o IntegrityError não "quebra" a transação externa.
-        try:
-            with transaction.atomic():
-                # cria com numero=0 como placeholder; só setamos o número após a criação
-                reserva = NfceNumeroReserva.objects.create(
-                    terminal_id=terminal_id,
-                    filial_id=filial_id,
-                    serie=serie,
-                    numero=0,
-                    request_id=request_id,
-                )
-                created_by_us = True
-        except IntegrityError:
-            # Outra thread criou primeiro. Buscamos a existente e devolvemos.
-            reserva = NfceNumeroReserva.objects.get(request_id=request_id)
-            created_by_us = False
-
-        if created_by_us:
-            # Só quem criou avança o contador e preenche o número
-            proximo = (term_locked.numero_atual or 0) + 1
-            term_locked.numero_atual = proximo
-            term_locked.save(update_fields=["numero_atual"])
-
-            reserva.numero = proximo
-            # (os demais campos já vieram corretos)
-            reserva.save(update_fields=["numero"])
-
-    # 7) Retorno
-    return ReservaNumeroResult(
-        numero=reserva.numero,
-        serie=reserva.serie,
-        terminal_id=str(reserva.terminal_id),
-        filial_id=str(reserva.filial_id),
-        request_id=str(reserva.request_id),
-        reserved_at=reserva.reserved_at.isoformat(),
-    )
+        for _, rid, numero in itens:
+            reservas[rid] = ReservaNumeroResult(
+                numero=numero,
+                serie=serie,
+                terminal_id=str(terminal_id),
+                filial_id=str(filial_id),
+                request_id=rid,
+                reserved_at=reserved_at.isoformat(),
+            )
+    return reservas
@@ -0,0 +1,255 @@
+# fiscal/services/particionamento_service.py
+
+"""
+Partições mensais de nfce_documento / nfce_auditoria (por created_at).
+
+- garantir_particoes: cria as partições do mês corrente até
+  FISCAL_NFCE_PARTICOES_MESES_A_FRENTE meses à frente (idempotente). Linhas
+  que caíram na partição padrão (mês ainda sem partição) são movidas para a
+  partição nova antes do ATTACH.
+- arquivar_particao: exporta uma partição fechada para CSV comprimido
+  (gzip, com .sha256 ao lado) e faz o DETACH — opcionalmente o DROP — na
+  mesma transação.
+
+NfceDocumentoIndice (índice global) não é tocado pelo arquivamento: request_id,
+chave de acesso e numeração continuam reservados.
+Executar dentro do schema do tenant (schema_context).
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger("pdv.fiscal")
+
+TABELAS_PARTICIONADAS = ("nfce_documento", "nfce_auditoria")
+
+DEFAULT_MESES_A_FRENTE = 3
+
+# Durante a movimentação da partição padrão o trigger do índice global
+# ignora os DELETEs (a linha continua existindo, só muda de partição)
+GUC_MOVENDO_PARTICAO = "pdv.nfce_movendo_particao"
+
+_SUFIXO_MES = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+@dataclass
+class Particao:
+    tabela: str
+    nome: str
+    inicio: date
+    fim: date
+
+
+@dataclass
+class ParticaoArquivada:
+    particao: Particao
+    arquivo: Path
+    linhas: int
+    sha256: str
+    removida: bool
+
+
+# ---------------------------------------------------------------------------
+# Nomes e intervalos
+# ---------------------------------------------------------------------------
+
+def inicio_do_mes(dia: date) -> date:
+    return date(dia.year, dia.month, 1)
+
+
+def somar_meses(inicio: date, meses: int) -> date:
+    total = inicio.year * 12 + (inicio.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nome_particao(tabela: str, inicio: date) -> str:
+    return f"{tabela}_p{inicio:%Y%m}"
+
+
+def nome_particao_padrao(tabela: str) -> str:
+    return f"{tabela}_padrao"
+
+
+def _limite(dia: date) -> datetime:
+    return datetime(dia.year, dia.month, dia.day, tzinfo=dt_timezone.utc)
+
+
+def meses_a_frente() -> int:
+    return int(getattr(settings, "FISCAL_NFCE_PARTICOES_MESES_A_FRENTE", DEFAULT_MESES_A_FRENTE))
+
+
+# ---------------------------------------------------------------------------
+# Consulta
+# ---------------------------------------------------------------------------
+
+def listar_particoes(tabela: str) -> List[Particao]:
+    """
+    Partições mensais anexadas à tabela no schema corrente (sem a padrão),
+    em ordem cronológica.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT filha.relname
+              FROM pg_inherits h
+              JOIN pg_class filha ON filha.oid = h.inhrelid
+             WHERE h.inhparent = to_regclass(%s)
+            """,
+            [tabela],
+        )
+        nomes = [linha[0] for linha in cursor.fetchall()]
+
+    particoes = []
+    for nome in nomes:
+        casamento = _SUFIXO_MES.search(nome)
+        if casamento is None:
+            continue
+        inicio = date(int(casamento.group(1)), int(casamento.group(2)), 1)
+        particoes.append(Particao(tabela=tabela, nome=nome, inicio=inicio, fim=somar_meses(inicio, 1)))
+    return sorted(particoes, key=lambda p: p.inicio)
+
+
+def particoes_fechadas(tabela: str, *, antes_de: date, hoje: Optional[date] = None) -> List[Particao]:
+    """
+    Partições cujo mês terminou antes de `antes_de` (nunca a do mês corrente).
+    """
+    corte = min(inicio_do_mes(antes_de), inicio_do_mes(hoje or timezone.localdate()))
+    return [p for p in listar_particoes(tabela) if p.fim <= corte]
+
+
+# ---------------------------------------------------------------------------
+# Criação
+# ---------------------------------------------------------------------------
+
+def _criar_particao(cursor, tabela: str, inicio: date) -> str:
+    quote = connection.ops.quote_name
+    nome = nome_particao(tabela, inicio)
+    fim = somar_meses(inicio, 1)
+    limites = [_limite(inicio), _limite(fim)]
+
+    cursor.execute(
+        f"CREATE TABLE {quote(nome)} (LIKE {quote(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute("SELECT set_config(%s, 'on', true)", [GUC_MOVENDO_PARTICAO])
+    cursor.execute(
+        f"INSERT INTO {quote(nome)} SELECT * FROM {quote(nome_particao_padrao(tabela))} "
+        f"WHERE created_at >= %s AND created_at < %s",
+        limites,
+    )
+    movidas = cursor.rowcount
+    if movidas:
+        cursor.execute(
+            f"DELETE FROM {quote(nome_particao_padrao(tabela))} WHERE created_at >= %s AND created_at < %s",
+            limites,
+        )
+    cursor.execute("SELECT set_config(%s, 'off', true)", [GUC_MOVENDO_PARTICAO])
+    cursor.execute(
+        f"ALTER TABLE {quote(tabela)} ATTACH PARTITION {quote(nome)} FOR VALUES FROM (%s) TO (%s)",
+        limites,
+    )
+
+    logger.info(
+        "nfce_particao_criada",
+        extra={
+            "event": "nfce_particoes",
+            "tenant_id": getattr(connection, "schema_name", None),
+            "tabela": tabela,
+            "particao": nome,
+            "linhas_movidas_da_padrao": max(movidas, 0),
+        },
+    )
+    return nome
+
+
+def garantir_particoes(*, meses: Optional[int] = None, hoje: Optional[date] = None) -> List[str]:
+    """
+    Cria as partições que faltam do mês corrente até `meses` à frente.
+    Retorna os nomes criados.
+    """
+    meses = meses_a_frente() if meses is None else meses
+    mes_corrente = inicio_do_mes(hoje or timezone.localdate())
+
+    criadas: List[str] = []
+    for tabela in TABELAS_PARTICIONADAS:
+        existentes = {p.inicio for p in listar_particoes(tabela)}
+        for deslocamento in range(meses + 1):
+            inicio = somar_meses(mes_corrente, deslocamento)
+            if inicio in existentes:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                criadas.append(_criar_particao(cursor, tabela, inicio))
+    return criadas
+
+
+# ---------------------------------------------------------------------------
+# Arquivamento
+# ---------------------------------------------------------------------------
+
+def _sha256_arquivo(caminho: Path) -> str:
+    digest = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def arquivar_particao(particao: Particao, *, destino: Path, remover: bool = False) -> ParticaoArquivada:
+    """
+    COPY da partição para <destino>/<schema>/<particao>.csv.gz e DETACH (ou
+    DROP, com remover=True). A partição fica travada para escrita durante a
+    exportação; se algo falhar, nada é desanexado.
+    """
+    quote = connection.ops.quote_name
+    schema = getattr(connection, "schema_name", None) or "public"
+    pasta = Path(destino) / schema
+    pasta.mkdir(parents=True, exist_ok=True)
+    arquivo = pasta / f"{particao.nome}.csv.gz"
+    parcial = arquivo.with_name(arquivo.name + ".parcial")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(particao.nome)} IN SHARE MODE")
+        cursor.execute(f"SELECT count(*) FROM {quote(particao.nome)}")
+        linhas = cursor.fetchone()[0]
+
+        with gzip.open(parcial, "wb") as saida:
+            cursor.copy_expert(
+                f"COPY {quote(particao.nome)} TO STDOUT WITH (FORMAT csv, HEADER true)",
+                saida,
+            )
+        sha256 = _sha256_arquivo(parcial)
+        os.replace(parcial, arquivo)
+        arquivo.with_name(arquivo.name + ".sha256").write_text(f"{sha256}  {arquivo.name}\n")
+
+        cursor.execute(f"ALTER TABLE {quote(particao.tabela)} DETACH PARTITION {quote(particao.nome)}")
+        if remover:
+            cursor.execute(f"DROP TABLE {quote(particao.nome)}")
+
+    logger.info(
+        "nfce_particao_arquivada",
+        extra={
+            "event": "nfce_particoes",
+            "tenant_id": schema,
+            "tabela": particao.tabela,
+            "particao": particao.nome,
+            "linhas": linhas,
+            "arquivo": str(arquivo),
+            "sha256": sha256,
+            "removida": remover,
+        },
+    )
+    return ParticaoArquivada(
+        particao=particao, arquivo=arquivo, linhas=linhas, sha256=sha256, removida=remover
+    )
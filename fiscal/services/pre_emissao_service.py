@@ -1,12 +1,14 @@
 # fiscal/services/pre_emissao_service.py
 import logging
 from dataclasses import dataclass
-from django.db import transaction
+from typing import Tuple
+
 from django.utils import timezone
 
 from fiscal.models import NfceNumeroReserva
 from fiscal.models.pre_emissao_models import NfcePreEmissao
 from filial.models.filial_models import Filial
+from fiscal.services.idempotencia_service import inserir_idempotente
 from fiscal.services.numero_service import _assert_a1_valid
 
 logger = logging.getLogger("pdv.fiscal")
@@ -28,13 +30,33 @@ class PreEmissaoResult:
     created_at: str
 
 
+def _inserir_pre_emissao(reserva, *, request_id, payload, **campos) -> Tuple[NfcePreEmissao, bool]:
+    """
+    INSERT ... ON CONFLICT (request_id) DO NOTHING da pré-emissão da reserva
+    (NfceNumeroReserva ou ReservaNumeroResult). `campos` extras vão na mesma
+    linha (ex.: o claim de emissão). Retorna (pré-emissão, criada).
+    """
+    return inserir_idempotente(
+        NfcePreEmissao(
+            filial_id=reserva.filial_id,
+            terminal_id=reserva.terminal_id,
+            numero=reserva.numero,
+            serie=reserva.serie,
+            request_id=request_id,
+            payload=payload,
+            **campos,
+        )
+    )
+
+
 def criar_pre_emissao(*, user, request_id, payload) -> PreEmissaoResult:
     """
     Regras:
     - Reserva de número deve existir.
     - Nenhuma pré-emissão pode existir com o mesmo request_id.
     - Certificado A1 da filial deve estar válido.
-    - Idempotência: se pré-emissão já existir, retorná-la.
+    - Idempotência: se pré-emissão já existir, retorná-la (um único INSERT
+      com ON CONFLICT; sem leitura prévia).
     """
 
     # 1) Recupera reserva
@@ -44,34 +66,16 @@ def criar_pre_emissao(*, user, request_id, payload) -> PreEmissaoResult:
         from rest_framework.exceptions import NotFound
         raise NotFound({"code": ERR_RESERVA_NAO_ENCONTRADA, "message": "Número não reservado."})
 
-    # 2) Valida A1
-    _assert_a1_valid(Filial)
-    
-    # 3) Idempotência — se já existe pré-emissão, retorna
-    try:
-        pre = NfcePreEmissao.objects.get(request_id=request_id)
-        return PreEmissaoResult(
-            id=str(pre.id),
-            numero=pre.numero,
-            serie=pre.serie,
-            filial_id=str(pre.filial_id),
-            terminal_id=str(pre.terminal_id),
-            request_id=str(pre.request_id),
-            payload=pre.payload,
-            created_at=pre.created_at.isoformat(),
-        )
-    except NfcePreEmissao.DoesNotExist:
-        pass
+    # 2) Valida A1 da filial da reserva (filial_id sem FK: filial + certificado numa consulta)
+    _assert_a1_valid(Filial.objects.select_related("certificado_a1").get(id=reserva.filial_id))
 
-    # 4) Cria nova pré-emissão (transação)
-    with transaction.atomic():
-        pre = NfcePreEmissao.objects.create(
-            filial_id=reserva.filial_id,
-            terminal_id=reserva.terminal_id,
-            numero=reserva.numero,
-            serie=reserva.serie,
-            request_id=request_id,
-            payload=payload,
+    # 3) Pré-emissão idempotente: INSERT ... ON CONFLICT (request_id) DO NOTHING;
+    #    se já existir (inclusive retry concorrente), devolve a existente
+    pre, criada = _inserir_pre_emissao(reserva, request_id=request_id, payload=payload)
+    if not criada:
+        logger.info(
+            "pre_emissao_idempotente_reuso",
+            extra={"event": "nfce_pre_emissao", "request_id": str(request_id), "pre_emissao_id": str(pre.id)},
         )
 
     return PreEmissaoResult(
@@ -0,0 +1,171 @@
+# fiscal/services/sequencia_service.py
+"""
+Numeração fiscal por (terminal, modelo, série) em DocumentoFiscalSequencia.
+
+Cada avanço é um único UPDATE ... RETURNING: o lock de linha dura só o
+tempo da transação do chamador e não há leitura prévia do contador.
+"""
+
+import uuid
+from typing import Optional
+
+from django.db import connection
+from django.utils import timezone
+
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroBloco, NfceNumeroReserva
+
+MODELO_NFE = DocumentoFiscalSequencia.MODELO_NFE
+MODELO_NFCE = DocumentoFiscalSequencia.MODELO_NFCE
+
+_TABELA = DocumentoFiscalSequencia._meta.db_table
+
+
+def avancar_sequencia(*, terminal_id, modelo: str, serie: int, quantidade: int = 1) -> Optional[int]:
+    """
+    Avança a sequência ativa em `quantidade` e retorna o novo numero_atual
+    (último número reservado). Os números reservados são
+    [retorno - quantidade + 1, retorno].
+
+    Retorna None se não existe sequência ativa para (terminal, modelo, série).
+    """
+    sql = f"""
+        UPDATE {_TABELA}
+           SET numero_atual = numero_atual + %s,
+               updated_at = %s
+         WHERE terminal_id = %s
+           AND modelo = %s
+           AND serie = %s
+           AND ativo
+        RETURNING numero_atual
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [quantidade, timezone.now(), terminal_id, modelo, serie])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def criar_sequencia_nfce_inicial(*, terminal_id, serie: int) -> bool:
+    """
+    Cria a sequência NFC-e (modelo 65) do terminal na primeira reserva.
+
+    Só cria se o terminal ainda não tem NENHUMA sequência NFC-e (ativa ou
+    não): série divergente num terminal já configurado e sequência
+    desativada continuam sem sequência. O contador parte do maior número já
+    usado pelo terminal/série (reservas e blocos), como a migração 0007.
+
+    INSERT ... ON CONFLICT DO NOTHING: requests concorrentes criam uma única
+    linha. Retorna True se a linha foi criada por esta chamada.
+    """
+    agora = timezone.now()
+    sql = f"""
+        INSERT INTO {_TABELA}
+            (id, terminal_id, modelo, serie, numero_atual, ativo, created_at, updated_at)
+        SELECT %s, %s, %s, %s,
+               GREATEST(
+                   COALESCE((SELECT MAX(numero) FROM {NfceNumeroReserva._meta.db_table}
+                              WHERE terminal_id = %s AND serie = %s), 0),
+                   COALESCE((SELECT MAX(numero_final) FROM {NfceNumeroBloco._meta.db_table}
+                              WHERE terminal_id = %s AND serie = %s), 0)
+               ),
+               TRUE, %s, %s
+         WHERE NOT EXISTS (
+               SELECT 1 FROM {_TABELA} WHERE terminal_id = %s AND modelo = %s
+         )
+        ON CONFLICT (terminal_id, modelo, serie) DO NOTHING
+        RETURNING id
+    """
+    params = [
+        uuid.uuid4(), terminal_id, MODELO_NFCE, serie,
+        terminal_id, serie,
+        terminal_id, serie,
+        agora, agora,
+        terminal_id, MODELO_NFCE,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone() is not None
+
+
+def reservar_numero_nfe(*, terminal_id, serie: int) -> Optional[int]:
+    """
+    Próximo número de NF-e (modelo 55) do terminal/série.
+    """
+    return avancar_sequencia(terminal_id=terminal_id, modelo=MODELO_NFE, serie=serie)
+
+
+def reservar_numero_nfce_com_registro(
+    *,
+    reserva_id,
+    terminal_id,
+    filial_id,
+    serie: int,
+    request_id,
+    reserved_at,
+):
+    """
+    NFC-e (modelo 65): avança a sequência e grava a NfceNumeroReserva
+    num único statement (CTE UPDATE ... RETURNING + INSERT ... ON CONFLICT).
+
+    A sequência só avança se o request_id ainda não existe. Retorna
+    (numero, reserved_at) ou None quando nada foi inserido — request_id já
+    reservado ou sequência inexistente/inativa. No caso raro de corrida com o
+    mesmo request_id, o chamador deve desfazer a transação para não deixar
+    buraco na numeração.
+    """
+    tabela_reserva = NfceNumeroReserva._meta.db_table
+    sql = f"""
+        WITH seq AS (
+            UPDATE {_TABELA}
+               SET numero_atual = numero_atual + 1,
+                   updated_at = %s
+             WHERE terminal_id = %s
+               AND modelo = %s
+               AND serie = %s
+               AND ativo
+               AND NOT EXISTS (
+                   SELECT 1 FROM {tabela_reserva} WHERE request_id = %s
+               )
+            RETURNING numero_atual
+        )
+        INSERT INTO {tabela_reserva}
+            (id, terminal_id, filial_id, serie, numero, request_id, reserved_at)
+        SELECT %s, %s, %s, %s, seq.numero_atual, %s, %s
+          FROM seq
+        ON CONFLICT (request_id) DO NOTHING
+        RETURNING numero, reserved_at
+    """
+    params = [
+        reserved_at, terminal_id, MODELO_NFCE, serie, request_id,
+        reserva_id, terminal_id, filial_id, serie, request_id, reserved_at,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def inserir_reservas_nfce_lote(*, terminal_id, filial_id, serie: int, itens, reserved_at) -> set:
+    """
+    Grava várias NfceNumeroReserva num único INSERT multi-linha com
+    ON CONFLICT (request_id) DO NOTHING.
+
+    itens: sequência de (reserva_id, request_id, numero).
+    Retorna o conjunto de request_ids (str) efetivamente inseridos.
+    """
+    if not itens:
+        return set()
+
+    valores = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(itens))
+    params = []
+    for reserva_id, request_id, numero in itens:
+        params.extend([reserva_id, terminal_id, filial_id, serie, numero, request_id, reserved_at])
+
+    sql = f"""
+        INSERT INTO {NfceNumeroReserva._meta.db_table}
+            (id, terminal_id, filial_id, serie, numero, request_id, reserved_at)
+        VALUES {valores}
+        ON CONFLICT (request_id) DO NOTHING
+        RETURNING request_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {str(row[0]) for row in cursor.fetchall()}
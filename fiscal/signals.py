@@ -0,0 +1,33 @@
+# fiscal/signals.py
+"""
+Invalidação do cache de contexto fiscal (fiscal.services.contexto_fiscal_service).
+
+Qualquer save/delete de UserFilial, Terminal, Filial, FilialCertificadoA1 ou
+DocumentoFiscalSequencia avança a geração do tenant. A invalidação é feita na
+hora (a própria transação passa a ler do banco) e de novo no commit (descarta
+uma entrada que outro request tenha carregado com os dados antigos enquanto a
+transação estava aberta).
+"""
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from fiscal.services.contexto_fiscal_service import invalidar_contexto_fiscal
+
+
+def _invalidar_contexto_fiscal(sender, **kwargs):
+    schema = getattr(connection, "schema_name", "")
+    invalidar_contexto_fiscal(schema)
+    transaction.on_commit(lambda: invalidar_contexto_fiscal(schema))
+
+
+def conectar_sinais_contexto_fiscal():
+    from filial.models import Filial, FilialCertificadoA1
+    from fiscal.models import DocumentoFiscalSequencia
+    from terminal.models.terminal_models import Terminal
+    from usuario.models.usuario_models import UserFilial
+
+    for model in (UserFilial, Terminal, Filial, FilialCertificadoA1, DocumentoFiscalSequencia):
+        uid = f"fiscal_contexto_{model._meta.label_lower}"
+        post_save.connect(_invalidar_contexto_fiscal, sender=model, dispatch_uid=f"{uid}_save")
+        post_delete.connect(_invalidar_contexto_fiscal, sender=model, dispatch_uid=f"{uid}_delete")
@@ -62,3 +62,6 @@ class FiscalUFConfig:
     cfop_venda_dentro_uf: str
     cfop_venda_fora_uf: Optional[str] = None
     cfop_devolucao: Optional[str] = None
+
+    # Código IBGE da UF (cUF do XML e da chave de acesso)
+    codigo_uf: str = ""
@@ -48,6 +48,7 @@ _NCMS_ES = {
 
 CONFIG = FiscalUFConfig(
     uf="ES",
+    codigo_uf="32",
     modelo_nfce="65",
     layout_versao="4.00",
     cfops=_CFOPS_ES,
@@ -48,6 +48,7 @@ _NCMS_MG = {
 
 CONFIG = FiscalUFConfig(
     uf="MG",
+    codigo_uf="31",
     modelo_nfce="65",
     layout_versao="4.00",
     cfops=_CFOPS_MG,
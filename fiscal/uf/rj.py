@@ -48,6 +48,7 @@ _NCMS_RJ = {
 
 CONFIG = FiscalUFConfig(
     uf="RJ",
+    codigo_uf="33",
     modelo_nfce="65",
     layout_versao="4.00",
     cfops=_CFOPS_RJ,
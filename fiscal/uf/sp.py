@@ -61,6 +61,7 @@ _NCMS_SP = {
 
 CONFIG = FiscalUFConfig(
     uf="SP",
+    codigo_uf="35",
     modelo_nfce="65",
     layout_versao="4.00",
     cfops=_CFOPS_SP,
@@ -7,9 +7,10 @@ from fiscal.views import nfce_contingencia_views
 from fiscal.views.ncm_views import NCMViewSet
 from fiscal.views.nfce_inutilizacao_views import inutilizar_faixa_nfce_view
 from fiscal.views.nfce_pre_emissao_views import pre_emissao
-from fiscal.views.nfce_views import reservar_numero
-from fiscal.views.nfce_emissao_views import emitir_nfce_view
+from fiscal.views.nfce_views import reservar_numero, reservar_numero_lote
+from fiscal.views.nfce_emissao_views import emissao_status_view, emitir_nfce_view
 from fiscal.views.nfce_cancelamento_views import cancelar_nfce_view
+from fiscal.views.sefaz_views import sefaz_circuit_breaker_view, sefaz_status_view
 
 app_name = "fiscal"
 
@@ -26,6 +27,10 @@ urlpatterns = [
     path("nfce/reservar-numero", reservar_numero, name="nfce_reservar_numero"),
     path("nfce/reservar-numero/", reservar_numero),
 
+    # nfce - reservar números em lote (vários request_ids, mesmo terminal/série)
+    path("nfce/reservar-numero-lote", reservar_numero_lote, name="nfce_reservar_numero_lote"),
+    path("nfce/reservar-numero-lote/", reservar_numero_lote),
+
     # nfce - pré-emissão
     path("nfce/pre-emissao", pre_emissao),
     path("nfce/pre-emissao/", pre_emissao),
@@ -34,6 +39,14 @@ urlpatterns = [
     path("nfce/emitir", emitir_nfce_view, name="nfce_emitir"),
     path("nfce/emitir/", emitir_nfce_view),
 
+    # nfce - status da emissão assíncrona (poll / long-poll)
+    path(
+        "nfce/emissao/<uuid:request_id>/status",
+        emissao_status_view,
+        name="nfce_emissao_status",
+    ),
+    path("nfce/emissao/<uuid:request_id>/status/", emissao_status_view),
+
     # tolerância a barras extras
     re_path(r"^nfce/reservar-numero/*$", reservar_numero),
 
@@ -45,6 +58,13 @@ urlpatterns = [
     path("nfce/inutilizar", inutilizar_faixa_nfce_view, name="nfce_inutilizar"),
     path("nfce/inutilizar/", inutilizar_faixa_nfce_view),
 
+    # sefaz - estado/métricas do circuit breaker por UF/ambiente
+    path("sefaz/circuit-breaker", sefaz_circuit_breaker_view, name="sefaz_circuit_breaker"),
+    path("sefaz/circuit-breaker/", sefaz_circuit_breaker_view),
+    # sefaz - saúde por UF/ambiente (sonda de status)
+    path("sefaz/status", sefaz_status_view, name="sefaz_status"),
+    path("sefaz/status/", sefaz_status_view),
+
     path(
         "nfce/regularizar-contingencia/",
         nfce_contingencia_views.nfce_regularizar_contingencia_view,
@@ -4,6 +4,7 @@ import logging
 from dataclasses import asdict
 
 from django.core.exceptions import ValidationError as DjangoValidationError, ObjectDoesNotExist
+from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -20,12 +21,20 @@ from filial.models.filial_models import Filial
 from fiscal.serializers_emissao import (
     EmitirNfceInputSerializer,
     EmitirNfceOutputSerializer,
+    NfceEmissaoJobOutputSerializer,
 )
 
-from fiscal.models import NfcePreEmissao
-from fiscal.sefaz_factory import get_sefaz_client_for_filial
+from fiscal.models import NfceDocumento, NfcePreEmissao
+from fiscal.sefaz_factory import SefazEmitirAdapter, get_sefaz_client_for_filial
 from fiscal.services.emissao_service import emitir_nfce, _build_result_from_document
-from fiscal.models import NfcePreEmissao, NfceDocumento
+from fiscal.services.emissao_fila_service import (
+    STATUS_FINAIS,
+    aguardar_job_emissao,
+    documento_do_job,
+    emissao_assincrona,
+    enfileirar_emissao_nfce,
+    obter_job_emissao,
+)
 
 
 logger = logging.getLogger("pdv.fiscal")
@@ -52,52 +61,46 @@ def _result_to_dict(result):
         # fallback genérico
         return {"raw_result": str(result)}
 
-class SefazEmitirAdapter:
-    """
-    Adaptador que expõe o método emitir_nfce(pre_emissao=...)
-    a partir de um client baseado em SefazClientProtocol (MockSefazClient, etc).
 
-    A service emitir_nfce continua falando com um client que tem emitir_nfce,
-    mas por baixo usamos autorizar_nfce(filial, pre_emissao, numero, serie)
-    da implementação real (MockSefazClient ou futura implementação por UF).
+def _tenant_id_from_request(request):
+    """
+    Extrai o identificador do tenant do request.
     """
+    return getattr(getattr(request, "tenant", None), "schema_name", None)
 
-    
 
+# Teto do long-poll do status (segundos), para não prender o worker HTTP
+MAX_AGUARDAR_SEGUNDOS = 30
 
-    def __init__(self, inner_client, filial: Filial):
-        self.inner_client = inner_client
-        self.filial = filial
 
-    def emitir_nfce(self, *, pre_emissao):
-        """
-        Adapta a chamada do client SEFAZ real (autorizar_nfce) para o formato
-        de dicionário que a service emitir_nfce espera hoje.
-        """
-        resp = self.inner_client.autorizar_nfce(
-            filial=self.filial,
-            pre_emissao=pre_emissao,
-            numero=pre_emissao.numero,
-            serie=pre_emissao.serie,
-        )
+def _job_status_url(job) -> str:
+    return reverse("fiscal:nfce_emissao_status", kwargs={"request_id": job.request_id})
 
-        status = "autorizada" if resp.codigo == 100 else "rejeitada"
 
-        return {
-            "chave_acesso": resp.chave_acesso,
-            "protocolo": resp.protocolo,
-            "status": status,
-            "xml_autorizado": resp.xml_autorizado,
-            "mensagem": resp.mensagem,
-            "raw": resp.raw,
-        }
-
-
-def _tenant_id_from_request(request):
+def _serializar_job(job) -> dict:
     """
-    Extrai o identificador do tenant do request.
+    Monta o payload de status do job; inclui a NFC-e quando concluído.
     """
-    return getattr(getattr(request, "tenant", None), "schema_name", None)
+    nfce = None
+    documento = documento_do_job(job)
+    if documento is not None:
+        nfce = asdict(_build_result_from_document(documento))
+
+    return NfceEmissaoJobOutputSerializer(
+        {
+            "id": job.id,
+            "request_id": job.request_id,
+            "status": job.status,
+            "uf": job.uf,
+            "tentativas": job.tentativas,
+            "codigo_erro": job.codigo_erro,
+            "mensagem_erro": job.mensagem_erro,
+            "created_at": job.created_at,
+            "concluido_em": job.concluido_em,
+            "status_url": _job_status_url(job),
+            "nfce": nfce,
+        }
+    ).data
 
 
 @api_view(["POST"])
@@ -113,6 +116,9 @@ def emitir_nfce_view(request):
     Fluxo:
 
     1. Valida o payload com EmitirNfceInputSerializer (request_id).
+       Em modo assíncrono (FISCAL_NFCE_EMISSAO_MODO="assincrono" ou
+       cabeçalho "Prefer: respond-async"), apenas enfileira a emissão e
+       responde 202 com a URL de status.
     2. Localiza a NfcePreEmissao e a filial correspondente.
     3. Usa a factory get_sefaz_client_for_filial para obter o client SEFAZ.
     4. Adapta o client para o contrato da service (emitir_nfce).
@@ -133,6 +139,25 @@ def emitir_nfce_view(request):
 
         request_id = ser_in.validated_data["request_id"]
 
+        if emissao_assincrona(request.headers.get("Prefer")):
+            job = enfileirar_emissao_nfce(user=user, request_id=request_id)
+            logger.info(
+                "nfce_emitir_enfileirada",
+                extra={
+                    "event": "nfce_emitir",
+                    "tenant_id": tenant_id,
+                    "user_id": getattr(user, "id", None),
+                    "request_id": str(request_id),
+                    "job_id": str(job.id),
+                    "outcome": "accepted",
+                },
+            )
+            return Response(
+                _serializar_job(job),
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": _job_status_url(job)},
+            )
+
         # ------------------------------------------------------------------
         # 2) Localiza pré-emissão e filial
         # ------------------------------------------------------------------
@@ -381,3 +406,36 @@ def emitir_nfce_view(request):
             }
         )
 
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def emissao_status_view(request, request_id):
+    """
+    Status de uma emissão NFC-e assíncrona.
+
+        GET /api/v1/fiscal/nfce/emissao/<request_id>/status?aguardar=<segundos>
+
+    - 200: job finalizado (concluido com "nfce" ou erro com codigo/mensagem).
+    - 202: ainda pendente/processando (cabeçalho Retry-After).
+    - aguardar: long-poll opcional até MAX_AGUARDAR_SEGUNDOS.
+    """
+    try:
+        aguardar = float(request.query_params.get("aguardar", 0))
+    except (TypeError, ValueError):
+        raise DRFValidationError(
+            {"code": "FISCAL_4105", "message": "Parâmetro 'aguardar' inválido."}
+        )
+    aguardar = min(max(aguardar, 0.0), MAX_AGUARDAR_SEGUNDOS)
+
+    job = obter_job_emissao(user=request.user, request_id=request_id)
+    if aguardar:
+        job = aguardar_job_emissao(job, timeout=aguardar)
+
+    if job.status in STATUS_FINAIS:
+        return Response(_serializar_job(job), status=status.HTTP_200_OK)
+
+    return Response(
+        _serializar_job(job),
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Retry-After": "1"},
+    )
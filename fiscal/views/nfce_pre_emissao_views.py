@@ -7,11 +7,11 @@ from django.apps import apps
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from fiscal.services.numero_service import _assert_a1_valid
+from fiscal.services.contexto_fiscal_service import obter_contexto_fiscal
 
 logger = logging.getLogger("pdv.fiscal")
 
@@ -66,7 +66,6 @@ def pre_emissao(request):
     # -------------------------------------------------------------------
     NfceNumeroReserva = apps.get_model("fiscal", "NfceNumeroReserva")
     NfcePreEmissao = apps.get_model("fiscal", "NfcePreEmissao")
-    Filial = apps.get_model("filial", "Filial")
 
     # -------------------------------------------------------------------
     # 3) Busca reserva existente para o request_id
@@ -87,21 +86,17 @@ def pre_emissao(request):
 
     # -------------------------------------------------------------------
     # 4) Permissão: usuário deve estar vinculado à filial da reserva
+    #    (contexto fiscal em cache, o mesmo usado na reserva de número)
     # -------------------------------------------------------------------
-    if not user.userfilial_set.filter(filial_id=filial_id).exists():
-        raise PermissionDenied(
-            {
-                "code": "AUTH_1006",
-                "message": "Usuário sem permissão para a filial do terminal",
-            }
-        )
+    contexto = obter_contexto_fiscal(user=user, terminal_id=reserva.terminal_id)
+    if contexto is None:
+        raise NotFound({"code": "TERMINAL_2001", "message": "Terminal não encontrado"})
+    contexto.assert_vinculado(filial_id)
 
     # -------------------------------------------------------------------
     # 5) Validação do certificado A1 da filial
     # -------------------------------------------------------------------
-    _assert_a1_valid(Filial.objects.get(id=filial_id))
-    
-
+    contexto.assert_a1_valido()
 
     # -------------------------------------------------------------------
     # 6) Idempotência da pré-emissão por request_id
@@ -13,9 +13,11 @@ from rest_framework.throttling import UserRateThrottle
 
 from fiscal.serializers import (
     ReservarNumeroInputSerializer,
+    ReservarNumeroLoteInputSerializer,
+    ReservarNumeroLoteOutputSerializer,
     ReservarNumeroOutputSerializer,
 )
-from fiscal.services.numero_service import reservar_numero_nfce
+from fiscal.services.numero_service import reservar_numero_nfce, reservar_numeros_nfce_lote
 
 logger = logging.getLogger("pdv.fiscal")
 root_logger = logging.getLogger()  # usado para garantir captura pelo caplog quando necessário
@@ -119,3 +121,74 @@ def reservar_numero(request):
     payload = getattr(result, "__dict__", None) or asdict(result)
     ser_out = ReservarNumeroOutputSerializer(payload)
     return Response(ser_out.data, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])  # permissão de vínculo user↔filial é feita na service
+@throttle_classes([UserRateThrottle])
+def reservar_numero_lote(request):
+    """
+    Reserva de numeração NFC-e em lote: vários request_ids para o mesmo
+    terminal e série, numa única transação.
+
+    - Mesma autenticação/throttling de reservar_numero (a chamada conta uma vez)
+    - Idempotência por item (request_id), igual à reserva unitária
+    - Resposta na mesma ordem de request_ids
+    """
+    tenant_id = _tenant_id_from_request(request)
+
+    ser_in = ReservarNumeroLoteInputSerializer(data=request.data)
+    ser_in.is_valid(raise_exception=True)
+    data = ser_in.validated_data
+
+    try:
+        results = reservar_numeros_nfce_lote(
+            user=request.user,
+            terminal_id=data["terminal_id"],
+            serie=data["serie"],
+            request_ids=data["request_ids"],
+        )
+    except DjangoValidationError as exc:
+        raise DRFValidationError({"terminal_id": list(exc.messages)})
+    except APIException:
+        raise
+    except Exception:
+        extra = {
+            "event": "nfce_reserva_numero_lote",
+            "outcome": "exception",
+            "tenant_id": tenant_id,
+            "user_id": getattr(request.user, "id", None),
+            "terminal_id": str(data.get("terminal_id")),
+            "serie": data.get("serie"),
+            "quantidade": len(data.get("request_ids") or []),
+        }
+        logger.exception("nfce_reserva_numero_lote", extra=extra)
+        root_logger.exception("nfce_reserva_numero_lote", extra=extra)
+
+        return Response(
+            {"detail": "Erro interno ao reservar números em lote."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    audit_extra: Dict[str, Any] = {
+        "event": "nfce_reserva_numero_lote",
+        "tenant_id": tenant_id,
+        "user_id": getattr(request.user, "id", None),
+        "filial_id": results[0].filial_id if results else None,
+        "terminal_id": str(data["terminal_id"]),
+        "serie": data["serie"],
+        "quantidade": len(results),
+        "numeros": [r.numero for r in results],
+        "outcome": "success",
+    }
+    logger.info("nfce_reserva_numero_lote", extra=audit_extra)
+    root_logger.info("nfce_reserva_numero_lote", extra=audit_extra)
+
+    ser_out = ReservarNumeroLoteOutputSerializer(
+        {
+            "terminal_id": data["terminal_id"],
+            "serie": data["serie"],
+            "reservas": [asdict(r) for r in results],
+        }
+    )
+    return Response(ser_out.data, status=status.HTTP_200_OK)
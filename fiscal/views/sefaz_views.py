@@ -0,0 +1,40 @@
+# fiscal/views/sefaz_views.py
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from fiscal.sefaz_circuit_breaker import metricas_circuit_breaker
+from fiscal.sefaz_factory import AMBIENTES, SUPPORTED_UFS
+from fiscal.sefaz_status import metricas_status
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sefaz_circuit_breaker_view(request):
+    """
+    Estado e métricas do circuit breaker SEFAZ por (UF, ambiente).
+
+        GET /api/v1/fiscal/sefaz/circuit-breaker
+
+    Para cada par: estado (fechado / aberto / meio_aberto), falhas
+    consecutivas, chamadas bloqueadas e contadores de transição.
+    """
+    pares = [(uf, ambiente) for uf in sorted(SUPPORTED_UFS) for ambiente in AMBIENTES]
+    return Response({"circuit_breakers": metricas_circuit_breaker(pares)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sefaz_status_view(request):
+    """
+    Saúde da SEFAZ por (UF, ambiente), medida pela sonda de status.
+
+        GET /api/v1/fiscal/sefaz/status
+
+    Para cada par: disponibilidade e latências (p50/p95) na janela de
+    amostras, falhas consecutivas e último cStat. Pares sem sonda recente
+    vêm com amostras = 0.
+    """
+    pares = [(uf, ambiente) for uf in sorted(SUPPORTED_UFS) for ambiente in AMBIENTES]
+    return Response({"sefaz": metricas_status(pares)})
@@ -0,0 +1,52 @@
+# tests/benchmarks/conftest.py
+"""
+Benchmarks de desempenho do PDV.
+
+Não rodam na suíte padrão: habilite com PDV_RUN_BENCHMARKS=1.
+    PDV_RUN_BENCHMARKS=1 pytest tests/benchmarks -s
+"""
+import os
+import time
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("PDV_RUN_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="Benchmarks desabilitados (defina PDV_RUN_BENCHMARKS=1).")
+    for item in items:
+        if "tests/benchmarks" in str(item.fspath).replace(os.sep, "/"):
+            item.add_marker(skip)
+
+
+class Cronometro:
+    """
+    Mede o tempo de um bloco e imprime operações por segundo.
+    """
+
+    def __init__(self, nome: str, operacoes: int):
+        self.nome = nome
+        self.operacoes = operacoes
+        self.segundos = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos = time.perf_counter() - self._inicio
+        print(
+            f"[bench] {self.nome}: {self.operacoes} ops em {self.segundos:.3f}s "
+            f"({self.por_segundo:.1f} ops/s)"
+        )
+        return False
+
+    @property
+    def por_segundo(self) -> float:
+        return self.operacoes / self.segundos if self.segundos else float("inf")
+
+
+@pytest.fixture
+def cronometro():
+    return Cronometro
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Requisições por segundo em POST nfce/reservar-numero: User carregado do banco
+a cada requisição (padrão) x User remontado das claims do token
+(AUTH_JWT_CLAIMS_CONFIAVEIS).
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.test import APIClient
+
+from fiscal.models import DocumentoFiscalSequencia
+from fiscal.views.nfce_views import reservar_numero
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+REQUISICOES = 300
+
+
+def _setup(schema):
+    with schema_context(schema):
+        Filial = apps.get_model("filial", "Filial")
+        FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+        filial = Filial.objects.first()
+        FilialCertificadoA1.objects.create(
+            filial=filial,
+            a1_pfx=b"cert",
+            senha_hash="hash",
+            a1_expires_at=timezone.now() + timedelta(days=30),
+        )
+        user = get_user_model().objects.create_user(username="bench-auth", password="123456")
+        user.userfilial_set.create(filial_id=filial.id)
+        term = Terminal.objects.create(filial=filial, identificador="BENCH-AUTH")
+        DocumentoFiscalSequencia.objects.create(
+            terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=1
+        )
+    return term
+
+
+def _cliente(host, term):
+    client = APIClient()
+    client.defaults["HTTP_HOST"] = host
+    resp = client.post(
+        "/api/v1/usuario/auth/login",
+        {"username": "bench-auth", "password": "123456", "terminal_id": str(term.id)},
+        format="json",
+    )
+    assert resp.status_code == 200, resp.content
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+    return client
+
+
+def _rodar(client, term, cronometro, nome):
+    payload = {"terminal_id": str(term.id), "serie": 1}
+    # aquece o cache do contexto fiscal
+    assert client.post(
+        "/api/v1/fiscal/nfce/reservar-numero",
+        {**payload, "request_id": str(uuid.uuid4())},
+        format="json",
+    ).status_code == 200
+
+    with cronometro(nome, REQUISICOES) as c:
+        for _ in range(REQUISICOES):
+            resp = client.post(
+                "/api/v1/fiscal/nfce/reservar-numero",
+                {**payload, "request_id": str(uuid.uuid4())},
+                format="json",
+            )
+            assert resp.status_code == 200, resp.content
+    return c
+
+
+def test_bench_reservar_numero_claims_confiaveis(two_tenants_with_admins, settings, monkeypatch, cronometro):
+    settings.ROOT_URLCONF = "config.urls"
+    # o throttle de usuário (60/min) limitaria o benchmark
+    monkeypatch.setattr(reservar_numero.cls, "throttle_classes", [])
+
+    term = _setup(two_tenants_with_admins["schema1"])
+    client = _cliente(two_tenants_with_admins["payload1"]["domain"], term)
+
+    settings.AUTH_JWT_CLAIMS_CONFIAVEIS = False
+    banco = _rodar(client, term, cronometro, "reservar-numero (User do banco)")
+
+    settings.AUTH_JWT_CLAIMS_CONFIAVEIS = True
+    claims = _rodar(client, term, cronometro, "reservar-numero (claims confiáveis)")
+
+    print(f"[bench] ganho claims confiáveis: {claims.por_segundo / banco.por_segundo:.2f}x")
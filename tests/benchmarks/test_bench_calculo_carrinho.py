@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Carrinhos com 10, 100 e 1000 itens, núcleo em centavos x Decimal:
+- cálculo completo a partir de preço/quantidade/percentual (inclui conversão)
+- recálculo dos totais com os itens já convertidos (caso de cada alteração)
+- rateio do desconto da venda
+"""
+
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+from vendas.utils.calculo_carrinho import ItemCarrinho, calcular_carrinho
+from vendas.utils.centavos import para_centavos
+
+TAMANHOS = (10, 100, 1000)
+REPETICOES = 50
+
+
+def _entradas(n: int):
+    rnd = random.Random(n)
+    return [
+        (
+            Decimal(rnd.randint(1, 10**7)) / Decimal(10**4),
+            Decimal(rnd.randint(1, 5000)) / Decimal(1000),
+            Decimal(rnd.choice([0, 500, 750, 1000])) / Decimal(100),
+        )
+        for _ in range(n)
+    ]
+
+
+def _decimal(entradas):
+    q = Decimal("0.01")
+    total_bruto = Decimal("0.00")
+    total_desconto = Decimal("0.00")
+    for preco, quantidade, percentual in entradas:
+        bruto = (preco * quantidade).quantize(q, rounding=ROUND_HALF_UP)
+        desconto = (bruto * percentual / Decimal("100")).quantize(q, rounding=ROUND_HALF_UP)
+        liquido = (bruto - desconto).quantize(q, rounding=ROUND_HALF_UP)
+        total_bruto += bruto
+        total_desconto += bruto - liquido
+    return total_bruto, total_desconto, (total_bruto - total_desconto).quantize(q, rounding=ROUND_HALF_UP)
+
+
+def _nucleo(entradas, desconto_venda=None):
+    itens = [ItemCarrinho(preco_unitario=p, quantidade=q, percentual=pc) for p, q, pc in entradas]
+    return calcular_carrinho(itens, desconto_venda=desconto_venda)
+
+
+def test_bench_calculo_carrinho_nucleo_x_decimal(cronometro):
+    for n in TAMANHOS:
+        entradas = _entradas(n)
+
+        with cronometro(f"Decimal {n} itens", REPETICOES):
+            for _ in range(REPETICOES):
+                esperado = _decimal(entradas)
+
+        with cronometro(f"núcleo centavos {n} itens", REPETICOES):
+            for _ in range(REPETICOES):
+                totais = _nucleo(entradas)
+
+        d = totais.decimal()
+        assert (d["total_bruto"], d["total_desconto"], d["total_liquido"]) == esperado
+
+        itens = [ItemCarrinho(preco_unitario=p, quantidade=q, percentual=pc) for p, q, pc in entradas]
+        calcular_carrinho(itens)
+        brutos = [Decimal(i.bruto).scaleb(-2) for i in itens]
+        liquidos = [Decimal(i.liquido).scaleb(-2) for i in itens]
+
+        with cronometro(f"recálculo Decimal {n} itens", REPETICOES):
+            for _ in range(REPETICOES):
+                sum(brutos, Decimal("0.00")) - sum((b - l for b, l in zip(brutos, liquidos)), Decimal("0.00"))
+
+        with cronometro(f"recálculo núcleo {n} itens", REPETICOES):
+            for _ in range(REPETICOES):
+                calcular_carrinho(itens)
+
+        desconto_venda = para_centavos(esperado[0] / 10)
+        with cronometro(f"núcleo centavos {n} itens + rateio da venda", REPETICOES):
+            for _ in range(REPETICOES):
+                totais = _nucleo(entradas, desconto_venda)
+        assert totais.desconto == desconto_venda
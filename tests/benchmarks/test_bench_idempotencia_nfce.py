@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Retries concorrentes com o mesmo request_id na pré-emissão NFC-e:
+get() → DoesNotExist → create() (com retry em IntegrityError) x
+INSERT ... ON CONFLICT DO NOTHING RETURNING (inserir_idempotente).
+
+Todas as threads percorrem os mesmos request_ids na mesma ordem, então
+cada request_id é disputado por THREADS chamadas ao mesmo tempo.
+"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfcePreEmissao
+from fiscal.services.idempotencia_service import inserir_idempotente
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+THREADS = 8
+REQUEST_IDS = 100
+
+
+def _campos(filial_id, terminal_id, numero, request_id):
+    return dict(
+        filial_id=filial_id,
+        terminal_id=terminal_id,
+        numero=numero,
+        serie=1,
+        request_id=request_id,
+        payload={"itens": [{"codigo": numero, "quantidade": 1}]},
+    )
+
+
+def _legado(campos, contadores):
+    try:
+        return NfcePreEmissao.objects.get(request_id=campos["request_id"])
+    except NfcePreEmissao.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return NfcePreEmissao.objects.create(**campos)
+    except IntegrityError:
+        contadores["integrity_errors"] += 1
+        return NfcePreEmissao.objects.get(request_id=campos["request_id"])
+
+
+def _idempotente(campos, contadores):
+    pre, _ = inserir_idempotente(NfcePreEmissao(**campos))
+    return pre
+
+
+def _rodar(schema, estrategia, lotes):
+    contadores = {"integrity_errors": 0, "queries": 0}
+    trava = threading.Lock()
+
+    def worker():
+        locais = {"integrity_errors": 0}
+        try:
+            with schema_context(schema), CaptureQueriesContext(connection) as ctx:
+                for campos in lotes:
+                    estrategia(campos, locais)
+            with trava:
+                contadores["integrity_errors"] += locais["integrity_errors"]
+                contadores["queries"] += sum(
+                    1 for q in ctx.captured_queries if not q["sql"].startswith("SET search_path")
+                )
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as ex:
+        for f in [ex.submit(worker) for _ in range(THREADS)]:
+            f.result()
+    return contadores
+
+
+def test_bench_retries_concorrentes_pre_emissao(two_tenants_with_admins, cronometro):
+    schema = two_tenants_with_admins["schema1"]
+    total = THREADS * REQUEST_IDS
+
+    with schema_context(schema):
+        filial = apps.get_model("filial", "Filial").objects.first()
+        terminais = [
+            apps.get_model("terminal", "Terminal").objects.create(filial=filial, identificador=f"BENCH-IDEMP-{n}")
+            for n in range(2)
+        ]
+
+    resultados = {}
+    for nome, estrategia, terminal in (
+        ("get/create", _legado, terminais[0]),
+        ("on_conflict", _idempotente, terminais[1]),
+    ):
+        lotes = [_campos(filial.id, terminal.id, n, uuid.uuid4()) for n in range(1, REQUEST_IDS + 1)]
+        with cronometro(f"pre-emissão {nome}", total):
+            resultados[nome] = _rodar(schema, estrategia, lotes)
+        print(
+            f"[bench] {nome}: {resultados[nome]['queries'] / total:.2f} queries/chamada, "
+            f"{resultados[nome]['integrity_errors']} IntegrityError"
+        )
+
+        with schema_context(schema):
+            assert NfcePreEmissao.objects.filter(terminal_id=terminal.id).count() == REQUEST_IDS
+
+    assert resultados["on_conflict"]["integrity_errors"] == 0
+    assert resultados["on_conflict"]["queries"] < resultados["get/create"]["queries"]
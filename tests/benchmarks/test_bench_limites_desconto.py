@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+1.000 validações de desconto: limites de terminal/filial/perfil em cache x
+lidos do banco a cada validação (cache invalidado antes de cada chamada).
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from usuario.models.usuario_models import UserPerfil
+from vendas.services.desconto_service import DescontoService
+from vendas.services.limites_desconto_cache_service import invalidar_limites_desconto
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+VALIDACOES = 1000
+
+
+def test_bench_validacoes_desconto_com_e_sem_cache(two_tenants_with_admins, cronometro):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        User = apps.get_model("usuario", "User")
+        filial = apps.get_model("filial", "Filial").objects.first()
+        perfil = UserPerfil.objects.create(descricao="BENCH", desconto_maximo_percentual=Decimal("10.00"))
+        operador = User.objects.create(username="bench-limites", perfil=perfil)
+        terminal = apps.get_model("terminal", "Terminal").objects.create(
+            filial=filial, identificador="BENCH-LIMITES", desconto_maximo_percentual=Decimal("5.00")
+        )
+
+        def validar():
+            DescontoService.validar_percentual_desconto(
+                percentual_solicitado=Decimal("3.00"),
+                produto=None,
+                metodo_pagamento=None,
+                terminal=terminal,
+                filial=filial,
+                operador=operador,
+            )
+
+        with CaptureQueriesContext(connection) as frio, cronometro("validações sem cache", VALIDACOES):
+            for _ in range(VALIDACOES):
+                invalidar_limites_desconto()
+                validar()
+        print(f"[bench] sem cache: {len(frio.captured_queries) / VALIDACOES:.2f} queries/validação")
+
+        validar()
+        with CaptureQueriesContext(connection) as quente, cronometro("validações com cache", VALIDACOES):
+            for _ in range(VALIDACOES):
+                validar()
+        print(f"[bench] com cache: {len(quente.captured_queries) / VALIDACOES:.2f} queries/validação")
+        assert len(quente.captured_queries) == 0
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Assinatura XMLDSig da NFC-e: assinaturas/s em um núcleo, comparando a chave
+A1 em cache com a abertura do PFX a cada assinatura.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, pkcs12
+from cryptography.x509.oid import NameOID
+
+from fiscal.nfce_xml import AssinadorNfce, EmitenteNfce, NfceXmlBuilder
+from fiscal.nfce_xml.assinatura import carregar_pfx
+
+SENHA = b"bench"
+ASSINATURAS = 200
+SEM_CACHE = 10
+
+
+def _pfx():
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "BENCH:12345678000199")])
+    agora = datetime.now(dt_timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(nome)
+        .issuer_name(nome)
+        .public_key(chave.public_key())
+        .serial_number(1)
+        .not_valid_before(agora)
+        .not_valid_after(agora + timedelta(days=30))
+        .sign(chave, hashes.SHA256())
+    )
+    return pkcs12.serialize_key_and_certificates(
+        b"a1", chave, certificado, None, BestAvailableEncryption(SENHA)
+    )
+
+
+def _xml(itens):
+    emitente = EmitenteNfce(
+        cnpj="12345678000199", razao_social="Bench", nome_fantasia="", ie="123456789012",
+        crt="1", logradouro="Rua A", numero="1", complemento="", bairro="Centro",
+        codigo_municipio="3550308", municipio="SAO PAULO", uf="SP", cep="01311000",
+    )
+    payload = {
+        "itens": [
+            {"produto_id": str(n), "descricao": f"Produto {n}", "quantidade": 1,
+             "preco_unitario": 9.9, "ncm": "22029900"}
+            for n in range(itens)
+        ]
+    }
+    return NfceXmlBuilder(emitente).build(payload=payload, numero=1, serie=1, semente=uuid.uuid4()).xml
+
+
+@pytest.mark.parametrize("itens", [1, 50])
+def test_bench_assinatura_com_chave_em_cache(cronometro, itens):
+    pfx = _pfx()
+    xml = _xml(itens)
+    assinador = AssinadorNfce(carregar_pfx(pfx, SENHA))
+
+    with cronometro(f"assinatura {itens} itens (chave em cache)", ASSINATURAS) as com_cache:
+        for _ in range(ASSINATURAS):
+            assinador.assinar(xml, canonico=True)
+
+    with cronometro(f"assinatura {itens} itens (C14N genérica)", ASSINATURAS) as generica:
+        for _ in range(ASSINATURAS):
+            assinador.assinar(xml)
+
+    with cronometro(f"assinatura {itens} itens (PFX aberto a cada vez)", SEM_CACHE) as sem_cache:
+        for _ in range(SEM_CACHE):
+            AssinadorNfce(carregar_pfx(pfx, SENHA)).assinar(xml, canonico=True)
+
+    print(
+        f"[bench] assinatura {itens} itens: {com_cache.por_segundo:.0f}/s por núcleo com cache, "
+        f"{generica.por_segundo:.0f}/s com C14N genérica, {sem_cache.por_segundo:.0f}/s sem cache"
+    )
+    assert com_cache.por_segundo > sem_cache.por_segundo * 5
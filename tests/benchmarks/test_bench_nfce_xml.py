@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Montagem do XML NFC-e 4.00: tempo e memória (pico) por quantidade de itens.
+"""
+
+import tracemalloc
+import uuid
+
+import pytest
+
+from fiscal.nfce_xml import EmitenteNfce, NfceXmlBuilder
+
+REPETICOES = 20
+
+
+def _builder():
+    return NfceXmlBuilder(
+        EmitenteNfce(
+            cnpj="12345678000199",
+            razao_social="Mercado Bench LTDA",
+            nome_fantasia="Bench",
+            ie="123456789012",
+            crt="1",
+            logradouro="Rua Paulista",
+            numero="10",
+            complemento="",
+            bairro="Centro",
+            codigo_municipio="3550308",
+            municipio="SAO PAULO",
+            uf="SP",
+            cep="01311000",
+        )
+    )
+
+
+def _payload(itens: int) -> dict:
+    return {
+        "itens": [
+            {
+                "produto_id": str(uuid.uuid4()),
+                "codigo": f"SKU-{n}",
+                "descricao": f"Produto de teste {n}",
+                "quantidade": 1.5,
+                "preco_unitario": 12.99,
+                "desconto": 0.25,
+                "ncm": "22029900",
+                "cfop": "5102",
+                "csosn": "102",
+            }
+            for n in range(itens)
+        ],
+        "pagamentos": [{"codigo_fiscal": "17", "status": "AUT", "valor_autorizado": 99999}],
+    }
+
+
+@pytest.mark.parametrize("itens", [1, 50, 500])
+def test_bench_build_xml(cronometro, itens):
+    builder = _builder()
+    payload = _payload(itens)
+
+    with cronometro(f"nfce_xml build {itens} itens", REPETICOES) as c:
+        for numero in range(1, REPETICOES + 1):
+            builder.build(payload=payload, numero=numero, serie=1, semente=numero)
+
+    tracemalloc.start()
+    resultado = builder.build(payload=payload, numero=1, serie=1, semente=1)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = c.segundos / REPETICOES * 1000
+    print(
+        f"[bench] nfce_xml {itens} itens: {ms:.2f} ms/cupom, "
+        f"{len(resultado.xml) / itens:.0f} bytes/item, pico {pico / 1024:.0f} KiB "
+        f"({pico / itens:.0f} B/item)"
+    )
+    # Meta: cupom de 500 itens em milissegundos
+    if itens == 500:
+        assert ms < 100
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Reservas de número NFC-e por segundo: modo sequencial (lock no Terminal)
+x modo bloco (lease por processo), com threads concorrentes no mesmo terminal.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroReserva
+from fiscal.services import numero_bloco_service
+from fiscal.services.numero_service import reservar_numero_nfce
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+THREADS = 8
+RESERVAS_POR_THREAD = 50
+
+
+def _setup_filial_e_usuario():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="bench-numeracao", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+    return filial, user
+
+
+def _setup_terminal(filial, identificador: str):
+    term = Terminal.objects.create(filial=filial, identificador=identificador)
+    DocumentoFiscalSequencia.objects.create(
+        terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=1
+    )
+    return term
+
+
+def _rodar(schema, user, term) -> None:
+    def worker():
+        try:
+            with schema_context(schema):
+                for _ in range(RESERVAS_POR_THREAD):
+                    reservar_numero_nfce(
+                        user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4()
+                    )
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as ex:
+        for f in [ex.submit(worker) for _ in range(THREADS)]:
+            f.result()
+
+
+def test_bench_reservas_por_segundo_sequencial_x_bloco(two_tenants_with_admins, settings, cronometro):
+    schema = two_tenants_with_admins["schema1"]
+    total = THREADS * RESERVAS_POR_THREAD
+    settings.FISCAL_NFCE_BLOCO_TAMANHO = 100
+
+    with schema_context(schema):
+        filial, user = _setup_filial_e_usuario()
+        term_seq = _setup_terminal(filial, "BENCH-SEQ")
+        term_blc = _setup_terminal(filial, "BENCH-BLOCO")
+
+    settings.FISCAL_NFCE_NUMERACAO_MODO = "sequencial"
+    with cronometro("reservar_numero_nfce sequencial", total) as seq:
+        _rodar(schema, user, term_seq)
+
+    settings.FISCAL_NFCE_NUMERACAO_MODO = "bloco"
+    numero_bloco_service._blocos_do_processo.clear()
+    with cronometro("reservar_numero_nfce bloco", total) as blc:
+        _rodar(schema, user, term_blc)
+
+    print(f"[bench] ganho bloco/sequencial: {blc.por_segundo / seq.por_segundo:.2f}x")
+
+    with schema_context(schema):
+        for term in (term_seq, term_blc):
+            numeros = sorted(
+                NfceNumeroReserva.objects.filter(terminal_id=term.id).values_list("numero", flat=True)
+            )
+            assert numeros == list(range(1, total + 1))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Emissão NFC-e ponta a ponta contra o simulador local da SEFAZ (HttpSefazClient
++ circuit breaker), com threads concorrentes: emissões por segundo e quantas
+caíram em contingência para uma UF rápida, uma lenta e uma instável.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfcePreEmissao
+from fiscal.sefaz_factory import SefazEmitirAdapter, get_sefaz_client_for_filial
+from fiscal.sefaz_simulador import PerfilSefaz, SimuladorSefaz, iniciar_em_thread
+from fiscal.services.emissao_service import emitir_nfce
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+THREADS = 8
+EMISSOES = 160
+
+PERFIS = {
+    "rapida": PerfilSefaz(latencia_mediana_ms=20, latencia_p99_ms=80),
+    "lenta": PerfilSefaz(latencia_mediana_ms=200, latencia_p99_ms=1500, taxa_timeout=0.05, atraso_timeout_ms=5000),
+    "instavel": PerfilSefaz(
+        latencia_mediana_ms=50,
+        latencia_p99_ms=300,
+        taxa_erro=0.1,
+        indisponivel_ciclo_segundos=4,
+        indisponivel_fracao=0.5,
+    ),
+}
+
+
+def _setup():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="bench-simulador", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+    term = Terminal.objects.create(filial=filial, identificador="BENCH-SIMULADOR")
+    return filial, user, term
+
+
+def _pre_emissoes(filial, term, inicio):
+    return [
+        NfcePreEmissao.objects.create(
+            filial_id=filial.id,
+            terminal_id=term.id,
+            numero=inicio + i,
+            serie=1,
+            request_id=uuid.uuid4(),
+            payload={"itens": [], "pagamentos": []},
+        ).request_id
+        for i in range(EMISSOES)
+    ]
+
+
+def _emitir(schema, filial, user, request_ids):
+    resultados = {"autorizadas": 0, "contingencia": 0}
+
+    def worker(fatia):
+        locais = {"autorizadas": 0, "contingencia": 0}
+        try:
+            with schema_context(schema):
+                client = SefazEmitirAdapter(get_sefaz_client_for_filial(filial), filial)
+                for request_id in fatia:
+                    result = emitir_nfce(user=user, request_id=request_id, sefaz_client=client)
+                    locais["contingencia" if result.em_contingencia else "autorizadas"] += 1
+        finally:
+            connection.close()
+        return locais
+
+    with ThreadPoolExecutor(max_workers=THREADS) as ex:
+        for locais in ex.map(worker, [request_ids[i::THREADS] for i in range(THREADS)]):
+            for chave, valor in locais.items():
+                resultados[chave] += valor
+    return resultados
+
+
+def test_bench_emissao_contra_simulador(two_tenants_with_admins, settings, cronometro):
+    simulador = SimuladorSefaz(semente=7)
+    servidor, url = iniciar_em_thread(simulador)
+
+    settings.FISCAL_SEFAZ_CLIENTE = "http"
+    settings.FISCAL_SEFAZ_HTTP_URL = url
+    settings.FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS = 1.0
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = True
+    settings.FISCAL_SEFAZ_CB_LIMITE_FALHAS = 5
+    settings.FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS = 2
+
+    schema = two_tenants_with_admins["schema1"]
+    try:
+        with schema_context(schema):
+            filial, user, term = _setup()
+            uf = filial.uf
+
+        for indice, (nome, perfil) in enumerate(PERFIS.items()):
+            cache.clear()
+            simulador.definir_perfil(uf, perfil)
+            simulador.contadores.clear()
+            with schema_context(schema):
+                request_ids = _pre_emissoes(filial, term, inicio=indice * EMISSOES + 1)
+
+            with cronometro(f"emissão NFC-e via simulador ({nome})", EMISSOES):
+                resultados = _emitir(schema, filial, user, request_ids)
+
+            print(f"[bench] {nome}: {resultados} contadores={dict(simulador.contadores)}")
+            assert resultados["autorizadas"] + resultados["contingencia"] == EMISSOES
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        cache.clear()
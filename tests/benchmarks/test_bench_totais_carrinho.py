@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Montagem de carrinhos com 10, 100 e 1000 itens: totais mantidos por delta
+(adicionar_item) x recálculo completo a cada item (comportamento anterior).
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from vendas.models.venda_models import Venda, VendaStatus
+from vendas.services.vendas import adicionar_item, recalcular_totais_venda, verificar_totais_vendas
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+TAMANHOS = (10, 100, 1000)
+
+
+def _setup():
+    filial = apps.get_model("filial", "Filial").objects.first()
+    operador = apps.get_model("usuario", "User").objects.first()
+    terminal = apps.get_model("terminal", "Terminal").objects.create(
+        filial=filial, identificador="BENCH-CARRINHO"
+    )
+    unidade = apps.get_model("produtos", "UnidadeMedida").objects.create(
+        sigla="UN", descricao="Unidade", ativo=True
+    )
+    produto = apps.get_model("produtos", "Produto").objects.create(
+        descricao="Produto bench carrinho",
+        preco_venda=Decimal("1.99"),
+        grupo=apps.get_model("produtos", "GrupoProduto").objects.create(descricao="Bench", ativo=True),
+        ncm=apps.get_model("fiscal", "NCM").objects.create(codigo="22030000", descricao="Bebidas"),
+        unidade_comercial_id=unidade.id,
+        unidade_tributavel_id=unidade.id,
+        ativo=True,
+    )
+    return filial, terminal, operador, produto
+
+
+def _nova_venda(filial, terminal, operador):
+    return Venda.objects.create(
+        filial=filial, terminal=terminal, operador=operador, status=VendaStatus.ABERTA
+    )
+
+
+def test_bench_totais_carrinho_delta_x_recalculo(two_tenants_with_admins, cronometro):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal, operador, produto = _setup()
+
+        for n in TAMANHOS:
+            venda = _nova_venda(filial, terminal, operador)
+            with CaptureQueriesContext(connection) as ctx, cronometro(f"delta {n} itens", n):
+                for _ in range(n):
+                    adicionar_item(
+                        venda=venda, produto=produto, quantidade=Decimal("1.000"), operador=operador
+                    )
+            print(f"[bench] delta {n} itens: {len(ctx.captured_queries) / n:.1f} queries/item")
+            assert venda.total_bruto == Decimal("1.99") * n
+
+            venda = _nova_venda(filial, terminal, operador)
+            with cronometro(f"recálculo completo {n} itens", n):
+                for _ in range(n):
+                    adicionar_item(
+                        venda=venda, produto=produto, quantidade=Decimal("1.000"), operador=operador
+                    )
+                    recalcular_totais_venda(venda)
+
+        with cronometro("verificar_totais_vendas", 2 * len(TAMANHOS)):
+            assert verificar_totais_vendas() == []
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Auditoria fiscal gravada no fim da transação:
+- Emissão: um único INSERT em nfce_auditoria e um único em nfce_blob
+- Rollback da operação descarta a auditoria; bloco interno que falha descarta só os seus eventos
+- Modo outbox: linha em nfce_auditoria_outbox, drenada uma única vez para nfce_auditoria
+"""
+
+import uuid
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceAuditoria, NfceAuditoriaOutbox, NfcePreEmissao
+from fiscal.services.auditoria_service import (
+    auditoria_transacional,
+    drenar_outbox_auditoria,
+    registrar_auditoria,
+)
+from fiscal.services.emissao_service import emitir_nfce
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class AutorizaClient:
+    def emitir_nfce(self, *, pre_emissao):
+        return {
+            "status": "autorizada",
+            "chave_acesso": "3" * 44,
+            "protocolo": "PROT-1",
+            "xml_autorizado": "<nfeProc>ok</nfeProc>",
+            "mensagem": "Autorizado",
+            "codigo_retorno": "100",
+            "raw": {"codigo_retorno": "100"},
+        }
+
+
+def _emitir(two_tenants_with_admins, admin_user, monkeypatch):
+    from fiscal.services import emissao_service as svc
+
+    monkeypatch.setattr(svc, "_assert_a1_valid", lambda filial: None)
+    user = admin_user(two_tenants_with_admins["admin_username_1"])
+    filial = apps.get_model("filial", "Filial").objects.first()
+    terminal = apps.get_model("terminal", "Terminal").objects.create(filial=filial, identificador="PDV-AUD")
+    request_id = uuid.uuid4()
+    NfcePreEmissao.objects.create(
+        filial_id=filial.id,
+        terminal_id=terminal.id,
+        numero=1,
+        serie=1,
+        request_id=request_id,
+        payload={"itens": []},
+    )
+    with CaptureQueriesContext(connection) as ctx:
+        emitir_nfce(user=user, request_id=request_id, sefaz_client=AutorizaClient())
+    return request_id, filial, terminal, ctx
+
+
+def _inserts(ctx, tabela):
+    # Inclui INSERTs em CTE (ex.: blobs gravados junto com o documento)
+    return [q for q in ctx.captured_queries if f'INSERT INTO "{tabela}" ' in q["sql"]]
+
+
+def test_emissao_grava_auditoria_com_um_insert(two_tenants_with_admins, admin_user, monkeypatch):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id, _, _, ctx = _emitir(two_tenants_with_admins, admin_user, monkeypatch)
+
+        assert len(_inserts(ctx, "nfce_auditoria")) == 1
+        # Auditoria reaproveita os blobs gravados pelo documento
+        assert len(_inserts(ctx, "nfce_blob")) == 1
+
+        auditoria = NfceAuditoria.objects.get(request_id=request_id)
+        assert auditoria.tipo_evento == "EMISSAO_AUTORIZADA"
+        assert auditoria.xml_autorizado == "<nfeProc>ok</nfeProc>"
+
+
+def test_rollback_descarta_auditoria(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id = uuid.uuid4()
+        campos = dict(filial_id=uuid.uuid4(), terminal_id=uuid.uuid4(), request_id=request_id)
+
+        with pytest.raises(RuntimeError):
+            with auditoria_transacional():
+                registrar_auditoria(tipo_evento="DESCARTADO", **campos)
+                raise RuntimeError("falha na operação")
+
+        with auditoria_transacional():
+            registrar_auditoria(tipo_evento="EXTERNO", **campos)
+            with pytest.raises(RuntimeError):
+                with auditoria_transacional():
+                    registrar_auditoria(tipo_evento="INTERNO_FALHOU", **campos)
+                    raise RuntimeError("falha no bloco interno")
+            with auditoria_transacional():
+                registrar_auditoria(tipo_evento="INTERNO_OK", **campos)
+            assert not NfceAuditoria.objects.filter(request_id=request_id).exists()
+
+        eventos = list(
+            NfceAuditoria.objects.filter(request_id=request_id)
+            .order_by("created_at")
+            .values_list("tipo_evento", flat=True)
+        )
+        assert eventos == ["EXTERNO", "INTERNO_OK"]
+
+
+def test_outbox_drenado_uma_vez_e_em_ordem(two_tenants_with_admins, settings):
+    settings.FISCAL_AUDITORIA_MODO = "outbox"
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id = uuid.uuid4()
+        campos = dict(filial_id=uuid.uuid4(), terminal_id=uuid.uuid4(), request_id=request_id)
+
+        with auditoria_transacional():
+            for n in range(5):
+                registrar_auditoria(tipo_evento=f"EVENTO_{n}", raw_sefaz_response={"n": n}, **campos)
+
+        assert NfceAuditoriaOutbox.objects.count() == 5
+        assert not NfceAuditoria.objects.filter(request_id=request_id).exists()
+
+        assert drenar_outbox_auditoria(tamanho_lote=3) == 3
+        assert drenar_outbox_auditoria(tamanho_lote=3) == 2
+        assert drenar_outbox_auditoria(tamanho_lote=3) == 0
+
+        assert NfceAuditoriaOutbox.objects.count() == 0
+        auditorias = list(NfceAuditoria.objects.filter(request_id=request_id).order_by("created_at"))
+        assert [a.tipo_evento for a in auditorias] == [f"EVENTO_{n}" for n in range(5)]
+        assert auditorias[4].raw_sefaz_response == {"n": 4}
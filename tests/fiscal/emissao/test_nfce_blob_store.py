@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+XML autorizado / resposta SEFAZ em NfceBlob:
+- Documento e auditoria apontam para o mesmo blob (deduplicado por hash)
+- Conteúdo comprimido, fora das linhas de nfce_documento
+- Leitura preguiçosa: consultas normais não tocam nfce_blob; 1 consulta no primeiro acesso
+- save(update_fields=[nome lógico]) e bulk_update continuam funcionando
+- Payload da pré-emissão gravado uma vez e referenciado pelo documento
+"""
+
+import uuid
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceAuditoria, NfceBlob, NfceDocumento, NfcePreEmissao
+from fiscal.services.emissao_service import _hash_payload, emitir_nfce
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+XML = "<nfeProc>" + "<det><prod><xProd>ITEM</xProd></prod></det>" * 200 + "</nfeProc>"
+
+
+class AutorizaClient:
+    def emitir_nfce(self, *, pre_emissao):
+        return {
+            "status": "autorizada",
+            "chave_acesso": "3" * 44,
+            "protocolo": "PROT-1",
+            "xml_autorizado": XML,
+            "mensagem": "Autorizado",
+            "codigo_retorno": "100",
+            "raw": {"codigo_retorno": "100", "mensagem": "Autorizado"},
+        }
+
+
+def _emitir(two_tenants_with_admins, admin_user, monkeypatch):
+    from fiscal.services import emissao_service as svc
+
+    monkeypatch.setattr(svc, "_assert_a1_valid", lambda filial: None)
+    user = admin_user(two_tenants_with_admins["admin_username_1"])
+    filial = apps.get_model("filial", "Filial").objects.first()
+    terminal = apps.get_model("terminal", "Terminal").objects.create(filial=filial, identificador="PDV-BLOB")
+    request_id = uuid.uuid4()
+    NfcePreEmissao.objects.create(
+        filial_id=filial.id,
+        terminal_id=terminal.id,
+        numero=1,
+        serie=1,
+        request_id=request_id,
+        payload={"itens": []},
+    )
+    emitir_nfce(user=user, request_id=request_id, sefaz_client=AutorizaClient())
+    return request_id
+
+
+def test_blob_deduplicado_comprimido_e_lazy(two_tenants_with_admins, admin_user, monkeypatch):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id = _emitir(two_tenants_with_admins, admin_user, monkeypatch)
+
+        doc = NfceDocumento.objects.get(request_id=request_id)
+        auditoria = NfceAuditoria.objects.get(request_id=request_id)
+        assert doc.xml_autorizado_blob_id == auditoria.xml_autorizado_blob_id
+        assert NfceBlob.objects.filter(tipo=NfceBlob.TIPO_XML).count() == 1
+
+        blob = NfceBlob.objects.get(pk=doc.xml_autorizado_blob_id)
+        assert blob.tamanho_original == len(XML.encode())
+        assert len(bytes(blob.conteudo)) < blob.tamanho_original / 10
+
+        with CaptureQueriesContext(connection) as ctx:
+            doc = NfceDocumento.objects.get(request_id=request_id)
+        assert all("nfce_blob" not in q["sql"] for q in ctx.captured_queries)
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert doc.xml_autorizado == XML
+            assert doc.xml_autorizado == XML
+        # django-tenants pode emitir SET search_path no primeiro cursor
+        assert len([q for q in ctx.captured_queries if "nfce_blob" in q["sql"]]) == 1
+
+        assert doc.raw_sefaz_response == {"codigo_retorno": "100", "mensagem": "Autorizado"}
+
+
+def test_update_fields_com_nome_logico(two_tenants_with_admins, admin_user, monkeypatch):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id = _emitir(two_tenants_with_admins, admin_user, monkeypatch)
+
+        doc = NfceDocumento.objects.get(request_id=request_id)
+        doc.raw_sefaz_response = {"codigo_retorno": "135", "evento": "cancelamento"}
+        doc.save(update_fields=["raw_sefaz_response", "updated_at"])
+
+        docs = list(NfceDocumento.objects.filter(request_id=request_id))
+        docs[0].xml_autorizado = "<nfeProc>cancelada</nfeProc>"
+        NfceDocumento.objects.bulk_update(docs, ["xml_autorizado"])
+
+        doc = NfceDocumento.objects.get(request_id=request_id)
+        assert doc.raw_sefaz_response["codigo_retorno"] == "135"
+        assert doc.xml_autorizado == "<nfeProc>cancelada</nfeProc>"
+        # XML anterior continua referenciado pela auditoria
+        assert NfceAuditoria.objects.get(request_id=request_id).xml_autorizado == XML
+
+
+def test_payload_compartilhado_entre_pre_emissao_e_documento(two_tenants_with_admins, admin_user, monkeypatch):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        request_id = _emitir(two_tenants_with_admins, admin_user, monkeypatch)
+
+        pre = NfcePreEmissao.objects.get(request_id=request_id)
+        doc = NfceDocumento.objects.get(request_id=request_id)
+        assert doc.payload_enviado_blob_id == pre.payload_blob_id
+        assert NfceBlob.objects.filter(tipo=NfceBlob.TIPO_PAYLOAD).count() == 1
+        assert doc.hash_payload_enviado == pre.hash_payload == _hash_payload({"itens": []})
+        assert doc.payload_enviado == pre.payload == {"itens": []}
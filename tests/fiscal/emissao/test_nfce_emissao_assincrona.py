@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Emissão NFC-e assíncrona (fila nfce_emissao_job):
+- Enfileirar é idempotente por request_id; o worker conclui o job e vincula o NfceDocumento
+- Claim com SKIP LOCKED: job travado por outra conexão é pulado
+- Limite de emissões simultâneas por UF
+- Falha técnica: backoff e, esgotadas as tentativas, erro final
+- API: POST /nfce/emitir com "Prefer: respond-async" -> 202 + status_url; GET status -> 200 com a NFC-e
+"""
+
+import threading
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.test import APIClient
+
+from fiscal.models import NfceDocumento, NfceEmissaoJob, NfcePreEmissao
+from fiscal.services.emissao_fila_service import (
+    enfileirar_emissao_nfce,
+    processar_fila,
+    processar_job,
+    reivindicar_proximo_job,
+)
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+EMITIR_URL = "/api/v1/fiscal/nfce/emitir"
+
+
+class FakeSefazClient:
+    def __init__(self):
+        self.chamadas = 0
+
+    def emitir_nfce(self, *, pre_emissao):
+        self.chamadas += 1
+        return {
+            "status": "autorizada",
+            "chave_acesso": "3" * 44,
+            "protocolo": "135000000000001",
+            "xml_autorizado": "<xml/>",
+            "mensagem": "Autorizado o uso da NF-e",
+            "raw": {"cStat": "100"},
+        }
+
+
+def _setup():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="oper-fila", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+    term = Terminal.objects.create(filial=filial, identificador="TERM-FILA")
+    return user, filial, term
+
+
+def _pre_emissao(filial, term, numero):
+    return NfcePreEmissao.objects.create(
+        filial_id=filial.id,
+        terminal_id=term.id,
+        numero=numero,
+        serie=1,
+        request_id=uuid.uuid4(),
+        payload={"itens": [], "pagamentos": []},
+    )
+
+
+def test_enfileirar_idempotente_e_worker_conclui(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, filial, term = _setup()
+        pre = _pre_emissao(filial, term, 1)
+
+        job = enfileirar_emissao_nfce(user=user, request_id=pre.request_id)
+        again = enfileirar_emissao_nfce(user=user, request_id=pre.request_id)
+        assert again.id == job.id
+        assert job.status == NfceEmissaoJob.STATUS_PENDENTE
+        assert job.uf == filial.uf
+
+        client = FakeSefazClient()
+        assert processar_fila(sefaz_client_factory=lambda _job: client) == 1
+        assert processar_fila(sefaz_client_factory=lambda _job: client) == 0
+
+        job.refresh_from_db()
+        doc = NfceDocumento.objects.get(request_id=pre.request_id)
+        assert job.status == NfceEmissaoJob.STATUS_CONCLUIDO
+        assert job.nfce_documento_id == doc.id
+        assert job.tentativas == 1
+        assert client.chamadas == 1
+
+
+def test_claim_pula_job_travado_e_respeita_limite_por_uf(two_tenants_with_admins, settings):
+    schema = two_tenants_with_admins["schema1"]
+    settings.FISCAL_NFCE_EMISSAO_LIMITE_POR_UF = 2
+
+    with schema_context(schema):
+        user, filial, term = _setup()
+        jobs = [
+            enfileirar_emissao_nfce(user=user, request_id=_pre_emissao(filial, term, n).request_id)
+            for n in (1, 2, 3)
+        ]
+
+    travado, liberar = threading.Event(), threading.Event()
+
+    def segura_primeiro_job():
+        try:
+            with schema_context(schema), transaction.atomic():
+                NfceEmissaoJob.objects.select_for_update().get(pk=jobs[0].pk)
+                travado.set()
+                liberar.wait(timeout=10)
+        finally:
+            connection.close()
+
+    t = threading.Thread(target=segura_primeiro_job)
+    t.start()
+    travado.wait(timeout=10)
+    try:
+        with schema_context(schema):
+            primeiro = reivindicar_proximo_job(worker="w1")
+            segundo = reivindicar_proximo_job(worker="w2")
+            # limite da UF (2) atingido: terceiro claim não devolve job
+            terceiro = reivindicar_proximo_job(worker="w3")
+    finally:
+        liberar.set()
+        t.join()
+
+    assert primeiro.pk == jobs[1].pk
+    assert segundo.pk == jobs[2].pk
+    assert terceiro is None
+
+    with schema_context(schema):
+        processar_job(primeiro, sefaz_client=FakeSefazClient())
+        # uma vaga liberada na UF -> o job antes travado é reivindicado
+        assert reivindicar_proximo_job(worker="w4").pk == jobs[0].pk
+
+
+def test_falha_tecnica_reagenda_e_esgota_tentativas(two_tenants_with_admins, settings, monkeypatch):
+    settings.FISCAL_NFCE_EMISSAO_MAX_TENTATIVAS = 2
+
+    class ClientQuebrado:
+        def emitir_nfce(self, *, pre_emissao):  # pragma: no cover - nunca transmitido
+            raise AssertionError("não deveria transmitir")
+
+    # falha inesperada antes do envio (após o envio vira "em_consulta")
+    def emitir_quebrado(**kwargs):
+        raise RuntimeError("timeout de rede")
+
+    monkeypatch.setattr("fiscal.services.emissao_fila_service.emitir_nfce", emitir_quebrado)
+
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, filial, term = _setup()
+        pre = _pre_emissao(filial, term, 1)
+        job = enfileirar_emissao_nfce(user=user, request_id=pre.request_id)
+
+        processar_job(reivindicar_proximo_job(worker="w1"), sefaz_client=ClientQuebrado())
+        job.refresh_from_db()
+        assert job.status == NfceEmissaoJob.STATUS_PENDENTE
+        assert job.disponivel_em > timezone.now()
+        assert reivindicar_proximo_job(worker="w1") is None
+
+        NfceEmissaoJob.objects.filter(pk=job.pk).update(disponivel_em=timezone.now())
+        processar_job(reivindicar_proximo_job(worker="w1"), sefaz_client=ClientQuebrado())
+        job.refresh_from_db()
+        assert job.status == NfceEmissaoJob.STATUS_ERRO
+        assert job.tentativas == 2
+        assert job.codigo_erro == "FISCAL_5999"
+
+        # PDV pede novamente: job volta para a fila
+        assert enfileirar_emissao_nfce(user=user, request_id=pre.request_id).status == (
+            NfceEmissaoJob.STATUS_PENDENTE
+        )
+
+
+def test_api_emitir_assincrono_e_status(two_tenants_with_admins, settings):
+    settings.ROOT_URLCONF = "config.urls"
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, filial, term = _setup()
+        pre = _pre_emissao(filial, term, 1)
+
+    client = APIClient(HTTP_HOST=two_tenants_with_admins["payload1"]["domain"])
+    client.force_authenticate(user=user)
+
+    resp = client.post(
+        EMITIR_URL,
+        {"request_id": str(pre.request_id)},
+        format="json",
+        HTTP_PREFER="respond-async",
+    )
+    assert resp.status_code == 202, resp.content
+    body = resp.json()
+    assert body["status"] == NfceEmissaoJob.STATUS_PENDENTE
+    assert body["nfce"] is None
+    status_url = body["status_url"]
+    assert resp["Location"] == status_url
+
+    resp = client.get(status_url)
+    assert resp.status_code == 202
+
+    with schema_context(schema):
+        assert processar_fila(sefaz_client_factory=lambda _job: FakeSefazClient()) == 1
+
+    resp = client.get(status_url, {"aguardar": 1})
+    assert resp.status_code == 200, resp.content
+    body = resp.json()
+    assert body["status"] == NfceEmissaoJob.STATUS_CONCLUIDO
+    assert body["nfce"]["chave_acesso"] == "3" * 44
+    assert body["nfce"]["status"] == "autorizada"
+
+    resp = client.get(f"/api/v1/fiscal/nfce/emissao/{uuid.uuid4()}/status")
+    assert resp.status_code == 404
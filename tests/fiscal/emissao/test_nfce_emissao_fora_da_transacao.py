@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+emitir_nfce em três fases (claim → SEFAZ → commit do resultado):
+- Durante a chamada remota (latência injetada) não há transação aberta
+  nem lock na NfcePreEmissao
+- O marcador de emissão em andamento impede transmissão dupla (409),
+  inclusive após o TTL enquanto o processo dono segura o advisory lock
+- Falha inesperada no client não libera o claim: documento "em_consulta",
+  reconciliado pela consulta de situação
+- Claim vencido reassumido consulta a SEFAZ antes de reenviar
+"""
+
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceDocumento, NfcePreEmissao
+from fiscal.sefaz_clients import SefazAutorizacaoResponse
+from fiscal.services.emissao_consulta_service import reconciliar_emissoes
+from fiscal.services.emissao_service import (
+    STATUS_EM_CONSULTA,
+    EmissaoEmAndamento,
+    _chave_lock_emissao,
+    emitir_nfce,
+)
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+LATENCIA_SEFAZ = 0.5
+
+
+def _setup_pre_emissao():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="oper-emissao", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+    term = Terminal.objects.create(filial=filial, identificador="TERM-EMISSAO")
+
+    pre = NfcePreEmissao.objects.create(
+        filial_id=filial.id,
+        terminal_id=term.id,
+        numero=1,
+        serie=1,
+        request_id=uuid.uuid4(),
+        payload={"itens": [], "pagamentos": []},
+    )
+    return user, pre
+
+
+def _em_outra_conexao(schema, fn):
+    """
+    Executa fn() em outra thread (logo, outra conexão) e devolve o resultado.
+    """
+    box = {}
+
+    def run():
+        try:
+            with schema_context(schema):
+                box["value"] = fn()
+        except Exception as exc:  # pragma: no cover - relatado no assert
+            box["error"] = exc
+        finally:
+            connection.close()
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    if "error" in box:
+        raise box["error"]
+    return box.get("value")
+
+
+class SlowSefazClient:
+    """
+    Client com latência injetada que inspeciona o estado do banco
+    enquanto a "SEFAZ" responde.
+    """
+
+    def __init__(self, schema, latencia=LATENCIA_SEFAZ, durante=None):
+        self.schema = schema
+        self.latencia = latencia
+        self.durante = durante
+        self.chamadas = 0
+        self.observado = {}
+
+    def emitir_nfce(self, *, pre_emissao):
+        self.chamadas += 1
+        self.observado["in_atomic_block"] = connection.in_atomic_block
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            pid = cursor.fetchone()[0]
+
+        def inspeciona():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT state FROM pg_stat_activity WHERE pid = %s", [pid])
+                estado = cursor.fetchone()[0]
+            with transaction.atomic():
+                # nowait: falha imediatamente se a linha estiver travada
+                NfcePreEmissao.objects.select_for_update(nowait=True).get(pk=pre_emissao.pk)
+            return estado
+
+        self.observado["estado_conexao"] = _em_outra_conexao(self.schema, inspeciona)
+
+        if self.durante is not None:
+            self.observado["durante"] = self.durante()
+
+        time.sleep(self.latencia)
+        return {
+            "status": "autorizada",
+            "chave_acesso": "3" * 44,
+            "protocolo": "135000000000001",
+            "xml_autorizado": "<xml/>",
+            "mensagem": "Autorizado o uso da NF-e",
+            "raw": {"cStat": "100"},
+        }
+
+
+def test_chamada_sefaz_sem_transacao_nem_lock(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        client = SlowSefazClient(schema)
+
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=client)
+
+        assert result.status == "autorizada"
+        assert client.observado["in_atomic_block"] is False
+        # conexão ociosa (não "idle in transaction") durante a chamada remota
+        assert client.observado["estado_conexao"] == "idle"
+        assert NfceDocumento.objects.filter(request_id=pre.request_id).count() == 1
+
+
+def test_marcador_em_andamento_impede_transmissao_dupla(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+
+        def segunda_tentativa():
+            try:
+                emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=SlowSefazClient(schema))
+            except EmissaoEmAndamento as exc:
+                return exc.status_code
+            return None
+
+        client = SlowSefazClient(
+            schema,
+            durante=lambda: _em_outra_conexao(schema, segunda_tentativa),
+        )
+
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=client)
+
+        assert client.observado["durante"] == 409
+        assert client.chamadas == 1
+
+        # Após concluir, nova chamada é idempotente e não transmite de novo
+        again = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=client)
+        assert again.chave_acesso == result.chave_acesso
+        assert client.chamadas == 1
+
+
+class ClientQuebrado:
+    def __init__(self):
+        self.chamadas = 0
+
+    def emitir_nfce(self, *, pre_emissao):
+        self.chamadas += 1
+        raise RuntimeError("bug no client")
+
+
+class ClientConsulta:
+    """
+    Client que só responde à consulta de situação (consultar_nfce).
+    """
+
+    def __init__(self, codigo):
+        self.codigo = codigo
+
+    def consultar_nfce(self, *, filial, pre_emissao, numero, serie):
+        return SefazAutorizacaoResponse(
+            codigo=self.codigo,
+            mensagem="Autorizado o uso da NF-e" if self.codigo == 100 else "NF-e não consta na base",
+            protocolo="135000000000009" if self.codigo == 100 else "",
+            chave_acesso="3" * 44 if self.codigo == 100 else "",
+            xml_autorizado="<xml/>" if self.codigo == 100 else None,
+            raw={"cStat": str(self.codigo)},
+        )
+
+
+def _vencer_claim(pre):
+    NfcePreEmissao.objects.filter(pk=pre.pk).update(
+        emissao_token=uuid.uuid4(),
+        emissao_iniciada_em=timezone.now() - timedelta(days=1),
+    )
+
+
+def test_falha_inesperada_mantem_claim_em_consulta(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        quebrado = ClientQuebrado()
+
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=quebrado)
+
+        assert result.status == STATUS_EM_CONSULTA
+        assert result.chave_acesso is None
+        pre.refresh_from_db()
+        assert pre.emissao_token is not None
+
+        # Nova chamada devolve o documento em consulta, sem reenviar
+        slow = SlowSefazClient(schema, latencia=0)
+        again = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=slow)
+        assert again.status == STATUS_EM_CONSULTA
+        assert slow.chamadas == 0
+        assert quebrado.chamadas == 1
+
+
+def test_reconciliacao_resolve_documento_em_consulta(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=ClientQuebrado())
+
+        resumo = reconciliar_emissoes(user=user, client_factory=lambda filial: ClientConsulta(100))
+
+        assert resumo.autorizadas == 1
+        doc = NfceDocumento.objects.get(request_id=pre.request_id)
+        assert doc.status == "autorizada"
+        assert doc.protocolo == "135000000000009"
+
+
+def test_reconciliacao_nada_consta_vai_para_contingencia(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=ClientQuebrado())
+
+        resumo = reconciliar_emissoes(user=user, client_factory=lambda filial: ClientConsulta(217))
+
+        assert resumo.contingencia == 1
+        doc = NfceDocumento.objects.get(request_id=pre.request_id)
+        assert doc.status == "contingencia_pendente"
+        assert doc.em_contingencia is True
+
+
+def test_claim_vencido_consulta_antes_de_reenviar(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    class ClientJaAutorizado(SlowSefazClient):
+        def situacao_nfce(self, *, pre_emissao):
+            return {
+                "status": "autorizada",
+                "chave_acesso": "4" * 44,
+                "protocolo": "135000000000002",
+                "xml_autorizado": "<xml/>",
+                "mensagem": "Autorizado o uso da NF-e",
+                "raw": {"cStat": "100"},
+                "codigo_retorno": "100",
+            }
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        _vencer_claim(pre)
+        client = ClientJaAutorizado(schema, latencia=0)
+
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=client)
+
+        assert result.status == "autorizada"
+        assert result.chave_acesso == "4" * 44
+        assert client.chamadas == 0
+
+
+def test_claim_vencido_com_processo_vivo_nao_e_reassumido(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, pre = _setup_pre_emissao()
+        _vencer_claim(pre)
+
+        travado = threading.Event()
+        soltar = threading.Event()
+
+        def dono_vivo():
+            # processo dono: segura o advisory lock além do TTL
+            with schema_context(schema):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", [_chave_lock_emissao(pre.request_id)])
+                    travado.set()
+                    soltar.wait(timeout=10)
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [_chave_lock_emissao(pre.request_id)])
+            connection.close()
+
+        t = threading.Thread(target=dono_vivo)
+        t.start()
+        try:
+            assert travado.wait(timeout=10)
+            client = SlowSefazClient(schema, latencia=0)
+            with pytest.raises(EmissaoEmAndamento):
+                emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=client)
+            assert client.chamadas == 0
+        finally:
+            soltar.set()
+            t.join()
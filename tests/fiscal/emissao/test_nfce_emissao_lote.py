@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Transmissão NFC-e em lote (enviNFe):
+- Agrupamento por (filial, UF, ambiente) em lotes de até 50
+- Backlog de pré-emissões: uma chamada SEFAZ por lote, documentos/auditorias em bulk
+- Erro técnico no lote -> contingência; regularização em lote depois
+- MockSefazClient recusa lote acima do limite
+"""
+
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceAuditoria, NfceDocumento, NfcePreEmissao
+from fiscal.sefaz_clients import MAX_NFCE_POR_LOTE, MockSefazClient, MockSefazClientAlwaysFail
+from fiscal.services.emissao_lote_service import (
+    agrupar_em_lotes,
+    emitir_pre_emissoes_em_lote,
+    regularizar_contingencias_em_lote,
+)
+from terminal.models.terminal_models import Terminal
+
+
+class ContadorLotesClient(MockSefazClient):
+    def __init__(self):
+        super().__init__(ambiente="homolog", uf="SP")
+        self.lotes = []
+
+    def autorizar_lote_nfce(self, *, filial, pre_emissoes):
+        self.lotes.append(len(pre_emissoes))
+        return super().autorizar_lote_nfce(filial=filial, pre_emissoes=pre_emissoes)
+
+
+def test_agrupar_por_filial_uf_ambiente_em_lotes_de_50():
+    sp = SimpleNamespace(id="f-sp", uf="SP", ambiente="homolog")
+    mg = SimpleNamespace(id="f-mg", uf="mg", ambiente="producao")
+    itens = [SimpleNamespace(filial_id="f-sp") for _ in range(120)]
+    itens += [SimpleNamespace(filial_id="f-mg") for _ in range(3)]
+    itens.append(SimpleNamespace(filial_id="desconhecida"))
+
+    lotes = list(agrupar_em_lotes(itens, {"f-sp": sp, "f-mg": mg}, tamanho_lote=500))
+
+    assert [(f.id, len(membros)) for f, membros in lotes] == [
+        ("f-sp", 50),
+        ("f-sp", 50),
+        ("f-sp", 20),
+        ("f-mg", 3),
+    ]
+
+
+def test_mock_recusa_lote_acima_do_limite():
+    pres = [SimpleNamespace(numero=n, serie=1) for n in range(MAX_NFCE_POR_LOTE + 1)]
+    with pytest.raises(ValueError):
+        MockSefazClient().autorizar_lote_nfce(filial=None, pre_emissoes=pres)
+
+
+def _setup_backlog(quantidade):
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    term = Terminal.objects.create(filial=filial, identificador="TERM-LOTE-SEFAZ")
+    NfcePreEmissao.objects.bulk_create(
+        [
+            NfcePreEmissao(
+                filial_id=filial.id,
+                terminal_id=term.id,
+                numero=n,
+                serie=1,
+                request_id=uuid.uuid4(),
+                payload={"itens": [], "pagamentos": []},
+            )
+            for n in range(1, quantidade + 1)
+        ]
+    )
+    return filial
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backlog_emitido_em_lotes_com_bulk_insert(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _setup_backlog(120)
+        client = ContadorLotesClient()
+
+        with CaptureQueriesContext(connection) as ctx:
+            resumo = emitir_pre_emissoes_em_lote(client_factory=lambda filial: client)
+
+        assert client.lotes == [50, 50, 20]
+        assert resumo.lotes == 3
+        assert resumo.autorizadas == resumo.documentos == 120
+        assert NfceDocumento.objects.filter(status="autorizada").count() == 120
+        assert NfceAuditoria.objects.filter(tipo_evento="EMISSAO_AUTORIZADA").count() == 120
+
+        # Custo por lote constante (claim + releitura + checagem + 2 INSERTs),
+        # não por documento.
+        assert len(ctx.captured_queries) <= 3 + 3 * 8
+
+        # Nada pendente: segunda execução não transmite
+        again = emitir_pre_emissoes_em_lote(client_factory=lambda filial: client)
+        assert again.lotes == 0
+        assert client.lotes == [50, 50, 20]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_erro_tecnico_gera_contingencia_e_regularizacao_em_lote(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _setup_backlog(7)
+
+        resumo = emitir_pre_emissoes_em_lote(
+            client_factory=lambda filial: MockSefazClientAlwaysFail()
+        )
+        assert resumo.lotes_com_erro_tecnico == 1
+        assert resumo.contingencia == 7
+        assert NfceDocumento.objects.filter(status="contingencia_pendente", em_contingencia=True).count() == 7
+
+        # Regularização com SEFAZ ainda fora: nada muda
+        falha = regularizar_contingencias_em_lote(
+            client_factory=lambda filial: MockSefazClientAlwaysFail()
+        )
+        assert falha.lotes_com_erro_tecnico == 1
+        assert NfceDocumento.objects.filter(status="contingencia_pendente").count() == 7
+
+        client = ContadorLotesClient()
+        ok = regularizar_contingencias_em_lote(client_factory=lambda filial: client, tamanho_lote=5)
+
+        assert client.lotes == [5, 2]
+        assert ok.autorizadas == 7
+        assert NfceDocumento.objects.filter(status="autorizada", em_contingencia=False).count() == 7
+        assert NfceAuditoria.objects.filter(tipo_evento="EMISSAO_CONTINGENCIA_REGULARIZADA").count() == 7
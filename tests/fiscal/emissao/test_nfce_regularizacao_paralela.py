@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Regularização de contingência em massa (worker com checkpoint):
+- Backlog inteiro regularizado em lotes; checkpoint zerado ao fim da passada
+- Queda no meio: checkpoint mantém a última página concluída e a execução seguinte retoma
+- Concorrência por UF limitada (limite_por_uf)
+- Erro técnico mantém pendente e aparece no backlog restante
+"""
+
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceDocumento, NfcePreEmissao, NfceRegularizacaoCursor
+from fiscal.sefaz_clients import MockSefazClient, MockSefazClientAlwaysFail
+from fiscal.services.contingencia_regularizacao_service import (
+    backlog_contingencia_por_uf,
+    regularizar_contingencias_paralelo,
+)
+from fiscal.services.emissao_lote_service import emitir_pre_emissoes_em_lote
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class ContadorClient(MockSefazClient):
+    def __init__(self, *, falhar_apos=None, espera=0.0):
+        super().__init__(ambiente="homolog", uf="SP")
+        self.falhar_apos = falhar_apos
+        self.espera = espera
+        self.lotes = 0
+        self.simultaneos = 0
+        self.max_simultaneos = 0
+        self._lock = threading.Lock()
+
+    def autorizar_lote_nfce(self, *, filial, pre_emissoes):
+        with self._lock:
+            self.lotes += 1
+            if self.falhar_apos is not None and self.lotes > self.falhar_apos:
+                raise RuntimeError("worker caiu")
+            self.simultaneos += 1
+            self.max_simultaneos = max(self.max_simultaneos, self.simultaneos)
+        try:
+            time.sleep(self.espera)
+            return super().autorizar_lote_nfce(filial=filial, pre_emissoes=pre_emissoes)
+        finally:
+            with self._lock:
+                self.simultaneos -= 1
+
+
+def _backlog_em_contingencia(quantidade):
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    term = Terminal.objects.create(filial=filial, identificador="TERM-REGULARIZA")
+    NfcePreEmissao.objects.bulk_create(
+        [
+            NfcePreEmissao(
+                filial_id=filial.id,
+                terminal_id=term.id,
+                numero=n,
+                serie=1,
+                request_id=uuid.uuid4(),
+                payload={"itens": [], "pagamentos": []},
+            )
+            for n in range(1, quantidade + 1)
+        ]
+    )
+    emitir_pre_emissoes_em_lote(client_factory=lambda filial: MockSefazClientAlwaysFail())
+    assert backlog_contingencia_por_uf() == {"SP": quantidade}
+    return filial
+
+
+def test_regulariza_backlog_e_zera_checkpoint(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _backlog_em_contingencia(23)
+        client = ContadorClient()
+
+        relatorio = regularizar_contingencias_paralelo(
+            tamanho_lote=5,
+            tamanho_pagina=10,
+            client_factory=lambda filial: client,
+        )
+
+        assert relatorio.autorizadas == relatorio.documentos == 23
+        assert relatorio.lotes == client.lotes == 5  # páginas 10/10/3 -> lotes 2 + 2 + 1
+        assert relatorio.paginas == 3
+        assert relatorio.passada_concluida is True
+        assert relatorio.backlog_restante == {}
+        assert relatorio.documentos_por_segundo > 0
+        assert NfceDocumento.objects.filter(status="autorizada", em_contingencia=False).count() == 23
+
+        cursor = NfceRegularizacaoCursor.objects.get()
+        assert cursor.ultimo_documento_id is None
+        assert cursor.ultima_passada_concluida_em is not None
+
+
+def test_queda_no_meio_retoma_do_checkpoint(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _backlog_em_contingencia(25)
+        ordem = list(
+            NfceDocumento.objects.filter(status="contingencia_pendente")
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+        )
+
+        # Primeira página (2 lotes) conclui; a segunda cai
+        with pytest.raises(RuntimeError):
+            regularizar_contingencias_paralelo(
+                tamanho_lote=5,
+                tamanho_pagina=10,
+                limites={"SP": 1},
+                client_factory=lambda filial, c=ContadorClient(falhar_apos=2): c,
+            )
+
+        cursor = NfceRegularizacaoCursor.objects.get()
+        assert cursor.ultimo_documento_id == ordem[9]
+        assert cursor.autorizadas == 10
+        assert backlog_contingencia_por_uf() == {"SP": 15}
+
+        client = ContadorClient()
+        relatorio = regularizar_contingencias_paralelo(
+            tamanho_lote=5,
+            tamanho_pagina=10,
+            client_factory=lambda filial: client,
+        )
+
+        # Só o que faltava foi reenviado
+        assert relatorio.documentos == 15
+        assert client.lotes == 3
+        assert relatorio.passada_concluida is True
+        assert NfceDocumento.objects.filter(status="autorizada").count() == 25
+
+
+def test_concorrencia_limitada_por_uf(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _backlog_em_contingencia(30)
+        client = ContadorClient(espera=0.05)
+
+        relatorio = regularizar_contingencias_paralelo(
+            tamanho_lote=5,
+            tamanho_pagina=30,
+            limites={"SP": 2},
+            client_factory=lambda filial: client,
+        )
+
+        assert relatorio.autorizadas == 30
+        assert client.lotes == 6
+        assert 1 <= client.max_simultaneos <= 2
+
+
+def test_erro_tecnico_mantem_pendente_no_backlog(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        _backlog_em_contingencia(7)
+
+        relatorio = regularizar_contingencias_paralelo(
+            client_factory=lambda filial: MockSefazClientAlwaysFail(),
+        )
+
+        assert relatorio.lotes_com_erro_tecnico == 1
+        assert relatorio.contingencia == 7
+        assert relatorio.documentos == 0
+        assert relatorio.passada_concluida is True
+        assert relatorio.backlog_restante == {"SP": 7}
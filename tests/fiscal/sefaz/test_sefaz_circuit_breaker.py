@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Circuit breaker SEFAZ por (UF, ambiente):
+- N falhas técnicas consecutivas abrem o circuito; chamadas seguintes falham na hora, sem rede
+- Emissão com circuito aberto vai direto para contingencia_pendente
+- Após a janela, uma única sonda (meio_aberto): sucesso fecha, falha reabre
+- Factory preserva isinstance(MockSefazClient) e expõe métricas no endpoint
+- System check fiscal.E001: breaker ativo exige cache compartilhado
+"""
+
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.test import APIClient
+
+from fiscal.models import NfceDocumento, NfcePreEmissao
+from fiscal.checks import checar_cache_circuit_breaker
+from fiscal.sefaz_circuit_breaker import (
+    ESTADO_ABERTO,
+    ESTADO_FECHADO,
+    ESTADO_MEIO_ABERTO,
+    CircuitBreakerSefaz,
+    SefazCircuitoAberto,
+    com_circuit_breaker,
+)
+from fiscal.sefaz_clients import MockSefazClient, SefazTechnicalError
+from fiscal.sefaz_factory import SefazEmitirAdapter, get_sefaz_client_for_filial
+from fiscal.services.emissao_service import emitir_nfce
+from terminal.models.terminal_models import Terminal
+
+
+class InstavelClient(MockSefazClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.falhar = True
+        self.chamadas = 0
+
+    def autorizar_nfce(self, **kwargs):
+        self.chamadas += 1
+        if self.falhar:
+            raise SefazTechnicalError("timeout", codigo="TIMEOUT")
+        return super().autorizar_nfce(**kwargs)
+
+
+def _pre():
+    return SimpleNamespace(numero=1, serie=1, request_id=uuid.uuid4())
+
+
+def _autorizar(client):
+    return client.autorizar_nfce(filial=None, pre_emissao=_pre(), numero=1, serie=1)
+
+
+@pytest.fixture(autouse=True)
+def breaker_limpo(settings):
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = True
+    settings.FISCAL_SEFAZ_CB_LIMITE_FALHAS = 3
+    settings.FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS = 30
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_abre_apos_falhas_consecutivas_e_bloqueia_sem_chamar_sefaz():
+    client = com_circuit_breaker(InstavelClient(uf="SP"), "SP", "homolog")
+
+    for _ in range(3):
+        with pytest.raises(SefazTechnicalError):
+            _autorizar(client)
+
+    assert client.circuit_breaker.estado() == ESTADO_ABERTO
+    assert client.chamadas == 3
+
+    with pytest.raises(SefazCircuitoAberto):
+        _autorizar(client)
+    assert client.chamadas == 3
+
+    # Outra UF não é afetada
+    assert CircuitBreakerSefaz("MG", "homolog").estado() == ESTADO_FECHADO
+
+    metricas = client.circuit_breaker.metricas()
+    assert metricas["chamadas_bloqueadas"] == 1
+    assert metricas["transicoes"]["fechado->aberto"] == 1
+
+
+def test_sucesso_zera_falhas_consecutivas():
+    client = com_circuit_breaker(InstavelClient(uf="SP"), "SP", "homolog")
+
+    for _ in range(2):
+        with pytest.raises(SefazTechnicalError):
+            _autorizar(client)
+    client.falhar = False
+    _autorizar(client)
+    client.falhar = True
+    for _ in range(2):
+        with pytest.raises(SefazTechnicalError):
+            _autorizar(client)
+
+    assert client.circuit_breaker.estado() == ESTADO_FECHADO
+    assert client.circuit_breaker.falhas_consecutivas() == 2
+
+
+def test_sonda_meio_aberto_fecha_ou_reabre(settings):
+    settings.FISCAL_SEFAZ_CB_ABERTO_SEGUNDOS = 0.05
+    client = com_circuit_breaker(InstavelClient(uf="SP"), "SP", "homolog")
+    breaker = client.circuit_breaker
+
+    for _ in range(3):
+        with pytest.raises(SefazTechnicalError):
+            _autorizar(client)
+    time.sleep(0.1)
+    assert breaker.estado() == ESTADO_MEIO_ABERTO
+
+    # Sonda falha: reabre sem precisar de novas N falhas
+    with pytest.raises(SefazTechnicalError):
+        _autorizar(client)
+    assert client.chamadas == 4
+    assert breaker.estado() == ESTADO_ABERTO
+
+    time.sleep(0.1)
+    # Uma única sonda por vez
+    assert breaker.permitir_chamada() is True
+    assert breaker.permitir_chamada() is False
+    breaker.cache.delete(breaker._k_sonda)
+
+    client.falhar = False
+    resp = _autorizar(client)
+    assert resp.codigo == 100
+    assert breaker.estado() == ESTADO_FECHADO
+
+    transicoes = breaker.metricas()["transicoes"]
+    assert transicoes["meio_aberto->aberto"] == 1
+    assert transicoes["meio_aberto->fechado"] == 1
+
+
+def test_factory_preserva_tipo_e_respeita_configuracao(settings):
+    filial = SimpleNamespace(uf="sp", ambiente="homolog")
+
+    client = get_sefaz_client_for_filial(filial)
+    assert isinstance(client, MockSefazClient)
+    assert client.circuit_breaker.uf == "SP"
+
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = False
+    client = get_sefaz_client_for_filial(filial)
+    assert type(client) is MockSefazClient
+
+
+def test_check_exige_cache_compartilhado(settings):
+    settings.DEBUG = False
+    settings.CACHES = {
+        **settings.CACHES,
+        "compartilhado": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "pdv_cache"},
+    }
+
+    settings.FISCAL_SEFAZ_CB_CACHE = "default"
+    erros = checar_cache_circuit_breaker()
+    assert [e.id for e in erros] == ["fiscal.E001"]
+    assert erros[0].is_serious()
+
+    settings.FISCAL_SEFAZ_CB_CACHE = "compartilhado"
+    assert checar_cache_circuit_breaker() == []
+
+    settings.FISCAL_SEFAZ_CB_CACHE = "default"
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = False
+    assert checar_cache_circuit_breaker() == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_emissao_com_circuito_aberto_vai_direto_para_contingencia(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        Filial = apps.get_model("filial", "Filial")
+        FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+        filial = Filial.objects.first()
+        FilialCertificadoA1.objects.create(
+            filial=filial,
+            a1_pfx=b"cert",
+            senha_hash="hash",
+            a1_expires_at=timezone.now() + timedelta(days=30),
+        )
+        user = get_user_model().objects.create_user(username="oper-cb", password="123456")
+        user.userfilial_set.create(filial_id=filial.id)
+        term = Terminal.objects.create(filial=filial, identificador="TERM-CB")
+
+        inner = com_circuit_breaker(InstavelClient(uf=filial.uf), filial.uf, "homolog")
+        for _ in range(3):
+            with pytest.raises(SefazTechnicalError):
+                _autorizar(inner)
+        assert inner.chamadas == 3
+
+        pre = NfcePreEmissao.objects.create(
+            filial_id=filial.id,
+            terminal_id=term.id,
+            numero=1,
+            serie=1,
+            request_id=uuid.uuid4(),
+            payload={"itens": [], "pagamentos": []},
+        )
+
+        result = emitir_nfce(
+            user=user,
+            request_id=pre.request_id,
+            sefaz_client=SefazEmitirAdapter(inner, filial),
+        )
+
+        assert result.em_contingencia is True
+        assert inner.chamadas == 3
+        doc = NfceDocumento.objects.get(request_id=pre.request_id)
+        assert doc.status == "contingencia_pendente"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_endpoint_metricas_circuit_breaker(two_tenants_with_admins, settings):
+    settings.ROOT_URLCONF = "config.urls"
+    payload1 = two_tenants_with_admins["payload1"]
+
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user = get_user_model().objects.create_user(username="suporte-cb", password="123456")
+        breaker = CircuitBreakerSefaz("SP", "producao")
+        for _ in range(3):
+            breaker.registrar_falha()
+
+    api = APIClient(HTTP_HOST=payload1["domain"])
+    api.force_authenticate(user=user)
+    resp = api.get("/api/v1/fiscal/sefaz/circuit-breaker")
+
+    assert resp.status_code == 200
+    por_par = {(m["uf"], m["ambiente"]): m for m in resp.json()["circuit_breakers"]}
+    assert por_par[("SP", "producao")]["estado"] == ESTADO_ABERTO
+    assert por_par[("SP", "homolog")]["estado"] == ESTADO_FECHADO
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Simulador local da SEFAZ + HttpSefazClient:
+- Autorização, lote, cancelamento e inutilização sobre HTTP
+- Rejeição por cStat é resposta válida; timeout / 503 / flapping viram SefazTechnicalError
+- Perfil trocado em execução (PUT /_perfis/<UF>) vale para a UF
+- Factory com FISCAL_SEFAZ_CLIENTE="http" + circuit breaker abre com a UF fora do ar
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import requests
+from django.core.cache import cache
+
+from fiscal.sefaz_circuit_breaker import ESTADO_ABERTO, SefazCircuitoAberto
+from fiscal.sefaz_clients import HttpSefazClient, SefazTechnicalError
+from fiscal.sefaz_factory import autorizacao_para_dict, get_sefaz_client_for_filial
+from fiscal.sefaz_simulador import PerfilSefaz, SimuladorSefaz, carregar_perfis, iniciar_em_thread
+
+RAPIDO = PerfilSefaz(latencia_mediana_ms=1, latencia_p99_ms=2)
+
+
+@pytest.fixture
+def simulador():
+    sim = SimuladorSefaz({"*": RAPIDO}, semente=42)
+    servidor, url = iniciar_em_thread(sim)
+    sim.url = url
+    yield sim
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _pre(numero=1):
+    return SimpleNamespace(numero=numero, serie=1, request_id=uuid.uuid4(), filial=None)
+
+
+def _autorizar(client, numero=1):
+    return client.autorizar_nfce(filial=None, pre_emissao=_pre(numero), numero=numero, serie=1)
+
+
+def test_autorizacao_lote_cancelamento_e_inutilizacao(simulador):
+    client = HttpSefazClient(uf="SP", base_url=simulador.url, timeout=2)
+
+    resp = _autorizar(client, numero=7)
+    assert resp.codigo == 100
+    assert len(resp.chave_acesso) == 44
+    assert "numero='7'" in resp.xml_autorizado
+    assert autorizacao_para_dict(resp)["status"] == "autorizada"
+
+    lote = client.autorizar_lote_nfce(filial=None, pre_emissoes=[_pre(n) for n in range(1, 4)])
+    assert lote.codigo == 104
+    assert [r.codigo for r in lote.resultados] == [100, 100, 100]
+
+    canc = client.cancelar_nfce(filial=None, documento=resp, motivo="Cancelamento de teste")
+    assert canc.codigo == 135
+
+    inut = client.inutilizar_faixa(filial=None, serie=1, numero_inicial=10, numero_final=12, motivo="Quebra")
+    assert inut.codigo == 102
+    assert inut.protocolo == "INUT-SP-1-10-12"
+
+    assert simulador.contadores == {"autorizacao": 1, "lote": 1, "cancelamento": 1, "inutilizacao": 1}
+
+
+def test_rejeicao_e_resposta_valida(simulador):
+    simulador.definir_perfil("MG", PerfilSefaz(latencia_mediana_ms=1, rejeicoes={"539": 1.0}))
+
+    resp = _autorizar(HttpSefazClient(uf="MG", base_url=simulador.url, timeout=2))
+
+    assert resp.codigo == 539
+    assert autorizacao_para_dict(resp)["status"] == "rejeitada"
+
+
+@pytest.mark.parametrize(
+    "perfil, codigo",
+    [
+        (PerfilSefaz(latencia_mediana_ms=1, taxa_timeout=1.0, atraso_timeout_ms=1000), "TIMEOUT"),
+        (PerfilSefaz(latencia_mediana_ms=1, taxa_erro=1.0), "HTTP_503"),
+        (PerfilSefaz(latencia_mediana_ms=1, indisponivel_ciclo_segundos=3600, indisponivel_fracao=1.0), "HTTP_503"),
+        (PerfilSefaz(latencia_mediana_ms=1, max_lote=0), "HTTP_501"),
+    ],
+)
+def test_falhas_viram_erro_tecnico(simulador, perfil, codigo):
+    simulador.definir_perfil("RJ", perfil)
+    client = HttpSefazClient(uf="RJ", base_url=simulador.url, timeout=0.3)
+
+    with pytest.raises(SefazTechnicalError) as exc:
+        if perfil.max_lote == 0:
+            client.autorizar_lote_nfce(filial=None, pre_emissoes=[_pre()])
+        else:
+            _autorizar(client)
+    assert exc.value.codigo == codigo
+
+
+def test_latencia_segue_o_perfil(simulador):
+    simulador.definir_perfil("SP", PerfilSefaz(latencia_mediana_ms=50, latencia_p99_ms=60))
+    client = HttpSefazClient(uf="SP", base_url=simulador.url, timeout=2)
+
+    latencias = sorted(_autorizar(client).raw["latencia_ms"] for _ in range(9))
+
+    assert 40 <= latencias[4] <= 62
+
+
+def test_perfil_trocado_via_http(simulador):
+    resp = requests.put(f"{simulador.url}/_perfis/es", json={"rejeicoes": {"778": 1.0}}, timeout=2)
+    assert resp.status_code == 200
+
+    assert _autorizar(HttpSefazClient(uf="ES", base_url=simulador.url, timeout=2)).codigo == 778
+    assert _autorizar(HttpSefazClient(uf="SP", base_url=simulador.url, timeout=2)).codigo == 100
+
+    resp = requests.put(f"{simulador.url}/_perfis/ES", json={"inexistente": 1}, timeout=2)
+    assert resp.status_code == 400
+
+
+def test_carregar_perfis_valida_campos():
+    perfis = carregar_perfis({"sp": {"latencia_mediana_ms": 800, "taxa_timeout": 0.02}})
+    assert perfis["SP"].latencia_mediana_ms == 800
+    assert "*" in perfis
+
+    with pytest.raises(ValueError):
+        carregar_perfis({"SP": {"latencia": 1}})
+
+
+def test_factory_http_com_circuit_breaker(simulador, settings):
+    settings.FISCAL_SEFAZ_CLIENTE = "http"
+    settings.FISCAL_SEFAZ_HTTP_URL = simulador.url
+    settings.FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS = 2
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = True
+    settings.FISCAL_SEFAZ_CB_LIMITE_FALHAS = 2
+    cache.clear()
+
+    client = get_sefaz_client_for_filial(SimpleNamespace(uf="MG", ambiente="homolog"))
+    assert isinstance(client, HttpSefazClient)
+    assert _autorizar(client).codigo == 100
+
+    simulador.definir_perfil("MG", PerfilSefaz(latencia_mediana_ms=1, taxa_erro=1.0))
+    for _ in range(2):
+        with pytest.raises(SefazTechnicalError):
+            _autorizar(client)
+
+    assert client.circuit_breaker.estado() == ESTADO_ABERTO
+    chamadas = dict(simulador.contadores)
+    with pytest.raises(SefazCircuitoAberto):
+        _autorizar(client)
+    assert simulador.contadores == chamadas
+    cache.clear()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Sonda de status SEFAZ (consStatServ) e roteamento da emissão:
+- Amostras da sonda viram disponibilidade/latência por (UF, ambiente)
+- SEFAZ fora segundo a sonda: emissão vai direto para contingência, sem chamar a SEFAZ
+- SEFAZ em operação: timeout da chamada derivado do p95 (timeout_sefaz)
+- Sem sonda recente, a emissão segue o fluxo padrão
+"""
+
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal import sefaz_status
+from fiscal.models import NfceDocumento, NfcePreEmissao
+from fiscal.sefaz_clients import HttpSefazClient, MockSefazClient, SefazTechnicalError, timeout_sefaz
+from fiscal.sefaz_factory import SefazEmitirAdapter
+from fiscal.sefaz_simulador import PerfilSefaz, SimuladorSefaz, iniciar_em_thread
+from fiscal.sefaz_status import registrar_amostra, rota_emissao, saude_sefaz, sondar
+from fiscal.services.emissao_service import emitir_nfce
+from terminal.models.terminal_models import Terminal
+
+
+@pytest.fixture(autouse=True)
+def status_limpo(settings):
+    settings.FISCAL_SEFAZ_STATUS_ROTEAMENTO_ATIVO = True
+    settings.FISCAL_SEFAZ_STATUS_FALHAS_CONTINGENCIA = 3
+    settings.FISCAL_SEFAZ_STATUS_VALIDADE_SEGUNDOS = 120
+    settings.FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS = 10
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def simulador():
+    sim = SimuladorSefaz({"*": PerfilSefaz(latencia_mediana_ms=1, latencia_p99_ms=2)}, semente=1)
+    servidor, url = iniciar_em_thread(sim)
+    sim.url = url
+    yield sim
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class ContadorClient(MockSefazClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chamadas = 0
+
+    def autorizar_nfce(self, **kwargs):
+        self.chamadas += 1
+        return super().autorizar_nfce(**kwargs)
+
+
+def test_sonda_registra_disponibilidade_e_latencia(simulador):
+    client = HttpSefazClient(uf="SP", base_url=simulador.url, timeout=2)
+
+    for _ in range(4):
+        saude = sondar(client, "SP", "homolog")
+
+    assert saude.amostras == 4
+    assert saude.disponibilidade == 1.0
+    assert saude.ultimo_codigo == "107"
+    assert saude.falhas_consecutivas == 0
+    assert saude.latencia_p95_ms is not None
+
+    rota = rota_emissao("SP", "homolog")
+    assert rota.contingencia is False
+    # p95 de poucos ms x fator: fica no piso configurado
+    assert rota.timeout == 1.0
+
+
+def test_falhas_seguidas_levam_a_contingencia(simulador):
+    client = HttpSefazClient(uf="MG", base_url=simulador.url, timeout=2)
+    for _ in range(4):
+        sondar(client, "MG", "homolog")
+
+    simulador.definir_perfil("MG", PerfilSefaz(latencia_mediana_ms=1, taxa_erro=1.0))
+    for _ in range(2):
+        sondar(client, "MG", "homolog")
+    # histórico bom segura a disponibilidade acima da mínima: ainda não é contingência
+    assert rota_emissao("MG", "homolog").contingencia is False
+
+    saude = sondar(client, "MG", "homolog")
+    assert saude.falhas_consecutivas == 3
+    assert saude.ultimo_codigo == "HTTP_503"
+    assert rota_emissao("MG", "homolog").contingencia is True
+
+    # SEFAZ volta: uma sonda boa reabre a emissão normal
+    simulador.definir_perfil("MG", PerfilSefaz(latencia_mediana_ms=1))
+    sondar(client, "MG", "homolog")
+    assert rota_emissao("MG", "homolog").contingencia is False
+
+
+def test_timeout_dinamico_segue_p95(settings):
+    for latencia in (100, 200, 300, 400, 900):
+        registrar_amostra("RJ", "homolog", ok=True, latencia_ms=latencia, codigo="107")
+
+    assert rota_emissao("RJ", "homolog").timeout == 3.6
+
+    settings.FISCAL_SEFAZ_HTTP_TIMEOUT_SEGUNDOS = 2
+    assert rota_emissao("RJ", "homolog").timeout == 2
+
+
+def test_sem_sonda_recente_segue_padrao(monkeypatch):
+    for _ in range(3):
+        registrar_amostra("ES", "homolog", ok=False, latencia_ms=5, codigo="TIMEOUT")
+    assert rota_emissao("ES", "homolog").contingencia is True
+
+    agora = time.time()
+    monkeypatch.setattr(sefaz_status.time, "time", lambda: agora + 121)
+
+    assert saude_sefaz("ES", "homolog") is None
+    rota = rota_emissao("ES", "homolog")
+    assert (rota.contingencia, rota.timeout, rota.motivo) == (False, None, "sem_sonda")
+
+
+def test_timeout_sefaz_vale_para_o_client_http(simulador):
+    simulador.definir_perfil("SP", PerfilSefaz(latencia_mediana_ms=500, latencia_p99_ms=501))
+    client = HttpSefazClient(uf="SP", base_url=simulador.url, timeout=5)
+    pre = SimpleNamespace(numero=1, serie=1, request_id=uuid.uuid4(), filial=None)
+
+    with timeout_sefaz(0.1), pytest.raises(SefazTechnicalError) as exc:
+        client.autorizar_nfce(filial=None, pre_emissao=pre, numero=1, serie=1)
+    assert exc.value.codigo == "TIMEOUT"
+
+    assert client.autorizar_nfce(filial=None, pre_emissao=pre, numero=1, serie=1).codigo == 100
+
+
+def test_comando_sonda_grava_saude(settings, capsys):
+    settings.FISCAL_SEFAZ_CLIENTE = "mock"
+
+    call_command("sefaz_status_sonda", uf=["sp"], ambiente=["homolog"])
+
+    saude = saude_sefaz("SP", "homolog")
+    assert saude.amostras == 1
+    assert saude.ultimo_codigo == "107"
+    assert saude_sefaz("SP", "producao") is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_emissao_com_sefaz_fora_vai_direto_para_contingencia(two_tenants_with_admins, settings):
+    settings.FISCAL_SEFAZ_CIRCUIT_BREAKER_ATIVO = False
+
+    with schema_context(two_tenants_with_admins["schema1"]):
+        Filial = apps.get_model("filial", "Filial")
+        FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+        filial = Filial.objects.first()
+        FilialCertificadoA1.objects.create(
+            filial=filial,
+            a1_pfx=b"cert",
+            senha_hash="hash",
+            a1_expires_at=timezone.now() + timedelta(days=30),
+        )
+        user = get_user_model().objects.create_user(username="oper-sonda", password="123456")
+        user.userfilial_set.create(filial_id=filial.id)
+        term = Terminal.objects.create(filial=filial, identificador="TERM-SONDA")
+
+        def _pre(numero):
+            return NfcePreEmissao.objects.create(
+                filial_id=filial.id,
+                terminal_id=term.id,
+                numero=numero,
+                serie=1,
+                request_id=uuid.uuid4(),
+                payload={"itens": [], "pagamentos": []},
+            )
+
+        client = ContadorClient(uf=filial.uf)
+        uf = filial.uf.strip().upper()
+        for _ in range(3):
+            registrar_amostra(uf, "homolog", ok=False, latencia_ms=10, codigo="TIMEOUT")
+
+        pre = _pre(1)
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=SefazEmitirAdapter(client, filial))
+
+        assert result.em_contingencia is True
+        assert client.chamadas == 0
+        doc = NfceDocumento.objects.get(request_id=pre.request_id)
+        assert doc.status == "contingencia_pendente"
+
+        # Sonda volta a responder: emissão normal
+        registrar_amostra(uf, "homolog", ok=True, latencia_ms=10, codigo="107")
+        pre = _pre(2)
+        result = emitir_nfce(user=user, request_id=pre.request_id, sefaz_client=SefazEmitirAdapter(client, filial))
+
+        assert result.em_contingencia is False
+        assert client.chamadas == 1
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Assinatura XMLDSig da NFC-e com cache de chaves A1:
+- Assinatura verificável com o certificado do KeyInfo; DigestValue = SHA-1 do infNFe canônico
+- Forma canônica do builder idêntica à C14N (caminho rápido sem reparse)
+- PFX decifrado uma vez por filial; troca do certificado invalida o cache
+- Certificado expirado bloqueia (FISCAL_3001); senha errada -> FISCAL_3005
+- Cache limitado (LRU)
+"""
+
+import base64
+import hashlib
+import re
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, pkcs12
+from cryptography.x509.oid import NameOID
+from django.apps import apps
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from fiscal.models import NfcePreEmissao
+from fiscal.nfce_xml import (
+    AssinadorNfce,
+    EmitenteNfce,
+    NfceXmlBuilder,
+    assinar_xml_nfce,
+    metricas_cache_a1,
+    montar_xml_assinado_pre_emissao,
+)
+from fiscal.nfce_xml.assinatura import (
+    CacheChavesA1,
+    canonicalizar_inf_nfe,
+    carregar_pfx,
+    resetar_cache_chaves_a1,
+)
+from terminal.models.terminal_models import Terminal
+
+SENHA = "segredo-a1"
+
+
+def _gerar_pfx(senha=SENHA, dias=365):
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "LOJA TESTE:12345678000199")])
+    agora = datetime.now(dt_timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(nome)
+        .issuer_name(nome)
+        .public_key(chave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(agora - timedelta(days=1))
+        .not_valid_after(agora + timedelta(days=dias))
+        .sign(chave, hashes.SHA256())
+    )
+    return pkcs12.serialize_key_and_certificates(
+        b"a1", chave, certificado, None, BestAvailableEncryption(senha.encode())
+    )
+
+
+def _xml(descricao="Café \"especial\" d'água <500g> & cia"):
+    emitente = EmitenteNfce(
+        cnpj="12345678000199", razao_social="Loja Teste", nome_fantasia="", ie="123456789012",
+        crt="1", logradouro="Rua A", numero="1", complemento="", bairro="Centro",
+        codigo_municipio="3550308", municipio="São Paulo", uf="SP", cep="01311000",
+    )
+    payload = {
+        "itens": [
+            {"produto_id": str(n), "descricao": descricao, "quantidade": 1, "preco_unitario": 9.9, "ncm": "09012100"}
+            for n in range(3)
+        ],
+        "pagamentos": [],
+    }
+    return NfceXmlBuilder(emitente, ambiente="producao").build(
+        payload=payload, numero=10, serie=1, semente=uuid.uuid4()
+    ).xml
+
+
+def _verificar(xml_assinado):
+    """
+    Confere DigestValue e SignatureValue de forma independente do assinador.
+    """
+    doc = ET.fromstring(xml_assinado)
+    ns = {"ds": "http://www.w3.org/2000/09/xmldsig#"}
+    assinatura = doc.find("ds:Signature", ns)
+    assert assinatura is not None
+
+    inf_nfe = re.search(r"<infNFe.*</infNFe>", xml_assinado, re.S).group(0)
+    inf_nfe = inf_nfe.replace("<infNFe", '<infNFe xmlns="http://www.portalfiscal.inf.br/nfe"', 1)
+    digest = base64.b64encode(hashlib.sha1(ET.canonicalize(inf_nfe).encode()).digest()).decode()
+    assert assinatura.findtext("ds:SignedInfo/ds:Reference/ds:DigestValue", namespaces=ns) == digest
+
+    signed_info = re.search(r"<SignedInfo>.*</SignedInfo>", xml_assinado, re.S).group(0)
+    signed_info = signed_info.replace(
+        "<SignedInfo>", '<SignedInfo xmlns="http://www.w3.org/2000/09/xmldsig#">', 1
+    )
+    certificado = x509.load_der_x509_certificate(
+        base64.b64decode(assinatura.findtext("ds:KeyInfo/ds:X509Data/ds:X509Certificate", namespaces=ns))
+    )
+    certificado.public_key().verify(
+        base64.b64decode(assinatura.findtext("ds:SignatureValue", namespaces=ns)),
+        ET.canonicalize(signed_info).encode(),
+        padding.PKCS1v15(),
+        hashes.SHA1(),
+    )
+
+
+def test_assinatura_verificavel_e_forma_canonica_do_builder():
+    xml = _xml()
+    _, generico = canonicalizar_inf_nfe(xml)
+    _, rapido = canonicalizar_inf_nfe(xml, canonico=True)
+    assert rapido == generico
+
+    assinador = AssinadorNfce(carregar_pfx(_gerar_pfx(), SENHA.encode()))
+    assinado = assinador.assinar(xml, canonico=True)
+
+    assert assinado.startswith(xml[: xml.index("</infNFe>")])
+    assert assinado.endswith("</Signature></NFe>")
+    _verificar(assinado)
+
+
+def test_senha_errada_e_cache_limitado():
+    with pytest.raises(ValidationError) as exc:
+        carregar_pfx(_gerar_pfx(), b"outra")
+    assert exc.value.detail["code"] == "FISCAL_3005"
+
+    chave = carregar_pfx(_gerar_pfx(), SENHA.encode(), versao=(1,))
+    cache = CacheChavesA1(2)
+    for n in range(3):
+        cache.guardar(("t", n), chave)
+    assert cache.obter(("t", 0), (1,)) is None
+    assert cache.obter(("t", 2), (1,)) is chave
+    assert cache.obter(("t", 2), (2,)) is None  # versão diferente descarta
+    assert cache.metricas()["entradas"] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cache_por_filial_invalida_na_troca_e_expiracao(two_tenants_with_admins):
+    resetar_cache_chaves_a1()
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial = Filial.objects.first()
+        cert = FilialCertificadoA1.objects.create(
+            filial=filial,
+            a1_pfx=_gerar_pfx(),
+            senha_hash=SENHA,
+            a1_expires_at=timezone.now() + timedelta(days=30),
+        )
+        xml = _xml()
+
+        for _ in range(5):
+            _verificar(assinar_xml_nfce(xml, filial_id=filial.id))
+        assert metricas_cache_a1()["faltas"] == 1
+        assert metricas_cache_a1()["acertos"] == 4
+
+        # Rotação do certificado: nova versão da linha -> PFX relido
+        cert.a1_pfx = _gerar_pfx()
+        cert.save()
+        _verificar(assinar_xml_nfce(xml, filial_id=filial.id))
+        assert metricas_cache_a1()["faltas"] == 2
+
+        # Pré-emissão -> XML assinado
+        term = Terminal.objects.create(filial=filial, identificador="TERM-ASSINA")
+        pre = NfcePreEmissao.objects.create(
+            filial_id=filial.id,
+            terminal_id=term.id,
+            numero=1,
+            serie=1,
+            request_id=uuid.uuid4(),
+            payload={"itens": [{"produto_id": "p1", "descricao": "X", "quantidade": 1,
+                                "preco_unitario": 1, "ncm": "22029900"}]},
+        )
+        _verificar(montar_xml_assinado_pre_emissao(pre, filial).xml)
+
+        # Expirado: bloqueia mesmo com a chave em cache
+        FilialCertificadoA1.objects.filter(pk=cert.pk).update(
+            a1_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        with pytest.raises(PermissionDenied) as exc:
+            assinar_xml_nfce(xml, filial_id=filial.id)
+        assert exc.value.detail["code"] == "FISCAL_3001"
+        assert metricas_cache_a1()["entradas"] == 0
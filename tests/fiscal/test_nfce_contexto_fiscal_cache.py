@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Cache do contexto fiscal (usuário, terminal) na reserva de número NFC-e:
+- Segunda reserva não relê Terminal / UserFilial / certificado / séries
+- Sinais invalidam: vínculo removido, certificado vencido, série desativada
+- Entrada não sobrevive ao vencimento do A1
+- System check fiscal.E002: cache por processo não serve em produção
+"""
+
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from fiscal.checks import checar_cache_contexto_fiscal
+from fiscal.models import DocumentoFiscalSequencia
+from fiscal.services.contexto_fiscal_service import obter_contexto_fiscal
+from fiscal.services.numero_service import ERR_SERIE_MISMATCH, reservar_numero_nfce
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup(validade=timedelta(days=30)):
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    cert = FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + validade,
+    )
+    user = get_user_model().objects.create_user(username="oper-contexto", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+
+    term = Terminal.objects.create(filial=filial, identificador="TERM-CONTEXTO")
+    seq = DocumentoFiscalSequencia.objects.create(
+        terminal=term,
+        modelo=DocumentoFiscalSequencia.MODELO_NFCE,
+        serie=1,
+        numero_atual=0,
+    )
+    return user, term, cert, seq
+
+
+def _reservar(user, term, serie=1):
+    return reservar_numero_nfce(user=user, terminal_id=term.id, serie=serie, request_id=uuid.uuid4())
+
+
+def test_contexto_em_cache_dispensa_releitura(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, _, _ = _setup()
+        _reservar(user, term)
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert _reservar(user, term).numero == 2
+
+        sqls = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith("SET search_path")]
+        for tabela in ("terminal_terminal", "usuario_userfilial", "filial_filialcertificadoa1"):
+            assert not any(s.startswith("SELECT") and tabela in s for s in sqls), sqls
+
+        contexto = obter_contexto_fiscal(user=user, terminal_id=term.id)
+        assert contexto.filial_id == str(term.filial_id)
+        assert contexto.series_nfce == (1,)
+        assert contexto.uf and contexto.ambiente == "homolog"
+
+
+def test_sinais_invalidam_contexto(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, cert, seq = _setup()
+        _reservar(user, term)
+
+        # Série desativada
+        seq.ativo = False
+        seq.save(update_fields=["ativo"])
+        with pytest.raises(ValidationError) as exc:
+            _reservar(user, term)
+        assert exc.value.detail["code"] == ERR_SERIE_MISMATCH
+        seq.ativo = True
+        seq.save(update_fields=["ativo"])
+
+        # Certificado vencido
+        cert.a1_expires_at = timezone.now() - timedelta(minutes=1)
+        cert.save()
+        with pytest.raises(PermissionDenied) as exc:
+            _reservar(user, term)
+        assert exc.value.detail["code"] == "FISCAL_3001"
+        cert.a1_expires_at = timezone.now() + timedelta(days=30)
+        cert.save()
+        assert _reservar(user, term).numero == 2
+
+        # Vínculo removido
+        user.userfilial_set.all().delete()
+        with pytest.raises(PermissionDenied) as exc:
+            _reservar(user, term)
+        assert exc.value.detail["code"] == "AUTH_1006"
+
+
+def test_contexto_respeita_vencimento_do_a1(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, _, _ = _setup(validade=timedelta(seconds=1))
+        assert _reservar(user, term).numero == 1
+
+        time.sleep(1.2)
+
+        with pytest.raises(PermissionDenied) as exc:
+            _reservar(user, term)
+        assert exc.value.detail["code"] == "FISCAL_3001"
+
+
+def test_check_exige_cache_compartilhado(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        "compartilhado": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "pdv_cache"},
+    }
+
+    settings.DEBUG = True
+    assert [(m.id, m.is_serious()) for m in checar_cache_contexto_fiscal()] == [("fiscal.E002", False)]
+
+    settings.DEBUG = False
+    assert [(m.id, m.is_serious()) for m in checar_cache_contexto_fiscal()] == [("fiscal.E002", True)]
+
+    settings.FISCAL_CONTEXTO_CACHE = "compartilhado"
+    assert checar_cache_contexto_fiscal() == []
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Numeração via DocumentoFiscalSequencia:
+- NFC-e (65) avança a sequência do terminal/série e grava a reserva num único statement
+- Mesmo request_id não avança a sequência
+- Série sem sequência ativa -> FISCAL_3002
+- Terminal novo (sem sequência nem reservas) ganha a sequência na primeira reserva
+- NF-e (55) usa sequência própria
+- Orçamento de queries da reserva
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.exceptions import ValidationError
+
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroReserva
+from fiscal.services.numero_service import ERR_SERIE_MISMATCH, reservar_numero_nfce
+from fiscal.services.sequencia_service import reservar_numero_nfe
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+# terminal + vínculo user/filial + UPDATE/INSERT (+ BEGIN/COMMIT não contam)
+MAX_QUERIES_RESERVA = 3
+
+
+def _setup():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="oper-seq", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+
+    term = Terminal.objects.create(filial=filial, identificador="TERM-SEQ")
+    seq_nfce = DocumentoFiscalSequencia.objects.create(
+        terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=1, numero_atual=41
+    )
+    seq_nfe = DocumentoFiscalSequencia.objects.create(
+        terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFE, serie=1, numero_atual=0
+    )
+    return user, term, seq_nfce, seq_nfe
+
+
+def test_reserva_avanca_sequencia_nfce_e_e_idempotente(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, seq_nfce, _ = _setup()
+        rid = uuid.uuid4()
+
+        r1 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=rid)
+        r2 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=rid)
+
+        assert r1.numero == r2.numero == 42
+        assert r1.reserved_at == r2.reserved_at
+
+        seq_nfce.refresh_from_db()
+        assert seq_nfce.numero_atual == 42
+        assert NfceNumeroReserva.objects.filter(request_id=rid).count() == 1
+
+
+def test_serie_sem_sequencia_ativa_retorna_fiscal_3002(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, seq_nfce, _ = _setup()
+
+        with pytest.raises(ValidationError) as exc:
+            reservar_numero_nfce(user=user, terminal_id=term.id, serie=9, request_id=uuid.uuid4())
+        assert exc.value.detail["code"] == ERR_SERIE_MISMATCH
+
+        seq_nfce.ativo = False
+        seq_nfce.save(update_fields=["ativo"])
+        with pytest.raises(ValidationError):
+            reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4())
+
+        seq_nfce.refresh_from_db()
+        assert seq_nfce.numero_atual == 41
+
+
+def test_terminal_novo_cria_sequencia_na_primeira_reserva(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, _, _ = _setup()
+        novo = Terminal.objects.create(filial=term.filial, identificador="TERM-SEQ-NOVO")
+        assert not NfceNumeroReserva.objects.filter(terminal=novo).exists()
+
+        r1 = reservar_numero_nfce(user=user, terminal_id=novo.id, serie=3, request_id=uuid.uuid4())
+        r2 = reservar_numero_nfce(user=user, terminal_id=novo.id, serie=3, request_id=uuid.uuid4())
+
+        assert (r1.numero, r2.numero) == (1, 2)
+        seq = DocumentoFiscalSequencia.objects.get(
+            terminal=novo, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=3
+        )
+        assert seq.ativo and seq.numero_atual == 2
+
+        # terminal já configurado: outra série continua FISCAL_3002
+        with pytest.raises(ValidationError) as exc:
+            reservar_numero_nfce(user=user, terminal_id=novo.id, serie=4, request_id=uuid.uuid4())
+        assert exc.value.detail["code"] == ERR_SERIE_MISMATCH
+        assert DocumentoFiscalSequencia.objects.filter(terminal=novo).count() == 1
+
+
+def test_nfe_usa_sequencia_propria(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, seq_nfce, seq_nfe = _setup()
+
+        assert reservar_numero_nfe(terminal_id=term.id, serie=1) == 1
+        assert reservar_numero_nfe(terminal_id=term.id, serie=1) == 2
+        assert reservar_numero_nfe(terminal_id=term.id, serie=7) is None
+
+        seq_nfce.refresh_from_db()
+        assert seq_nfce.numero_atual == 41
+
+
+def test_reserva_dentro_do_orcamento_de_queries(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, _, _ = _setup()
+
+        with CaptureQueriesContext(connection) as ctx:
+            reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4())
+
+        sqls = [
+            q["sql"] for q in ctx.captured_queries
+            if not q["sql"].upper().startswith(("SAVEPOINT", "RELEASE", "BEGIN", "COMMIT", "SET"))
+        ]
+        assert len(sqls) <= MAX_QUERIES_RESERVA, sqls
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Gravação idempotente por request_id (INSERT ... ON CONFLICT DO NOTHING RETURNING):
+- Pré-emissão: sem leitura prévia; retries concorrentes recebem a mesma linha, sem IntegrityError
+- Inutilização: idempotente por request_id e por faixa, inclusive com retries concorrentes
+- Emissão: resultado já registrado não gera segundo documento, inclusive com
+  duas transações concorrentes gravando o mesmo request_id
+"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.apps import apps
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceDocumento, NfceInutilizacao, NfceNumeroReserva, NfcePreEmissao
+from fiscal.services import pre_emissao_service
+from fiscal.services.emissao_service import _inserir_documento
+from fiscal.services.inutilizacao_service import inutilizar_faixa_nfce
+from fiscal.services.pre_emissao_service import criar_pre_emissao
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+THREADS = 6
+MOTIVO = "Falha de comunicação do terminal"
+
+
+def _concorrente(schema, funcao):
+    def worker():
+        try:
+            with schema_context(schema):
+                return funcao()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as ex:
+        return [f.result() for f in [ex.submit(worker) for _ in range(THREADS)]]
+
+
+def _reserva(filial, terminal, numero=1):
+    return NfceNumeroReserva.objects.create(
+        terminal_id=terminal.id,
+        filial_id=filial.id,
+        serie=1,
+        numero=numero,
+        request_id=uuid.uuid4(),
+    )
+
+
+def _contexto(identificador):
+    filial = apps.get_model("filial", "Filial").objects.first()
+    terminal = apps.get_model("terminal", "Terminal").objects.create(filial=filial, identificador=identificador)
+    return filial, terminal
+
+
+def test_pre_emissao_sem_leitura_previa_e_concorrente(two_tenants_with_admins, admin_user, monkeypatch):
+    monkeypatch.setattr(pre_emissao_service, "_assert_a1_valid", lambda filial: None)
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user = admin_user(two_tenants_with_admins["admin_username_1"])
+        filial, terminal = _contexto("PDV-IDEMP-PRE")
+        reserva = _reserva(filial, terminal)
+
+        with CaptureQueriesContext(connection) as ctx:
+            primeira = criar_pre_emissao(user=user, request_id=reserva.request_id, payload={"itens": []})
+        sqls = [q["sql"] for q in ctx.captured_queries]
+        assert not any(s.startswith('SELECT') and "nfce_pre_emissao" in s for s in sqls)
+        assert any("ON CONFLICT" in s and "nfce_pre_emissao" in s for s in sqls)
+
+    resultados = _concorrente(
+        schema,
+        lambda: criar_pre_emissao(user=user, request_id=reserva.request_id, payload={"itens": []}),
+    )
+
+    assert {r.id for r in resultados} == {primeira.id}
+    with schema_context(schema):
+        assert NfcePreEmissao.objects.filter(request_id=reserva.request_id).count() == 1
+
+
+def test_inutilizacao_idempotente_por_request_id_e_faixa(two_tenants_with_admins, admin_user):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user = admin_user(two_tenants_with_admins["admin_username_1"])
+        filial, _ = _contexto("PDV-IDEMP-INUT")
+
+    request_id = uuid.uuid4()
+    faixa = dict(user=user, filial_id=str(filial.id), serie=1, numero_inicial=10, numero_final=12, motivo=MOTIVO)
+
+    resultados = _concorrente(schema, lambda: inutilizar_faixa_nfce(request_id=request_id, **faixa))
+    assert {(r.request_id, r.protocolo, r.status) for r in resultados} == {
+        (str(request_id), resultados[0].protocolo, "inutilizada")
+    }
+
+    with schema_context(schema):
+        # Mesma faixa com outro request_id devolve a inutilização existente
+        outra = inutilizar_faixa_nfce(request_id=uuid.uuid4(), **faixa)
+        assert outra.request_id == str(request_id)
+        assert NfceInutilizacao.objects.filter(filial_id=filial.id).count() == 1
+
+
+def test_documento_ja_registrado_nao_duplica(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal = _contexto("PDV-IDEMP-DOC")
+        request_id = uuid.uuid4()
+
+        def novo(chave):
+            return NfceDocumento(
+                filial=filial,
+                terminal=terminal,
+                numero=1,
+                serie=1,
+                request_id=request_id,
+                chave_acesso=chave,
+                status="autorizada",
+                raw_sefaz_response={"codigo_retorno": "100"},
+            )
+
+        doc, criado = _inserir_documento(novo("1" * 44))
+        assert criado
+
+        existente, criado = _inserir_documento(novo("2" * 44))
+        assert not criado
+        assert existente.pk == doc.pk
+        assert existente.raw_sefaz_response == {"codigo_retorno": "100"}
+        assert NfceDocumento.objects.pelo_indice(request_id=request_id).count() == 1
+
+
+def test_documento_concorrente_mesmo_request_id(two_tenants_with_admins):
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        filial, terminal = _contexto("PDV-IDEMP-DOC-CONC")
+    request_id = uuid.uuid4()
+    largada = threading.Barrier(2)
+
+    def gravar(chave):
+        try:
+            with schema_context(schema):
+                doc = NfceDocumento(
+                    filial=filial,
+                    terminal=terminal,
+                    numero=1,
+                    serie=1,
+                    request_id=request_id,
+                    chave_acesso=chave,
+                    status="autorizada",
+                    raw_sefaz_response={"codigo_retorno": "100"},
+                )
+                largada.wait()
+                with transaction.atomic():
+                    doc, criado = _inserir_documento(doc)
+                return doc.pk, criado
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        resultados = list(ex.map(gravar, ["1" * 44, "2" * 44]))
+
+    assert len({pk for pk, _ in resultados}) == 1
+    assert sorted(criado for _, criado in resultados) == [False, True]
+    with schema_context(schema):
+        assert NfceDocumento.objects.pelo_indice(request_id=request_id).count() == 1
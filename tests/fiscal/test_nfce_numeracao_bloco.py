@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Numeração NFC-e por blocos arrendados (FISCAL_NFCE_NUMERACAO_MODO="bloco"):
+- Reservas sequenciais dentro do bloco; a sequência do terminal avança por bloco
+- Idempotência por request_id continua valendo
+- Bloco esgotado -> novo bloco contíguo
+- Bloco liberado com números sobrando -> faixa reportada para inutilização
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test.utils import override_settings
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroBloco
+from fiscal.services import numero_bloco_service
+from fiscal.services.numero_service import reservar_numero_nfce
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup_terminal():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+    User = get_user_model()
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = User.objects.create_user(username="oper-bloco", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+
+    term = Terminal.objects.create(filial=filial, identificador="TERM-BLOCO")
+    DocumentoFiscalSequencia.objects.create(
+        terminal=term,
+        modelo=DocumentoFiscalSequencia.MODELO_NFCE,
+        serie=1,
+        numero_atual=0,
+    )
+    return user, term
+
+
+@pytest.fixture(autouse=True)
+def _limpa_cache_de_blocos():
+    numero_bloco_service._blocos_do_processo.clear()
+    yield
+    numero_bloco_service._blocos_do_processo.clear()
+
+
+@override_settings(FISCAL_NFCE_NUMERACAO_MODO="bloco", FISCAL_NFCE_BLOCO_TAMANHO=3)
+def test_bloco_numeros_sequenciais_e_novo_bloco_ao_esgotar(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term = _setup_terminal()
+
+        numeros = [
+            reservar_numero_nfce(
+                user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4()
+            ).numero
+            for _ in range(5)
+        ]
+
+        assert numeros == [1, 2, 3, 4, 5]
+
+        blocos = list(NfceNumeroBloco.objects.filter(terminal_id=term.id).order_by("numero_inicial"))
+        assert [(b.numero_inicial, b.numero_final) for b in blocos] == [(1, 3), (4, 6)]
+        assert blocos[0].status == NfceNumeroBloco.STATUS_ESGOTADO
+
+        # A sequência avança por bloco inteiro
+        seq = DocumentoFiscalSequencia.objects.get(terminal=term, modelo="65", serie=1)
+        assert seq.numero_atual == 6
+
+
+@override_settings(FISCAL_NFCE_NUMERACAO_MODO="bloco", FISCAL_NFCE_BLOCO_TAMANHO=10)
+def test_bloco_idempotencia_mesmo_request_id(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term = _setup_terminal()
+        rid = uuid.uuid4()
+
+        r1 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=rid)
+        r2 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=rid)
+
+        assert r1.numero == r2.numero == 1
+
+        # o próximo request_id continua a sequência sem buraco
+        r3 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4())
+        assert r3.numero == 2
+
+
+@override_settings(FISCAL_NFCE_NUMERACAO_MODO="bloco", FISCAL_NFCE_BLOCO_TAMANHO=10)
+def test_bloco_liberado_reporta_faixa_nao_utilizada(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term = _setup_terminal()
+
+        for _ in range(4):
+            reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4())
+
+        assert numero_bloco_service.liberar_blocos_do_processo() == 1
+
+        # Dentro da janela de segurança nada é reportado
+        assert numero_bloco_service.listar_faixas_nao_utilizadas(terminal_id=term.id) == []
+
+        depois = timezone.now() + timedelta(minutes=5)
+        faixas = numero_bloco_service.listar_faixas_nao_utilizadas(terminal_id=term.id, agora=depois)
+        assert [(f.numero_inicial, f.numero_final) for f in faixas] == [(5, 10)]
+
+        numero_bloco_service.marcar_blocos_reportados({f.bloco_id for f in faixas})
+        assert numero_bloco_service.listar_faixas_nao_utilizadas(terminal_id=term.id, agora=depois) == []
+
+        # Novo bloco começa após o bloco liberado (não reaproveita números)
+        r = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=uuid.uuid4())
+        assert r.numero == 11
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Particionamento mensal de nfce_documento / nfce_auditoria:
+- Documento cai na partição do mês; índice global garante unicidade e resolve buscas
+- garantir_particoes é idempotente e move linhas da partição padrão
+- Arquivamento exporta CSV gzip, desanexa a partição e mantém o índice global
+"""
+
+import gzip
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+
+import pytest
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from fiscal.models import NfceDocumento, NfceDocumentoIndice
+from fiscal.services.particionamento_service import (
+    arquivar_particao,
+    garantir_particoes,
+    listar_particoes,
+    nome_particao,
+    somar_meses,
+)
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _documento(filial, terminal, numero, created_at=None):
+    return NfceDocumento.objects.create(
+        filial=filial,
+        terminal=terminal,
+        numero=numero,
+        serie=1,
+        request_id=uuid.uuid4(),
+        chave_acesso=f"{numero:044d}",
+        status="autorizada",
+        created_at=created_at or timezone.now(),
+    )
+
+
+def _particao_da_linha(tabela, id_):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT tableoid::regclass::text FROM {tabela} WHERE id = %s", [id_])
+        return cursor.fetchone()[0].split(".")[-1]
+
+
+def _contexto():
+    filial = apps.get_model("filial", "Filial").objects.first()
+    terminal = apps.get_model("terminal", "Terminal").objects.create(
+        filial=filial, identificador=f"PDV-{uuid.uuid4().hex[:6]}"
+    )
+    return filial, terminal
+
+
+def test_documento_na_particao_do_mes_e_indice_global(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal = _contexto()
+        doc = _documento(filial, terminal, 1)
+
+        assert _particao_da_linha("nfce_documento", doc.id) == nome_particao(
+            "nfce_documento", timezone.now().astimezone(dt_timezone.utc).date().replace(day=1)
+        )
+        indice = NfceDocumentoIndice.objects.get(pk=doc.id)
+        assert indice.chave_acesso == doc.chave_acesso
+
+        assert NfceDocumento.objects.pelo_indice(chave_acesso=doc.chave_acesso).get() == doc
+        assert NfceDocumento.objects.pelo_indice(request_id=doc.request_id).get() == doc
+        assert NfceDocumento.objects.pelo_indice(filial_id=filial.id, serie=1, numero=1).get() == doc
+
+        doc.chave_acesso = "9" * 44
+        doc.save(update_fields=["chave_acesso"])
+        assert NfceDocumentoIndice.objects.get(pk=doc.id).chave_acesso == "9" * 44
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            NfceDocumento.objects.create(
+                filial=filial, terminal=terminal, numero=2, serie=1,
+                request_id=doc.request_id, chave_acesso="8" * 44, status="autorizada",
+            )
+
+
+def test_garantir_particoes_idempotente_e_move_padrao(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal = _contexto()
+        futuro = somar_meses(date.today().replace(day=1), 12)
+        doc = _documento(filial, terminal, 10, created_at=datetime(futuro.year, futuro.month, 15, tzinfo=dt_timezone.utc))
+        assert _particao_da_linha("nfce_documento", doc.id) == "nfce_documento_padrao"
+
+        criadas = garantir_particoes(meses=0, hoje=futuro)
+        assert nome_particao("nfce_documento", futuro) in criadas
+        assert garantir_particoes(meses=0, hoje=futuro) == []
+
+        assert _particao_da_linha("nfce_documento", doc.id) == nome_particao("nfce_documento", futuro)
+        assert NfceDocumentoIndice.objects.filter(pk=doc.id).exists()
+
+
+def test_arquivar_particao_fechada(two_tenants_with_admins, tmp_path):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal = _contexto()
+        antigo = date(2019, 3, 1)
+        garantir_particoes(meses=0, hoje=antigo)
+        doc = _documento(filial, terminal, 20, created_at=datetime(2019, 3, 10, tzinfo=dt_timezone.utc))
+
+        particao = next(p for p in listar_particoes("nfce_documento") if p.inicio == antigo)
+        arquivada = arquivar_particao(particao, destino=tmp_path, remover=True)
+
+        assert arquivada.linhas == 1
+        with gzip.open(arquivada.arquivo, "rt") as arquivo:
+            assert doc.chave_acesso in arquivo.read()
+        assert all(p.inicio != antigo for p in listar_particoes("nfce_documento"))
+
+        # Numeração e chave continuam reservadas no índice global
+        assert NfceDocumentoIndice.objects.filter(chave_acesso=doc.chave_acesso).exists()
+        assert not NfceDocumento.objects.pelo_indice(chave_acesso=doc.chave_acesso).exists()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Reserva de numeração NFC-e em lote:
+- Números contíguos na ordem dos request_ids, numa única transação
+- Idempotência por item (request_id já reservado devolve a mesma reserva)
+- request_id repetido no lote recebe a mesma reserva
+- Série sem sequência -> FISCAL_3002 e nada é gravado
+- Endpoint POST /api/v1/fiscal/nfce/reservar-numero-lote
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from fiscal.models import DocumentoFiscalSequencia, NfceNumeroReserva
+from fiscal.services.numero_service import (
+    ERR_SERIE_MISMATCH,
+    reservar_numero_nfce,
+    reservar_numeros_nfce_lote,
+)
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+API_URL = "/api/v1/fiscal/nfce/reservar-numero-lote"
+
+
+def _setup():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="oper-lote", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+
+    term = Terminal.objects.create(filial=filial, identificador="TERM-LOTE")
+    seq = DocumentoFiscalSequencia.objects.create(
+        terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=1, numero_atual=10
+    )
+    return user, term, seq
+
+
+def test_lote_numeros_contiguos_e_idempotencia_por_item(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, seq = _setup()
+
+        ja_reservado = uuid.uuid4()
+        r0 = reservar_numero_nfce(user=user, terminal_id=term.id, serie=1, request_id=ja_reservado)
+        assert r0.numero == 11
+
+        novo_a, novo_b = uuid.uuid4(), uuid.uuid4()
+        results = reservar_numeros_nfce_lote(
+            user=user,
+            terminal_id=term.id,
+            serie=1,
+            request_ids=[novo_a, ja_reservado, novo_b, novo_a],
+        )
+
+        assert [r.numero for r in results] == [12, 11, 13, 12]
+        assert [r.request_id for r in results] == [str(novo_a), str(ja_reservado), str(novo_b), str(novo_a)]
+
+        seq.refresh_from_db()
+        assert seq.numero_atual == 13
+
+        # Repetir o lote inteiro não avança a sequência
+        again = reservar_numeros_nfce_lote(
+            user=user, terminal_id=term.id, serie=1, request_ids=[novo_a, novo_b]
+        )
+        assert [r.numero for r in again] == [12, 13]
+        seq.refresh_from_db()
+        assert seq.numero_atual == 13
+
+
+def test_lote_serie_sem_sequencia_nao_grava_nada(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, term, _ = _setup()
+        rids = [uuid.uuid4(), uuid.uuid4()]
+
+        with pytest.raises(ValidationError) as exc:
+            reservar_numeros_nfce_lote(user=user, terminal_id=term.id, serie=5, request_ids=rids)
+
+        assert exc.value.detail["code"] == ERR_SERIE_MISMATCH
+        assert not NfceNumeroReserva.objects.filter(request_id__in=rids).exists()
+
+
+def test_lote_endpoint(two_tenants_with_admins, settings):
+    settings.ROOT_URLCONF = "config.urls"
+    schema = two_tenants_with_admins["schema1"]
+
+    with schema_context(schema):
+        user, term, _ = _setup()
+
+    client = APIClient(HTTP_HOST=two_tenants_with_admins["payload1"]["domain"])
+    client.force_authenticate(user=user)
+
+    rids = [str(uuid.uuid4()) for _ in range(3)]
+    resp = client.post(
+        API_URL,
+        {"terminal_id": str(term.id), "serie": 1, "request_ids": rids},
+        format="json",
+    )
+
+    assert resp.status_code == 200, resp.content
+    body = resp.json()
+    assert body["serie"] == 1
+    assert [r["numero"] for r in body["reservas"]] == [11, 12, 13]
+    assert [r["request_id"] for r in body["reservas"]] == rids
+
+    resp = client.post(
+        API_URL,
+        {"terminal_id": str(term.id), "serie": 1, "request_ids": []},
+        format="json",
+    )
+    assert resp.status_code == 400
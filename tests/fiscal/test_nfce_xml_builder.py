@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Builder do XML NFC-e 4.00 (fiscal.nfce_xml):
+- Chave de acesso de 44 dígitos com DV módulo 11 (exemplo do manual SEFAZ)
+- cNF determinístico pela semente e diferente do nNF
+- Estrutura ide/emit/det/total/pag, escape de texto e totais somados dos itens
+- Simples Nacional (ICMSSN102) x Regime Normal (ICMS00 com destaque)
+- Item sem NCM -> FISCAL_4007
+- escrever() (streaming) gera o mesmo XML de build()
+"""
+
+import io
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from rest_framework.exceptions import ValidationError
+
+from fiscal.nfce_xml import (
+    TP_EMIS_OFFLINE,
+    EmitenteNfce,
+    NfceXmlBuilder,
+    calcular_dv,
+    chave_valida,
+    codigo_numerico,
+)
+
+NS = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
+EMISSAO = datetime(2026, 10, 17, 10, 30, tzinfo=dt_timezone(timedelta(hours=-3)))
+
+
+def _emitente(crt="1"):
+    return EmitenteNfce(
+        cnpj="12.345.678/0001-99",
+        razao_social="Mercado Bom & Barato LTDA",
+        nome_fantasia="Bom & Barato",
+        ie="123456789012",
+        crt=crt,
+        logradouro="Rua Paulista",
+        numero="10",
+        complemento="",
+        bairro="Centro",
+        codigo_municipio="3550308",
+        municipio="São Paulo",
+        uf="SP",
+        cep="01311000",
+    )
+
+
+def _payload(qtd_itens=2, **extra_item):
+    itens = [
+        {
+            "produto_id": str(uuid.uuid4()),
+            "codigo": f"SKU-{n}",
+            "descricao": f"Refrigerante <lata> {n}",
+            "quantidade": 2,
+            "preco_unitario": 4.99,
+            "desconto": 0.50,
+            "ncm": "22029900",
+            **extra_item,
+        }
+        for n in range(1, qtd_itens + 1)
+    ]
+    return {
+        "itens": itens,
+        "pagamentos": [
+            {"codigo_fiscal": "01", "status": "AUT", "valor_autorizado": 20.00, "valor_troco": 1.04},
+        ],
+    }
+
+
+def _build(builder=None, **kwargs):
+    builder = builder or NfceXmlBuilder(_emitente())
+    params = dict(payload=_payload(), numero=123, serie=1, semente=uuid.uuid4(), emissao=EMISSAO)
+    params.update(kwargs)
+    return builder.build(**params)
+
+
+def test_dv_modulo_11_exemplo_manual():
+    chave = "35080599999090910270550010000000015180051273"
+    assert calcular_dv(chave[:-1]) == 3
+    assert chave_valida(chave)
+    assert not chave_valida(chave[:-1] + "4")
+
+
+def test_cnf_deterministico_e_diferente_do_numero():
+    semente = uuid.uuid4()
+    assert codigo_numerico(semente, 1) == codigo_numerico(semente, 1)
+    assert codigo_numerico(12345678, 12345678) != "12345678"
+
+
+def test_chave_e_estrutura_do_xml():
+    resultado = _build()
+
+    chave = resultado.chave_acesso
+    assert chave_valida(chave)
+    assert chave[:2] == "35" and chave[2:6] == "2610"
+    assert chave[6:20] == "12345678000199"
+    assert chave[20:22] == "65" and chave[22:25] == "001" and chave[25:34] == "000000123"
+    assert chave[35:43] == resultado.codigo_numerico
+
+    raiz = ET.fromstring(resultado.xml)
+    inf = raiz.find("nfe:infNFe", NS)
+    assert inf.get("Id") == f"NFe{chave}"
+    assert inf.get("versao") == "4.00"
+    assert inf.findtext("nfe:ide/nfe:cDV", namespaces=NS) == chave[-1]
+    assert inf.findtext("nfe:ide/nfe:tpAmb", namespaces=NS) == "2"
+    assert inf.findtext("nfe:emit/nfe:xNome", namespaces=NS) == "Mercado Bom & Barato LTDA"
+
+    dets = inf.findall("nfe:det", NS)
+    assert [d.get("nItem") for d in dets] == ["1", "2"]
+    # Homologação: xProd do 1º item é fixo
+    assert dets[0].findtext("nfe:prod/nfe:xProd", namespaces=NS).startswith("NOTA FISCAL EMITIDA")
+    assert dets[1].findtext("nfe:prod/nfe:xProd", namespaces=NS) == "Refrigerante <lata> 2"
+    assert dets[1].find("nfe:imposto/nfe:ICMS/nfe:ICMSSN102", NS) is not None
+
+    tot = inf.find("nfe:total/nfe:ICMSTot", NS)
+    assert tot.findtext("nfe:vProd", namespaces=NS) == "19.96"
+    assert tot.findtext("nfe:vDesc", namespaces=NS) == "1.00"
+    assert tot.findtext("nfe:vNF", namespaces=NS) == "18.96"
+    assert inf.findtext("nfe:pag/nfe:detPag/nfe:tPag", namespaces=NS) == "01"
+    assert inf.findtext("nfe:pag/nfe:vTroco", namespaces=NS) == "1.04"
+
+
+def test_regime_normal_destaca_icms_e_pis_cofins():
+    builder = NfceXmlBuilder(_emitente(crt="3"), ambiente="producao")
+    payload = _payload(
+        1, csosn="00", aliquota_icms=18, cst_pis="01", aliquota_pis=1.65,
+        cst_cofins="01", aliquota_cofins=7.6,
+    )
+    inf = ET.fromstring(_build(builder, payload=payload).xml).find("nfe:infNFe", NS)
+
+    icms = inf.find("nfe:det/nfe:imposto/nfe:ICMS/nfe:ICMS00", NS)
+    assert icms.findtext("nfe:vBC", namespaces=NS) == "9.48"
+    assert icms.findtext("nfe:vICMS", namespaces=NS) == "1.71"
+    tot = inf.find("nfe:total/nfe:ICMSTot", NS)
+    assert tot.findtext("nfe:vICMS", namespaces=NS) == "1.71"
+    assert tot.findtext("nfe:vPIS", namespaces=NS) == "0.16"
+    assert tot.findtext("nfe:vCOFINS", namespaces=NS) == "0.72"
+    assert inf.findtext("nfe:ide/nfe:tpAmb", namespaces=NS) == "1"
+    assert inf.findtext("nfe:det/nfe:prod/nfe:xProd", namespaces=NS) == "Refrigerante <lata> 1"
+
+
+def test_dados_fiscais_do_produto_quando_item_nao_traz():
+    payload = _payload(1, ncm=None)
+    produto_id = payload["itens"][0]["produto_id"]
+
+    with pytest.raises(ValidationError) as exc:
+        _build(payload=payload)
+    assert exc.value.detail["code"] == "FISCAL_4007"
+
+    resultado = _build(payload=payload, produtos={produto_id: {"ncm": "61091000", "gtin": "7891234567895"}})
+    inf = ET.fromstring(resultado.xml).find("nfe:infNFe", NS)
+    assert inf.findtext("nfe:det/nfe:prod/nfe:NCM", namespaces=NS) == "61091000"
+    assert inf.findtext("nfe:det/nfe:prod/nfe:cEAN", namespaces=NS) == "7891234567895"
+
+
+def test_contingencia_offline_e_streaming():
+    builder = NfceXmlBuilder(_emitente())
+    semente = uuid.uuid4()
+    kwargs = dict(
+        payload=_payload(30), numero=77, serie=2, semente=semente, emissao=EMISSAO,
+        tipo_emissao=TP_EMIS_OFFLINE, justificativa_contingencia="SEFAZ fora do ar",
+    )
+
+    resultado = builder.build(**kwargs)
+    destino = io.StringIO()
+    chave = builder.escrever(destino, **kwargs)
+
+    assert chave == resultado.chave_acesso
+    assert chave[34] == "9"
+    assert destino.getvalue() == resultado.xml
+    assert "<xJust>SEFAZ fora do ar</xJust>" in resultado.xml
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Autenticação JWT com claims confiáveis (AUTH_JWT_CLAIMS_CONFIAVEIS):
+- Login grava perfil/filiais/terminal no token
+- Com o modo ligado, a requisição não lê usuario_user nem usuario_userfilial
+- Alteração de vínculo revoga os tokens do usuário
+- Logout revoga access e refresh (jti)
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.test import APIClient
+
+from fiscal.models import DocumentoFiscalSequencia
+from terminal.models.terminal_models import Terminal
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+LOGIN_URL = "/api/v1/usuario/auth/login"
+LOGOUT_URL = "/api/v1/usuario/auth/logout"
+REFRESH_URL = "/api/v1/usuario/auth/refresh"
+RESERVAR_URL = "/api/v1/fiscal/nfce/reservar-numero"
+
+
+@pytest.fixture
+def ambiente(two_tenants_with_admins, settings):
+    settings.ROOT_URLCONF = "config.urls"
+    settings.AUTH_JWT_CLAIMS_CONFIAVEIS = True
+
+    with schema_context(two_tenants_with_admins["schema1"]):
+        Filial = apps.get_model("filial", "Filial")
+        FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+
+        filial = Filial.objects.first()
+        FilialCertificadoA1.objects.create(
+            filial=filial,
+            a1_pfx=b"cert",
+            senha_hash="hash",
+            a1_expires_at=timezone.now() + timedelta(days=30),
+        )
+        user = get_user_model().objects.create_user(username="oper-claims", password="123456")
+        user.userfilial_set.create(filial_id=filial.id)
+        term = Terminal.objects.create(filial=filial, identificador="TERM-CLAIMS")
+        DocumentoFiscalSequencia.objects.create(
+            terminal=term, modelo=DocumentoFiscalSequencia.MODELO_NFCE, serie=1
+        )
+
+    client = APIClient()
+    client.defaults["HTTP_HOST"] = two_tenants_with_admins["payload1"]["domain"]
+    resp = client.post(
+        LOGIN_URL,
+        {"username": "oper-claims", "password": "123456", "terminal_id": str(term.id)},
+        format="json",
+    )
+    assert resp.status_code == 200, resp.content
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    return {
+        "schema": two_tenants_with_admins["schema1"],
+        "client": client,
+        "user": user,
+        "term": term,
+        "filial": filial,
+        "refresh": resp.json()["refresh"],
+    }
+
+
+def _reservar(amb):
+    return amb["client"].post(
+        RESERVAR_URL,
+        {"terminal_id": str(amb["term"].id), "serie": 1, "request_id": str(uuid.uuid4())},
+        format="json",
+    )
+
+
+def _selects(ctx, tabela):
+    return [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and f'"{tabela}"' in q["sql"]]
+
+
+def test_claims_confiaveis_dispensam_user_e_userfilial(ambiente):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = _reservar(ambiente)
+    assert resp.status_code == 200, resp.content
+
+    assert _selects(ctx, "usuario_user") == []
+    assert _selects(ctx, "usuario_userfilial") == []
+
+
+def test_modo_padrao_carrega_user_do_banco(ambiente, settings):
+    settings.AUTH_JWT_CLAIMS_CONFIAVEIS = False
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = _reservar(ambiente)
+    assert resp.status_code == 200, resp.content
+
+    assert _selects(ctx, "usuario_user")
+
+
+def test_alteracao_de_vinculo_revoga_tokens(ambiente):
+    assert _reservar(ambiente).status_code == 200
+
+    with schema_context(ambiente["schema"]):
+        ambiente["user"].userfilial_set.all().delete()
+
+    resp = _reservar(ambiente)
+    assert resp.status_code == 401
+    assert "AUTH_1012" in resp.content.decode()
+
+    # refresh emitido antes da revogação também não serve mais
+    resp = ambiente["client"].post(REFRESH_URL, {"refresh": ambiente["refresh"]}, format="json")
+    assert resp.status_code == 401
+
+
+def test_logout_revoga_access_e_refresh(ambiente, settings):
+    settings.AUTH_JWT_CLAIMS_CONFIAVEIS = False
+
+    resp = ambiente["client"].post(LOGOUT_URL, {"refresh": ambiente["refresh"]}, format="json")
+    assert resp.status_code == 200, resp.content
+
+    resp = _reservar(ambiente)
+    assert resp.status_code == 401
+    assert "AUTH_1012" in resp.content.decode()
+
+    resp = APIClient().post(
+        REFRESH_URL,
+        {"refresh": ambiente["refresh"]},
+        format="json",
+        HTTP_HOST=ambiente["client"].defaults["HTTP_HOST"],
+    )
+    assert resp.status_code == 401
+    assert resp.json()["code"] == "AUTH_1011"
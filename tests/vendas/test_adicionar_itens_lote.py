@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+adicionar_itens_lote:
+- produto_id e código de barras, desconto por linha, um bulk_create e totais uma vez
+- erros por linha sem abortar o lote; modo estrito não grava nada
+- regras de VendaItem (validar_valores) aplicadas antes do bulk_create
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from produtos.models.codigos_barras_models import ProdutoCodigoBarras
+from usuario.models.usuario_models import UserPerfil
+from vendas.models.venda_models import Venda, VendaStatus
+from vendas.services.vendas import adicionar_itens_lote, verificar_totais_vendas
+from vendas.services.vendas.dto import ItemLoteEntrada
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup(identificador: str):
+    Filial = apps.get_model("filial", "Filial")
+    Terminal = apps.get_model("terminal", "Terminal")
+    User = apps.get_model("usuario", "User")
+
+    filial = Filial.objects.first()
+    operador = User.objects.first()
+    operador.perfil = UserPerfil.objects.create(
+        descricao="OPER_LOTE",
+        desconto_maximo_percentual=Decimal("10.00"),
+    )
+    operador.save(update_fields=["perfil"])
+
+    terminal = Terminal.objects.create(filial=filial, identificador=identificador, ativo=True)
+    unidade = apps.get_model("produtos", "UnidadeMedida").objects.create(
+        sigla="UN", descricao="Unidade", ativo=True
+    )
+    ncm = apps.get_model("fiscal", "NCM").objects.create(
+        codigo="87089990", descricao="NCM basico", ativo=True
+    )
+    grupo = apps.get_model("produtos", "GrupoProduto").objects.create(
+        descricao="Grupo lote", ativo=True
+    )
+
+    produtos = [
+        apps.get_model("produtos", "Produto").objects.create(
+            descricao=f"Produto lote {i}",
+            preco_venda=Decimal(preco),
+            desconto_maximo_percentual=Decimal("5.00"),
+            grupo=grupo,
+            ncm=ncm,
+            unidade_comercial_id=unidade.id,
+            unidade_tributavel_id=unidade.id,
+            ativo=True,
+        )
+        for i, preco in enumerate(["10.00", "4.99"])
+    ]
+    ProdutoCodigoBarras.objects.create(produto=produtos[1], codigo="7891000100103")
+
+    motivo = apps.get_model("promocoes", "MotivoDesconto").objects.create(
+        codigo="LOTE", descricao="Desconto atacado."
+    )
+    venda = Venda.objects.create(
+        filial=filial, terminal=terminal, operador=operador, status=VendaStatus.ABERTA
+    )
+    return venda, operador, produtos, motivo
+
+
+def test_lote_grava_itens_validos_e_devolve_erros_por_linha(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, (p1, p2), motivo = _setup("CX_LOTE_01")
+
+        entradas = [
+            ItemLoteEntrada(produto_id=str(p1.id), quantidade=Decimal("2.000")),
+            ItemLoteEntrada(codigo_barras="7891000100103", quantidade=Decimal("3.000")),
+            ItemLoteEntrada(
+                produto_id=str(p1.id), quantidade=Decimal("1.000"), percentual_desconto=Decimal("5.00")
+            ),
+            ItemLoteEntrada(codigo_barras="0000000000000", quantidade=Decimal("1.000")),
+            ItemLoteEntrada(produto_id=str(p2.id), quantidade=Decimal("0.000")),
+            ItemLoteEntrada(
+                produto_id=str(p2.id), quantidade=Decimal("1.000"), percentual_desconto=Decimal("50.00")
+            ),
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = adicionar_itens_lote(
+                venda=venda, itens=entradas, operador=operador, motivo_desconto=motivo
+            )
+
+        assert len(resultado.itens) == 3
+        assert [(e.indice, e.codigo) for e in resultado.erros] == [
+            (3, "PRODUTO_NAO_ENCONTRADO"),
+            (4, "QUANTIDADE_INVALIDA"),
+            (5, "DESCONTO_NAO_PERMITIDO"),
+        ]
+
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "venda_item"')]
+        assert len(inserts) == 1
+
+        venda.refresh_from_db()
+        assert venda.itens.count() == 3
+        assert venda.total_bruto == Decimal("44.97")
+        assert venda.total_desconto == Decimal("0.50")
+        assert venda.total_liquido == Decimal("44.47")
+        assert verificar_totais_vendas() == []
+
+        com_desconto = venda.itens.get(percentual_desconto_aplicado=Decimal("5.00"))
+        assert com_desconto.desconto == Decimal("0.50")
+        assert com_desconto.total_liquido == com_desconto.total_bruto - com_desconto.desconto
+        assert com_desconto.motivo_desconto_id == motivo.id
+
+
+def test_lote_aplica_regras_do_modelo_por_linha(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, (p1, p2), _ = _setup("CX_LOTE_04")
+        # preço negativo passa pelo lookup, mas não pelas regras de VendaItem.clean()
+        type(p2).objects.filter(pk=p2.pk).update(preco_venda=Decimal("-1.00"))
+
+        resultado = adicionar_itens_lote(
+            venda=venda,
+            itens=[
+                ItemLoteEntrada(produto_id=str(p1.id), quantidade=Decimal("1.000")),
+                ItemLoteEntrada(produto_id=str(p2.id), quantidade=Decimal("1.000")),
+            ],
+            operador=operador,
+        )
+
+        assert len(resultado.itens) == 1
+        assert [(e.indice, e.codigo) for e in resultado.erros] == [(1, "ITEM_INVALIDO")]
+        venda.refresh_from_db()
+        assert venda.total_bruto == Decimal("10.00")
+
+
+def test_lote_estrito_nao_grava_nada_com_erro(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, (p1, _), _ = _setup("CX_LOTE_02")
+
+        with pytest.raises(ValidationError):
+            adicionar_itens_lote(
+                venda=venda,
+                itens=[
+                    ItemLoteEntrada(produto_id=str(p1.id), quantidade=Decimal("1.000")),
+                    ItemLoteEntrada(codigo_barras="0000000000000", quantidade=Decimal("1.000")),
+                ],
+                operador=operador,
+                estrito=True,
+            )
+
+        venda.refresh_from_db()
+        assert venda.itens.count() == 0
+        assert venda.total_bruto == Decimal("0.00")
+
+
+def test_lote_recusa_venda_nao_aberta(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, (p1, _), _ = _setup("CX_LOTE_03")
+        Venda.objects.filter(pk=venda.pk).update(status=VendaStatus.AGUARDANDO_PAGAMENTO)
+        venda.refresh_from_db()
+
+        with pytest.raises(ValidationError):
+            adicionar_itens_lote(
+                venda=venda,
+                itens=[ItemLoteEntrada(produto_id=str(p1.id), quantidade=Decimal("1.000"))],
+                operador=operador,
+            )
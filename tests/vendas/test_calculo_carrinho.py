@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo de cálculo do carrinho (centavos inteiros) x arredondamento atual:
+- tabela golden de itens (bruto, desconto, líquido) e rateio do desconto da venda
+- comparação com as fórmulas Decimal anteriores em casos gerados (sementes fixas)
+- pagamentos e saldo_a_pagar
+"""
+
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from vendas.models.venda_models import Venda
+from vendas.utils.calculo_carrinho import (
+    ItemCarrinho,
+    PagamentoCarrinho,
+    calcular_carrinho,
+)
+
+D = Decimal
+
+
+def _q(valor: Decimal) -> Decimal:
+    return valor.quantize(D("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _item_legado(preco: Decimal, quantidade: Decimal, percentual: Decimal):
+    """Fórmulas de adicionar_item + DescontoService.aplicar_desconto_item antes do núcleo."""
+    bruto = _q(preco * quantidade)
+    desconto = _q(bruto * percentual / D("100")) if percentual > 0 else D("0.00")
+    return bruto, desconto, _q(bruto - desconto)
+
+
+GOLDEN_ITENS = [
+    # preço, quantidade, percentual -> bruto, desconto, líquido
+    ("19.99", "3.000", "0", "59.97", "0.00", "59.97"),
+    ("3.33", "7.000", "7.50", "23.31", "1.75", "21.56"),
+    ("0.333333", "1.500", "0", "0.50", "0.00", "0.50"),
+    ("2.499999", "1.000", "0", "2.50", "0.00", "2.50"),
+    ("10.005", "1.000", "33.33", "10.01", "3.34", "6.67"),
+    ("1234.567891", "0.125", "12.34", "154.32", "19.04", "135.28"),
+    ("0.005", "1.000", "0", "0.01", "0.00", "0.01"),
+    ("99.99", "0.001", "0", "0.10", "0.00", "0.10"),
+    ("7.77", "11.000", "7.50", "85.47", "6.41", "79.06"),
+]
+
+
+@pytest.mark.parametrize("preco,quantidade,percentual,bruto,desconto,liquido", GOLDEN_ITENS)
+def test_golden_itens(preco, quantidade, percentual, bruto, desconto, liquido):
+    item = ItemCarrinho(preco_unitario=D(preco), quantidade=D(quantidade), percentual=D(percentual))
+
+    totais = calcular_carrinho([item])
+
+    assert (item.bruto, item.desconto, item.liquido) == (
+        int(D(bruto) * 100),
+        int(D(desconto) * 100),
+        int(D(liquido) * 100),
+    )
+    assert totais.decimal()["total_liquido"] == D(liquido)
+
+
+def test_golden_desconto_venda_rateado():
+    itens = [ItemCarrinho(preco_unitario=D("33.33"), quantidade=D("1.000")) for _ in range(3)]
+
+    totais = calcular_carrinho(itens, desconto_venda=1000)
+
+    assert [i.desconto for i in itens] == [334, 333, 333]
+    assert [i.percentual_aplicado for i in itens] == [D("10.02"), D("9.99"), D("9.99")]
+    assert totais.decimal() == {
+        "total_bruto": D("99.99"),
+        "total_desconto": D("10.00"),
+        "total_liquido": D("89.99"),
+        "total_pago": D("0.00"),
+        "total_troco": D("0.00"),
+    }
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_nucleo_igual_ao_calculo_decimal(seed):
+    rnd = random.Random(seed)
+    entradas = [
+        (
+            D(rnd.randint(0, 10**9)) / D(10**6),
+            D(rnd.randint(1, 10**5)) / D(1000),
+            D(rnd.choice([0, 0, rnd.randint(1, 10000)])) / D(100),
+        )
+        for _ in range(rnd.randint(1, 200))
+    ]
+
+    itens = [ItemCarrinho(preco_unitario=p, quantidade=q, percentual=pc) for p, q, pc in entradas]
+    totais = calcular_carrinho(itens).decimal()
+
+    legado = [_item_legado(*e) for e in entradas]
+    for item, (bruto, desconto, liquido) in zip(itens, legado):
+        assert (item.bruto, item.desconto, item.liquido) == (
+            int(bruto * 100),
+            int(desconto * 100),
+            int(liquido * 100),
+        )
+
+    # DescontoService.recalcular_totais_venda
+    total_bruto = sum((b for b, _, _ in legado), D("0.00"))
+    total_desconto = sum((b - l for b, _, l in legado), D("0.00"))
+    assert totais["total_bruto"] == total_bruto
+    assert totais["total_desconto"] == total_desconto
+    assert totais["total_liquido"] == _q(total_bruto - total_desconto)
+
+
+def test_pagamentos_e_saldo_a_pagar():
+    itens = [ItemCarrinho(preco_unitario=D("10.00"), quantidade=D("2.000"))]
+    totais = calcular_carrinho(
+        itens,
+        pagamentos=[PagamentoCarrinho(valor=1500), PagamentoCarrinho(valor=1000, troco=500)],
+    )
+
+    assert (totais.pago, totais.troco, totais.saldo) == (2500, 500, 0)
+
+    venda = Venda(
+        total_liquido=D("20.00"),
+        total_pago=D("12.50"),
+        total_troco=D("0.00"),
+    )
+    assert venda.saldo_a_pagar == D("7.50")
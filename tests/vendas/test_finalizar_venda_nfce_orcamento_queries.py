@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamento de queries do POST /api/v1/pdv/vendas/<id>/finalizar-nfce/ (modo síncrono):
+- Caminho feliz (venda paga → NFC-e autorizada → FINALIZADA) dentro de ORCAMENTO_QUERIES_FINALIZAR_NFCE
+- O número de queries não cresce com a quantidade de itens / pagamentos
+- Reenvio para venda já FINALIZADA: 2 leituras, sem tocar no fiscal
+"""
+
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import schema_context
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from fiscal.models import DocumentoFiscalSequencia, NfceDocumento
+from vendas.api.v1.views import FinalizarVendaNfceView
+from vendas.models.venda_models import VendaStatus
+from vendas.models.venda_pagamentos_models import StatusPagamento
+from vendas.services.finalizar_venda_nfce_service import ORCAMENTO_QUERIES_FINALIZAR_NFCE
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup():
+    Filial = apps.get_model("filial", "Filial")
+    FilialCertificadoA1 = apps.get_model("filial", "FilialCertificadoA1")
+    Terminal = apps.get_model("terminal", "Terminal")
+
+    filial = Filial.objects.first()
+    FilialCertificadoA1.objects.create(
+        filial=filial,
+        a1_pfx=b"cert",
+        senha_hash="hash",
+        a1_expires_at=timezone.now() + timedelta(days=30),
+    )
+    user = get_user_model().objects.create_user(username="oper-orcamento", password="123456")
+    user.userfilial_set.create(filial_id=filial.id)
+
+    terminal = Terminal.objects.create(filial=filial, identificador="CX_ORCAMENTO")
+    DocumentoFiscalSequencia.objects.create(
+        terminal=terminal,
+        modelo=DocumentoFiscalSequencia.MODELO_NFCE,
+        serie=1,
+        numero_atual=0,
+    )
+
+    unidade = apps.get_model("produtos", "UnidadeMedida").objects.create(
+        sigla="UN", descricao="Unidade", fator_conversao=Decimal("1.000000")
+    )
+    produto = apps.get_model("produtos", "Produto").objects.create(
+        codigo_interno="PROD_ORC",
+        descricao="Produto orçamento",
+        grupo=apps.get_model("produtos", "GrupoProduto").objects.create(nome="Grupo orçamento"),
+        unidade_comercial=unidade,
+        unidade_tributavel=unidade,
+        fator_conversao_tributavel=Decimal("1.000000"),
+        preco_venda=Decimal("10.000"),
+        ncm=apps.get_model("fiscal", "NCM").objects.create(codigo="22030000", descricao="Bebidas"),
+        ativo=True,
+    )
+    metodo = apps.get_model("metodoPagamento", "MetodoPagamento").objects.create(
+        codigo="DIN_ORC",
+        tipo="DIN",
+        descricao="Dinheiro",
+        utiliza_tef=False,
+        codigo_fiscal="01",
+        permite_troco=True,
+        ativo=True,
+    )
+    return user, filial, terminal, produto, metodo
+
+
+def _venda_paga(user, filial, terminal, produto, metodo, *, itens, pagamentos=1):
+    Venda = apps.get_model("vendas", "Venda")
+    total = Decimal("10.00") * itens
+
+    venda = Venda.objects.create(
+        filial=filial,
+        terminal=terminal,
+        operador=user,
+        tipo_venda="VENDA_NORMAL",
+        documento_fiscal_tipo="NFCE",
+        status=VendaStatus.PAGAMENTO_CONFIRMADO,
+        total_bruto=total,
+        total_desconto=Decimal("0.00"),
+        total_liquido=total,
+        total_pago=total,
+        total_troco=Decimal("0.00"),
+    )
+    for _ in range(itens):
+        venda.itens.create(
+            produto=produto,
+            descricao=produto.descricao,
+            quantidade=Decimal("1.000"),
+            preco_unitario=Decimal("10.000000"),
+            total_bruto=Decimal("10.00"),
+            desconto=Decimal("0.00"),
+            total_liquido=Decimal("10.00"),
+            ncm_codigo="22030000",
+        )
+    parcela = total / pagamentos
+    for _ in range(pagamentos):
+        venda.pagamentos.create(
+            metodo_pagamento=metodo,
+            valor_solicitado=parcela,
+            valor_autorizado=parcela,
+            valor_troco=Decimal("0.00"),
+            status=StatusPagamento.AUTORIZADO,
+            utiliza_tef=False,
+        )
+    return venda
+
+
+def _finalizar(user, venda):
+    request = APIRequestFactory().post(
+        f"/api/v1/pdv/vendas/{venda.id}/finalizar-nfce/",
+        {},
+        format="json",
+        HTTP_X_REQUEST_ID=str(uuid.uuid4()),
+    )
+    force_authenticate(request, user=user)
+    with CaptureQueriesContext(connection) as ctx:
+        response = FinalizarVendaNfceView.as_view()(request, venda_id=venda.id)
+    # SET search_path é do django-tenants (por cursor), não do fluxo
+    queries = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith("SET search_path")]
+    return response, queries
+
+
+def test_finalizar_nfce_dentro_do_orcamento(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, filial, terminal, produto, metodo = _setup()
+        venda = _venda_paga(user, filial, terminal, produto, metodo, itens=3)
+
+        response, queries = _finalizar(user, venda)
+
+        assert response.status_code == 200, response.data
+        assert response.data["venda"]["status"] == VendaStatus.FINALIZADA
+        assert response.data["nfce"]["status"] == "autorizada"
+        assert response.data["nfce"]["numero"] == 1
+        assert len(queries) <= ORCAMENTO_QUERIES_FINALIZAR_NFCE, "\n".join(queries)
+
+        venda.refresh_from_db()
+        assert venda.status == VendaStatus.FINALIZADA
+        doc = NfceDocumento.objects.pelo_indice(request_id=response.data["request_id"]).get()
+        assert doc.status == "autorizada"
+        assert len(doc.payload_enviado["itens"]) == 3
+
+
+def test_finalizar_nfce_queries_nao_crescem_com_itens(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, filial, terminal, produto, metodo = _setup()
+        pequena = _venda_paga(user, filial, terminal, produto, metodo, itens=1)
+        grande = _venda_paga(user, filial, terminal, produto, metodo, itens=8, pagamentos=2)
+
+        _, queries_pequena = _finalizar(user, pequena)
+        response, queries_grande = _finalizar(user, grande)
+
+        assert response.status_code == 200, response.data
+        assert len(queries_grande) == len(queries_pequena)
+
+
+def test_finalizar_nfce_reenvio_venda_finalizada(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        user, filial, terminal, produto, metodo = _setup()
+        venda = _venda_paga(user, filial, terminal, produto, metodo, itens=1)
+        _finalizar(user, venda)
+
+        response, queries = _finalizar(user, venda)
+
+        assert response.status_code == 200
+        assert response.data["nfce"] is None
+        assert response.data["venda"]["status"] == VendaStatus.FINALIZADA
+        assert len(queries) <= 2, "\n".join(queries)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Cache dos limites de desconto por (terminal, filial, perfil do operador):
+- validações repetidas não fazem query (nem lazy-load do perfil)
+- save de UserPerfil / Terminal invalida a entrada
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from usuario.models.usuario_models import UserPerfil
+from vendas.checks import checar_cache_limites_desconto
+from vendas.services.desconto_service import DescontoService
+from vendas.services.exceptions import (
+    DescontoNaoPermitidoError,
+    DescontoRequerAutenticacaoOperadorError,
+)
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup(identificador: str):
+    Filial = apps.get_model("filial", "Filial")
+    Terminal = apps.get_model("terminal", "Terminal")
+    User = apps.get_model("usuario", "User")
+
+    filial = Filial.objects.first()
+    perfil = UserPerfil.objects.create(
+        descricao="OPER_LIMITES", desconto_maximo_percentual=Decimal("5.00")
+    )
+    operador = User.objects.create(username=f"oper-{identificador}", perfil=perfil)
+    terminal = Terminal.objects.create(
+        filial=filial,
+        identificador=identificador,
+        ativo=True,
+        desconto_maximo_percentual=Decimal("2.00"),
+    )
+    # instância nova: perfil não carregado (o FK seria lazy-load a cada validação)
+    operador = User.objects.get(pk=operador.pk)
+    return filial, terminal, operador, perfil
+
+
+def _validar(percentual, *, terminal, filial, operador):
+    return DescontoService.validar_percentual_desconto(
+        percentual_solicitado=Decimal(percentual),
+        produto=None,
+        metodo_pagamento=None,
+        terminal=terminal,
+        filial=filial,
+        operador=operador,
+    )
+
+
+def test_validacoes_repetidas_sem_query(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal, operador, _ = _setup("CX_LIMITES_01")
+
+        assert _validar("1.00", terminal=terminal, filial=filial, operador=operador)[0] == "livre"
+
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(1000):
+                nivel, limites = _validar("1.50", terminal=terminal, filial=filial, operador=operador)
+
+        assert nivel == "livre"
+        assert limites.limite_operador == Decimal("5.00")
+        assert len(ctx.captured_queries) == 0
+
+
+def test_save_de_perfil_e_terminal_invalida_cache(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial, terminal, operador, perfil = _setup("CX_LIMITES_02")
+
+        with pytest.raises(DescontoNaoPermitidoError):
+            _validar("8.00", terminal=terminal, filial=filial, operador=operador)
+
+        perfil.desconto_maximo_percentual = Decimal("10.00")
+        perfil.save(update_fields=["desconto_maximo_percentual"])
+
+        with pytest.raises(DescontoRequerAutenticacaoOperadorError):
+            _validar("8.00", terminal=terminal, filial=filial, operador=operador)
+
+        terminal.desconto_maximo_percentual = Decimal("9.00")
+        terminal.save(update_fields=["desconto_maximo_percentual"])
+
+        assert _validar("8.00", terminal=terminal, filial=filial, operador=operador)[0] == "livre"
+
+
+def test_check_exige_cache_compartilhado(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        "compartilhado": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "pdv_cache"},
+    }
+
+    settings.DEBUG = True
+    assert [(m.id, m.is_serious()) for m in checar_cache_limites_desconto()] == [("vendas.E001", False)]
+
+    settings.DEBUG = False
+    assert [(m.id, m.is_serious()) for m in checar_cache_limites_desconto()] == [("vendas.E001", True)]
+
+    settings.VENDAS_LIMITES_DESCONTO_CACHE = "compartilhado"
+    assert checar_cache_limites_desconto() == []
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Rateio do desconto total da venda (maiores restos em centavos):
+- propriedades: soma exata, nenhuma parte acima do peso, proporcionalidade ±1 centavo,
+  determinismo (casos gerados com sementes fixas)
+- aplicar_desconto_total_venda grava todos os itens com um único UPDATE
+"""
+
+import random
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from usuario.models.usuario_models import UserPerfil
+from vendas.models.venda_models import Venda, VendaStatus
+from vendas.services.desconto_service import DescontoService
+from vendas.utils.centavos import (
+    de_centavos,
+    para_centavos,
+    ratear_maiores_restos,
+)
+
+
+def _caso(seed: int):
+    rnd = random.Random(seed)
+    pesos = [rnd.choice([0, 1, 7, 99, rnd.randint(1, 10**7)]) for _ in range(rnd.randint(1, 300))]
+    if not any(pesos):
+        pesos[0] = 1
+    valor = rnd.randint(0, sum(pesos))
+    return valor, pesos
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_rateio_soma_exata_e_limitado_pelo_peso(seed):
+    valor, pesos = _caso(seed)
+
+    partes = ratear_maiores_restos(valor, pesos)
+
+    assert sum(partes) == valor
+    assert len(partes) == len(pesos)
+    soma = sum(pesos)
+    for parte, peso in zip(partes, pesos):
+        assert 0 <= parte <= peso
+        # no máximo 1 centavo acima da cota exata (floor)
+        assert valor * peso // soma <= parte <= valor * peso // soma + 1
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_rateio_acrescimo_espelha_desconto_e_e_deterministico(seed):
+    valor, pesos = _caso(seed)
+
+    assert ratear_maiores_restos(-valor, pesos) == [-p for p in ratear_maiores_restos(valor, pesos)]
+    assert ratear_maiores_restos(valor, pesos) == ratear_maiores_restos(valor, list(pesos))
+
+
+def test_rateio_casos_conhecidos():
+    assert ratear_maiores_restos(1000, [3000, 7000]) == [300, 700]
+    assert ratear_maiores_restos(1000, [3333, 3333, 3334]) == [333, 333, 334]
+    assert ratear_maiores_restos(2, [100, 100, 100]) == [1, 1, 0]
+    assert ratear_maiores_restos(0, [5, 0, 5]) == [0, 0, 0]
+
+    with pytest.raises(ValueError):
+        ratear_maiores_restos(1, [0, 0])
+    with pytest.raises(ValueError):
+        ratear_maiores_restos(1, [1, -1])
+
+
+def test_conversao_centavos():
+    assert para_centavos(Decimal("12.345")) == 1235
+    assert para_centavos(Decimal("-0.01")) == -1
+    assert de_centavos(1235) == Decimal("12.35")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_desconto_total_venda_um_update_e_soma_exata(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        filial = apps.get_model("filial", "Filial").objects.first()
+        operador = apps.get_model("usuario", "User").objects.first()
+        operador.perfil = UserPerfil.objects.create(
+            descricao="OPER_RATEIO", desconto_maximo_percentual=Decimal("50.00")
+        )
+        operador.save(update_fields=["perfil"])
+        terminal = apps.get_model("terminal", "Terminal").objects.create(
+            filial=filial, identificador="CX_RATEIO", ativo=True
+        )
+        unidade = apps.get_model("produtos", "UnidadeMedida").objects.create(
+            sigla="UN", descricao="Unidade", ativo=True
+        )
+        produto = apps.get_model("produtos", "Produto").objects.create(
+            descricao="Produto rateio",
+            preco_venda=Decimal("33.33"),
+            grupo=apps.get_model("produtos", "GrupoProduto").objects.create(descricao="Rateio", ativo=True),
+            ncm=apps.get_model("fiscal", "NCM").objects.create(codigo="87089990", descricao="NCM", ativo=True),
+            unidade_comercial_id=unidade.id,
+            unidade_tributavel_id=unidade.id,
+            ativo=True,
+        )
+        motivo = apps.get_model("promocoes", "MotivoDesconto").objects.create(
+            codigo="RATEIO", descricao="Desconto no total."
+        )
+
+        n = 25
+        venda = Venda.objects.create(
+            filial=filial,
+            terminal=terminal,
+            operador=operador,
+            status=VendaStatus.ABERTA,
+            total_bruto=Decimal("33.33") * n,
+            total_liquido=Decimal("33.33") * n,
+        )
+        for _ in range(n):
+            venda.itens.create(
+                produto=produto,
+                descricao=produto.descricao,
+                quantidade=Decimal("1.000"),
+                preco_unitario=Decimal("33.33"),
+                total_bruto=Decimal("33.33"),
+                total_liquido=Decimal("33.33"),
+            )
+
+        with CaptureQueriesContext(connection) as ctx:
+            DescontoService.aplicar_desconto_total_venda(
+                venda=venda,
+                valor_desconto=Decimal("100.01"),
+                operador=operador,
+                motivo=motivo,
+                operador_autenticado=True,
+            )
+
+        updates_itens = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "venda_item"')]
+        selects_itens = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and 'FROM "venda_item"' in q["sql"]
+        ]
+        assert len(updates_itens) == 1
+        assert len(selects_itens) == 1
+
+        venda.refresh_from_db()
+        descontos = [it.desconto for it in venda.itens.all()]
+        assert sum(descontos) == Decimal("100.01")
+        assert max(descontos) - min(descontos) == Decimal("0.01")
+        assert venda.total_desconto == Decimal("100.01")
+        assert venda.total_liquido == venda.total_bruto - Decimal("100.01")
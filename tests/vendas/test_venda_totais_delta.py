@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Totais da venda mantidos por delta (F()) nas operações de carrinho:
+- adicionar/alterar/remover mantêm os totais iguais ao recálculo completo
+- alterar quantidade grava o valor de desconto e devolve a venda com os totais do banco
+- adicionar_item não relê os itens da venda (um INSERT + um UPDATE)
+- verificar_totais_vendas detecta e corrige divergências
+- recálculo completo grava mesmo com a instância em memória defasada do banco
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from usuario.models.usuario_models import UserPerfil
+from vendas.models.venda_models import Venda, VendaStatus
+from vendas.services.desconto_service import DescontoService
+from vendas.services.vendas import (
+    adicionar_item,
+    alterar_quantidade_item,
+    remover_item,
+    verificar_totais_vendas,
+)
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _setup(identificador: str):
+    Filial = apps.get_model("filial", "Filial")
+    Terminal = apps.get_model("terminal", "Terminal")
+    User = apps.get_model("usuario", "User")
+
+    filial = Filial.objects.first()
+    operador = User.objects.first()
+    operador.perfil = UserPerfil.objects.create(
+        descricao="OPER_DELTA",
+        desconto_maximo_percentual=Decimal("10.00"),
+    )
+    operador.save(update_fields=["perfil"])
+
+    terminal = Terminal.objects.create(filial=filial, identificador=identificador, ativo=True)
+
+    unidade = apps.get_model("produtos", "UnidadeMedida").objects.create(
+        sigla="UN", descricao="Unidade", ativo=True
+    )
+    ncm = apps.get_model("fiscal", "NCM").objects.create(
+        codigo="87089990", descricao="NCM basico", ativo=True
+    )
+    grupo = apps.get_model("produtos", "GrupoProduto").objects.create(
+        descricao="Grupo delta", ativo=True
+    )
+
+    def produto(descricao: str, preco: str):
+        return apps.get_model("produtos", "Produto").objects.create(
+            descricao=descricao,
+            preco_venda=Decimal(preco),
+            desconto_maximo_percentual=Decimal("10.00"),
+            grupo=grupo,
+            ncm=ncm,
+            unidade_comercial_id=unidade.id,
+            unidade_tributavel_id=unidade.id,
+            ativo=True,
+        )
+
+    motivo = apps.get_model("promocoes", "MotivoDesconto").objects.create(
+        codigo="DELTA_CART",
+        descricao="Desconto carrinho (delta).",
+    )
+
+    venda = Venda.objects.create(
+        filial=filial,
+        terminal=terminal,
+        operador=operador,
+        status=VendaStatus.ABERTA,
+    )
+    return venda, operador, produto, motivo
+
+
+def _assert_totais_iguais_ao_recalculo(venda):
+    venda.refresh_from_db()
+    armazenado = (venda.total_bruto, venda.total_desconto, venda.total_liquido)
+
+    esperado = DescontoService.recalcular_totais_venda(
+        Venda.objects.get(pk=venda.pk), salvar=False
+    )
+    assert armazenado == (esperado.total_bruto, esperado.total_desconto, esperado.total_liquido)
+
+
+def test_operacoes_de_carrinho_mantem_totais_por_delta(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, produto, motivo = _setup("CX_DELTA_01")
+        p1 = produto("Produto delta 1", "19.99")
+        p2 = produto("Produto delta 2", "3.33")
+
+        i1 = adicionar_item(venda=venda, produto=p1, quantidade=Decimal("3.000"), operador=operador)
+        _assert_totais_iguais_ao_recalculo(venda)
+
+        i2 = adicionar_item(
+            venda=venda,
+            produto=p2,
+            quantidade=Decimal("7.000"),
+            operador=operador,
+            motivo_desconto=motivo,
+            percentual_desconto=Decimal("7.50"),
+        )
+        _assert_totais_iguais_ao_recalculo(venda)
+        assert venda.total_desconto == i2.total_bruto - i2.total_liquido > 0
+
+        i2 = alterar_quantidade_item(
+            venda=venda, item=i2, nova_quantidade=Decimal("11.000"), operador=operador
+        )
+        assert i2.percentual_desconto_aplicado == Decimal("7.50")
+        # valor de desconto gravado e totais da instância iguais aos do banco
+        i2.refresh_from_db(fields=["desconto"])
+        assert i2.desconto == i2.total_bruto - i2.total_liquido > 0
+        db = Venda.objects.get(pk=venda.pk)
+        assert (venda.total_bruto, venda.total_desconto, venda.total_liquido) == (
+            db.total_bruto,
+            db.total_desconto,
+            db.total_liquido,
+        )
+        _assert_totais_iguais_ao_recalculo(venda)
+
+        DescontoService.aplicar_desconto_item(
+            venda=venda,
+            item=i1,
+            percentual_desconto_aplicado=Decimal("5.00"),
+            operador=operador,
+            motivo=motivo,
+        )
+        _assert_totais_iguais_ao_recalculo(venda)
+
+        remover_item(venda=venda, item=i2)
+        _assert_totais_iguais_ao_recalculo(venda)
+
+        remover_item(venda=venda, item=i1)
+        venda.refresh_from_db()
+        assert (venda.total_bruto, venda.total_desconto, venda.total_liquido) == (
+            Decimal("0.00"),
+            Decimal("0.00"),
+            Decimal("0.00"),
+        )
+        assert verificar_totais_vendas() == []
+
+
+def test_adicionar_item_nao_rele_itens_da_venda(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, produto, _ = _setup("CX_DELTA_02")
+        p1 = produto("Produto delta 3", "2.50")
+
+        for _ in range(5):
+            adicionar_item(venda=venda, produto=p1, quantidade=Decimal("1.000"), operador=operador)
+
+        with CaptureQueriesContext(connection) as ctx:
+            adicionar_item(venda=venda, produto=p1, quantidade=Decimal("1.000"), operador=operador)
+
+        sqls = [q["sql"] for q in ctx.captured_queries]
+        assert not [s for s in sqls if s.startswith("SELECT") and '"venda_item"' in s]
+        assert len([s for s in sqls if s.startswith('UPDATE "venda" ')]) == 1
+        assert venda.total_bruto == Decimal("15.00")
+        _assert_totais_iguais_ao_recalculo(venda)
+
+
+def test_verificar_totais_vendas_detecta_e_corrige(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, produto, _ = _setup("CX_DELTA_03")
+        adicionar_item(
+            venda=venda, produto=produto("Produto delta 4", "10.00"), quantidade=Decimal("2.000"), operador=operador
+        )
+
+        Venda.objects.filter(pk=venda.pk).update(total_bruto=Decimal("99.00"))
+
+        divergencias = verificar_totais_vendas(corrigir=True)
+        assert [d.venda_id for d in divergencias] == [str(venda.id)]
+        assert divergencias[0].esperado_bruto == Decimal("20.00")
+        assert divergencias[0].corrigida
+
+        venda.refresh_from_db()
+        assert venda.total_bruto == Decimal("20.00")
+        assert verificar_totais_vendas() == []
+
+
+def test_recalculo_completo_corrige_banco_com_instancia_defasada(two_tenants_with_admins):
+    with schema_context(two_tenants_with_admins["schema1"]):
+        venda, operador, produto, _ = _setup("CX_DELTA_04")
+        adicionar_item(
+            venda=venda, produto=produto("Produto delta 5", "10.00"), quantidade=Decimal("2.000"), operador=operador
+        )
+        assert venda.total_bruto == Decimal("20.00")
+
+        # a instância em memória já tem os valores corretos; o banco, não
+        Venda.objects.filter(pk=venda.pk).update(total_bruto=Decimal("99.00"), total_liquido=Decimal("99.00"))
+
+        DescontoService.recalcular_totais_venda(venda)
+
+        venda.refresh_from_db()
+        assert (venda.total_bruto, venda.total_liquido) == (Decimal("20.00"), Decimal("20.00"))
+        assert verificar_totais_vendas() == []
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UsuarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuario'
+
+    def ready(self):
+        from usuario.signals import conectar_sinais_revogacao
+
+        conectar_sinais_revogacao()
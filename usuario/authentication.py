@@ -0,0 +1,165 @@
+# usuario/authentication.py
+"""
+Autenticação JWT do PDV.
+
+Modo padrão: igual ao JWTAuthentication do SimpleJWT (User carregado do banco
+a cada requisição).
+
+Com AUTH_JWT_CLAIMS_CONFIAVEIS=True, os tokens emitidos pelo login (claim
+"pdv_claims") são confiáveis durante o tempo de vida: o User é remontado a
+partir das claims assinadas (id, username, perfil, limite de desconto,
+filiais permitidas, terminal/filial do login), sem consulta ao banco.
+Services que consultariam UserFilial usam `user.filiais_permitidas`.
+
+Revogação, num cache compartilhado entre processos (alias
+AUTH_REVOGACAO_CACHE; Redis/Memcached em produção):
+  - por token (jti), em qualquer modo: revogar_token() (POST auth/logout);
+  - por usuário, só para tokens confiáveis: revogar_tokens_do_usuario()
+    recusa tokens emitidos até aquele instante. Disparada pelos sinais de
+    User, UserFilial e UserPerfil (usuario.signals), já que as claims
+    deixariam de refletir o cadastro.
+"""
+
+import time
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+CLAIMS_VERSAO = 1
+
+_PREFIXO = "pdv:auth:revogado"
+
+
+def _cache():
+    return caches[getattr(settings, "AUTH_REVOGACAO_CACHE", "default")]
+
+
+def _schema() -> str:
+    return getattr(connection, "schema_name", "")
+
+
+def _chave_jti(jti) -> str:
+    return f"{_PREFIXO}:jti:{jti}"
+
+
+def _chave_usuario(schema: str, user_id) -> str:
+    return f"{_PREFIXO}:{schema}:user:{user_id}"
+
+
+def claims_confiaveis_ativas() -> bool:
+    return bool(getattr(settings, "AUTH_JWT_CLAIMS_CONFIAVEIS", False))
+
+
+def filiais_das_claims(user) -> Optional[frozenset]:
+    """Filiais permitidas vindas do token confiável; None se o User veio do banco."""
+    return getattr(user, "filiais_permitidas", None)
+
+
+def adicionar_claims_pdv(token, user, *, terminal, filiais: Iterable) -> None:
+    """
+    Grava no token (refresh; o access herda) as claims usadas no modo
+    AUTH_JWT_CLAIMS_CONFIAVEIS. `emitido_em` tem fração de segundo para a
+    revogação por usuário não alcançar um login logo após a alteração.
+    """
+    perfil = user.perfil if user.perfil_id else None
+    desconto = getattr(perfil, "desconto_maximo_percentual", None)
+
+    token["pdv_claims"] = CLAIMS_VERSAO
+    token["emitido_em"] = time.time()
+    token["username"] = user.get_username()
+    token["perfil"] = user.perfil_id
+    token["desconto_maximo_percentual"] = None if desconto is None else str(desconto)
+    token["filiais"] = sorted(str(f) for f in filiais)
+    token["terminal_id"] = str(terminal.id)
+    token["filial_id"] = str(terminal.filial_id)
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+
+
+def revogar_token(token) -> None:
+    """Revoga um token (jti) até o seu vencimento."""
+    restante = int(token["exp"] - time.time())
+    if restante > 0:
+        _cache().set(_chave_jti(token[api_settings.JTI_CLAIM]), True, timeout=restante)
+
+
+def revogar_tokens_do_usuario(user_id, schema: Optional[str] = None) -> None:
+    """
+    Recusa os tokens confiáveis do usuário emitidos até agora. A marca dura o
+    tempo de vida de um refresh token (nenhum token anterior sobrevive a isso).
+    """
+    schema = _schema() if schema is None else schema
+    _cache().set(
+        _chave_usuario(schema, user_id),
+        time.time(),
+        timeout=int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+def _token_confiavel(token) -> bool:
+    return claims_confiaveis_ativas() and token.get("pdv_claims") == CLAIMS_VERSAO
+
+
+def token_revogado(token) -> bool:
+    """
+    jti na lista de revogação ou, para token confiável, emitido até a última
+    revogação do usuário. Uma leitura (get_many) no cache.
+    """
+    confiavel = _token_confiavel(token)
+    chaves = [_chave_jti(token.get(api_settings.JTI_CLAIM))]
+    if confiavel:
+        chaves.append(_chave_usuario(_schema(), token.get(api_settings.USER_ID_CLAIM)))
+    marcas = _cache().get_many(chaves)
+
+    if marcas.get(chaves[0]):
+        return True
+    revogado_em = marcas.get(chaves[-1]) if confiavel else None
+    return revogado_em is not None and token.get("emitido_em", token.get("iat", 0)) <= revogado_em
+
+
+class PdvJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication com revogação e, se AUTH_JWT_CLAIMS_CONFIAVEIS, com o
+    User remontado das claims. Tokens sem "pdv_claims" seguem pelo banco.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if token_revogado(token):
+            raise InvalidToken({"code": "AUTH_1012", "message": "Token revogado."})
+        return token
+
+    def get_user(self, validated_token):
+        if not _token_confiavel(validated_token):
+            return super().get_user(validated_token)
+        return _usuario_das_claims(validated_token)
+
+
+def _usuario_das_claims(token):
+    """
+    User parcial (from_db com campos adiados): atributos fora das claims são
+    lidos do banco sob demanda e save() só grava os campos carregados.
+    """
+    desconto = token.get("desconto_maximo_percentual")
+    campos = {
+        "id": token[api_settings.USER_ID_CLAIM],
+        "username": token.get("username", ""),
+        "perfil_id": token.get("perfil"),
+        "is_active": True,
+        "is_staff": bool(token.get("is_staff")),
+        "is_superuser": bool(token.get("is_superuser")),
+    }
+    user = get_user_model().from_db("default", list(campos), list(campos.values()))
+
+    user.filiais_permitidas = frozenset(token.get("filiais", ()))
+    user.desconto_maximo_percentual = None if desconto is None else Decimal(desconto)
+    user.terminal_id_login = token.get("terminal_id")
+    user.filial_id_login = token.get("filial_id")
+    return user
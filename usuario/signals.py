@@ -0,0 +1,51 @@
+# usuario/signals.py
+"""
+Revogação dos tokens confiáveis (usuario.authentication) quando o cadastro
+que vira claim muda: vínculos (UserFilial), perfil/flags do User e limite de
+desconto do UserPerfil.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from usuario.authentication import revogar_tokens_do_usuario
+
+# Campos do User copiados para as claims
+_CAMPOS_CLAIMS_USER = {"username", "perfil", "perfil_id", "is_active", "is_staff", "is_superuser"}
+
+
+def _revogar_por_vinculo(sender, instance, **kwargs):
+    revogar_tokens_do_usuario(instance.user_id)
+
+
+def _revogar_por_usuario(sender, instance, created=False, update_fields=None, **kwargs):
+    if created:
+        return
+    # save(update_fields=["password"]) (rehash no login) não mexe nas claims
+    if update_fields is not None and not _CAMPOS_CLAIMS_USER.intersection(update_fields):
+        return
+    revogar_tokens_do_usuario(instance.pk)
+
+
+def _revogar_usuario_removido(sender, instance, **kwargs):
+    revogar_tokens_do_usuario(instance.pk)
+
+
+def _revogar_por_perfil(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    from usuario.models.usuario_models import User
+
+    for user_id in User.objects.filter(perfil_id=instance.pk).values_list("id", flat=True):
+        revogar_tokens_do_usuario(user_id)
+
+
+def conectar_sinais_revogacao():
+    from usuario.models.usuario_models import User, UserFilial, UserPerfil
+
+    post_save.connect(_revogar_por_vinculo, sender=UserFilial, dispatch_uid="usuario_revoga_userfilial_save")
+    post_delete.connect(_revogar_por_vinculo, sender=UserFilial, dispatch_uid="usuario_revoga_userfilial_delete")
+    post_save.connect(_revogar_por_usuario, sender=User, dispatch_uid="usuario_revoga_user_save")
+    post_delete.connect(_revogar_usuario_removido, sender=User, dispatch_uid="usuario_revoga_user_delete")
+    post_save.connect(_revogar_por_perfil, sender=UserPerfil, dispatch_uid="usuario_revoga_perfil_save")
+    # pre_delete: depois do delete o SET_NULL já desvinculou os usuários
+    pre_delete.connect(_revogar_por_perfil, sender=UserPerfil, dispatch_uid="usuario_revoga_perfil_delete")
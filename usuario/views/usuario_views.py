@@ -1,7 +1,9 @@
-from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from django.utils import timezone
@@ -12,6 +14,7 @@ from terminal.models import Terminal
 from django.contrib.auth import get_user_model
 import hashlib
 
+from usuario.authentication import adicionar_claims_pdv, revogar_token, token_revogado
 from usuario.serializers import LoginSerializer, PinSerializer
 
 User = get_user_model()
@@ -36,15 +39,14 @@ def login(request):
 
     # Checagem: usuário possui acesso à filial do terminal?
     # Como Filial é multi-tenant, aqui assumimos filial_id armazenado no terminal
-    has_access = user.userfilial_set.filter(filial_id=term.filial_id).exists()
-    if not has_access:
+    # (a lista completa de filiais também vai para as claims do token)
+    filiais = [str(f) for f in user.userfilial_set.values_list("filial_id", flat=True)]
+    if str(term.filial_id) not in filiais:
         return Response({"code":"AUTH_1006","message":"Usuário não autorizado na filial do terminal"}, status=403)
 
     refresh = RefreshToken.for_user(user)
-    # claims
-    refresh["perfil"] = user.perfil
-    refresh["terminal_id"] = str(term.id)
-    refresh["filial_id"] = str(term.filial_id)
+    # claims (perfil, terminal, filial, filiais permitidas...) — ver usuario.authentication
+    adicionar_claims_pdv(refresh, user, terminal=term, filiais=filiais)
 
     access = refresh.access_token
     # inatividade (>2h) — guardaremos last_activity em cache/db (fase 2)
@@ -54,7 +56,7 @@ def login(request):
     return Response({
         "access": str(access),
         "refresh": str(refresh),
-        "perfil": user.perfil,
+        "perfil": user.perfil_id,
         "terminal_id": str(term.id),
         "filial_id": str(term.filial_id),
     })
@@ -64,10 +66,22 @@ def login(request):
 def refresh(request):
     from rest_framework_simplejwt.serializers import TokenRefreshSerializer
     ser = TokenRefreshSerializer(data=request.data)
-    if not ser.is_valid():
+    if not ser.is_valid() or token_revogado(RefreshToken(request.data["refresh"])):
         return Response({"code":"AUTH_1011","message":"Refresh token inválido ou expirado."}, status=401)
     return Response(ser.validated_data)
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    # revoga o access em uso e, se enviado, o refresh (lista de revogação em cache)
+    revogar_token(request.auth)
+    if request.data.get("refresh"):
+        try:
+            revogar_token(RefreshToken(request.data["refresh"]))
+        except TokenError:
+            return Response({"code":"AUTH_1011","message":"Refresh token inválido ou expirado."}, status=401)
+    return Response({"ok": True})
+
 @api_view(["POST"])
 def validar_pin(request):
     ser = PinSerializer(data=request.data)
@@ -0,0 +1,31 @@
+# vendas/api/v1/serializers.py
+from rest_framework import serializers
+
+
+class ItemLoteInputSerializer(serializers.Serializer):
+    """
+    Linha do lote: produto_id OU codigo_barras, quantidade e desconto opcional.
+    """
+
+    produto_id = serializers.UUIDField(required=False, allow_null=True)
+    codigo_barras = serializers.CharField(required=False, allow_null=True, allow_blank=False, max_length=20)
+    quantidade = serializers.DecimalField(max_digits=12, decimal_places=3)
+    percentual_desconto = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False, allow_null=True
+    )
+
+
+class AdicionarItensLoteInputSerializer(serializers.Serializer):
+    """
+    Dados de entrada de POST /api/v1/pdv/vendas/<id>/itens/lote/.
+
+    A validação de cada linha (produto, quantidade, desconto) é feita pela
+    service, que devolve os erros por linha.
+    """
+
+    itens = ItemLoteInputSerializer(many=True, allow_empty=False, max_length=1000)
+    motivo_desconto_id = serializers.UUIDField(required=False, allow_null=True)
+    operador_autenticado = serializers.BooleanField(required=False, default=False)
+    aprovador_id = serializers.IntegerField(required=False, allow_null=True)
+    aprovador_autenticado = serializers.BooleanField(required=False, default=False)
+    estrito = serializers.BooleanField(required=False, default=False)
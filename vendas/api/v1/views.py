@@ -4,16 +4,25 @@ import logging
 from uuid import uuid4
 
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.core.exceptions import ValidationError as DjangoValidationError
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import APIException
 
 from vendas.models.venda_models import Venda, VendaStatus
+from fiscal.services.emissao_fila_service import emissao_assincrona
+from promocoes.models.motivo_desconto_models import MotivoDesconto
+from usuario.models.usuario_models import User
+from vendas.api.v1.serializers import AdicionarItensLoteInputSerializer
+from vendas.services.vendas.adicionar_itens_lote_service import adicionar_itens_lote
+from vendas.services.vendas.dto import ItemLoteEntrada
 from vendas.services.finalizar_venda_nfce_service import (
     finalizar_venda_e_emitir_nfce,
+    finalizar_venda_e_enfileirar_nfce,
 )
 
 logger = logging.getLogger(__name__)
@@ -30,9 +39,16 @@ class FinalizarVendaNfceView(APIView):
     - Chama finalizar_venda_e_emitir_nfce().
     - Mapeia o resultado (ou erro) para um JSON padronizado.
 
+    Em modo assíncrono (FISCAL_NFCE_EMISSAO_MODO="assincrono" ou cabeçalho
+    "Prefer: respond-async") a SEFAZ não é chamada na requisição: a venda vai
+    para AGUARDANDO_EMISSAO_FISCAL, a pré-emissão é feita e a emissão é
+    enfileirada (202 + status_url).
+
     Códigos de resposta:
     - 200 OK:
         - Venda FINALIZADA (NFCE emitida, ou chamada idempotente).
+    - 202 ACCEPTED:
+        - Emissão enfileirada (modo assíncrono).
     - 400 BAD REQUEST:
         - Erro de validação de negócio (ex.: venda não paga, tipo fiscal inválido).
     - 404 NOT FOUND:
@@ -67,6 +83,9 @@ class FinalizarVendaNfceView(APIView):
             request_id,
         )
 
+        if emissao_assincrona(request.headers.get("Prefer")):
+            return self._enfileirar(venda, operador, request_id)
+
         try:
             nfce_doc = finalizar_venda_e_emitir_nfce(
                 venda=venda,
@@ -124,8 +143,7 @@ class FinalizarVendaNfceView(APIView):
                 status=status.HTTP_502_BAD_GATEWAY,
             )
 
-        # Se não houve exceção, recarrega a venda para inspecionar status final
-        venda.refresh_from_db()
+        # Sem exceção, o service já copiou o status final para `venda`
 
         # Monta payload base da venda
         venda_payload = {
@@ -201,3 +219,189 @@ class FinalizarVendaNfceView(APIView):
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
+
+    def _enfileirar(self, venda, operador, request_id):
+        """
+        Fluxo assíncrono: pré-emissão + enfileiramento, resposta 202.
+        """
+        try:
+            job = finalizar_venda_e_enfileirar_nfce(
+                venda=venda,
+                operador=operador,
+                request_id=request_id,
+            )
+        except DjangoValidationError as exc:
+            detail = exc.message if hasattr(exc, "message") else str(exc)
+            return Response(
+                {
+                    "code": "ERRO_VALIDACAO_VENDA_NFCE",
+                    "detail": detail,
+                    "venda_id": str(venda.id),
+                    "request_id": str(request_id),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except APIException as exc:
+            # Erros fiscais de pré-emissão (pagamentos, série, A1, vínculo):
+            # transação desfeita, venda permanece no status anterior.
+            logger.warning(
+                "HTTP PDV: pré-emissão NFC-e recusada ao enfileirar. "
+                "venda_id=%s erro=%s request_id=%s",
+                venda.id,
+                exc.detail,
+                request_id,
+            )
+            return Response(
+                {
+                    "code": "ERRO_FISCAL",
+                    "detail": exc.detail,
+                    "venda_id": str(venda.id),
+                    "request_id": str(request_id),
+                },
+                status=exc.status_code,
+            )
+
+        venda.refresh_from_db()
+        venda_payload = {
+            "id": str(venda.id),
+            "status": venda.status,
+            "documento_fiscal_tipo": getattr(venda, "documento_fiscal_tipo", None),
+            "codigo_erro_fiscal": getattr(venda, "codigo_erro_fiscal", None),
+            "mensagem_erro_fiscal": getattr(venda, "mensagem_erro_fiscal", None),
+        }
+
+        if job is None:
+            # Venda já FINALIZADA (idempotência)
+            return Response(
+                {
+                    "code": "NFCE_EMITIDA",
+                    "detail": "Venda finalizada com NFC-e autorizada.",
+                    "venda": venda_payload,
+                    "nfce": None,
+                    "request_id": str(request_id),
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        status_url = reverse(
+            "fiscal:nfce_emissao_status", kwargs={"request_id": job.request_id}
+        )
+        return Response(
+            {
+                "code": "NFCE_EMISSAO_ENFILEIRADA",
+                "detail": "Emissão NFC-e enfileirada. Consulte status_url.",
+                "venda": venda_payload,
+                "job": {"id": str(job.id), "status": job.status, "uf": job.uf},
+                "status_url": status_url,
+                "request_id": str(job.request_id),
+            },
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url},
+        )
+
+
+class AdicionarItensLoteView(APIView):
+    """
+    Adiciona várias linhas ao carrinho em uma única requisição/transação
+    (rajada de leitor de código de barras, sincronização offline).
+
+    Corpo:
+        {
+          "itens": [{"produto_id" | "codigo_barras", "quantidade", "percentual_desconto"?}, ...],
+          "motivo_desconto_id": opcional (obrigatório se houver desconto),
+          "operador_autenticado": false (senha do operador conferida pelo PDV),
+          "aprovador_id": opcional, "aprovador_autenticado": false,
+          "estrito": false
+        }
+
+    Códigos de resposta:
+    - 200 OK: linhas válidas gravadas; "erros" traz as linhas recusadas.
+    - 400 BAD REQUEST: payload inválido, venda não ABERTA ou, com
+      estrito=true, qualquer linha inválida (nada é gravado).
+    - 404 NOT FOUND: venda, motivo ou aprovador não encontrado no tenant atual.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, venda_id, *args, **kwargs):
+        serializer = AdicionarItensLoteInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+
+        venda = get_object_or_404(Venda, pk=venda_id)
+
+        motivo = None
+        if dados.get("motivo_desconto_id"):
+            motivo = get_object_or_404(MotivoDesconto, pk=dados["motivo_desconto_id"])
+
+        aprovador = None
+        if dados.get("aprovador_id") is not None:
+            aprovador = get_object_or_404(User, pk=dados["aprovador_id"])
+
+        entradas = [
+            ItemLoteEntrada(
+                produto_id=linha.get("produto_id"),
+                codigo_barras=linha.get("codigo_barras"),
+                quantidade=linha["quantidade"],
+                percentual_desconto=linha.get("percentual_desconto"),
+            )
+            for linha in dados["itens"]
+        ]
+
+        try:
+            resultado = adicionar_itens_lote(
+                venda=venda,
+                itens=entradas,
+                operador=request.user,
+                motivo_desconto=motivo,
+                aprovador=aprovador,
+                operador_autenticado=dados["operador_autenticado"],
+                aprovador_autenticado=dados["aprovador_autenticado"],
+                estrito=dados["estrito"],
+            )
+        except DjangoValidationError as exc:
+            logger.warning(
+                "HTTP PDV: lote de itens recusado. venda_id=%s erro=%s",
+                venda_id,
+                exc,
+            )
+            return Response(
+                {
+                    "code": "ERRO_VALIDACAO_ITENS_LOTE",
+                    "detail": exc.messages,
+                    "venda_id": str(venda_id),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "code": "ITENS_ADICIONADOS",
+                "venda": {
+                    "id": str(venda.id),
+                    "total_bruto": str(venda.total_bruto),
+                    "total_desconto": str(venda.total_desconto),
+                    "total_liquido": str(venda.total_liquido),
+                },
+                "itens": [
+                    {
+                        "id": str(item.id),
+                        "produto_id": str(item.produto_id),
+                        "quantidade": str(item.quantidade),
+                        "total_bruto": str(item.total_bruto),
+                        "total_liquido": str(item.total_liquido),
+                        "percentual_desconto_aplicado": (
+                            str(item.percentual_desconto_aplicado)
+                            if item.percentual_desconto_aplicado is not None
+                            else None
+                        ),
+                    }
+                    for item in resultado.itens
+                ],
+                "erros": [
+                    {"indice": e.indice, "codigo": e.codigo, "mensagem": e.mensagem}
+                    for e in resultado.erros
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
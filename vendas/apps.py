@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VendasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vendas'
+
+    def ready(self):
+        from vendas import checks  # noqa: F401 - registra os system checks
+        from vendas.signals import conectar_sinais_limites_desconto
+
+        conectar_sinais_limites_desconto()
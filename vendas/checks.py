@@ -0,0 +1,19 @@
+# vendas/checks.py
+"""
+System checks do app vendas: estado em cache que precisa ser compartilhado
+entre processos.
+"""
+
+from django.core import checks
+
+from commons.cache import checar_cache_compartilhado
+
+
+@checks.register(checks.Tags.caches)
+def checar_cache_limites_desconto(app_configs=None, **kwargs):
+    # a invalidação por sinais só alcança os outros workers pelo cache
+    return checar_cache_compartilhado(
+        setting="VENDAS_LIMITES_DESCONTO_CACHE",
+        uso="os limites de desconto (e sua invalidação por sinais)",
+        id="vendas.E001",
+    )
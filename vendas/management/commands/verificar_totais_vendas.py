@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from vendas.models.venda_models import VendaStatus
+from vendas.services.vendas.totais_venda_service import verificar_totais_vendas
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara total_bruto/total_desconto/total_liquido das vendas (mantidos por "
+        "delta) com o recálculo a partir dos itens e, opcionalmente, corrige."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema-name",
+            type=str,
+            default=None,
+            help=(
+                "Schema do tenant a processar. "
+                "Se não informado, processa todos os tenants (exceto o público)."
+            ),
+        )
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Verifica vendas em qualquer status (padrão: apenas ABERTA).",
+        )
+        parser.add_argument(
+            "--corrigir",
+            action="store_true",
+            help="Recalcula os totais das vendas divergentes.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Repete as verificações até ser interrompido.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=300.0,
+            help="Segundos entre passadas no modo contínuo.",
+        )
+
+    def _schemas(self, schema_name):
+        if schema_name:
+            return [schema_name]
+        TenantModel = get_tenant_model()
+        return list(
+            TenantModel.objects.exclude(schema_name=get_public_schema_name())
+            .order_by("schema_name")
+            .values_list("schema_name", flat=True)
+        )
+
+    def handle(self, *args, **options):
+        schemas = self._schemas(options["schema_name"])
+        status = None if options["todas"] else (VendaStatus.ABERTA,)
+
+        try:
+            while True:
+                for schema in schemas:
+                    inicio = time.monotonic()
+                    with schema_context(schema):
+                        divergencias = verificar_totais_vendas(
+                            status=status,
+                            corrigir=options["corrigir"],
+                        )
+
+                    estilo = self.style.WARNING if divergencias else self.style.SUCCESS
+                    corrigidas = sum(1 for d in divergencias if d.corrigida)
+                    self.stdout.write(
+                        estilo(
+                            f"[verificar_totais_vendas] {schema}: {len(divergencias)} "
+                            f"divergência(s), {corrigidas} corrigida(s) "
+                            f"em {time.monotonic() - inicio:.2f}s."
+                        )
+                    )
+                    for d in divergencias:
+                        self.stdout.write(
+                            f"  venda={d.venda_id} bruto={d.total_bruto}/{d.esperado_bruto} "
+                            f"desc={d.total_desconto}/{d.esperado_desconto} "
+                            f"liquido={d.total_liquido}/{d.esperado_liquido}"
+                        )
+
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("[verificar_totais_vendas] Interrompido."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+_particionamento = import_module("fiscal.migrations.0014_particionamento_mensal")
+
+
+class Migration(migrations.Migration):
+    """
+    Particiona nfce_documento/nfce_auditoria (fiscal 0014) depois que a FK
+    Venda.nfce_documento existe, reapontando-a para nfce_documento_indice.
+    """
+
+    dependencies = [
+        ('fiscal', '0014_particionamento_mensal'),
+        ('vendas', '0013_venda_caixa'),
+    ]
+
+    operations = [
+        migrations.RunPython(_particionamento.particionar, _particionamento.desparticionar),
+    ]
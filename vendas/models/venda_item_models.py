@@ -1,11 +1,13 @@
 import uuid
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 
 from django.db import models
 from django.core.exceptions import ValidationError
 
 from produtos.models.produtos_models import Produto
 from vendas.models.venda_models import Venda
+from vendas.utils.calculo_carrinho import bruto_centavos, desconto_percentual_centavos
+from vendas.utils.centavos import de_centavos, para_centavos
 
 
 class VendaItem(models.Model):
@@ -270,29 +272,29 @@ class VendaItem(models.Model):
                 }
             )
 
-        total_bruto = (self.quantidade * self.preco_unitario).quantize(
-            Decimal("0.01"), rounding=ROUND_HALF_UP
-        )
+        # aritmética em centavos (vendas.utils.calculo_carrinho), mesmo arredondamento
+        bruto = bruto_centavos(self.preco_unitario, self.quantidade)
 
-        desconto = self.desconto or Decimal("0.00")
+        desconto = para_centavos(self.desconto or Decimal("0.00"))
         if (
             self.percentual_desconto_aplicado is not None
             and self.percentual_desconto_aplicado > 0
         ):
-            desconto = (total_bruto * self.percentual_desconto_aplicado / Decimal("100")).quantize(
-                Decimal("0.01"), rounding=ROUND_HALF_UP
-            )
+            desconto = desconto_percentual_centavos(bruto, self.percentual_desconto_aplicado)
 
-        self.total_bruto = total_bruto
-        self.desconto = desconto
-        self.total_liquido = total_bruto - desconto
+        self.total_bruto = de_centavos(bruto)
+        self.desconto = de_centavos(desconto)
+        self.total_liquido = de_centavos(bruto - desconto)
 
         return self
 
     # -------------------------------------------------------------------------
     # VALIDAÇÕES
     # -------------------------------------------------------------------------
-    def clean(self):
+    def _erros_de_valores(self) -> dict:
+        """
+        Regras de quantidade, totais e desconto do item (sem consultar o banco).
+        """
         errors = {}
 
         # Quantidade
@@ -360,6 +362,20 @@ class VendaItem(models.Model):
                     "Desconto acima do máximo do produto exige aprovação explícita."
                 )
 
+        return errors
+
+    def validar_valores(self):
+        """
+        Levanta ValidationError se as regras de valores/desconto falharem.
+        Usado por quem grava sem save() individual (bulk_create do lote).
+        """
+        errors = self._erros_de_valores()
+        if errors:
+            raise ValidationError(errors)
+
+    def clean(self):
+        errors = self._erros_de_valores()
+
         # Snapshot fiscal obrigatório quando o item já está vinculado a uma venda
         if self.venda_id and not self.ncm_codigo:
             errors["ncm_codigo"] = (
@@ -11,6 +11,8 @@ from commons.models.base_models import BaseModel
 from filial.models.filial_models import Filial
 from terminal.models.terminal_models import Terminal
 from usuario.models.usuario_models import User
+from vendas.utils.calculo_carrinho import TotaisCarrinho
+from vendas.utils.centavos import de_centavos, para_centavos
 
 def _somente_digitos(valor: str) -> str:
     return "".join(ch for ch in valor if ch.isdigit())
@@ -353,12 +355,12 @@ class Venda(BaseModel):
         Fórmula:
             saldo = total_liquido - total_pago + total_troco
         """
-        from decimal import Decimal as D
-
-        tl = self.total_liquido or D("0.00")
-        tp = self.total_pago or D("0.00")
-        tt = self.total_troco or D("0.00")
-        return tl - tp + tt
+        totais = TotaisCarrinho(
+            liquido=para_centavos(self.total_liquido or 0),
+            pago=para_centavos(self.total_pago or 0),
+            troco=para_centavos(self.total_troco or 0),
+        )
+        return de_centavos(totais.saldo)
 
     # Helpers simples para uso posterior
     @property
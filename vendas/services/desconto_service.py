@@ -3,10 +3,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional, Tuple
+from decimal import Decimal
+from typing import List, Optional, Tuple
 
 from django.db import transaction
+from django.db.models import F
 
 from filial.models.filial_models import Filial
 from metodoPagamento.models.metodo_pagamento_models import MetodoPagamento
@@ -17,12 +18,36 @@ from promocoes.models.motivo_desconto_models import MotivoDesconto
 from vendas.models.venda_models import Venda
 from vendas.models.venda_item_models import VendaItem
 
+from vendas.services.limites_desconto_cache_service import (
+    LimitesDescontoBase,
+    obter_limite_perfil,
+    obter_limites_base,
+)
 from vendas.services.exceptions import (
     DescontoNaoPermitidoError,
     DescontoRequerAutenticacaoOperadorError,
     DescontoRequerAprovadorError,
     MotivoDescontoObrigatorioError,
 )
+from vendas.utils.calculo_carrinho import (
+    calcular_carrinho,
+    desconto_percentual_centavos,
+    item_de_venda_item,
+)
+from vendas.utils.centavos import de_centavos, para_centavos
+
+
+def _campos_alterados(obj, valores: dict) -> List[str]:
+    """
+    Atribui valores em obj e devolve só os campos que mudaram (para update_fields).
+    Só faz sentido para instâncias recém-lidas do banco.
+    """
+    alterados = []
+    for campo, valor in valores.items():
+        if getattr(obj, campo) != valor:
+            setattr(obj, campo, valor)
+            alterados.append(campo)
+    return alterados
 
 
 @dataclass
@@ -85,10 +110,15 @@ class DescontoService:
         filial: Filial,
         operador: User,
         aprovador: Optional[User] = None,
+        limites_base: Optional[LimitesDescontoBase] = None,
     ) -> LimitesDescontoContexto:
         """
         Calcula os limites de desconto disponíveis no contexto atual.
 
+        Terminal, filial e perfis vêm do cache de limites
+        (limites_desconto_cache_service), por id, sem carregar FKs. Quem valida
+        vários itens do mesmo carrinho pode passar limites_base já obtido.
+
         Ordem de prioridade para o limite de contexto (zona sem senha):
         1) Produto
         2) Método de Pagamento
@@ -110,14 +140,21 @@ class DescontoService:
             else None
         )
 
-        limite_terminal = terminal.desconto_maximo_percentual
-        limite_filial = filial.desconto_maximo_percentual
+        if limites_base is None:
+            limites_base = obter_limites_base(
+                terminal_id=terminal.pk,
+                filial_id=filial.pk,
+                perfil_id=getattr(operador, "perfil_id", None),
+            )
+
+        limite_terminal = limites_base.limite_terminal
+        limite_filial = limites_base.limite_filial
 
-        limite_operador = operador.perfil.desconto_maximo_percentual
+        limite_operador = limites_base.limite_operador
 
         limite_aprovador = None
         if aprovador is not None:
-            limite_aprovador = aprovador.perfil.desconto_maximo_percentual
+            limite_aprovador = obter_limite_perfil(aprovador)
 
         # limite de contexto (zona 'livre' sem senha)
         limite_contexto = None
@@ -155,6 +192,7 @@ class DescontoService:
         filial: Filial,
         operador: User,
         aprovador: Optional[User] = None,
+        limites_base: Optional[LimitesDescontoBase] = None,
     ) -> Tuple[str, LimitesDescontoContexto]:
         """
         Valida se um percentual de desconto é permitido no contexto.
@@ -185,6 +223,7 @@ class DescontoService:
             filial=filial,
             operador=operador,
             aprovador=aprovador,
+            limites_base=limites_base,
         )
 
         # Se absolutamente ninguém tem limite:
@@ -261,8 +300,10 @@ class DescontoService:
         - valor_desconto == 0 => não faz nada
         - valor_desconto < 0  => acréscimo (desconto negativo)
         - Respeita os mesmos limites de desconto já usados em aplicar_desconto_item.
-        - Atualiza desconto/total_liquido em cada item.
-        - Recalcula os totais da venda ao final.
+        - Rateio pelos maiores restos em centavos (calcular_carrinho): a
+          soma dos descontos dos itens é exatamente valor_desconto.
+        - Atualiza os itens alterados com um único bulk_update.
+        - Totais da venda calculados a partir dos itens já carregados.
         """
         from decimal import Decimal as D  # segue o padrão já usado no arquivo
 
@@ -343,65 +384,47 @@ class DescontoService:
 
         # ------------------------------------------------------------------
         # Redistribuir o desconto entre os itens proporcionalmente ao total_bruto
+        # (maiores restos em centavos inteiros: a soma bate exatamente)
         # ------------------------------------------------------------------
-        desconto_restante = valor_desconto
-        total_bruto_restante = total_bruto
-
-        for idx, item in enumerate(itens, start=1):
-            if idx < len(itens):
-                # Fração proporcional do desconto para este item
-                if total_bruto_restante == D("0.00"):
-                    desconto_item = D("0.00")
-                else:
-                    proporcao = item.total_bruto / total_bruto_restante
-                    desconto_item = (valor_desconto * proporcao).quantize(
-                        D("0.01"), rounding=ROUND_HALF_UP
-                    )
-            else:
-                # Último item: garante que a soma dos descontos bata exatamente com valor_desconto
-                desconto_item = desconto_restante
-
-            desconto_restante -= desconto_item
-            total_bruto_restante -= item.total_bruto
-
-            novo_total_liquido = item.total_bruto - desconto_item
-
-            if novo_total_liquido < D("0.00"):
+        carrinho = [item_de_venda_item(it) for it in itens]
+        totais = calcular_carrinho(carrinho, desconto_venda=para_centavos(valor_desconto))
+
+        alterados = []
+        campos = set()
+        for item, linha in zip(itens, carrinho):
+            if linha.desconto > linha.bruto:
                 raise DescontoNaoPermitidoError(
                     f"Desconto resultou em valor negativo para o item {item.id}.",
                     percentual_solicitado=percentual_equivalente,
                 )
 
             # Atualiza campos do item (mesma ideia de aplicar_desconto_item)
-            item.desconto = (item.total_bruto - novo_total_liquido).quantize(
-                D("0.01"), rounding=ROUND_HALF_UP
-            )
-            item.total_liquido = novo_total_liquido.quantize(
-                D("0.01"), rounding=ROUND_HALF_UP
+            campos_item = _campos_alterados(
+                item,
+                {
+                    "desconto": de_centavos(linha.desconto),
+                    "total_liquido": de_centavos(linha.liquido),
+                    "percentual_desconto_aplicado": linha.percentual_aplicado,
+                    "motivo_desconto": motivo,
+                    "desconto_aprovado_por": aprovador,
+                },
             )
+            if campos_item:
+                alterados.append(item)
+                campos.update(campos_item)
 
-            if item.total_bruto > D("0.00"):
-                item.percentual_desconto_aplicado = (
-                    (item.desconto / item.total_bruto) * D("100")
-                ).quantize(D("0.01"), rounding=ROUND_HALF_UP)
-            else:
-                item.percentual_desconto_aplicado = D("0.00")
+        # Um único UPDATE, apenas para os itens/campos que mudaram
+        if alterados:
+            VendaItem.objects.bulk_update(alterados, fields=sorted(campos))
 
-            item.motivo_desconto = motivo
-            item.desconto_aprovado_por = aprovador
+        # Totais da venda a partir dos itens já em memória (sem reler).
+        # Sempre gravados: a instância recebida pode estar defasada do banco.
+        venda.total_bruto = de_centavos(totais.bruto)
+        venda.total_desconto = de_centavos(totais.desconto)
+        venda.total_liquido = de_centavos(totais.liquido)
 
-            item.save(
-                update_fields=[
-                    "desconto",
-                    "total_liquido",
-                    "percentual_desconto_aplicado",
-                    "motivo_desconto",
-                    "desconto_aprovado_por",
-                ]
-            )
-
-        # Recalcula os totais da venda com base nos itens atualizados
-        DescontoService.recalcular_totais_venda(venda=venda, salvar=salvar)
+        if salvar:
+            venda.save(update_fields=["total_bruto", "total_desconto", "total_liquido"])
 
         return venda
 
@@ -424,6 +447,7 @@ class DescontoService:
         operador_autenticado: bool = False,
         aprovador_autenticado: bool = False,
         salvar: bool = True,
+        limites_base: Optional[LimitesDescontoBase] = None,
     ) -> VendaItem:
         """
         Aplica desconto em um item da venda, obedecendo todas as regras de limite:
@@ -440,6 +464,11 @@ class DescontoService:
         - Se for zona 'livre' -> não exige senha.
         - Se exigir operador -> operador_autenticado deve ser True.
         - Se exigir aprovador -> aprovador_autenticado deve ser True e aprovador != None.
+        - Com salvar=True, os totais da venda são ajustados por delta
+          (aplicar_delta_totais_venda). Com salvar=False nada é persistido e o
+          chamador é responsável por gravar o item e os totais.
+        - limites_base (opcional) evita consultar o cache de limites a cada
+          item quando o chamador valida um carrinho inteiro.
 
         Lança:
         - MotivoDescontoObrigatorioError
@@ -449,6 +478,9 @@ class DescontoService:
         """
         from decimal import Decimal as D  # para facilitar
 
+        # Valor líquido persistido antes desta aplicação, base do delta nos totais da venda
+        liquido_anterior = item.total_liquido
+
         if percentual_desconto_aplicado <= 0:
             # Zera desconto do item
             item.percentual_desconto_aplicado = Decimal("0.00")
@@ -464,7 +496,11 @@ class DescontoService:
                     "motivo_desconto",
                     "desconto_aprovado_por",
                 ])
-                DescontoService.recalcular_totais_venda(venda)
+                DescontoService.aplicar_delta_totais_venda(
+                    venda,
+                    delta_bruto=D("0.00"),
+                    delta_liquido=item.total_liquido - liquido_anterior,
+                )
             return item
 
         # Motivo é obrigatório para qualquer desconto > 0
@@ -481,6 +517,7 @@ class DescontoService:
                 filial=venda.filial,
                 operador=operador,
                 aprovador=aprovador,
+                limites_base=limites_base,
             )
         except DescontoRequerAutenticacaoOperadorError as e:
             # Só podemos seguir se operador_autenticado for True
@@ -496,6 +533,7 @@ class DescontoService:
                 filial=venda.filial,
                 operador=operador,
                 aprovador=aprovador,
+                limites_base=limites_base,
             )
         except DescontoRequerAprovadorError as e:
             # Só podemos seguir se aprovador_autenticado e aprovador existirem
@@ -510,18 +548,18 @@ class DescontoService:
                 filial=venda.filial,
                 operador=operador,
                 aprovador=aprovador,
+                limites_base=limites_base,
             )
 
         # Se chegou aqui sem exceção, ou ajustamos nivel manualmente acima
         # 'nivel' será "livre", "operador" ou "aprovador"
         # Cálculo do valor de desconto e novos totais do item
         valor_bruto = item.total_bruto
-        valor_desconto = (valor_bruto * percentual_desconto_aplicado / D("100")).quantize(
-            D("0.01"), rounding=ROUND_HALF_UP
-        )
-        valor_liquido = (valor_bruto - valor_desconto).quantize(
-            D("0.01"), rounding=ROUND_HALF_UP
+        desconto_centavos = desconto_percentual_centavos(
+            para_centavos(valor_bruto), percentual_desconto_aplicado
         )
+        valor_desconto = de_centavos(desconto_centavos)
+        valor_liquido = de_centavos(para_centavos(valor_bruto) - desconto_centavos)
 
         if valor_liquido < 0:
             raise DescontoNaoPermitidoError(
@@ -552,9 +590,13 @@ class DescontoService:
                 "desconto_aprovado_por",
             ])
 
-        # Atualiza totais da venda após o desconto
+        # Atualiza totais da venda após o desconto (delta, sem reler os itens)
         if salvar:
-            DescontoService.recalcular_totais_venda(venda)
+            DescontoService.aplicar_delta_totais_venda(
+                venda,
+                delta_bruto=D("0.00"),
+                delta_liquido=valor_liquido - liquido_anterior,
+            )
 
         return item
     
@@ -571,26 +613,63 @@ class DescontoService:
         - total_liquido = total_bruto - total_desconto
 
         (total_pago e total_troco serão atualizados em outro ponto, após pagamentos.)
+
+        Cálculo em centavos por calcular_carrinho. Os três campos são sempre
+        gravados: comparar com a instância em memória (possivelmente defasada
+        do banco) pularia justamente a correção que o recálculo deve fazer.
+        """
+        totais = calcular_carrinho([item_de_venda_item(it) for it in venda.itens.all()])
+
+        venda.total_bruto = de_centavos(totais.bruto)
+        venda.total_desconto = de_centavos(totais.desconto)
+        venda.total_liquido = de_centavos(totais.liquido)
+
+        if salvar:
+            venda.save(update_fields=["total_bruto", "total_desconto", "total_liquido"])
+
+        return venda
+
+    # ------------------------------------------------------------------
+    # Ajuste incremental dos totais de venda
+    # ------------------------------------------------------------------
+    @staticmethod
+    def aplicar_delta_totais_venda(
+        venda: Venda,
+        *,
+        delta_bruto: Decimal,
+        delta_liquido: Decimal,
+    ) -> Venda:
+        """
+        Ajusta os totais da venda pela variação de UM item, sem reler os itens.
+
+        - total_bruto    += delta_bruto
+        - total_liquido  += delta_liquido
+        - total_desconto += delta_bruto - delta_liquido
+
+        O UPDATE usa expressões F(), então é atômico no banco mesmo com outra
+        transação alterando a mesma venda. A instância em memória recebe os
+        mesmos deltas. Deltas zerados não geram query.
+
+        Divergências eventuais (ex.: escrita direta no banco) são detectadas por
+        verificar_totais_vendas, que compara com recalcular_totais_venda.
         """
         from decimal import Decimal as D
 
-        itens = list(venda.itens.all())
-        total_bruto = D("0.00")
-        total_desconto = D("0.00")
+        delta_bruto = D(delta_bruto)
+        delta_liquido = D(delta_liquido)
+        delta_desconto = delta_bruto - delta_liquido
 
-        for it in itens:
-            total_bruto += it.total_bruto
-            total_desconto += (it.total_bruto - it.total_liquido)
+        if not delta_bruto and not delta_liquido:
+            return venda
 
-        total_liquido = (total_bruto - total_desconto).quantize(
-            D("0.01"), rounding=ROUND_HALF_UP
+        Venda.objects.filter(pk=venda.pk).update(
+            total_bruto=F("total_bruto") + delta_bruto,
+            total_desconto=F("total_desconto") + delta_desconto,
+            total_liquido=F("total_liquido") + delta_liquido,
         )
 
-        venda.total_bruto = total_bruto
-        venda.total_desconto = total_desconto
-        venda.total_liquido = total_liquido
-
-        if salvar:
-            venda.save(update_fields=["total_bruto", "total_desconto", "total_liquido"])
+        venda.total_bruto = (venda.total_bruto or D("0.00")) + delta_bruto
+        venda.total_desconto = (venda.total_desconto or D("0.00")) + delta_desconto
+        venda.total_liquido = (venda.total_liquido or D("0.00")) + delta_liquido
 
         return venda
@@ -16,6 +16,39 @@ from vendas.services.venda_state_machine import VendaStateMachine  # NOVO IMPORT
 logger = logging.getLogger(__name__)
 
 
+# Orçamento de queries do caminho feliz síncrono, medido no endpoint
+# POST /api/v1/pdv/vendas/<id>/finalizar-nfce/ (tests/vendas/
+# test_finalizar_venda_nfce_orcamento_queries.py), contando BEGIN/COMMIT e
+# savepoints e ignorando o SET search_path do django-tenants:
+#
+#   view: venda (404/log) ........................................ 1
+#   BEGIN + venda sob lock com contexto fiscal ................... 2
+#   itens + pagamentos (prefetch) ................................ 2
+#   reserva de número (savepoint + CTE) .......................... 3
+#   pré-emissão já com claim + blob do payload ................... 1
+#   resultado: savepoint + lock da chave + NfceDocumento (+ blobs)
+#              + auditoria ........................................ 5
+#   UPDATE da venda + COMMIT ..................................... 2
+#                                                                 --
+#                                                                 16
+#
+# Orçamento = 1/3 das 48 que o fluxo fazia recarregando venda, terminal,
+# filial e vínculo em cada etapa. Independe da quantidade de itens e
+# pagamentos.
+ORCAMENTO_QUERIES_FINALIZAR_NFCE = 16
+
+_CAMPOS_STATUS_FISCAL = ("status", "codigo_erro_fiscal", "mensagem_erro_fiscal")
+
+
+def _sincronizar_status_fiscal(venda: Venda, venda_db: Venda) -> None:
+    """
+    Copia o status fiscal gravado para a instância do chamador
+    (a view responde com ela, sem refresh_from_db).
+    """
+    for campo in _CAMPOS_STATUS_FISCAL:
+        setattr(venda, campo, getattr(venda_db, campo))
+
+
 def finalizar_venda_e_emitir_nfce(
     *,
     venda: Venda,
@@ -37,12 +70,17 @@ def finalizar_venda_e_emitir_nfce(
     - Faz commit dessas alterações.
     - Propaga a exceção para o chamador.
 
+    Contexto fiscal (venda, terminal, filial + A1 + UF, vínculo do operador)
+    carregado uma única vez, sob lock, e repassado ao fluxo fiscal; o status
+    final é gravado num único UPDATE e copiado para `venda`.
+    Orçamento: ORCAMENTO_QUERIES_FINALIZAR_NFCE.
+
     Observação:
     - NÃO depende de FK venda ↔ NfceDocumento.
     - Idempotência é feita exclusivamente pelo status da venda.
     """
 
-    from fiscal.services.nfce_venda_service import emitir_nfce_para_venda
+    from fiscal.services import nfce_venda_service
 
     logger.info(
         "Iniciando orquestração de emissão NFC-e para venda. "
@@ -53,33 +91,17 @@ def finalizar_venda_e_emitir_nfce(
         request_id,
     )
 
-    # Idempotência antes de qualquer coisa: se já FINALIZADA, não faz nada
-    venda_db = Venda.objects.select_related("filial", "terminal").get(pk=venda.pk)
-    if venda_db.status == VendaStatus.FINALIZADA:
+    # Idempotência antes de qualquer coisa: FINALIZADA é status final, então
+    # a instância recebida basta (sem query)
+    if venda.status == VendaStatus.FINALIZADA:
         logger.info(
             "Venda já está FINALIZADA. Tratando chamada como idempotente. "
             "venda_id=%s request_id=%s",
-            venda_db.id,
+            venda.id,
             request_id,
         )
         return None
 
-    # Valida status e tipo fiscal ANTES de entrar em transação
-    if venda_db.status not in {
-        VendaStatus.PAGAMENTO_CONFIRMADO,
-        VendaStatus.AGUARDANDO_EMISSAO_FISCAL,
-    }:
-        raise ValidationError(
-            f"Venda não está em status válido para emissão de NFC-e. "
-            f"Status atual: {venda_db.status}"
-        )
-
-    if getattr(venda_db, "documento_fiscal_tipo", None) != "NFCE":
-        raise ValidationError(
-            "Somente vendas configuradas para documento_fiscal_tipo = 'NFCE' "
-            "podem ser processadas neste fluxo."
-        )
-
     nfce_doc = None
     erro_interno: Optional[Exception] = None
 
@@ -87,11 +109,10 @@ def finalizar_venda_e_emitir_nfce(
     # Bloco transacional: garante consistência de concorrência
     # ------------------------------------------------------------------
     with transaction.atomic():
-        # Recarrega sob lock
-        venda_db = (
-            Venda.objects.select_for_update()
-            .select_related("filial", "terminal")
-            .get(pk=venda.pk)
+        # Carrega sob lock, já com o contexto fiscal
+        venda_db = nfce_venda_service.carregar_venda_para_emissao(
+            venda_id=venda.pk,
+            operador=operador,
         )
 
         # Re-checa idempotência dentro do lock
@@ -102,30 +123,36 @@ def finalizar_venda_e_emitir_nfce(
                 venda_db.id,
                 request_id,
             )
+            _sincronizar_status_fiscal(venda, venda_db)
             return None
 
+        if venda_db.status not in {
+            VendaStatus.PAGAMENTO_CONFIRMADO,
+            VendaStatus.AGUARDANDO_EMISSAO_FISCAL,
+        }:
+            raise ValidationError(
+                f"Venda não está em status válido para emissão de NFC-e. "
+                f"Status atual: {venda_db.status}"
+            )
+
+        if getattr(venda_db, "documento_fiscal_tipo", None) != "NFCE":
+            raise ValidationError(
+                "Somente vendas configuradas para documento_fiscal_tipo = 'NFCE' "
+                "podem ser processadas neste fluxo."
+            )
+
         status_original = venda_db.status
 
-        # Atualiza para AGUARDANDO_EMISSAO_FISCAL via state machine (sem salvar ainda)
+        # AGUARDANDO_EMISSAO_FISCAL via state machine, só em memória: dentro
+        # desta transação ninguém mais vê a venda, e o status final é
+        # gravado num único UPDATE no fim
         VendaStateMachine.para_aguardando_emissao_fiscal(
             venda_db,
             motivo="Preparando emissão NFC-e.",
             save=False,
         )
-
-        # Zera campos de erro fiscal (se existirem)
-        if hasattr(venda_db, "codigo_erro_fiscal"):
-            venda_db.codigo_erro_fiscal = None
-        if hasattr(venda_db, "mensagem_erro_fiscal"):
-            venda_db.mensagem_erro_fiscal = None
-
-        campos_update = ["status"]
-        if hasattr(venda_db, "codigo_erro_fiscal"):
-            campos_update.append("codigo_erro_fiscal")
-        if hasattr(venda_db, "mensagem_erro_fiscal"):
-            campos_update.append("mensagem_erro_fiscal")
-
-        venda_db.save(update_fields=campos_update)
+        venda_db.codigo_erro_fiscal = None
+        venda_db.mensagem_erro_fiscal = None
 
         logger.info(
             "Status da venda atualizado para AGUARDANDO_EMISSAO_FISCAL. "
@@ -139,7 +166,7 @@ def finalizar_venda_e_emitir_nfce(
         # Chama fluxo fiscal
         # -----------------------------
         try:
-            nfce_doc = emitir_nfce_para_venda(
+            nfce_doc = nfce_venda_service.emitir_nfce_para_venda(
                 venda=venda_db,
                 operador=operador,
                 request_id=str(request_id) if request_id is not None else None,
@@ -159,16 +186,7 @@ def finalizar_venda_e_emitir_nfce(
                 motivo="Falha interna ao emitir NFC-e.",
                 save=False,
             )
-            if hasattr(venda_db, "mensagem_erro_fiscal"):
-                venda_db.mensagem_erro_fiscal = (
-                    "Falha interna ao emitir NFC-e. Ver logs."
-                )
-
-            campos_update = ["status"]
-            if hasattr(venda_db, "mensagem_erro_fiscal"):
-                campos_update.append("mensagem_erro_fiscal")
-
-            venda_db.save(update_fields=campos_update)
+            venda_db.mensagem_erro_fiscal = "Falha interna ao emitir NFC-e. Ver logs."
 
             erro_interno = exc
         else:
@@ -181,24 +199,12 @@ def finalizar_venda_e_emitir_nfce(
 
             if status_nfce in {"AUTORIZADA", "AUT"}:
                 venda_db.status = VendaStatus.FINALIZADA
-                if hasattr(venda_db, "codigo_erro_fiscal"):
-                    venda_db.codigo_erro_fiscal = None
-                if hasattr(venda_db, "mensagem_erro_fiscal"):
-                    venda_db.mensagem_erro_fiscal = None
+                venda_db.codigo_erro_fiscal = None
+                venda_db.mensagem_erro_fiscal = None
             else:
                 venda_db.status = VendaStatus.ERRO_FISCAL
-                if hasattr(venda_db, "codigo_erro_fiscal"):
-                    venda_db.codigo_erro_fiscal = codigo_erro
-                if hasattr(venda_db, "mensagem_erro_fiscal"):
-                    venda_db.mensagem_erro_fiscal = mensagem_erro
-
-            campos_update = ["status"]
-            if hasattr(venda_db, "codigo_erro_fiscal"):
-                campos_update.append("codigo_erro_fiscal")
-            if hasattr(venda_db, "mensagem_erro_fiscal"):
-                campos_update.append("mensagem_erro_fiscal")
-
-            venda_db.save(update_fields=campos_update)
+                venda_db.codigo_erro_fiscal = codigo_erro
+                venda_db.mensagem_erro_fiscal = mensagem_erro
 
             logger.info(
                 "Finalização de venda após emissão NFC-e. venda_id=%s status_venda=%s "
@@ -211,6 +217,10 @@ def finalizar_venda_e_emitir_nfce(
                 request_id,
             )
 
+        venda_db.save(update_fields=list(_CAMPOS_STATUS_FISCAL))
+
+    _sincronizar_status_fiscal(venda, venda_db)
+
     # ------------------------------------------------------------------
     # Fora do atomic: se houve erro interno, propaga a exceção
     # (as alterações já foram commitadas).
@@ -219,3 +229,79 @@ def finalizar_venda_e_emitir_nfce(
         raise erro_interno
 
     return nfce_doc
+
+
+def finalizar_venda_e_enfileirar_nfce(
+    *,
+    venda: Venda,
+    operador: User,
+    request_id: Union[str, UUID],
+):
+    """
+    Variante assíncrona de finalizar_venda_e_emitir_nfce.
+
+    Numa transação curta (lock na venda):
+    - move a venda para AGUARDANDO_EMISSAO_FISCAL;
+    - executa a pré-emissão (reserva de número + NfcePreEmissao);
+    - enfileira a emissão (NfceEmissaoJob vinculado à venda).
+
+    A SEFAZ é chamada depois, pelo worker, que sincroniza a venda ao concluir.
+    Retorna o job, ou None se a venda já estiver FINALIZADA (idempotência).
+    Erros de validação propagam com rollback completo (venda inalterada).
+    """
+
+    from fiscal.services.emissao_fila_service import enfileirar_emissao_nfce
+    from fiscal.services.nfce_venda_service import nfce_pre_emissao
+
+    venda_db = Venda.objects.only("id", "status", "documento_fiscal_tipo").get(pk=venda.pk)
+    if venda_db.status == VendaStatus.FINALIZADA:
+        logger.info(
+            "Venda já está FINALIZADA. Tratando chamada como idempotente. "
+            "venda_id=%s request_id=%s",
+            venda_db.id,
+            request_id,
+        )
+        return None
+
+    if getattr(venda_db, "documento_fiscal_tipo", None) != "NFCE":
+        raise ValidationError(
+            "Somente vendas configuradas para documento_fiscal_tipo = 'NFCE' "
+            "podem ser processadas neste fluxo."
+        )
+
+    with transaction.atomic():
+        venda_db = (
+            Venda.objects.select_for_update()
+            .select_related("filial", "terminal")
+            .get(pk=venda.pk)
+        )
+
+        if venda_db.status == VendaStatus.PAGAMENTO_CONFIRMADO:
+            VendaStateMachine.para_aguardando_emissao_fiscal(
+                venda_db,
+                motivo="Emissão NFC-e enfileirada.",
+                save=False,
+            )
+            venda_db.codigo_erro_fiscal = None
+            venda_db.mensagem_erro_fiscal = None
+            venda_db.save(update_fields=["status", "codigo_erro_fiscal", "mensagem_erro_fiscal"])
+        elif venda_db.status != VendaStatus.AGUARDANDO_EMISSAO_FISCAL:
+            raise ValidationError(
+                f"Venda não está em status válido para emissão de NFC-e. "
+                f"Status atual: {venda_db.status}"
+            )
+
+        pre = nfce_pre_emissao(venda=venda_db, operador=operador, request_id=request_id)
+        job = enfileirar_emissao_nfce(
+            user=operador,
+            request_id=pre.request_id,
+            venda_id=venda_db.id,
+        )
+
+    logger.info(
+        "Emissão NFC-e enfileirada para venda. venda_id=%s job_id=%s request_id=%s",
+        venda_db.id,
+        job.id,
+        request_id,
+    )
+    return job
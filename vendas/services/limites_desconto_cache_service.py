@@ -0,0 +1,175 @@
+# vendas/services/limites_desconto_cache_service.py
+"""
+Cache dos limites de desconto por (tenant, terminal, filial, perfil do operador).
+
+DescontoService._obter_limites_contexto lia, a cada validação, o limite do
+terminal, da filial e do perfil do operador/aprovador. Com o carrinho
+montado item a item, cada leitura de perfil era uma query (lazy-load do FK).
+Uma entrada do cache guarda:
+
+  - limite do terminal e da filial;
+  - limite do perfil do operador (None se o usuário não tem perfil).
+
+O limite do perfil do aprovador tem entrada própria (por perfil). Limites de
+produto e de método de pagamento continuam vindo dos objetos já carregados
+pelo chamador (item.produto, metodo_pagamento).
+
+Regras:
+  - o cache é o Django cache (alias VENDAS_LIMITES_DESCONTO_CACHE); em produção
+    deve ser compartilhado entre processos, como o do contexto fiscal
+    (check vendas.E001);
+  - a chave inclui uma geração por tenant: save/delete de Terminal, Filial ou
+    UserPerfil (vendas.signals) avança a geração e invalida o tenant inteiro;
+  - a troca de perfil de um usuário não precisa de invalidação: o perfil_id
+    faz parte da chave;
+  - alterações feitas com QuerySet.update()/SQL cru não disparam sinais:
+    chame invalidar_limites_desconto() nesses casos.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Subquery
+
+from filial.models.filial_models import Filial
+from terminal.models.terminal_models import Terminal
+from usuario.models.usuario_models import UserPerfil
+
+DEFAULT_TTL_SEGUNDOS = 300
+
+_PREFIXO = "pdv:vendas:limites"
+_SEM_EXPIRACAO = None
+_AUSENTE = "-"
+
+
+@dataclass(frozen=True)
+class LimitesDescontoBase:
+    """
+    Limites que não dependem do item: terminal, filial e perfil do operador.
+    """
+
+    terminal_id: str
+    filial_id: str
+    perfil_id: Optional[int]
+    limite_terminal: Optional[Decimal]
+    limite_filial: Optional[Decimal]
+    limite_operador: Optional[Decimal]
+
+
+def _cache():
+    return caches[getattr(settings, "VENDAS_LIMITES_DESCONTO_CACHE", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "VENDAS_LIMITES_DESCONTO_CACHE_TTL_SEGUNDOS", DEFAULT_TTL_SEGUNDOS))
+
+
+def _schema() -> str:
+    return getattr(connection, "schema_name", "")
+
+
+def _chave_geracao(schema: str) -> str:
+    return f"{_PREFIXO}:{schema}:geracao"
+
+
+def _geracao(cache, schema: str) -> int:
+    geracao = cache.get(_chave_geracao(schema))
+    if geracao is None:
+        cache.add(_chave_geracao(schema), 0, timeout=_SEM_EXPIRACAO)
+        geracao = cache.get(_chave_geracao(schema), 0)
+    return geracao
+
+
+def invalidar_limites_desconto(schema: Optional[str] = None) -> None:
+    """
+    Invalida todas as entradas do tenant (padrão: o schema da conexão),
+    avançando a geração usada nas chaves.
+    """
+    cache = _cache()
+    chave = _chave_geracao(_schema() if schema is None else schema)
+    cache.add(chave, 0, timeout=_SEM_EXPIRACAO)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # chave removida entre o add e o incr (eviction/clear)
+        cache.set(chave, 1, timeout=_SEM_EXPIRACAO)
+
+
+def _carregar_limites_base(*, terminal_id, filial_id, perfil_id) -> LimitesDescontoBase:
+    # terminal, filial e perfil em uma única consulta
+    linha = (
+        Terminal.objects.filter(pk=terminal_id)
+        .annotate(
+            limite_filial=Subquery(
+                Filial.objects.filter(pk=filial_id).values("desconto_maximo_percentual")[:1]
+            ),
+            limite_perfil=Subquery(
+                UserPerfil.objects.filter(pk=perfil_id).values("desconto_maximo_percentual")[:1]
+            ),
+        )
+        .values("desconto_maximo_percentual", "limite_filial", "limite_perfil")
+        .first()
+    ) or {}
+
+    return LimitesDescontoBase(
+        terminal_id=str(terminal_id),
+        filial_id=str(filial_id),
+        perfil_id=perfil_id,
+        limite_terminal=linha.get("desconto_maximo_percentual"),
+        limite_filial=linha.get("limite_filial"),
+        limite_operador=linha.get("limite_perfil") if perfil_id is not None else None,
+    )
+
+
+def obter_limites_base(*, terminal_id, filial_id, perfil_id) -> LimitesDescontoBase:
+    """
+    Limites de (terminal, filial, perfil do operador) do tenant corrente.
+
+    Recebe apenas ids (ex.: venda.terminal_id, venda.filial_id,
+    operador.perfil_id), então nenhum FK é carregado. Em cache, não há query.
+    """
+    cache = _cache()
+    schema = _schema()
+    chave = (
+        f"{_PREFIXO}:{schema}:{_geracao(cache, schema)}:"
+        f"{terminal_id}:{filial_id}:{_AUSENTE if perfil_id is None else perfil_id}"
+    )
+
+    limites = cache.get(chave)
+    if limites is None:
+        limites = _carregar_limites_base(
+            terminal_id=terminal_id, filial_id=filial_id, perfil_id=perfil_id
+        )
+        cache.set(chave, limites, timeout=_ttl())
+    return limites
+
+
+def obter_limite_perfil(usuario) -> Optional[Decimal]:
+    """
+    Limite do perfil de um usuário (aprovador); None sem perfil.
+    """
+    perfil_id = getattr(usuario, "perfil_id", None)
+    if perfil_id is None:
+        return None
+
+    cache = _cache()
+    schema = _schema()
+    chave = f"{_PREFIXO}:{schema}:{_geracao(cache, schema)}:perfil:{perfil_id}"
+
+    linha = cache.get(chave)
+    if linha is None:
+        limite = (
+            UserPerfil.objects.filter(pk=perfil_id)
+            .values_list("desconto_maximo_percentual", flat=True)
+            .first()
+        )
+        # tupla: distingue "limite None em cache" de "ausente"
+        linha = (limite,)
+        cache.set(chave, linha, timeout=_ttl())
+    return linha[0]
@@ -9,6 +9,11 @@ from django.db import transaction
 
 from vendas.models import Venda, VendaPagamento, StatusPagamento
 from vendas.models.venda_models import VendaStatus
+from vendas.utils.calculo_carrinho import (
+    PagamentoCarrinho,
+    calcular_carrinho,
+)
+from vendas.utils.centavos import de_centavos, para_centavos
 from vendas.services.venda_state_machine import VendaStateMachine  # NOVO IMPORT
 
 logger = logging.getLogger(__name__)
@@ -39,12 +44,16 @@ def recalcular_totais_pagamento(*, venda: Venda, salvar: bool = True) -> None:
         status=StatusPagamento.AUTORIZADO
     )
 
-    total_pago = D("0.00")
-    total_troco = D("0.00")
-
-    for pagamento in pagamentos_autorizados:
-        total_pago += pagamento.valor_liquido_para_total
-        total_troco += pagamento.valor_troco or D("0.00")
+    totais = calcular_carrinho(
+        [],
+        pagamentos=[
+            PagamentoCarrinho(
+                valor=para_centavos(pagamento.valor_liquido_para_total),
+                troco=para_centavos(pagamento.valor_troco or D("0.00")),
+            )
+            for pagamento in pagamentos_autorizados
+        ],
+    )
 
     logger.info(
         "Totais de pagamento antes do recálculo: total_pago=%s, total_troco=%s",
@@ -52,8 +61,10 @@ def recalcular_totais_pagamento(*, venda: Venda, salvar: bool = True) -> None:
         venda.total_troco,
     )
 
-    venda.total_pago = total_pago.quantize(D("0.01"))
-    venda.total_troco = total_troco.quantize(D("0.01"))
+    # recálculo completo: sempre gravado (a instância pode estar defasada do banco)
+    venda.total_pago = de_centavos(totais.pago)
+    venda.total_troco = de_centavos(totais.troco)
+    update_fields = ["total_pago", "total_troco"]
 
     logger.info(
         "Totais de pagamento após recálculo (antes de salvar): total_pago=%s, total_troco=%s",
@@ -70,8 +81,6 @@ def recalcular_totais_pagamento(*, venda: Venda, salvar: bool = True) -> None:
     status_original = venda.status
     saldo_atual = venda.saldo_a_pagar
 
-    update_fields = ["total_pago", "total_troco"]
-
     if venda.total_pago <= D("0.00"):
         # Nenhum pagamento efetivo ainda: não alteramos o status
         logger.info(
@@ -6,7 +6,6 @@ import logging
 from typing import Iterable
 
 from django.core.exceptions import ValidationError
-from django.db import transaction
 
 from vendas.models.venda_models import Venda, VendaStatus
 
@@ -78,7 +77,6 @@ class VendaStateMachine:
     """
 
     @classmethod
-    @transaction.atomic
     def mudar_status(
         cls,
         venda: Venda,
@@ -91,7 +89,8 @@ class VendaStateMachine:
         """
         - Valida se a transição é permitida (baseado no status atual).
         - É idempotente (se já estiver no status solicitado, não faz nada).
-        - Pode ou não salvar a venda (save=True/False).
+        - Pode ou não salvar a venda (save=True/False); salvar é um único
+          UPDATE, sem transação/savepoint próprios.
         """
         status_atual = venda.status
 
@@ -2,18 +2,26 @@
 
 from .abrir_venda_services import abrir_venda
 from .adicionar_item_service import adicionar_item
+from .adicionar_itens_lote_service import adicionar_itens_lote
 from .alterar_quantidade_item_service import alterar_quantidade_item
 from .remover_item_service import remover_item
 from .limpar_carrinho_service import limpar_carrinho
-from .totais_venda_service import recalcular_totais_venda
+from .totais_venda_service import (
+    aplicar_delta_totais_venda,
+    recalcular_totais_venda,
+    verificar_totais_vendas,
+)
 from .resumo_carrinho_service import obter_resumo_carrinho
 
 __all__ = [
     "abrir_venda",
     "adicionar_item",
+    "adicionar_itens_lote",
     "alterar_quantidade_item",
     "remover_item",
     "limpar_carrinho",
     "recalcular_totais_venda",
+    "aplicar_delta_totais_venda",
+    "verificar_totais_vendas",
     "obter_resumo_carrinho",
 ]
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from typing import Optional
 
 from django.core.exceptions import ValidationError
@@ -14,8 +14,10 @@ from produtos.models.produtos_models import Produto
 from usuario.models.usuario_models import User
 from promocoes.models.motivo_desconto_models import MotivoDesconto
 from vendas.models.venda_models import Venda, VendaStatus
+from vendas.utils.calculo_carrinho import bruto_centavos
 from vendas.services.desconto_service import DescontoService
-from vendas.services.vendas.totais_venda_service import recalcular_totais_venda
+from vendas.utils.centavos import de_centavos
+from vendas.services.vendas.totais_venda_service import aplicar_delta_totais_venda
 from vendas.models.venda_item_models import VendaItem
 
 logger = logging.getLogger(__name__)
@@ -41,12 +43,11 @@ def adicionar_item(
     Fluxo:
     - Valida se venda está ABERTA.
     - Calcula total_bruto = preco_unitario * quantidade.
-    - Cria VendaItem sem desconto inicial.
-    - Se percentual_desconto > 0, delega para DescontoService.aplicar_desconto_item.
-    - Recalcula totais da venda.
+    - Monta o VendaItem; se percentual_desconto > 0, delega o cálculo para
+      DescontoService.aplicar_desconto_item (salvar=False).
+    - Grava o item (um INSERT).
+    - Soma o item aos totais da venda por delta (um UPDATE com F()).
     """
-    from decimal import Decimal as D
-
     if venda.status != VendaStatus.ABERTA:
         logger.warning(
             "Tentativa de adicionar item em venda não-ABERTA. venda_id=%s, status=%s",
@@ -73,11 +74,9 @@ def adicionar_item(
         percentual_desconto,
     )
 
-    total_bruto = (preco_unitario * quantidade).quantize(
-        D("0.01"), rounding=ROUND_HALF_UP
-    )
+    total_bruto = de_centavos(bruto_centavos(preco_unitario, quantidade))
 
-    item = VendaItem.objects.create(
+    item = VendaItem(
         venda=venda,
         produto=produto,
         descricao=produto.descricao,
@@ -88,8 +87,8 @@ def adicionar_item(
         total_liquido=total_bruto,
     )
 
-    # Se houver desconto solicitado, delega ao DescontoService
-    print("percentual_desconto:", percentual_desconto)
+    # Se houver desconto solicitado, delega ao DescontoService (sem persistir):
+    # o item é gravado uma única vez, já com o desconto.
     if percentual_desconto is not None and percentual_desconto > 0:
         logger.info(
             "Aplicando desconto ao item recém-criado. item_id=%s, perc_desc=%s",
@@ -106,10 +105,17 @@ def adicionar_item(
             aprovador=aprovador,
             operador_autenticado=operador_autenticado,
             aprovador_autenticado=aprovador_autenticado,
+            salvar=False,
         )
-    else:
-        # Apenas recalcular totais da venda (sem desconto)
-        recalcular_totais_venda(venda)
+
+    item.save(force_insert=True)
+
+    # Totais da venda ajustados pelo item novo, sem reler o carrinho
+    aplicar_delta_totais_venda(
+        venda,
+        delta_bruto=item.total_bruto,
+        delta_liquido=item.total_liquido,
+    )
 
     logger.info(
         "Item adicionado com sucesso. venda_id=%s, item_id=%s, total_bruto=%s, total_liquido=%s",
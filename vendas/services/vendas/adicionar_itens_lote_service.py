@@ -0,0 +1,229 @@
+# vendas/services/vendas/adicionar_itens_lote_service.py
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from metodoPagamento.models.metodo_pagamento_models import MetodoPagamento
+from produtos.models.codigos_barras_models import ProdutoCodigoBarras
+from produtos.models.produtos_models import Produto
+from promocoes.models.motivo_desconto_models import MotivoDesconto
+from usuario.models.usuario_models import User
+from vendas.models.venda_item_models import VendaItem
+from vendas.models.venda_models import Venda, VendaStatus
+from vendas.utils.calculo_carrinho import bruto_centavos
+from vendas.services.desconto_service import DescontoService
+from vendas.services.exceptions import (
+    DescontoError,
+    DescontoNaoPermitidoError,
+    DescontoRequerAprovadorError,
+    DescontoRequerAutenticacaoOperadorError,
+    MotivoDescontoObrigatorioError,
+)
+from vendas.services.limites_desconto_cache_service import obter_limites_base
+from vendas.utils.centavos import de_centavos
+from vendas.services.vendas.dto import ItemLoteEntrada, ItemLoteErro, ResultadoItensLote
+from vendas.services.vendas.totais_venda_service import aplicar_delta_totais_venda
+
+logger = logging.getLogger(__name__)
+
+_CODIGOS_ERRO_DESCONTO = {
+    DescontoNaoPermitidoError: "DESCONTO_NAO_PERMITIDO",
+    DescontoRequerAutenticacaoOperadorError: "DESCONTO_REQUER_SENHA_OPERADOR",
+    DescontoRequerAprovadorError: "DESCONTO_REQUER_APROVADOR",
+    MotivoDescontoObrigatorioError: "MOTIVO_DESCONTO_OBRIGATORIO",
+}
+
+
+def _resolver_codigos_barras(codigos: Sequence[str]) -> Dict[str, List[str]]:
+    """
+    codigo -> lista de produto_id (mais de um => código ambíguo). Uma query.
+    """
+    por_codigo: Dict[str, List[str]] = defaultdict(list)
+    if not codigos:
+        return por_codigo
+
+    for codigo, produto_id in ProdutoCodigoBarras.objects.filter(
+        codigo__in=set(codigos), ativo=True
+    ).values_list("codigo", "produto_id"):
+        por_codigo[codigo].append(str(produto_id))
+    return por_codigo
+
+
+@transaction.atomic
+def adicionar_itens_lote(
+    *,
+    venda: Venda,
+    itens: Sequence[ItemLoteEntrada],
+    operador: User,
+    motivo_desconto: Optional[MotivoDesconto] = None,
+    metodo_pagamento: Optional[MetodoPagamento] = None,
+    aprovador: Optional[User] = None,
+    operador_autenticado: bool = False,
+    aprovador_autenticado: bool = False,
+    estrito: bool = False,
+) -> ResultadoItensLote:
+    """
+    Adiciona várias linhas ao carrinho de uma vez (rajada de leitor / sincronização offline).
+
+    Fluxo:
+    - Valida se venda está ABERTA.
+    - Resolve códigos de barras e produtos com uma query cada (lookups compartilhados).
+    - Valida cada linha e aplica o desconto em memória
+      (DescontoService.aplicar_desconto_item com salvar=False), depois as
+      regras de valores do modelo (VendaItem.validar_valores).
+    - Grava as linhas válidas com um bulk_create e ajusta os totais da venda
+      uma única vez (delta somado).
+
+    Linhas inválidas voltam em ResultadoItensLote.erros sem abortar o lote.
+    Com estrito=True, qualquer erro levanta ValidationError e nada é gravado.
+    """
+    if venda.status != VendaStatus.ABERTA:
+        logger.warning(
+            "Tentativa de adicionar itens em lote em venda não-ABERTA. venda_id=%s, status=%s",
+            venda.id,
+            venda.status,
+        )
+        raise ValidationError(
+            f"Não é permitido adicionar itens quando a venda está em status {venda.status}."
+        )
+
+    if not itens:
+        raise ValidationError("Nenhum item informado.")
+
+    logger.info(
+        "Adicionando itens em lote. venda_id=%s, linhas=%s, estrito=%s",
+        venda.id,
+        len(itens),
+        estrito,
+    )
+
+    por_codigo = _resolver_codigos_barras(
+        [e.codigo_barras for e in itens if not e.produto_id and e.codigo_barras]
+    )
+
+    produto_ids = {str(e.produto_id) for e in itens if e.produto_id}
+    for ids in por_codigo.values():
+        produto_ids.update(ids)
+    produtos = {str(p.id): p for p in Produto.objects.filter(id__in=produto_ids)}
+
+    # limites de terminal/filial/perfil uma vez para o lote inteiro
+    limites_base = None
+    if any(e.percentual_desconto is not None and e.percentual_desconto > 0 for e in itens):
+        limites_base = obter_limites_base(
+            terminal_id=venda.terminal_id,
+            filial_id=venda.filial_id,
+            perfil_id=operador.perfil_id,
+        )
+
+    novos: List[VendaItem] = []
+    erros: List[ItemLoteErro] = []
+
+    for indice, entrada in enumerate(itens):
+        def erro(codigo: str, mensagem: str) -> None:
+            erros.append(ItemLoteErro(indice=indice, codigo=codigo, mensagem=mensagem))
+
+        if entrada.produto_id:
+            produto = produtos.get(str(entrada.produto_id))
+        elif entrada.codigo_barras:
+            candidatos = por_codigo.get(entrada.codigo_barras, [])
+            if len(candidatos) > 1:
+                erro("CODIGO_BARRAS_AMBIGUO", "Código de barras associado a mais de um produto.")
+                continue
+            produto = produtos.get(candidatos[0]) if candidatos else None
+        else:
+            erro("PRODUTO_NAO_INFORMADO", "Informe produto_id ou codigo_barras.")
+            continue
+
+        if produto is None:
+            erro("PRODUTO_NAO_ENCONTRADO", "Produto não encontrado.")
+            continue
+
+        quantidade = entrada.quantidade
+        if quantidade is None or quantidade <= 0:
+            erro("QUANTIDADE_INVALIDA", "Quantidade do item deve ser maior que zero.")
+            continue
+
+        preco_unitario = produto.preco_venda
+        if preco_unitario is None:
+            erro("PRODUTO_SEM_PRECO", "Produto não possui campo 'preco_venda' definido.")
+            continue
+
+        total_bruto = de_centavos(bruto_centavos(preco_unitario, quantidade))
+        item = VendaItem(
+            venda=venda,
+            produto=produto,
+            descricao=produto.descricao,
+            quantidade=quantidade,
+            preco_unitario=preco_unitario,
+            total_bruto=total_bruto,
+            total_liquido=total_bruto,
+        )
+
+        percentual = entrada.percentual_desconto
+        if percentual is not None and percentual > 0:
+            try:
+                item = DescontoService.aplicar_desconto_item(
+                    venda=venda,
+                    item=item,
+                    percentual_desconto_aplicado=percentual,
+                    operador=operador,
+                    motivo=motivo_desconto,
+                    metodo_pagamento=metodo_pagamento,
+                    aprovador=aprovador,
+                    operador_autenticado=operador_autenticado,
+                    aprovador_autenticado=aprovador_autenticado,
+                    salvar=False,
+                    limites_base=limites_base,
+                )
+            except DescontoError as exc:
+                erro(
+                    _CODIGOS_ERRO_DESCONTO.get(type(exc), "DESCONTO_INVALIDO"),
+                    getattr(exc, "mensagem", str(exc)),
+                )
+                continue
+
+        # mesmas regras de VendaItem.clean(): bulk_create não passa pelo save() individual
+        item.desconto = item.total_bruto - item.total_liquido
+        try:
+            item.validar_valores()
+        except ValidationError as exc:
+            erro("ITEM_INVALIDO", "; ".join(exc.messages))
+            continue
+
+        novos.append(item)
+
+    if erros and estrito:
+        logger.warning(
+            "Lote de itens recusado (modo estrito). venda_id=%s, erros=%s",
+            venda.id,
+            len(erros),
+        )
+        raise ValidationError(
+            [f"Linha {e.indice}: {e.mensagem}" for e in erros],
+            code="ITENS_LOTE_INVALIDOS",
+        )
+
+    if novos:
+        VendaItem.objects.bulk_create(novos)
+        aplicar_delta_totais_venda(
+            venda,
+            delta_bruto=sum((i.total_bruto for i in novos), Decimal("0.00")),
+            delta_liquido=sum((i.total_liquido for i in novos), Decimal("0.00")),
+        )
+
+    logger.info(
+        "Itens em lote adicionados. venda_id=%s, gravados=%s, erros=%s, total_bruto=%s, total_liquido=%s",
+        venda.id,
+        len(novos),
+        len(erros),
+        venda.total_bruto,
+        venda.total_liquido,
+    )
+    return ResultadoItensLote(itens=novos, erros=erros)
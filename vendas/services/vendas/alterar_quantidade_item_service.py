@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from typing import Optional
 
 from django.core.exceptions import ValidationError
@@ -14,8 +14,10 @@ from promocoes.models.motivo_desconto_models import MotivoDesconto
 from usuario.models.usuario_models import User
 from vendas.models.venda_item_models import VendaItem
 from vendas.models.venda_models import Venda,  VendaStatus
+from vendas.utils.calculo_carrinho import bruto_centavos
 from vendas.services.desconto_service import DescontoService
-from vendas.services.vendas.totais_venda_service import recalcular_totais_venda
+from vendas.utils.centavos import de_centavos
+from vendas.services.vendas.totais_venda_service import aplicar_delta_totais_venda
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,8 @@ def alterar_quantidade_item(
     - Se o item já tinha percentual_desconto_aplicado, reaplica o MESMO percentual
       usando DescontoService (respeitando limites).
     - Se não tinha desconto ou percentual=0 -> sem desconto.
+    - O item é gravado uma vez (inclusive o valor de desconto) e os totais da
+      venda são ajustados por delta e relidos.
     """
     from decimal import Decimal as D
 
@@ -70,17 +74,14 @@ def alterar_quantidade_item(
         perc_antigo,
     )
 
+    bruto_anterior = item.total_bruto
+    liquido_anterior = item.total_liquido
+
     item.quantidade = nova_quantidade
-    item.total_bruto = (item.preco_unitario * nova_quantidade).quantize(
-        D("0.01"), rounding=ROUND_HALF_UP
-    )
+    item.total_bruto = de_centavos(bruto_centavos(item.preco_unitario, nova_quantidade))
     # zera desconto momentaneamente; será recalculado abaixo, se for o caso
     item.percentual_desconto_aplicado = D("0.00")
     item.total_liquido = item.total_bruto
-    item.save(
-        update_fields=["quantidade", "total_bruto", "percentual_desconto_aplicado", "total_liquido"]
-    )
-
 
     if perc_antigo is not None and perc_antigo > 0:
         logger.info(
@@ -102,9 +103,31 @@ def alterar_quantidade_item(
             aprovador=aprovador,
             operador_autenticado=operador_autenticado,
             aprovador_autenticado=aprovador_autenticado,
+            salvar=False,
         )
-    else:
-        recalcular_totais_venda(venda)
+
+    item.desconto = item.total_bruto - item.total_liquido
+
+    item.save(
+        update_fields=[
+            "quantidade",
+            "total_bruto",
+            "percentual_desconto_aplicado",
+            "desconto",
+            "total_liquido",
+            "motivo_desconto",
+            "desconto_aprovado_por",
+        ]
+    )
+
+    aplicar_delta_totais_venda(
+        venda,
+        delta_bruto=item.total_bruto - bruto_anterior,
+        delta_liquido=item.total_liquido - liquido_anterior,
+    )
+    # o delta foi aplicado por F() no banco; a instância recebe os totais
+    # efetivos (inclusive alterações concorrentes de outros itens)
+    venda.refresh_from_db(fields=["total_bruto", "total_desconto", "total_liquido"])
 
     logger.info(
         "Quantidade alterada com sucesso. venda_id=%s, item_id=%s, nova_qtd=%s, total_bruto=%s, total_liquido=%s",
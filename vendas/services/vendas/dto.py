@@ -29,3 +29,40 @@ class ResumoCarrinho:
     total_desconto: Decimal
     total_liquido: Decimal
     itens: List[ResumoItemCarrinho]
+
+
+@dataclass
+class DivergenciaTotaisVenda:
+    venda_id: str
+    total_bruto: Decimal
+    total_desconto: Decimal
+    total_liquido: Decimal
+    esperado_bruto: Decimal
+    esperado_desconto: Decimal
+    esperado_liquido: Decimal
+    corrigida: bool = False
+
+
+@dataclass
+class ItemLoteEntrada:
+    """
+    Linha de entrada de adicionar_itens_lote: produto_id OU codigo_barras.
+    """
+
+    quantidade: Decimal
+    produto_id: Optional[str] = None
+    codigo_barras: Optional[str] = None
+    percentual_desconto: Optional[Decimal] = None
+
+
+@dataclass
+class ItemLoteErro:
+    indice: int
+    codigo: str
+    mensagem: str
+
+
+@dataclass
+class ResultadoItensLote:
+    itens: list
+    erros: List[ItemLoteErro]
@@ -9,7 +9,7 @@ from django.db import transaction
 
 from vendas.models.venda_models import Venda, VendaStatus
 from vendas.models.venda_item_models import VendaItem
-from vendas.services.vendas.totais_venda_service import recalcular_totais_venda
+from vendas.services.vendas.totais_venda_service import aplicar_delta_totais_venda
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 @transaction.atomic
 def remover_item(*, venda: Venda, item: VendaItem) -> None:
     """
-    Remove um item do carrinho e recalcula os totais.
+    Remove um item do carrinho e subtrai seus valores dos totais da venda.
 
     Se o carrinho ficar vazio, a venda continua ABERTA, porém com totais zerados.
     """
@@ -35,8 +35,15 @@ def remover_item(*, venda: Venda, item: VendaItem) -> None:
         "Removendo item da venda. venda_id=%s, item_id=%s", venda.id, item.id
     )
 
+    delta_bruto = -item.total_bruto
+    delta_liquido = -item.total_liquido
+
     item.delete()
-    recalcular_totais_venda(venda)
+    aplicar_delta_totais_venda(
+        venda,
+        delta_bruto=delta_bruto,
+        delta_liquido=delta_liquido,
+    )
 
     logger.info(
         "Item removido. venda_id=%s, novos_totais: bruto=%s, desc=%s, liquido=%s",
@@ -3,11 +3,16 @@
 from __future__ import annotations
 
 import logging
+from decimal import Decimal
+from typing import Iterable, List, Optional
 
 from django.db import transaction
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
 
-from vendas.models.venda_models import Venda
+from vendas.models.venda_models import Venda, VendaStatus
 from vendas.services.desconto_service import DescontoService
+from vendas.services.vendas.dto import DivergenciaTotaisVenda
 
 logger = logging.getLogger(__name__)
 
@@ -37,3 +42,93 @@ def recalcular_totais_venda(venda: Venda, salvar: bool = True) -> Venda:
         venda_atualizada.total_liquido,
     )
     return venda_atualizada
+
+
+def aplicar_delta_totais_venda(
+    venda: Venda,
+    *,
+    delta_bruto: Decimal,
+    delta_liquido: Decimal,
+) -> Venda:
+    """
+    Ajusta os totais da venda pela variação de um item (ver
+    DescontoService.aplicar_delta_totais_venda). Usado pelas operações de
+    carrinho no lugar do recálculo completo.
+    """
+    return DescontoService.aplicar_delta_totais_venda(
+        venda,
+        delta_bruto=delta_bruto,
+        delta_liquido=delta_liquido,
+    )
+
+
+def verificar_totais_vendas(
+    *,
+    status: Optional[Iterable[str]] = (VendaStatus.ABERTA,),
+    corrigir: bool = False,
+) -> List[DivergenciaTotaisVenda]:
+    """
+    Compara os totais mantidos por delta com um recálculo completo.
+
+    - Uma única query agrega os itens por venda (status=None -> todas).
+    - Cada divergência é registrada em log; com corrigir=True a venda é
+      travada e recalculada via recalcular_totais_venda.
+    """
+    zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    qs = Venda.objects.all()
+    if status is not None:
+        qs = qs.filter(status__in=list(status))
+
+    linhas = (
+        qs.annotate(
+            soma_bruto=Coalesce(Sum("itens__total_bruto"), zero),
+            soma_liquido=Coalesce(Sum("itens__total_liquido"), zero),
+        )
+        .values_list(
+            "id",
+            "total_bruto",
+            "total_desconto",
+            "total_liquido",
+            "soma_bruto",
+            "soma_liquido",
+        )
+        .order_by("id")
+    )
+
+    divergencias: List[DivergenciaTotaisVenda] = []
+    for venda_id, bruto, desconto, liquido, soma_bruto, soma_liquido in linhas.iterator():
+        esperado_desconto = soma_bruto - soma_liquido
+        if (bruto, desconto, liquido) == (soma_bruto, esperado_desconto, soma_liquido):
+            continue
+
+        divergencia = DivergenciaTotaisVenda(
+            venda_id=str(venda_id),
+            total_bruto=bruto,
+            total_desconto=desconto,
+            total_liquido=liquido,
+            esperado_bruto=soma_bruto,
+            esperado_desconto=esperado_desconto,
+            esperado_liquido=soma_liquido,
+        )
+        logger.warning(
+            "Totais da venda divergentes do recálculo. venda_id=%s "
+            "(armazenado: bruto=%s, desc=%s, liquido=%s; esperado: bruto=%s, desc=%s, liquido=%s)",
+            venda_id,
+            bruto,
+            desconto,
+            liquido,
+            soma_bruto,
+            esperado_desconto,
+            soma_liquido,
+        )
+
+        if corrigir:
+            with transaction.atomic():
+                venda = Venda.objects.select_for_update().get(pk=venda_id)
+                recalcular_totais_venda(venda)
+            divergencia.corrigida = True
+
+        divergencias.append(divergencia)
+
+    return divergencias
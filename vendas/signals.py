@@ -0,0 +1,30 @@
+# vendas/signals.py
+"""
+Invalidação do cache de limites de desconto
+(vendas.services.limites_desconto_cache_service).
+
+Qualquer save/delete de Terminal, Filial ou UserPerfil avança a geração do
+tenant, na hora e de novo no commit (mesma regra de fiscal.signals).
+"""
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from vendas.services.limites_desconto_cache_service import invalidar_limites_desconto
+
+
+def _invalidar_limites_desconto(sender, **kwargs):
+    schema = getattr(connection, "schema_name", "")
+    invalidar_limites_desconto(schema)
+    transaction.on_commit(lambda: invalidar_limites_desconto(schema))
+
+
+def conectar_sinais_limites_desconto():
+    from filial.models import Filial
+    from terminal.models.terminal_models import Terminal
+    from usuario.models.usuario_models import UserPerfil
+
+    for model in (Terminal, Filial, UserPerfil):
+        uid = f"vendas_limites_desconto_{model._meta.label_lower}"
+        post_save.connect(_invalidar_limites_desconto, sender=model, dispatch_uid=f"{uid}_save")
+        post_delete.connect(_invalidar_limites_desconto, sender=model, dispatch_uid=f"{uid}_delete")
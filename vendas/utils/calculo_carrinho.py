@@ -0,0 +1,243 @@
+# vendas/utils/calculo_carrinho.py
+"""
+Núcleo de cálculo do carrinho em centavos inteiros.
+
+Concentra a aritmética que estava espalhada em VendaItem.recalcular_totais,
+adicionar_item/alterar_quantidade_item, DescontoService e
+Venda.saldo_a_pagar, cada um com seus próprios Decimal.quantize. Aqui não há
+Django nem Decimal no laço: os valores viram inteiros exatos uma vez na
+entrada (preço, quantidade e percentual como inteiro + escala, dinheiro em
+centavos) e voltam a Decimal só na saída.
+
+Arredondamento idêntico ao de antes (ROUND_HALF_UP em cada etapa):
+  - total_bruto do item  = round(preco * quantidade, 2)
+  - desconto do item     = round(total_bruto * percentual / 100, 2)
+  - desconto da venda    = maiores restos sobre o total_bruto dos itens
+                           (vendas.utils.centavos), substitui o do item
+  - percentual do rateio = round(desconto / total_bruto * 100, 2)
+  - total_pago/troco     = soma dos pagamentos autorizados
+  - saldo_a_pagar        = total_liquido - total_pago + total_troco
+
+Não importa models nem services: os models de vendas também o usam.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence, Tuple
+
+from vendas.utils.centavos import (
+    de_centavos,
+    para_centavos,
+    ratear_maiores_restos,
+)
+
+def _escalado(valor) -> Tuple[int, int]:
+    """
+    Decimal exato como fração de inteiros: Decimal("1.25") -> (5, 4).
+    """
+    if type(valor) is int:
+        return valor, 1
+    return Decimal(valor).as_integer_ratio()
+
+
+def _dividir_half_up(numerador: int, denominador: int) -> int:
+    """
+    numerador / denominador arredondado com ROUND_HALF_UP (meio afasta do zero).
+    """
+    q, r = divmod(abs(numerador), denominador)
+    if 2 * r >= denominador:
+        q += 1
+    return -q if numerador < 0 else q
+
+
+def bruto_centavos(preco_unitario, quantidade) -> int:
+    """
+    round(preco_unitario * quantidade, 2) em centavos.
+    """
+    preco, escala_preco = _escalado(preco_unitario)
+    qtd, escala_qtd = _escalado(quantidade)
+    return _dividir_half_up(preco * qtd * 100, escala_preco * escala_qtd)
+
+
+def desconto_percentual_centavos(bruto: int, percentual) -> int:
+    """
+    round(bruto * percentual / 100, 2) em centavos; percentual None/<=0 -> 0.
+    """
+    if percentual is None or percentual <= 0:
+        return 0
+    valor, escala = _escalado(percentual)
+    return _dividir_half_up(bruto * valor, 100 * escala)
+
+
+def percentual_de_centavos(desconto: int, bruto: int) -> Decimal:
+    """
+    round(desconto / bruto * 100, 2) como Decimal; bruto 0 -> 0.00.
+    """
+    if bruto <= 0:
+        return Decimal("0.00")
+    return Decimal(_dividir_half_up(desconto * 100 * 100, bruto)).scaleb(-2)
+
+
+class ItemCarrinho:
+    """
+    Linha do carrinho. Entrada: preço, quantidade e percentual (ou desconto
+    absoluto); saída (após calcular_carrinho): bruto/desconto/liquido em centavos.
+    """
+
+    __slots__ = (
+        "chave",
+        "preco_unitario",
+        "quantidade",
+        "percentual",
+        "percentual_fracao",
+        "desconto_fixo",
+        "bruto",
+        "desconto",
+        "liquido",
+    )
+
+    def __init__(
+        self,
+        *,
+        preco_unitario,
+        quantidade,
+        percentual=None,
+        desconto_fixo: Optional[int] = None,
+        bruto: Optional[int] = None,
+        chave=None,
+    ):
+        self.chave = chave
+        self.preco_unitario = preco_unitario
+        self.quantidade = quantidade
+        self.percentual = percentual
+        # convertido uma vez: recálculos seguintes só usam inteiros
+        self.percentual_fracao = (
+            _escalado(percentual) if percentual is not None and percentual > 0 else None
+        )
+        self.desconto_fixo = desconto_fixo
+        self.bruto = bruto
+        self.desconto = 0
+        self.liquido = 0
+
+    @property
+    def percentual_aplicado(self) -> Decimal:
+        """
+        Percentual efetivo do desconto: o informado ou, para desconto
+        absoluto (rateio), o equivalente sobre o bruto.
+        """
+        if self.desconto_fixo is None and self.percentual is not None:
+            return Decimal(self.percentual)
+        return percentual_de_centavos(self.desconto, self.bruto)
+
+
+class PagamentoCarrinho:
+    """
+    Pagamento autorizado: valor (valor_autorizado) e troco, em centavos.
+    """
+
+    __slots__ = ("valor", "troco")
+
+    def __init__(self, *, valor: int, troco: int = 0):
+        self.valor = valor
+        self.troco = troco
+
+
+class TotaisCarrinho:
+    """
+    Totais da venda em centavos; decimal() devolve o dicionário de campos de Venda.
+    """
+
+    __slots__ = ("bruto", "desconto", "liquido", "pago", "troco")
+
+    def __init__(self, bruto: int = 0, desconto: int = 0, liquido: int = 0, pago: int = 0, troco: int = 0):
+        self.bruto = bruto
+        self.desconto = desconto
+        self.liquido = liquido
+        self.pago = pago
+        self.troco = troco
+
+    @property
+    def saldo(self) -> int:
+        return self.liquido - self.pago + self.troco
+
+    def decimal(self) -> dict:
+        return {
+            "total_bruto": de_centavos(self.bruto),
+            "total_desconto": de_centavos(self.desconto),
+            "total_liquido": de_centavos(self.liquido),
+            "total_pago": de_centavos(self.pago),
+            "total_troco": de_centavos(self.troco),
+        }
+
+
+def calcular_carrinho(
+    itens: Sequence[ItemCarrinho],
+    *,
+    desconto_venda: Optional[int] = None,
+    pagamentos: Iterable[PagamentoCarrinho] = (),
+) -> TotaisCarrinho:
+    """
+    Calcula itens e totais em uma passada (mais uma para o rateio, se houver).
+
+    - item.bruto já informado é mantido (valor persistido); senão vem de preço x quantidade.
+    - desconto_venda (centavos) é rateado sobre os brutos e substitui o desconto
+      dos itens, como DescontoService.aplicar_desconto_total_venda.
+    - Não valida limites nem sinal dos resultados: isso fica com os services.
+    """
+    total_bruto = 0
+    total_desconto = 0
+
+    if desconto_venda is not None:
+        for item in itens:
+            if item.bruto is None:
+                item.bruto = bruto_centavos(item.preco_unitario, item.quantidade)
+        partes = ratear_maiores_restos(desconto_venda, [i.bruto for i in itens])
+        for item, parte in zip(itens, partes):
+            item.desconto_fixo = parte
+
+    for item in itens:
+        bruto = item.bruto
+        if bruto is None:
+            bruto = item.bruto = bruto_centavos(item.preco_unitario, item.quantidade)
+
+        desconto = item.desconto_fixo
+        if desconto is None:
+            fracao = item.percentual_fracao
+            desconto = _dividir_half_up(bruto * fracao[0], 100 * fracao[1]) if fracao else 0
+
+        item.desconto = desconto
+        item.liquido = bruto - desconto
+        total_bruto += bruto
+        total_desconto += desconto
+
+    totais = TotaisCarrinho(
+        bruto=total_bruto,
+        desconto=total_desconto,
+        liquido=total_bruto - total_desconto,
+    )
+
+    for pagamento in pagamentos:
+        totais.pago += pagamento.valor
+        totais.troco += pagamento.troco
+
+    return totais
+
+
+def item_de_venda_item(item, *, manter_bruto: bool = True) -> ItemCarrinho:
+    """
+    ItemCarrinho a partir de um VendaItem (desconto atual = bruto - líquido).
+    """
+    bruto = para_centavos(item.total_bruto) if manter_bruto and item.total_bruto is not None else None
+    desconto = None
+    if bruto is not None and item.total_liquido is not None:
+        desconto = bruto - para_centavos(item.total_liquido)
+    return ItemCarrinho(
+        chave=item.pk,
+        preco_unitario=item.preco_unitario,
+        quantidade=item.quantidade,
+        percentual=item.percentual_desconto_aplicado,
+        desconto_fixo=desconto,
+        bruto=bruto,
+    )
+
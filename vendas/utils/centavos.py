@@ -0,0 +1,72 @@
+# vendas/utils/centavos.py
+"""
+Dinheiro em centavos inteiros e rateio pelos maiores restos.
+
+Sem dependência de models/services: usado pelos models de vendas
+(VendaItem, Venda) e pelo núcleo de cálculo do carrinho.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Sequence
+
+CENTAVO = Decimal("0.01")
+
+
+def para_centavos(valor: Decimal) -> int:
+    """
+    Converte um valor monetário em centavos inteiros (ROUND_HALF_UP).
+    """
+    return int((Decimal(valor) / CENTAVO).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def de_centavos(centavos: int) -> Decimal:
+    """
+    Converte centavos inteiros em Decimal com 2 casas.
+    """
+    return (Decimal(centavos) * CENTAVO).quantize(CENTAVO)
+
+
+def ratear_maiores_restos(valor_centavos: int, pesos_centavos: Sequence[int]) -> List[int]:
+    """
+    Reparte valor_centavos proporcionalmente aos pesos pelo método dos maiores
+    restos (Hamilton), apenas com aritmética inteira.
+
+    - Cada parte recebe floor(valor * peso / soma_pesos).
+    - Os centavos que sobram vão, um a um, para as maiores frações descartadas
+      (empate: maior peso, depois menor índice), o que torna o resultado
+      determinístico.
+    - sum(resultado) == valor_centavos sempre; valor negativo (acréscimo) é
+      rateado pelo módulo e devolvido com sinal.
+    - Com 0 <= |valor| <= soma_pesos, nenhuma parte excede o próprio peso.
+
+    Lança ValueError se houver peso negativo ou se a soma dos pesos for zero.
+    """
+    if any(p < 0 for p in pesos_centavos):
+        raise ValueError("Pesos do rateio não podem ser negativos.")
+
+    soma = sum(pesos_centavos)
+    if soma <= 0:
+        raise ValueError("Soma dos pesos do rateio deve ser maior que zero.")
+
+    sinal = -1 if valor_centavos < 0 else 1
+    valor = abs(valor_centavos)
+
+    partes: List[int] = []
+    restos: List[int] = []
+    for peso in pesos_centavos:
+        parte, resto = divmod(valor * peso, soma)
+        partes.append(parte)
+        restos.append(resto)
+
+    sobra = valor - sum(partes)
+    if sobra:
+        ordem = sorted(
+            range(len(pesos_centavos)),
+            key=lambda i: (-restos[i], -pesos_centavos[i], i),
+        )
+        for i in ordem[:sobra]:
+            partes[i] += 1
+
+    return [sinal * p for p in partes]